@@ -68,104 +68,64 @@ def logBasicSettings():
     del f
 
 ## ================================================================================================================
-def createPool(elevationValue,storageTxtFile):
+def createPools(demArray, demInfo, storageRows):
+    # Traces the pool of every stage from the clipped DEM array in one pass, creates a Pool_<elev> feature
+    # class for each stage and writes all of the pools to the merged pool feature class in one insert.
+    # storageRows is the StageStorageTable (or list of rows) of the stages.
     try:
         global conversionFactor,acreConversion,ftConversion,volConversion
 
-        tempDEM2 = watershedGDB_path + os.sep + "tempDEM2"
-        tempDEM3 = watershedGDB_path + os.sep + "tempDEM3"
-        tempDEM4 = watershedGDB_path + os.sep + "tempDEM4"
-        poolTemp = watershedFD + os.sep + "poolTemp"
-        poolTempLayer = os.path.dirname(watershedGDB_path) + os.sep + "poolTemp.shp"
+        poolFields = ["ELEV_FEET","POOL_ACRES","POOL_SQFT","ACRE_FOOT"]
+        pools = poolPolygons.poolRings(demArray, demInfo, [storageRow[0] for storageRow in storageRows])
 
-        # Just in case they exist Remove them
-        layersToRemove = (tempDEM2,tempDEM3,tempDEM4,poolTemp,poolTempLayer)
-           
-        for layer in layersToRemove:
-            if arcpy.Exists(layer):
-                try:
-                    arcpy.Delete_management(layer)
-                except:
-                    pass
+        arcpy.CreateFeatureclass_management(watershedFD, os.path.basename(PoolMerge), "POLYGON", "", "DISABLED", "DISABLED", sr)
+        for field in poolFields:
+            arcpy.AddField_management(PoolMerge, field, "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
 
-        fcName =  ("Pool_" + str(round((elevationValue * conversionFactor),1))).replace(".","_")
-        
-        poolExit = watershedFD + os.sep + fcName        
-
-        # Create new raster of only values below an elevation value
-        conStatement = "Value > " + str(elevationValue)
-        #gp.SetNull_sa(tempDEM, tempDEM, tempDEM2, conStatement)
-        tempNull = arcpy.sa.SetNull(tempDEM, tempDEM, conStatement)
-        tempNull.save(tempDEM2)
-
-        # Multiply every pixel by 0 and convert to integer for vectorizing
-        # with geoprocessor 9.3 you need to have 0 w/out quotes.
-        #gp.Times_sa(tempDEM2, 0, tempDEM3)
-        tempTimes = arcpy.sa.Times(tempDEM2, 0)
-        tempTimes.save(tempDEM3)
-        
-        #gp.Int_sa(tempDEM3, tempDEM4)
-        tempInt = arcpy.sa.Int(tempDEM3)
-        tempInt.save(tempDEM4)
-
-        # Convert to polygon and dissolve
-        # This continuously fails despite changing env settings.  Works fine from python win
-        # but always fails from arcgis 10 not 9.3.  Some reason ArcGIS 10 thinks that the
-        # output of RasterToPolygon is empty?
-        try:
-            arcpy.RasterToPolygon_conversion(tempDEM4, poolTemp, "NO_SIMPLIFY", "VALUE")
-            
-        except:
-            if arcpy.Exists(poolTemp):
-                pass
-                 #AddMsgAndPrint(" ",0)
-            else:
-                AddMsgAndPrint("\n" + arcpy.GetMessages(2) + "\n",2)
-                sys.exit()
-
-        arcpy.CopyFeatures_management(poolTemp,poolTempLayer)
-        arcpy.Dissolve_management(poolTempLayer, poolExit, "", "", "MULTI_PART", "DISSOLVE_LINES")
-      
-        arcpy.AddField_management(poolExit, "ELEV_FEET", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-        arcpy.AddField_management(poolExit, "POOL_ACRES", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-        arcpy.AddField_management(poolExit, "POOL_SQFT", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-        arcpy.AddField_management(poolExit, "ACRE_FOOT", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-
-        # open storageCSV file and read the last line which should represent the last pool
-        file = open(storageTxtFile)
-        lines = file.readlines()
-        file.close()    
-
-        area2D = float(lines[len(lines)-1].split(',')[4])
-        volume = float(lines[len(lines)-1].split(',')[6])
-
-        elevFeetCalc = round(elevationValue * conversionFactor,1)
-        poolAcresCalc = round(area2D / acreConversion,1)
-        poolSqftCalc = round(area2D / ftConversion,1)
-        acreFootCalc = round(volume / volConversion,1)
-     
-        arcpy.CalculateField_management(poolExit, "ELEV_FEET", elevFeetCalc, "PYTHON")
-        arcpy.CalculateField_management(poolExit, "POOL_ACRES", poolAcresCalc, "PYTHON")
-        arcpy.CalculateField_management(poolExit, "POOL_SQFT", poolSqftCalc, "PYTHON")
-        arcpy.CalculateField_management(poolExit, "ACRE_FOOT", acreFootCalc, "PYTHON")
-
-        AddMsgAndPrint("\n\tCreated " + fcName + ":",0)
-        AddMsgAndPrint("\t\tArea:   " + str(splitThousands(round(poolSqftCalc,1))) + " Sq.Feet",0)
-        AddMsgAndPrint("\t\tAcres:  " + str(splitThousands(round(poolAcresCalc,1))),0)
-        AddMsgAndPrint("\t\tVolume: " + str(splitThousands(round(acreFootCalc,1))) + " Ac. Foot",0)
-
-        #------------------------------------------------------------------------------------ Delete Temp Layers
-        layersToRemove = (tempDEM2,tempDEM3,tempDEM4,poolTemp,poolTempLayer)
-     
-        for layer in layersToRemove:
-            if arcpy.Exists(layer):
-                try:
-                    arcpy.Delete_management(layer)
-                except:
-                    pass
+        poolRows = []
+        for elevationValue, area2D, area3D, volume in storageRows:
+            rings = pools[elevationValue]
+            if not rings:
+                AddMsgAndPrint("\nFailed to Create Pool Polygon for elevation value: " + str(elevationValue),1)
+                continue
+
+            fcName =  ("Pool_" + str(round((elevationValue * conversionFactor),1))).replace(".","_")
+
+            elevFeetCalc = round(elevationValue * conversionFactor,1)
+            poolAcresCalc = round(area2D / acreConversion,1)
+            poolSqftCalc = round(area2D / ftConversion,1)
+            acreFootCalc = round(volume / volConversion,1)
+
+            poolShape = arcpy.Polygon(arcpy.Array([arcpy.Array([arcpy.Point(x, y) for x, y in ring]) for ring in rings]), sr)
+            poolRows.append((fcName, (poolShape, elevFeetCalc, poolAcresCalc, poolSqftCalc, acreFootCalc)))
+
+            AddMsgAndPrint("\n\tCreated " + fcName + ":",0)
+            AddMsgAndPrint("\t\tArea:   " + str(splitThousands(round(poolSqftCalc,1))) + " Sq.Feet",0)
+            AddMsgAndPrint("\t\tAcres:  " + str(splitThousands(round(poolAcresCalc,1))),0)
+            AddMsgAndPrint("\t\tVolume: " + str(splitThousands(round(acreFootCalc,1))) + " Ac. Foot",0)
+
+        del pools
+
+        # All pools in one insert
+        rows = arcpy.da.InsertCursor(PoolMerge, ["SHAPE@"] + poolFields)
+        for fcName, poolRow in poolRows:
+            rows.insertRow(poolRow)
+        del rows
+        AddMsgAndPrint("\nSuccessfully Merged Pools into " + os.path.basename(PoolMerge),0)
+
+        # One feature class per stage, using the merged pools as the schema template
+        for fcName, poolRow in poolRows:
+            poolExit = watershedFD + os.sep + fcName
+            arcpy.CreateFeatureclass_management(watershedFD, fcName, "POLYGON", PoolMerge, "DISABLED", "DISABLED", sr)
+            rows = arcpy.da.InsertCursor(poolExit, ["SHAPE@"] + poolFields)
+            rows.insertRow(poolRow)
+            del rows
+
+        del poolRows
+        return True
 
     except:
-        AddMsgAndPrint("\nFailed to Create Pool Polygon for elevation value: " + str(elevationValue),1)
+        AddMsgAndPrint("\nFailed to Create Pool Polygons",1)
         print_exception()
         sys.exit()
         return False
@@ -184,6 +144,8 @@ def splitThousands(someNumber):
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, string, traceback, re
+import numpy as np
+import rasterArrays, stageStorage, poolPolygons
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -211,13 +173,6 @@ try:
         arcpy.AddError("Spatial Analyst Extension not enabled. Please enable Spatial analyst from the Tools/Extensions menu. Exiting...\n")
         sys.exit()
 
-    # Check out 3D Analyst License        
-    if arcpy.CheckExtension("3D") == "Available":
-        arcpy.CheckOutExtension("3D")
-    else:
-        arcpy.AddError("3D Analyst Extension not enabled. Please enable 3D Analyst from the Tools/Extensions menu. Exiting...\n")
-        sys.exit()
-
     #----------------------------------------------------------------------------------------- Input Parameters
     inputDEM = arcpy.GetParameterAsText(0)
     zUnits = arcpy.GetParameterAsText(1)
@@ -455,9 +410,12 @@ try:
     tempMask = arcpy.sa.ExtractByMask(inputDEM, inPool)
     tempMask.save(tempDEM)
 
+    # Read the clipped DEM once; the stage-storage curve and the elevation range both come from this array
+    demArray, demInfo = rasterArrays.rasterToArray(tempDEM)
+
     # User specified max elevation value must be within min-max elevation range of clipped dem
-    demTempMaxElev = round(float(arcpy.GetRasterProperties_management(tempDEM, "MAXIMUM").getOutput(0)),1)
-    demTempMinElev = round(float(arcpy.GetRasterProperties_management(tempDEM, "MINIMUM").getOutput(0)),1)
+    demTempMaxElev = round(float(np.nanmax(demArray)),1)
+    demTempMinElev = round(float(np.nanmin(demArray)),1)
 
     # convert max elev value and increment(FT) to match the native Z-units of input DEM
     maxElevConverted = maxElev * Zfactor
@@ -478,23 +436,20 @@ try:
 
     # --------------------------------------------------------------------------------- Set Elevations to calculate volume and surface area                   
     try:
-        i = 1    
-        while maxElevConverted > demTempMinElev:
+        stages = stageStorage.stageElevations(maxElevConverted, demTempMinElev, increment)
 
-            if i == 1:
-                AddMsgAndPrint("\nDeriving Surface Volume for elevation values between " + str(round(demTempMinElev * conversionFactor,1)) + " and " + str(maxElev) + " FT every " + str(userIncrement) + " FT" ,0)
-                numOfPoolsToCreate = str(int(round((maxElevConverted - demTempMinElev)/increment)))
-                AddMsgAndPrint(numOfPoolsToCreate + " Pool Feature Classes will be created",0)
-                i+=1
+        AddMsgAndPrint("\nDeriving Surface Volume for elevation values between " + str(round(demTempMinElev * conversionFactor,1)) + " and " + str(maxElev) + " FT every " + str(userIncrement) + " FT" ,0)
+        AddMsgAndPrint(str(len(stages)) + " Pool Feature Classes will be created",0)
 
-            arcpy.SurfaceVolume_3d(tempDEM, storageCSV, "BELOW", maxElevConverted, "1")
+        # Sort the DEM cells once and derive area and volume for every stage from prefix sums
+        elevIndex = stageStorage.buildElevationIndex(demArray, demInfo["cellWidth"], demInfo["cellHeight"])
+        stageTable = stageStorage.StageStorageTable(stageStorage.stageStorage(elevIndex, stages))
+
+        if b_createPools:
+            createPools(demArray, demInfo, stageTable)
+
+        del stages, elevIndex, demArray
 
-            if b_createPools:
-                if not createPool(maxElevConverted,storageCSV):
-                    pass
-            maxElevConverted = maxElevConverted - increment
-        del i            
-  
     except:
         print_exception()
         sys.exit()
@@ -503,6 +458,10 @@ try:
         arcpy.Delete_management(tempDEM)
         
     #------------------------------------------------------------------------ Convert StorageCSV to FGDB Table and populate fields.
+    # The storage curve is kept in memory for all stages and written out once here
+    stageTable.writeCSV(storageCSV, tempDEM)
+    del stageTable
+
     arcpy.CopyRows_management(storageCSV, storageTable, "")
     arcpy.AddField_management(storageTable, "ELEV_FEET", "DOUBLE", "5", "1", "", "", "NULLABLE", "NON_REQUIRED", "")
     arcpy.AddField_management(storageTable, "POOL_ACRES", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
@@ -523,26 +482,6 @@ try:
 
     AddMsgAndPrint("\nSuccessfully Created " + os.path.basename(storageTable),0)
 
-    #------------------------------------------------------------------------ Append all Pool Polygons together
-    if b_createPools:
-        mergeList = ""
-        i = 1
-        arcpy.env.workspace = watershedFD
-        poolFCs = arcpy.ListFeatureClasses("Pool_*")
-
-        for poolFC in poolFCs:
-            if i == 1:
-                mergeList = arcpy.Describe(poolFC).CatalogPath + ";"
-            else:
-                mergeList = mergeList + ";" + arcpy.Describe(poolFC).CatalogPath
-            i+=1
-
-        arcpy.Merge_management(mergeList,PoolMerge)
-                
-        AddMsgAndPrint("\nSuccessfully Merged Pools into " + os.path.basename(PoolMerge),0)
-
-        del mergeList,poolFCs,i
-
     # ------------------------------------------------------------------------------------------------ Compact FGDB
     try:
         arcpy.Compact_management(watershedGDB_path)
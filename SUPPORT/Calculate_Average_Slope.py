@@ -73,6 +73,7 @@ def splitThousands(someNumber):
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, traceback, re
+import surfaceSlope, zonalStats
 #import  arcgisscripting
 
 # Environment settings
@@ -125,7 +126,7 @@ try:
     DEM_aoi = watershedGDB_path + os.sep + "slopeDEM"
     DEMsmooth = watershedGDB_path + os.sep + "DEMsmooth_calcAvgSlope"
     slopeGrid = watershedGDB_path + os.sep + "slopeGrid_calcAvgSlope"
-    slopeStats = watershedGDB_path + os.sep + "slopeStats"
+    aoiGrid = watershedGDB_path + os.sep + "aoiGrid"
 
     # ------------------------------- Map Layers
     aoiOut = "" + projectName + "_AOI"
@@ -223,7 +224,7 @@ try:
 
     # ----------------------------------------------------------------------------------------------- Clean old files if FGDB already existed.
     if FGDBexists:     
-        gridsToRemove = (DEM_aoi,DEMsmooth,slopeGrid,slopeStats)
+        gridsToRemove = (DEM_aoi,DEMsmooth,slopeGrid,aoiGrid)
         x = 0
         for grid in gridsToRemove:
             if arcpy.Exists(grid):
@@ -317,20 +318,14 @@ try:
     maskedDEM.save(DEM_aoi)
     AddMsgAndPrint("\nSuccessully Clipped " + os.path.basename(inputDEM) + " using " + os.path.basename(projectAOI),0)
 
-    # Smooth the DEM to remove noise
-    outFocalStats = arcpy.sa.FocalStatistics(DEM_aoi, "RECTANGLE 3 3 CELL","MEAN","DATA")
-    outFocalStats.save(DEMsmooth)
-    AddMsgAndPrint("\nSuccessully Smoothed the Clipped DEM",0)
-
     # Calculate Slope using user specified slopeType and appropriate Z factor
     if slopeType == "Degrees":
         slopeType = "DEGREE"
     else:
         slopeType = "PERCENT_RISE"
 
-    # create slopeGrid        
-    outSlope = arcpy.sa.Slope(DEMsmooth, slopeType, Zfactor)
-    outSlope.save(slopeGrid)
+    # create slopeGrid from the 3x3 smoothed DEM in one pass; the smoothed DEM is not written out
+    surfaceSlope.slopeRaster(DEM_aoi, slopeGrid, Zfactor, slopeType)
     AddMsgAndPrint("\nSuccessully Created Slope Grid using a Z-factor of " + str(Zfactor),0)
 
     # retreive slope average from raster properties if there is only 1 AOI delineation
@@ -353,28 +348,17 @@ try:
 
     # retreive slope average from zonal statistics if there is more than 1 AOI delineation
     else:
-        arcpy.sa.ZonalStatisticsAsTable(projectAOI, "UID", slopeGrid, slopeStats, "DATA")
+        aoiSlopes = zonalStats.zonalStatisticsByFeatures(projectAOI, "UID", slopeGrid, aoiGrid)
         AddMsgAndPrint("\nSuccessfully Calculated Average Slope for " + str(arcpy.GetCount_management(projectAOI).getOutput(0)) + " AOIs:",0)        
 
-        # create an update cursor for each row of the AOI table and pull in the corresponding record from the slopestats table
-        aoiRows = arcpy.UpdateCursor(projectAOI)
-        aoiRow = aoiRows.next()
-        while aoiRow:
-            aoiID = aoiRow.UID
-            rows = arcpy.SearchCursor(slopeStats)
-            row = rows.next()
-            while row:
-                rowID = row.UID
-                if rowID == aoiID:
-                    zonalMeanValue = row.MEAN
-                    aoiRow.Avg_Slope = zonalMeanValue
-                    aoiRows.updateRow(aoiRow)
-                    row = rows.next()
-                else:
-                    row = rows.next()
-            aoiRow = aoiRows.next()      
-
-        del aoiRows, aoiRow, aoiID, rows, row, rowID, zonalMeanValue
+        # pull in the mean slope of each AOI from the zonal statistics
+        aoiRows = arcpy.da.UpdateCursor(projectAOI, ["UID","Avg_Slope"])
+        for aoiRow in aoiRows:
+            if aoiRow[0] in aoiSlopes:
+                aoiRow[1] = aoiSlopes[aoiRow[0]]["MEAN"]
+                aoiRows.updateRow(aoiRow)
+
+        del aoiRows, aoiSlopes
 
         # Tell the user the results
         rows = arcpy.SearchCursor(projectAOI)
@@ -389,7 +373,7 @@ try:
         del rows, row
        
     # ---------------------------------------------------------------------------------------------- Delete Intermediate data
-    datasetsToRemove = (DEM_aoi,DEMsmooth,slopeStats,slopeGrid)
+    datasetsToRemove = (DEM_aoi,DEMsmooth,aoiGrid,slopeGrid)
     x = 0
     for dataset in datasetsToRemove:
         if arcpy.Exists(dataset):
@@ -72,6 +72,7 @@ def splitThousands(someNumber):
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, traceback, re
+import surfaceSlope
 #import arcgisscripting
 
 # Environment settings
@@ -314,15 +315,9 @@ try:
     maskedDEM.save(DEM_aoi)
     AddMsgAndPrint("\nSuccessully Clipped " + os.path.basename(inputDEM) + " using " + os.path.basename(projectAOI),0)
 
-    # Smooth the DEM to remove noise
-    outFocalStats = arcpy.sa.FocalStatistics(DEM_aoi, "RECTANGLE 3 3 CELL","MEAN","DATA")
-    outFocalStats.save(DEMsmooth)
-    AddMsgAndPrint("\nSuccessully Smoothed the Clipped DEM",0)
-
-    # Calculate Slope using appropriate Z factor
+    # Calculate Slope from the 3x3 smoothed DEM using appropriate Z factor; the smoothed DEM is not written out
     slopeType = "PERCENT_RISE"
-    outSlope = arcpy.sa.Slope(DEMsmooth, slopeType, Zfactor)
-    outSlope.save(slopeGrid)
+    surfaceSlope.slopeRaster(DEM_aoi, slopeGrid, Zfactor, slopeType)
     AddMsgAndPrint("\nSuccessully Created Slope Grid using a Z-factor of " + str(Zfactor),0)       
 
     # ---------------------------------------------------------------------------------------------- Delete Intermediate data
@@ -60,6 +60,7 @@ def logBasicSettings():
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, string, traceback
+import lookupTables
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -463,43 +464,30 @@ try:
     if assumptions == 0:
         AddMsgAndPrint("\n\tAll populated correctly!",0)
 
-    # ------------------------------------------------------------------------------------------------ Join LU Descriptions and assign codes for RCN Lookup
-    # Select Landuse categories that arent assigned a condition (these dont need to be concatenated)
-    query = "\"CONDITION\" = ''"
-    arcpy.SelectLayerByAttribute_management(wtshdLanduseSoilsIntersect_Layer, "NEW_SELECTION", query)
-    count = int(arcpy.GetCount_management(wtshdLanduseSoilsIntersect_Layer).getOutput(0))
-    if count > 0:
-        arcpy.CalculateField_management(wtshdLanduseSoilsIntersect_Layer, "LUDESC", "!LANDUSE!", "PYTHON")
-
-    # Concatenate Landuse and Condition fields together
-    arcpy.SelectLayerByAttribute_management(wtshdLanduseSoilsIntersect_Layer, "SWITCH_SELECTION", "")
-    arcpy.CalculateField_management(wtshdLanduseSoilsIntersect_Layer, "LUDESC", "!LANDUSE!" + "' '" +  "!CONDITION!", "PYTHON")  
-    arcpy.SelectLayerByAttribute_management(wtshdLanduseSoilsIntersect_Layer, "CLEAR_SELECTION", "")
-    del query, count
-    
-    # Join Layer and TR_55_RCN_Lookup table to get LUCODE
-    arcpy.AddJoin_management(wtshdLanduseSoilsIntersect_Layer, "LUDESC", TR_55_RCN_Lookup, "LandUseDes", "KEEP_ALL")
-    arcpy.CalculateField_management(wtshdLanduseSoilsIntersect_Layer, "wtshdLanduseSoilsIntersect.LU_CODE", "!TR_55_RCN_Lookup.LU_CODE!", "PYTHON")
-    arcpy.RemoveJoin_management(wtshdLanduseSoilsIntersect_Layer, "TR_55_RCN_Lookup")
-    AddMsgAndPrint("\nSuccesfully Joined to TR_55_RCN Lookup table to assign Land Use Codes",0)
-
-    # Join Layer and HYD_GRP_Lookup table to get HYDCODE
-    arcpy.AddJoin_management(wtshdLanduseSoilsIntersect_Layer, "HYDGROUP", HYD_GRP_Lookup_Table, "HYDGRP", "KEEP_ALL")
-    arcpy.CalculateField_management(wtshdLanduseSoilsIntersect_Layer, "wtshdLanduseSoilsIntersect.HYDROL_ID", "!HYD_GRP_Lookup.HYDCODE!", "PYTHON")
-    arcpy.RemoveJoin_management(wtshdLanduseSoilsIntersect_Layer, "HYD_GRP_Lookup")
-    AddMsgAndPrint("\nSuccesfully Joined to HYD_GRP_Lookup table to assign Hydro Codes",0)
-
-    # ------------------------------------------------------------------------------------------------ Join and Populate RCN Values        
-    # Concatenate LU Code and Hydrol ID to create HYD_CODE for RCN Lookup
-    exp = "''.join([str(int(!LU_CODE!)),str(int(!HYDROL_ID!))])"
-    arcpy.CalculateField_management(wtshdLanduseSoilsIntersect_Layer, "HYD_CODE", exp,"PYTHON")
-    #arcpy.CalculateField_management(wtshdLanduseSoilsIntersect_Layer, "HYD_CODE", "str(int(!LU_CODE!)) + str(int(!HYDROL_ID!))", "PYTHON")
-
-    # Join Layer and TR_55_RCN_Lookup to get RCN value
-    arcpy.AddJoin_management(wtshdLanduseSoilsIntersect_Layer, "HYD_CODE", TR_55_RCN_Lookup, "HYD_CODE", "KEEP_ALL")
-    arcpy.CalculateField_management(wtshdLanduseSoilsIntersect_Layer, "wtshdLanduseSoilsIntersect.RCN", "!TR_55_RCN_Lookup.RCN!", "PYTHON")
-    arcpy.RemoveJoin_management(wtshdLanduseSoilsIntersect_Layer, "TR_55_RCN_Lookup")
-    AddMsgAndPrint("\nSuccesfully Joined to TR_55_RCN Lookup table to assign Curve Numbers for Unique Combinations",0)
+    # ------------------------------------------------------------------------------------------------ Assign codes and RCN values from the lookup tables
+    # The Support.gdb lookup tables are loaded once (from the lookup cache when it is current) and LUDESC,
+    # LU_CODE, HYDROL_ID, HYD_CODE and RCN are filled in a single pass without joins
+    supportTables = lookupTables.loadTables(os.path.dirname(TR_55_RCN_Lookup), dict((name, lookupTables.supportTables[name]) for name in ("TR_55_RCN_Lookup","HYD_GRP_Lookup")))
+    luCodes, hydCodes, rcnValues = lookupTables.tr55Lookups(supportTables)
+    del supportTables
+
+    rows = arcpy.da.UpdateCursor(wtshdLanduseSoilsIntersect, ["LANDUSE","CONDITION","HYDGROUP","LUDESC","LU_CODE","HYDROL_ID","HYD_CODE","RCN"])
+    for row in rows:
+        landuse, condition, hydGroup = row[0], row[1], row[2]
+
+        # Landuse categories that arent assigned a condition dont need to be concatenated
+        if condition:
+            luDesc = str(landuse) + " " + str(condition)
+        else:
+            luDesc = landuse
+
+        luCode = luCodes.get(luDesc)
+        hydrolID = hydCodes.get(hydGroup)
+        hydCode = lookupTables.combinedCode(luCode, hydrolID)
+        rows.updateRow([landuse, condition, hydGroup, luDesc, luCode, hydrolID, hydCode, rcnValues.get(hydCode)])
+    del rows, luCodes, hydCodes, rcnValues
+
+    AddMsgAndPrint("\nSuccesfully assigned Land Use Codes, Hydro Codes and Curve Numbers from the TR_55_RCN and HYD_GRP Lookup tables",0)
     
     # ------------------------------------------------------------------------------------------------ Calculate Weighted RCN For Each Subbasin
     # Update acres for each new polygon
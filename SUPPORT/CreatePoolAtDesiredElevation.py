@@ -4,7 +4,7 @@
 ## Updated by Chris Morse, USDA NRCS, 2020
 ## 
 ## Creates a pool polygon and calculates storage volume at a user provided elevation using a watershed or pool
-## boundary to limit analysis extent.
+## boundary to limit analysis extent.  If an outlet point is given, only the pool connected to it is kept.
 
 ## ================================================================================================================ 
 def print_exception():
@@ -58,6 +58,7 @@ def logBasicSettings():
     f.write("\tElevation Z-units: " + zUnits + "\n")
     f.write("\tInput Watershed Mask: " + str(inPool) + "\n")
     f.write("\tPool Elevation: " + str(maxElev) + "\n")
+    f.write("\tOutlet Point: " + str(outletPoint) + "\n")
     f.write("\tOutput Pool Polygon: " + str(outPool) + "\n")    
 
     f.close
@@ -164,6 +165,65 @@ def createPool(elevationValue,storageTxtFile):
         sys.exit()
         return False
 
+## ================================================================================================================
+def createConnectedPool(elevationValue,storageTxtFile):
+    # Pool of only the cells below elevationValue that are connected to the outlet point.  The clipped DEM is
+    # read once; the connected cells are traced to the pool polygon and summed for area and volume, and the
+    # row is written to the storage CSV in the SurfaceVolume layout so the storage table is built as before.
+    try:
+        global conversionFactor,acreConversion,ftConversion,volConversion
+
+        demArray, demInfo = rasterArrays.rasterToArray(tempDEM)
+
+        outletXY = [row[0] for row in arcpy.da.SearchCursor(outletPoint, ["SHAPE@XY"], "", sr)]
+        if not outletXY:
+            AddMsgAndPrint("\tThe Outlet Point layer is empty! Exiting...",2)
+            return False
+
+        x, y = outletXY[0]
+        outletRow = int((demInfo["ymax"] - y) // demInfo["cellHeight"])
+        outletCol = int((x - demInfo["xmin"]) // demInfo["cellWidth"])
+
+        poolMask = poolPolygons.connectedPool(demArray, elevationValue, outletRow, outletCol)
+        if poolMask is None:
+            AddMsgAndPrint("\tThe Outlet Point is not next to any area below the Pool Elevation! Exiting...",2)
+            return False
+
+        area2D, area3D, volume = poolPolygons.poolStorage(demArray, poolMask, elevationValue, demInfo["cellWidth"], demInfo["cellHeight"])
+        stageStorage.writeStorageCSV(storageTxtFile, tempDEM, [(elevationValue, area2D, area3D, volume)])
+
+        rings = poolPolygons.ringsToCoordinates(poolPolygons.traceBoundaries(poolMask), demInfo)
+        del demArray, poolMask
+
+        poolExit = outPool
+        poolFields = ["ELEV_FEET","POOL_ACRES","POOL_SQFT","ACRE_FOOT"]
+
+        arcpy.CreateFeatureclass_management(os.path.dirname(poolExit), os.path.basename(poolExit), "POLYGON", "", "DISABLED", "DISABLED", sr)
+        for field in poolFields:
+            arcpy.AddField_management(poolExit, field, "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+
+        elevFeetCalc = round(elevationValue * conversionFactor,1)
+        poolAcresCalc = round(area2D / acreConversion,1)
+        poolSqftCalc = round(area2D / ftConversion,1)
+        acreFootCalc = round(volume / volConversion,1)
+
+        poolShape = arcpy.Polygon(arcpy.Array([arcpy.Array([arcpy.Point(px, py) for px, py in ring]) for ring in rings]), sr)
+        rows = arcpy.da.InsertCursor(poolExit, ["SHAPE@"] + poolFields)
+        rows.insertRow((poolShape, elevFeetCalc, poolAcresCalc, poolSqftCalc, acreFootCalc))
+        del rows, rings, poolShape
+
+        AddMsgAndPrint("\n\tCreated " + poolName + ":",0)
+        AddMsgAndPrint("\t\tArea:   " + str(splitThousands(round(poolSqftCalc,1))) + " Sq.Feet",0)
+        AddMsgAndPrint("\t\tAcres:  " + str(splitThousands(round(poolAcresCalc,1))),0)
+        AddMsgAndPrint("\t\tVolume: " + str(splitThousands(round(acreFootCalc,1))) + " Ac. Foot",0)
+        return True
+
+    except:
+        AddMsgAndPrint("\nFailed to Create Pool Polygon for elevation value: " + str(elevationValue),1)
+        print_exception()
+        sys.exit()
+        return False
+
 ## ================================================================================================================
 def splitThousands(someNumber):
 # will determine where to put a thousands seperator if one is needed.
@@ -178,6 +238,7 @@ def splitThousands(someNumber):
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, string, traceback, re
+import rasterArrays, stageStorage, poolPolygons
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -210,6 +271,11 @@ try:
     zUnits = arcpy.GetParameterAsText(1)
     inMask = arcpy.GetParameterAsText(2)                
     maxElev = float(arcpy.GetParameterAsText(3))
+
+    # Optional dam or outlet point.  When given, low areas that are not connected to it are left out of the pool.
+    outletPoint = ""
+    if arcpy.GetArgumentCount() > 5:
+        outletPoint = arcpy.GetParameterAsText(5)
     
     # ---------------------------------------------------------------------------------------- Define Variables
     inPool = arcpy.Describe(inMask).CatalogPath
@@ -420,10 +486,16 @@ try:
 
     AddMsgAndPrint("\nCreating Pool at " + str(maxElev) + " FT")
 
-    arcpy.SurfaceVolume_3d(tempDEM, storageCSV, "BELOW", demElev, "1")
+    if outletPoint:
+        AddMsgAndPrint("\tLimiting the pool to the area connected to " + os.path.basename(outletPoint),0)
+        if not createConnectedPool(demElev,storageCSV):
+            sys.exit()
 
-    if not createPool(demElev,storageCSV):
-        pass
+    else:
+        arcpy.SurfaceVolume_3d(tempDEM, storageCSV, "BELOW", demElev, "1")
+
+        if not createPool(demElev,storageCSV):
+            pass
 
     if arcpy.Exists(tempDEM):
         arcpy.Delete_management(tempDEM)
@@ -62,6 +62,7 @@ def logBasicSettings():
     else:
         f.write("\tCulverts Digitized: 0\n")
     f.write("\tStream Threshold: " + str(streamThreshold) + "\n")
+    f.write("\tDerivative Cache (MB): " + str(cacheBytes // (1024 * 1024)) + "\n")
     
     f.close
     del f
@@ -201,6 +202,7 @@ def determineOverlap(culvertLayer):
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, traceback
+import priorityFlood, flowRouting, derivativeCache
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -230,6 +232,11 @@ try:
     burnCulverts = arcpy.GetParameterAsText(1)  
     streamThreshold = arcpy.GetParameterAsText(2)
 
+    # Optional: disk budget of the derivative cache in MB (0 turns the cache off)
+    cacheBytes = derivativeCache.defaultCacheBytes
+    if arcpy.GetArgumentCount() > 5 and arcpy.GetParameterAsText(5) not in ("", "#"):
+        cacheBytes = int(float(arcpy.GetParameterAsText(5)) * 1024 * 1024)
+
     # --------------------------------------------------------------------------------------------- Define Variables 
     projectAOI_path = arcpy.Describe(AOI).CatalogPath
 
@@ -306,6 +313,8 @@ try:
         
     # ------------------------------------------------------------------------------------------------------------------------ Incorporate Culverts into DEM
     reuseCulverts = False
+    proceed = False
+
     # Culverts will be incorporated into the DEM_aoi if at least 1 culvert is provided.
     if culvertsExist:
         if int(arcpy.GetCount_management(burnCulverts).getOutput(0)) > 0:
@@ -332,103 +341,99 @@ try:
 
             # --------------------------------------------------------------------- determine overlap of culverts & AOI
             AddMsgAndPrint("\nChecking Placement of Culverts",0)
-            proceed = False
-
             if determineOverlap(culverts):
                 proceed = True
 
-            # ------------------------------------------------------------------- Buffer Culverts
-            if proceed:
-                cellSize = arcpy.Describe(DEM_aoi).MeanCellWidth
+        # No culverts were detected.
+        else:
+            AddMsgAndPrint("\nNo Culverts detected!",0)
 
-                # determine linear units to set buffer value to the equivalent of 1 pixel
-                if arcpy.Describe(DEM_aoi).SpatialReference.LinearUnitName == "Meter":
-                    bufferSize = str(cellSize) + " Meters"
-                    AddMsgAndPrint("\nBuffer size applied on Culverts: " + str(cellSize) + " Meter(s)",0)
+    else:
+        AddMsgAndPrint("\nNo Culverts detected!",0)
 
-                elif arcpy.Describe(DEM_aoi).SpatialReference.LinearUnitName == "Foot":
-                    bufferSize = str(cellSize) + " Feet"
-                    AddMsgAndPrint("\nBuffer size applied on Culverts: " + bufferSize,0)
-                    
-                elif arcpy.Describe(DEM_aoi).SpatialReference.LinearUnitName == "Foot_US":
-                    bufferSize = str(cellSize) + " Feet"
-                    AddMsgAndPrint("\nBuffer size applied on Culverts: " + bufferSize,0)
-                    
-                else:
-                    bufferSize = str(cellSize) + " Unknown"
-                    AddMsgAndPrint("\nBuffer size applied on Culverts: Equivalent of 1 pixel since linear units are unknown",0)
-                    
-                # Buffer the culverts to 1 pixel
-                arcpy.Buffer_analysis(culverts, culvertBuffered, bufferSize, "FULL", "ROUND", "NONE", "")
+    # ------------------------------------------------------------------------------------------------------------------------ Derivative Cache
+    # FlowDir and FlowAccum of the same DEM and culverts are reused from earlier runs; the filled DEM is
+    # only an intermediate and is not cached
+    derivatives = None
+    if cacheBytes > 0:
+        AddMsgAndPrint("\nChecking the derivative cache...",0)
+        derivatives = derivativeCache.openCache(maxBytes=cacheBytes)
+        culvertSignature = derivativeCache.featureSignature(culverts, sr) if proceed else ""
+        derivativeKey = derivativeCache.derivativeKey(derivativeCache.rasterSignature(DEM_aoi), culvertSignature)
+        del culvertSignature
 
-                # Dummy field just to execute Zonal stats on each feature
-                AddMsgAndPrint("\nApplying the minimum Zonal DEM Value to the Culverts",0)
-                arcpy.AddField_management(culvertBuffered, "ZONE", "TEXT", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-                arcpy.CalculateField_management(culvertBuffered, "ZONE", "!OBJECTID!", "PYTHON_9.3")
+    if derivatives is not None and derivativeCache.restoreDerivatives(derivatives, derivativeKey, {"FlowDir": (FlowDir, flowRouting.flowDirNoData), "FlowAccum": (FlowAccum, -1)}, sr):
+        AddMsgAndPrint("\nReused Flow Direction and Flow Accumulation of an earlier run with the same DEM and culverts",0)
 
-                tempZones = arcpy.sa.ZonalStatistics(culvertBuffered, "ZONE", DEM_aoi, "MINIMUM", "NODATA")
-                tempZones.save(culvertRaster)
-                
-                # Elevation cells that overlap the culverts will get the minimum elevation value
-                AddMsgAndPrint("\nFusing Culverts and " + os.path.basename(DEM_aoi) + " to create " + os.path.basename(hydroDEM),0)
-                mosaicList = DEM_aoi + ";" + culvertRaster
-                arcpy.MosaicToNewRaster_management(mosaicList, watershedGDB_path, "hydroDEM", "#", "32_BIT_FLOAT", cellSize, "1", "LAST", "#")
+    else:
+        # ------------------------------------------------------------------- Buffer Culverts
+        if proceed:
+            cellSize = arcpy.Describe(DEM_aoi).MeanCellWidth
 
-                AddMsgAndPrint("\nFilling sinks...",0)
-                #gp.Fill_sa(hydroDEM, Fill_hydroDEM)
-                tempFill = arcpy.sa.Fill(hydroDEM)
-                tempFill.save(Fill_hydroDEM)
-                AddMsgAndPrint("\nSuccessfully filled sinks in " + os.path.basename(hydroDEM) + " to remove small imperfections",0)
+            # determine linear units to set buffer value to the equivalent of 1 pixel
+            if arcpy.Describe(DEM_aoi).SpatialReference.LinearUnitName == "Meter":
+                bufferSize = str(cellSize) + " Meters"
+                AddMsgAndPrint("\nBuffer size applied on Culverts: " + str(cellSize) + " Meter(s)",0)
 
-                del bufferSize
-                del mosaicList
+            elif arcpy.Describe(DEM_aoi).SpatialReference.LinearUnitName == "Foot":
+                bufferSize = str(cellSize) + " Feet"
+                AddMsgAndPrint("\nBuffer size applied on Culverts: " + bufferSize,0)
 
-                # Delete unwanted datasets
-                arcpy.Delete_management(culvertBuffered)
-                arcpy.Delete_management(culvertRaster)
+            elif arcpy.Describe(DEM_aoi).SpatialReference.LinearUnitName == "Foot_US":
+                bufferSize = str(cellSize) + " Feet"
+                AddMsgAndPrint("\nBuffer size applied on Culverts: " + bufferSize,0)
 
-            # No Culverts will be used due to no overlap or determining overlap error.
             else:
-                AddMsgAndPrint("\nFilling sinks...",0)
-                cellSize = arcpy.Describe(DEM_aoi).MeanCellWidth
-                #gp.Fill_sa(DEM_aoi, Fill_hydroDEM)
-                tempFill = arcpy.sa.Fill(DEM_aoi)
-                tempFill.save(Fill_hydroDEM)
-                AddMsgAndPrint("\nSuccessfully filled sinks in " + os.path.basename(hydroDEM) + " to remove small imperfections",0)
-
-            del proceed
-            
-        # No culverts were detected.
+                bufferSize = str(cellSize) + " Unknown"
+                AddMsgAndPrint("\nBuffer size applied on Culverts: Equivalent of 1 pixel since linear units are unknown",0)
+
+            # Buffer the culverts to 1 pixel
+            arcpy.Buffer_analysis(culverts, culvertBuffered, bufferSize, "FULL", "ROUND", "NONE", "")
+
+            # Dummy field just to execute Zonal stats on each feature
+            AddMsgAndPrint("\nApplying the minimum Zonal DEM Value to the Culverts",0)
+            arcpy.AddField_management(culvertBuffered, "ZONE", "TEXT", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+            arcpy.CalculateField_management(culvertBuffered, "ZONE", "!OBJECTID!", "PYTHON_9.3")
+
+            tempZones = arcpy.sa.ZonalStatistics(culvertBuffered, "ZONE", DEM_aoi, "MINIMUM", "NODATA")
+            tempZones.save(culvertRaster)
+
+            # Elevation cells that overlap the culverts will get the minimum elevation value
+            AddMsgAndPrint("\nFusing Culverts and " + os.path.basename(DEM_aoi) + " to create " + os.path.basename(hydroDEM),0)
+            mosaicList = DEM_aoi + ";" + culvertRaster
+            arcpy.MosaicToNewRaster_management(mosaicList, watershedGDB_path, "hydroDEM", "#", "32_BIT_FLOAT", cellSize, "1", "LAST", "#")
+
+            AddMsgAndPrint("\nFilling sinks...",0)
+            #gp.Fill_sa(hydroDEM, Fill_hydroDEM)
+            priorityFlood.fillRaster(hydroDEM, Fill_hydroDEM, True)
+            AddMsgAndPrint("\nSuccessfully filled sinks in " + os.path.basename(hydroDEM) + " to remove small imperfections",0)
+
+            del bufferSize
+            del mosaicList
+
+            # Delete unwanted datasets
+            arcpy.Delete_management(culvertBuffered)
+            arcpy.Delete_management(culvertRaster)
+
+        # No Culverts will be used due to no culverts, no overlap or determining overlap error.
         else:
-            AddMsgAndPrint("\nNo Culverts detected!",0)
             AddMsgAndPrint("\nFilling sinks...",0)
             cellSize = arcpy.Describe(DEM_aoi).MeanCellWidth
             #gp.Fill_sa(DEM_aoi, Fill_hydroDEM)
-            tempFill = arcpy.sa.Fill(DEM_aoi)
-            tempFill.save(Fill_hydroDEM)
+            priorityFlood.fillRaster(DEM_aoi, Fill_hydroDEM, True)
             AddMsgAndPrint("\nSuccessfully filled sinks in " + os.path.basename(DEM_aoi) + " to remove small imperfections",0)
 
-    else:
-        AddMsgAndPrint("\nNo Culverts detected!",0)
-        AddMsgAndPrint("\nFilling sinks...",0)
-        cellSize = arcpy.Describe(DEM_aoi).MeanCellWidth
-        #gp.Fill_sa(DEM_aoi, Fill_hydroDEM)
-        tempFill = arcpy.sa.Fill(DEM_aoi)
-        tempFill.save(Fill_hydroDEM)
-        AddMsgAndPrint("\nSuccessfully filled sinks in " + os.path.basename(DEM_aoi) + " to remove small imperfections",0)            
-
-    # ---------------------------------------------------------------------------------------------- Create Stream Network
-    # Create Flow Direction Grid...
-    AddMsgAndPrint("\nCreating Flow Direciton...",0)
-    #gp.FlowDirection_sa(Fill_hydroDEM, FlowDir, "NORMAL", "")
-    tempFlow = arcpy.sa.FlowDirection(Fill_hydroDEM, "NORMAL", "")
-    tempFlow.save(FlowDir)
-
-    # Create Flow Accumulation Grid...
-    AddMsgAndPrint("\nCreating Flow Accumulation...",0)
-    #gp.FlowAccumulation_sa(FlowDir, FlowAccum, "", "INTEGER")
-    tempAcc = arcpy.sa.FlowAccumulation(FlowDir, "", "INTEGER")
-    tempAcc.save(FlowAccum)
+        # ---------------------------------------------------------------------------------------------- Create Stream Network
+        # Create Flow Direction and Flow Accumulation Grids...
+        # D8 codes match arcpy.sa.FlowDirection and accumulation is a single topological pass over the same array
+        AddMsgAndPrint("\nCreating Flow Direction and Flow Accumulation...",0)
+        flowDirArray, flowAccArray, flowInfo = flowRouting.flowDirectionAndAccumulation(Fill_hydroDEM, FlowDir, FlowAccum)
+
+        if derivatives is not None:
+            derivativeCache.saveDerivatives(derivatives, derivativeKey, {"FlowDir": flowDirArray, "FlowAccum": flowAccArray}, flowInfo)
+            AddMsgAndPrint("\nSaved Flow Direction and Flow Accumulation to the derivative cache",0)
+        del flowDirArray, flowAccArray, flowInfo
+    del proceed, derivatives
 
     # Need to compute a histogram for the FlowAccumulation layer so that the full range of values is captured for subsequent stream generation
     # This tries to fix a bug of the primary channel not generating for large watersheds with high values in flow accumulation grid
@@ -485,7 +490,8 @@ try:
     AddMsgAndPrint("\nSuccessfully created stream linear network using a flow accumulation value >= " + str(acreThresholdVal),0)
 
     # ------------------------------------------------------------------------------------------------ Delete unwanted datasets
-    arcpy.Delete_management(Fill_hydroDEM)
+    if arcpy.Exists(Fill_hydroDEM):
+        arcpy.Delete_management(Fill_hydroDEM)
     arcpy.Delete_management(conFlowAccum)
     arcpy.Delete_management(streamLink)
 
@@ -215,6 +215,7 @@ def splitThousands(someNumber):
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, string, traceback, re
+import rasterArrays, flowRouting, watershedLabels, flowPaths, surfaceSlope, attributeUpdates
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -298,7 +299,7 @@ try:
     watershedGrid = watershedGDB_path + os.sep + "watershedGrid"
     watershedTemp = watershedGDB_path + os.sep + "watershedTemp"
     watershedDissolve = watershedGDB_path + os.sep + "watershedDissolve"
-    wtshdDEMsmooth = watershedGDB_path + os.sep + "wtshdDEMsmooth"
+    wtshdGrid = watershedGDB_path + os.sep + "wtshdGrid"
     slopeGrid = watershedGDB_path + os.sep + "slopeGrid"
     slopeStats = watershedGDB_path + os.sep + "slopeStats"
     
@@ -343,7 +344,7 @@ try:
         sys.exit(0)
 
     # ---------------------------------------------------------------------------------------------- Delete old datasets
-    datasetsToRemove = (outletBuffer,pourPointGrid,snapPourPoint,watershedGrid,watershedTemp,watershedDissolve,wtshdDEMsmooth,slopeGrid,slopeStats)
+    datasetsToRemove = (outletBuffer,pourPointGrid,snapPourPoint,watershedGrid,watershedTemp,watershedDissolve,wtshdGrid,slopeGrid,slopeStats)
 
     x = 0
     for dataset in datasetsToRemove:
@@ -431,6 +432,7 @@ try:
 
     # Convert bufferd outlet to raster pour points    
     arcpy.MakeFeatureLayer_management(outletBuffer,"outletBufferLyr")
+    arcpy.env.snapRaster = FlowDir
     arcpy.PolygonToRaster_conversion("outletBufferLyr","IDENT",pourPointGrid,"MAXIMUM_AREA","NONE",cellSize)
 
     # Delete intermediate data
@@ -444,9 +446,14 @@ try:
     # ------------------------------------------------------------------ Create Watershed Raster using the raster pour point
     
     #gp.Watershed_sa(FlowDir,pourPointGrid,watershedGrid,"VALUE")
+    # Label every outlet's contributing area in one upstream pass over the flow direction array.
+    # Nested outlets split the downstream watershed into separate subbasins, the same as Watershed.
     arcpy.env.extent = "MAXOF"
-    tempShed = arcpy.sa.Watershed(FlowDir,pourPointGrid,"VALUE")
-    tempShed.save(watershedGrid)
+    flowDirArray, flowDirInfo = rasterArrays.rasterToArray(FlowDir, None, flowRouting.flowDirNoData)
+    pourPointArray = rasterArrays.rasterToArray(pourPointGrid, flowDirInfo, 0)[0]
+    watershedArray, subbasinCells = watershedLabels.labelWatersheds(flowDirArray, pourPointArray)
+    rasterArrays.arrayToRaster(watershedArray, flowDirInfo, watershedGrid, 0)
+    del pourPointArray
     
     # ------------------------------------------------------------------- Convert results to simplified polygon
 ##    if ArcGIS10:
@@ -526,8 +533,25 @@ try:
     displayAreaInfo = False
 
     arcpy.AddField_management(watershed, "Acres", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-    expression = "!shape.area@acres!"
-    arcpy.CalculateField_management(watershed, "Acres", expression, "PYTHON_9.3")
+
+    # Acres come from the labeled cell counts when the linear units are known
+    if units == "Meters" or units == "Feet":
+        if units == "Meters":
+            acreConversion = 4046.8564224
+        else:
+            acreConversion = 43560
+        cellAcres = flowDirInfo["cellWidth"] * flowDirInfo["cellHeight"] / acreConversion
+
+        wtshdRows = arcpy.da.UpdateCursor(watershed, ["Subbasin","Acres"])
+        for wtshdRow in wtshdRows:
+            wtshdRow[1] = subbasinCells.get(wtshdRow[0], 0) * cellAcres
+            wtshdRows.updateRow(wtshdRow)
+        del wtshdRows, acreConversion, cellAcres
+
+    else:
+        expression = "!shape.area@acres!"
+        arcpy.CalculateField_management(watershed, "Acres", expression, "PYTHON_9.3")
+
     displayAreaInfo = True
 
 ##    if units == "Meters":
@@ -543,24 +567,22 @@ try:
 ##    else:
 ##        displayAreaInfo = False
 
+    # ----------------------------- Retrieve Z Units from AOI; used for the flow path drop and the average slope
+    zUnits = None
+    if arcpy.Exists(projectAOI):
+        
+        rows = arcpy.SearchCursor(projectAOI)
+        row = rows.next()
+        zUnits = row.Z_UNITS
+        
+        del rows
+        del row
+
     # ---------------------------------------------------------------------------- If user opts to calculate watershed flow paths
     if calcLHL:
         try:
 
-            # ----------------------------------------- Temporary Datasets (Yes, there's a bunch)
-            UP_GRID = watershedGDB_path + os.sep + "upgrid"
-            DOWN_GRID = watershedGDB_path + os.sep + "downgrid"
-            PLUS_GRID = watershedGDB_path + os.sep + "plusgrid"
-            MAX_GRID = watershedGDB_path + os.sep + "maxgrid"
-            MINUS_GRID = watershedGDB_path + os.sep + "minusgrid"
-            LONGPATH = watershedGDB_path + os.sep + "longpath"
-            LP_Extract = watershedGDB_path + os.sep + "lpExt"
-            LongpathTemp = watershedGDB_path + os.sep + "lpTemp"
-            LongpathTemp1 = watershedGDB_path + os.sep + "lpTemp1"
-            LongpathTemp2 = watershedGDB_path + os.sep + "lpTemp2"
-            LP_Smooth = watershedGDB_path + os.sep + "lpSmooth"
-            
-            # ------------------------------------------- Permanent Datasets (...and yes, it took 13 other ones to get here)
+            # ------------------------------------------- Permanent Datasets
             Flow_Length = watershedFD + os.sep + os.path.basename(watershed) + "_FlowPaths"
             FlowLengthName = os.path.basename(Flow_Length)
 
@@ -571,105 +593,39 @@ try:
             arcpy.AddField_management(Flow_Length, "Reach", "LONG", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
             arcpy.AddField_management(Flow_Length, "Type", "TEXT", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
             arcpy.AddField_management(Flow_Length, "Length_ft", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+            arcpy.AddField_management(Flow_Length, "Drop_ft", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
 
             AddMsgAndPrint("\nCalculating watershed flow path(s)...",0)
-            
-            # -------------------------------------------- Raster Flow Length Analysis
-            # Set mask to watershed to limit calculations
-            arcpy.env.mask = watershed
-
-            # Calculate total upstream flow length on FlowDir grid
-            AddMsgAndPrint("\tCalculating upstream flow...",0)
-            #gp.FlowLength_sa(FlowDir, UP_GRID, "UPSTREAM", "")
-            tempUp = arcpy.sa.FlowLength(FlowDir, "UPSTREAM", "")
-            tempUp.save(UP_GRID)
-            
-            # Calculate total downsteam flow length on FlowDir grid
-            AddMsgAndPrint("\tCalculating downstream flow...",0)
-            #gp.FlowLength_sa(FlowDir, DOWN_GRID, "DOWNSTREAM", "")
-            tempDown = arcpy.sa.FlowLength(FlowDir, "DOWNSTREAM", "")
-            tempDown.save(DOWN_GRID)            
-            
-            # Sum total upstream and downstream flow lengths
-            AddMsgAndPrint("\tCombining upstream and downstream flow...",0)
-            #gp.Plus_sa(UP_GRID, DOWN_GRID, PLUS_GRID)
-            tempSum = arcpy.sa.Plus(UP_GRID, DOWN_GRID)
-            tempSum.save(PLUS_GRID)
-            
-            # Get Maximum downstream flow length in each subbasin
-            AddMsgAndPrint("\tExtracting maximum flow values...",0)
-            #gp.ZonalStatistics_sa(watershed, "Subbasin", DOWN_GRID, MAX_GRID, "MAXIMUM", "DATA")
-            tempZones = arcpy.sa.ZonalStatistics(watershed, "Subbasin", DOWN_GRID, "MAXIMUM", "DATA")
-            tempZones.save(MAX_GRID)
-            
-            # Subtract tolerance from Maximum flow length -- where do you get tolerance from?
-            AddMsgAndPrint("\tAdjusting maximum flows for tolerance level...",0)
-            #gp.Minus_sa(MAX_GRID, "0.3", MINUS_GRID)
-            tempMinus = arcpy.sa.Minus(MAX_GRID, 0.3)
-            tempMinus.save(MINUS_GRID)
-            
-            # Extract cells with positive difference to isolate longest flow path(s)
-            AddMsgAndPrint("\tExtracting Longest Flow Path...",0)
-            #gp.GreaterThan_sa(PLUS_GRID, MINUS_GRID, LONGPATH)
-            tempGTR = arcpy.sa.GreaterThan(PLUS_GRID, MINUS_GRID)
-            tempGTR.save(LONGPATH)
-            #gp.Con_sa(LONGPATH, LONGPATH, LP_Extract, "", "\"VALUE\" = 1")
-            tempLPE = arcpy.sa.Con(LONGPATH, LONGPATH, "", "\"VALUE\" = 1")
-            tempLPE.save(LP_Extract)
-
-    ##            # -------------------------------------------- Convert to Polyline features
-    ##            # Convert raster flow path to polyline (DOES NOT RUN IN ARCGIS 10.5.0 Base Install)
-    ##            gp.RasterToPolyline_conversion(LP_Extract, LongpathTemp, "ZERO", "", "NO_SIMPLIFY", "VALUE")
-    ##            
-    ####################################################################################################################################
-            # Try to use Stream to Feature process to convert the raster Con result to a line (DUE TO 10.5.0 BUG)
-            AddMsgAndPrint("\tConverting Raster flow path to a line...",0)
-            LFP_StreamLink = watershedGDB_path + os.sep + "lfplink"
-            #gp.StreamLink_sa(LP_Extract, FlowDir, LFP_StreamLink)
-            tempLink = arcpy.sa.StreamLink(LP_Extract, FlowDir)
-            tempLink.save(LFP_StreamLink)
-            arcpy.sa.StreamToFeature(LFP_StreamLink, FlowDir, LongpathTemp, "NO_SIMPLIFY")
-    ####################################################################################################################################
-            
-            # Smooth and Dissolve results
-            arcpy.SmoothLine_cartography(LongpathTemp, LP_Smooth, "PAEK", "100 Feet", "FIXED_CLOSED_ENDPOINT", "NO_CHECK")
 
-            # Intersect with watershed to get subbasin ID
-            arcpy.Intersect_analysis(LP_Smooth + "; " + watershed, LongpathTemp1, "ALL", "", "INPUT")
-            
-            # Dissolve to create single lines for each subbasin
-            arcpy.Dissolve_management(LongpathTemp1, LongpathTemp2, "Subbasin", "", "MULTI_PART", "DISSOLVE_LINES")
-            
-            # Add Fields / attributes & calculate length in feet
-            AddMsgAndPrint("\tUpdating longest flow path attributes...",0)
-            arcpy.AddField_management(LongpathTemp2, "Reach", "SHORT", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-            arcpy.CalculateField_management(LongpathTemp2, "Reach", "!OBJECTID!", "PYTHON_9.3")
-            arcpy.AddField_management(LongpathTemp2, "Type", "TEXT", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-            arcpy.CalculateField_management(LongpathTemp2, "Type", "'Natural Watercourse'", "PYTHON_9.3")
-            arcpy.AddField_management(LongpathTemp2, "Length_ft", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-            expression = "!shape.length@feet!"
-            arcpy.CalculateField_management(LongpathTemp2, "Length_ft", expression, "PYTHON_9.3")
-            
-    ##            if units == "Meters":
-    ##                gp.CalculateField_management(LongpathTemp2, "Length_ft", "[shape_length] * 3.28084", "VB", "")
-    ##            else:
-    ##                gp.CalculateField_management(LongpathTemp2, "Length_ft", "[shape_length]", "VB", "")
-                
-            # Append Results to Flow Length FC
-            arcpy.Append_management(LongpathTemp2, Flow_Length, "NO_TEST")
+            # -------------------------------------------- Flow Length Analysis
+            # Upstream and downstream flow lengths are measured within each subbasin on the flow direction and
+            # watershed arrays already in memory; each path is traced from the cell farthest from its outlet.
+            demArray = rasterArrays.rasterToArray(DEM_aoi, flowDirInfo)[0]
+            longestPaths = flowPaths.longestFlowPaths(flowDirArray, watershedArray, demArray, flowDirInfo)
+            del demArray
 
-            # Delete Intermediate Data            
-            datasetsToRemove = (UP_GRID,DOWN_GRID,PLUS_GRID,MAX_GRID,MINUS_GRID,LONGPATH,LP_Extract,LongpathTemp,LongpathTemp1,LongpathTemp2,LP_Smooth, LFP_StreamLink)
-            x = 0
-            for dataset in datasetsToRemove:
-                if arcpy.Exists(dataset):
-                    if x < 1:
-                        x += 1
-                    try:
-                        arcpy.Delete_management(dataset)
-                    except:
-                        pass
-            del datasetsToRemove, x
+            if units == "Meters":
+                lengthToFeet = 3.280839896
+            else:
+                lengthToFeet = 1
+
+            # Elevation drop is reported in feet; Z units come from the project AOI
+            dropToFeet = {"Meters":3.280839896, "Centimeters":0.03280839896, "Inches":0.0833333}.get(zUnits, 1)
+
+            # Write every path in one pass
+            AddMsgAndPrint("\tUpdating longest flow path attributes...",0)
+            with arcpy.da.InsertCursor(Flow_Length, ["SHAPE@", "Subbasin", "Reach", "Type", "Length_ft", "Drop_ft"]) as cursor:
+                reach = 1
+                for subbasin in sorted(longestPaths):
+                    path = longestPaths[subbasin]
+                    if len(path["points"]) < 2:
+                        continue
+                    line = arcpy.Polyline(arcpy.Array([arcpy.Point(x, y) for x, y in path["points"]]), sr)
+                    cursor.insertRow((line, subbasin, reach, "Natural Watercourse", round(path["length"] * lengthToFeet, 1), round(path["drop"] * dropToFeet, 1)))
+                    AddMsgAndPrint("\tSubbasin " + str(subbasin) + ": " + str(round(path["length"] * lengthToFeet, 1)) + " ft long, " + str(round(path["drop"] * dropToFeet, 1)) + " ft drop",0)
+                    reach += 1
+
+            del longestPaths, lengthToFeet, dropToFeet, reach
         
             # ---------------------------------------------------------------------------------------------- Set up Domains
             # Apply domains to watershed geodatabase and Flow Length fields to aid in user editing
@@ -719,21 +675,15 @@ try:
             # If Calc LHL fails prompt user to delineate manually and continue...  ...capture error for reference
             AddMsgAndPrint("\nUnable to Calculate Flow Path(s). You will have to trace your stream network to create them manually.",1)
             AddMsgAndPrint("\nContinuing...",1)
+
+    del flowDirArray, watershedArray
             
     # ----------------------------------------------------------------------------------------------- Calculate Average Slope
     calcAvgSlope = False
 
-    # ----------------------------- Retrieve Z Units from AOI    
+    # ----------------------------- Assign proper Z factor from the Z units of the AOI
     if arcpy.Exists(projectAOI):
         
-        rows = arcpy.SearchCursor(projectAOI)
-        row = rows.next()
-        zUnits = row.Z_UNITS
-        
-        del rows
-        del row
-        
-        # Assign proper Z factor
         if zUnits == "Meters":
             
             if units == "Feet":
@@ -768,53 +718,25 @@ try:
     if Zfactor > 0:
         AddMsgAndPrint("\nCalculating average slope...",0)
         
-        if arcpy.Exists(DEMsmooth):
+        if arcpy.Exists(DEM_aoi) or arcpy.Exists(DEMsmooth):
             
-            # Use smoothed DEM to calculate slope to remove exteraneous values
-            arcpy.AddField_management(watershed, "Avg_Slope", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-
-            #gp.ExtractByMask_sa(DEMsmooth, watershed, wtshdDEMsmooth)
-            tempWtshDEM = arcpy.sa.ExtractByMask(DEMsmooth, watershed)
-            tempWtshDEM.save(wtshdDEMsmooth)
-            
-            #gp.Slope_sa(wtshdDEMsmooth, slopeGrid, "PERCENT_RISE", Zfactor)
-            tempSlope = arcpy.sa.Slope(wtshdDEMsmooth, "PERCENT_RISE", Zfactor)
-            tempSlope.save(slopeGrid)
-            
-            #gp.ZonalStatisticsAsTable_sa(watershed, "Subbasin", slopeGrid, slopeStats, "DATA")
-            arcpy.sa.ZonalStatisticsAsTable(watershed, "Subbasin", slopeGrid, slopeStats, "DATA")
-            calcAvgSlope = True
-
-            # Delete unwanted rasters
-            arcpy.Delete_management(DEMsmooth)
-            arcpy.Delete_management(wtshdDEMsmooth)
-            arcpy.Delete_management(slopeGrid)
-
-        elif arcpy.Exists(DEM_aoi):
-            
-            # Run Focal Statistics on the DEM_aoi to remove exteraneous values
-            #gp.focalstatistics_sa(DEM_aoi, DEMsmooth,"RECTANGLE 3 3 CELL","MEAN","DATA")
-            tempFocal = arcpy.sa.FocalStatistics(DEM_aoi, "RECTANGLE 3 3 CELL","MEAN","DATA")
-            tempFocal.save(DEMsmooth)
-
+            # Use smoothed DEM to calculate slope to remove extraneous values.  Smoothing, the watershed mask,
+            # slope and the per subbasin statistics are computed in one pass over the DEM.
             arcpy.AddField_management(watershed, "Avg_Slope", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
 
-            #gp.ExtractByMask_sa(DEMsmooth, watershed, wtshdDEMsmooth)
-            tempWtshDEM = arcpy.sa.ExtractByMask(DEMsmooth, watershed)
-            tempWtshDEM.save(wtshdDEMsmooth)
-            
-            #gp.Slope_sa(wtshdDEMsmooth, slopeGrid, "PERCENT_RISE", Zfactor)
-            tempSlope = arcpy.sa.Slope(wtshdDEMsmooth, "PERCENT_RISE", Zfactor)
-            tempSlope.save(slopeGrid)
-            
-            #gp.ZonalStatisticsAsTable_sa(watershed, "Subbasin", slopeGrid, slopeStats, "DATA")
-            arcpy.sa.ZonalStatisticsAsTable(watershed, "Subbasin", slopeGrid, slopeStats, "DATA")
+            if arcpy.Exists(DEM_aoi):
+                rasterArrays.polygonsToRaster(watershed, "Subbasin", DEM_aoi, wtshdGrid)
+                subbasinSlopes = surfaceSlope.zonalSlopeStatistics(DEM_aoi, wtshdGrid, Zfactor, "PERCENT_RISE")
+            else:
+                # DEMsmooth is already smoothed
+                rasterArrays.polygonsToRaster(watershed, "Subbasin", DEMsmooth, wtshdGrid)
+                subbasinSlopes = surfaceSlope.zonalSlopeStatistics(DEMsmooth, wtshdGrid, Zfactor, "PERCENT_RISE", False)
             calcAvgSlope = True
 
             # Delete unwanted rasters
-            arcpy.Delete_management(DEMsmooth)
-            arcpy.Delete_management(wtshdDEMsmooth)
-            arcpy.Delete_management(slopeGrid)   
+            if arcpy.Exists(DEMsmooth):
+                arcpy.Delete_management(DEMsmooth)
+            arcpy.Delete_management(wtshdGrid)
 
         else:
             AddMsgAndPrint("\nMissing DEMsmooth or DEM_aoi from FGDB. Could not Calculate Average Slope",1)
@@ -825,9 +747,7 @@ try:
     # -------------------------------------------------------------------------------------- Update Watershed FC with Average Slope
     if calcAvgSlope:
         
-        # go through each zonal Stat record and pull out the Mean value
-        rows = arcpy.SearchCursor(slopeStats)
-        row = rows.next()
+        # go through each subbasin's zonal statistics and pull out the Mean value
 
         AddMsgAndPrint("\n\tSuccessfully Calculated Average Slope",0)
 
@@ -835,55 +755,31 @@ try:
         AddMsgAndPrint("\n===================================================",0)
         AddMsgAndPrint("\tUser Watershed: " + str(watershedOut),0)
         
-        while row:
-            wtshdID = row.OBJECTID
-
-            # zonal stats doesnt generate "Value" with the 9.3 geoprocessor
-            if len(arcpy.ListFields(slopeStats,"Value")) > 0:
-                zonalValue = row.VALUE
+        # Pass the Mean values from the zonal statistics to the watershed FC in one pass
+        slopeUpdates = dict((zonalValue, {"Avg_Slope": subbasinSlopes[zonalValue]["MEAN"]}) for zonalValue in subbasinSlopes)
+        attributeUpdates.updateAttributes(watershed, "Subbasin", slopeUpdates)
+
+        wtshdRows = sorted(arcpy.da.SearchCursor(watershed, ["Subbasin","OID@","Acres","SHAPE@AREA"]))
+        for zonalValue, wtshdID, wtshdAcres, wtshdArea in wtshdRows:
+            if zonalValue not in subbasinSlopes:
+                continue
+            zonalMeanValue = subbasinSlopes[zonalValue]["MEAN"]
+
+            # Inform the user of Watershed Acres, area and avg. slope
+            if displayAreaInfo:
                 
-            else:
-                zonalValue = row.SUBBASIN
-                
-            zonalMeanValue = row.MEAN
-
-            whereclause = "Subbasin = " + str(zonalValue)
-            wtshdRows = arcpy.UpdateCursor(watershed,whereclause)
-            wtshdRow = wtshdRows.next()           
-
-            # Pass the Mean value from the zonalStat table to the watershed FC.
-            while wtshdRow:
-                
-                wtshdRow.Avg_Slope = zonalMeanValue
-                wtshdRows.updateRow(wtshdRow)
-
                 # Inform the user of Watershed Acres, area and avg. slope
-                if displayAreaInfo:
-                    
-                    # Inform the user of Watershed Acres, area and avg. slope
-                    AddMsgAndPrint("\n\tSubbasin: " + str(wtshdRow.OBJECTID),0)
-                    AddMsgAndPrint("\t\tAcres: " + str(splitThousands(round(wtshdRow.Acres,2))),0)
-                    AddMsgAndPrint("\t\tArea: " + str(splitThousands(round(wtshdRow.Shape_Area,2))) + " Sq. " + units,0)
-                    AddMsgAndPrint("\t\tAvg. Slope: " + str(round(zonalMeanValue,2)),0)
-
-                else:
-                    AddMsgAndPrint("\tSubbasin " + str(wtshdRow.OBJECTID) + " Avg. Slope: " + str(zonalMeanValue) + "%",0)
-                                   
-                break
+                AddMsgAndPrint("\n\tSubbasin: " + str(wtshdID),0)
+                AddMsgAndPrint("\t\tAcres: " + str(splitThousands(round(wtshdAcres,2))),0)
+                AddMsgAndPrint("\t\tArea: " + str(splitThousands(round(wtshdArea,2))) + " Sq. " + units,0)
+                AddMsgAndPrint("\t\tAvg. Slope: " + str(round(zonalMeanValue,2)),0)
 
-            row = rows.next()        
+            else:
+                AddMsgAndPrint("\tSubbasin " + str(wtshdID) + " Avg. Slope: " + str(zonalMeanValue) + "%",0)
 
-            del wtshdID
-            del zonalValue
-            del zonalMeanValue
-            del whereclause
-            del wtshdRows
-            del wtshdRow
+        del slopeUpdates, wtshdRows
 
-        del rows
-        del row
         AddMsgAndPrint("\n===================================================",0)
-        arcpy.Delete_management(slopeStats)
 
     ## ????????
     import time
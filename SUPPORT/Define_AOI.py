@@ -94,6 +94,7 @@ def splitThousands(someNumber):
 ## ================================================================================================================
 # Import system modules
 import sys, os, arcpy, traceback, re
+import focalStats
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -375,8 +376,7 @@ try:
 
     if createContours:
         # Run Focal Statistics on the DEM_aoi for the purpose of generating smooth contours
-        outFocalStats = arcpy.sa.FocalStatistics(DEM_aoi, "RECTANGLE 3 3 CELL","MEAN","DATA")
-        outFocalStats.save(DEMsmooth)
+        focalStats.focalRaster(DEM_aoi, DEMsmooth, "RECTANGLE 3 3 CELL", "MEAN")
         AddMsgAndPrint("\nSuccessully Smoothed " + os.path.basename(DEM_aoi),0)
         
         arcpy.sa.Contour(DEMsmooth, ContoursTemp, interval, "0", Zfactor)
@@ -1,7 +1,8 @@
 ## Download_Image_Service_Elevation.py: Chris Morse, 4/18/2019
 ## Used to download a DEM from WGS84 web services
 
-import arcpy, os, traceback
+import arcpy, sys, os, traceback
+import imageServiceTiles, mosaicRasters
 
 ## ===============================================================================================================
 ## Error handling and messaging
@@ -14,6 +15,24 @@ def print_exception():
     arcpy.AddError("Traceback Info: \n" + tbinfo + "Error Info: \n    " +  str(sys.exc_type)+ ": " + str(sys.exc_value) + "")
     arcpy.AddError("------------------------------------- ERROR End -----------------------------------\n")
 
+## ===============================================================================================================
+## Image service URL behind the source layer, or None if it is not an ArcGIS image service
+def imageServiceUrl(service):
+    path = service
+    if not path.lower().startswith("http"):
+        try:
+            path = arcpy.Describe(service).catalogPath
+        except:
+            return None
+    if path.lower().startswith("http") and "/imageserver" in path.lower():
+        return path[:path.lower().index("/imageserver") + len("/imageserver")]
+    return None
+
+## ===============================================================================================================
+## Tile download progress
+def tileProgress(tilesDone, tilesTotal, fromCache):
+    arcpy.SetProgressorLabel("Downloading Data: " + str(tilesDone) + " of " + str(tilesTotal) + " tiles...")
+
 ## =============================================== MAIN =======================================================
 
 arcpy.env.overwriteOutput = True
@@ -49,6 +68,11 @@ try:
     target_pcs = arcpy.GetParameterAsText(4)
     target_Cellsize = arcpy.GetParameterAsText(5)
 
+    # Optional size limit of the downloaded tile cache, in MB
+    cacheBytes = imageServiceTiles.defaultCacheBytes
+    if arcpy.GetArgumentCount() > 7 and arcpy.GetParameterAsText(7):
+        cacheBytes = int(float(arcpy.GetParameterAsText(7)) * 1024 ** 2)
+
     # Define variables
     arcpy.AddMessage("\nSetting Variables...\n")
     projectName = arcpy.ValidateTableName(os.path.basename(userWorkspace).replace(" ","_"))
@@ -105,8 +129,29 @@ try:
     ##clip_ext = str(xMin) + " " + str(yMin) + " " + str(xMax) + " " + str(yMax)
     ##arcpy.Clip_management(source_Service, clip_ext, WGS84_DEM, input_extent, "", "ClippingGeometry", "NO_MAINTAIN_EXTENT") #### DO NOT USE
     ##arcpy.Clip_management(source_Service, clip_ext, WGS84_DEM, wgs_AOI, "", "ClippingGeometry", "NO_MAINTAIN_EXTENT") #### USE
-    maskedDEM = arcpy.sa.ExtractByMask(source_Service, wgs_AOI)
-    maskedDEM.save(WGS84_DEM)
+    # Image services are fetched as tiles in parallel through the local tile cache, so a rerun over the same
+    # area reads the tiles from disk; anything else is extracted in one request as before.
+    serviceUrl = imageServiceUrl(source_Service)
+    if serviceUrl:
+        serviceDesc = arcpy.Describe(source_Service)
+        pixelSize = serviceDesc.meanCellWidth
+        if serviceDesc.spatialReference.type != "Geographic":
+            # Native resolution in degrees; ProjectRaster resamples to the target cell size below
+            pixelSize = pixelSize * serviceDesc.spatialReference.metersPerUnit / 111320.0
+        del serviceDesc
+
+        aoi_ext = arcpy.Describe(wgs_AOI).extent
+        tiles = imageServiceTiles.tileGrid((aoi_ext.XMin, aoi_ext.YMin, aoi_ext.XMax, aoi_ext.YMax), pixelSize)
+        arcpy.AddMessage("\tRequesting " + str(len(tiles)) + " tiles from " + serviceUrl + "\n")
+        tileCache = imageServiceTiles.TileCache(maxBytes=cacheBytes)
+        tilePaths = imageServiceTiles.fetchTiles(serviceUrl, tiles, tileCache, progress=tileProgress)
+
+        # Mosaic the tiles and clip them to the AOI in one pass
+        mosaicRasters.mosaicRasters(tilePaths, WGS84_DEM, "FIRST", wgs_AOI, False)
+        del aoi_ext, tiles, tileCache, tilePaths
+    else:
+        maskedDEM = arcpy.sa.ExtractByMask(source_Service, wgs_AOI)
+        maskedDEM.save(WGS84_DEM)
 
     # Project the WGS 1984 DEM to the coordinate system of the input extent OR override with the specified pcs
     # We use the factory code to get it
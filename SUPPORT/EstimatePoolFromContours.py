@@ -74,6 +74,7 @@ def logBasicSettings():
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, traceback
+import zonalStats
 #import arcgisscripting, string
 
 # Environment settings
@@ -164,7 +165,7 @@ try:
     extentMask = watershedFD + os.sep + "extMask"
     damTemp = watershedGDB_path + os.sep + "damTemp"
     outDamLyr = "damLyr"
-    damStats = watershedGDB_path + os.sep + "damStats"
+    damGrid = watershedGDB_path + os.sep + "damGrid"
     DEMclip = watershedGDB_path + os.sep + "DEMclip"
     DEMminus = watershedGDB_path + os.sep + "DEMminus"
     DEMsn = watershedGDB_path + os.sep + "DEMsn"
@@ -234,7 +235,7 @@ try:
         
     # ----------------------------------------------------------------------------------------------- Clean old files if FGDB already existed.
     if FGDBexists:    
-        gridsToRemove = (contourMask,buffer1,buffer2,buffer3,buffer4,buffer5,buffer6,buffer7,contourErase,extentMask,damStats,DEMclip,DEMminus,DEMsn,volGrid,volume,ExtentRaster,PoolRast1,PoolRast2,PoolPoly)
+        gridsToRemove = (contourMask,buffer1,buffer2,buffer3,buffer4,buffer5,buffer6,buffer7,contourErase,extentMask,damGrid,DEMclip,DEMminus,DEMsn,volGrid,volume,ExtentRaster,PoolRast1,PoolRast2,PoolPoly)
         x = 0        
         for grid in gridsToRemove:
             if arcpy.Exists(grid):
@@ -497,21 +498,12 @@ try:
     # ------------------------------------------------------------------------ Retrieve attributes for dam and populate fields
     arcpy.Buffer_analysis(outDam, buffer7, "3 Meters", "RIGHT", "ROUND", "LIST", "ID")
     arcpy.AddField_management(buffer7, "ELEV", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")    
-    arcpy.sa.ZonalStatisticsAsTable(buffer7, "ID", DEM_aoi, damStats, "NODATA", "ALL") 
+    damElevations = zonalStats.zonalStatisticsByFeatures(buffer7, "ID", DEM_aoi, damGrid, False)
 
-    rows = arcpy.SearchCursor(damStats)
-    row = rows.next()
-    
-    while row:
-        # zonal stats doesnt generate "Value" with the 9.3 geoprocessor in 10
-        ID = row.ID
-
-        #previously row.value in 9.3 geoprocessor
-        #ID = row.VALUE
-            
-        maxElev = row.MAX
-        minElev = row.MIN
-        meanElev = row.MEAN
+    for ID in sorted(damElevations):
+        maxElev = damElevations[ID]["MAX"]
+        minElev = damElevations[ID]["MIN"]
+        meanElev = damElevations[ID]["MEAN"]
         
         maxFt = round(float(maxElev * Zfactor),1)
         minFt = round(float(minElev * Zfactor),1)
@@ -572,8 +564,6 @@ try:
             damRows.updateRow(damRow)
             damRow = damRows.next()
             
-        row = rows.next()
-        
         del ID
         del maxElev
         del minElev
@@ -587,12 +577,9 @@ try:
         del damHeight
         del topWidth
         del bottomWidth
-
-    del rows
-    del row
     
     # ------------------------------------------------------------------------------------------------ Delete Intermediate Data            
-    datasetsToRemove = (damTemp,buffer1,buffer2,buffer3,buffer4,buffer5,buffer6,buffer7,contourErase,contourMask,extentMask,ExtentRaster,PoolRast1,PoolRast2,PoolPoly,PoolMask,DEMclip,DEMminus,DEMsn,DEMsnu,volGrid,volume,outDamLyr,damStats)
+    datasetsToRemove = (damTemp,buffer1,buffer2,buffer3,buffer4,buffer5,buffer6,buffer7,contourErase,contourMask,extentMask,ExtentRaster,PoolRast1,PoolRast2,PoolPoly,PoolMask,DEMclip,DEMminus,DEMsn,DEMsnu,volGrid,volume,outDamLyr,damGrid)
 
     x = 0
     for dataset in datasetsToRemove:
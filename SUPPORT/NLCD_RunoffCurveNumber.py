@@ -73,6 +73,7 @@ def logBasicSettings():
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, string, traceback
+import rasterArrays, curveNumbers, attributeUpdates, lookupTables
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -154,14 +155,13 @@ try:
 
     # ----------------------------------------------------------------------------- Datasets
     # --------------------------------------------------- Temporary Datasets
-    LU_PLUS_SOILS = watershedGDB_path + os.sep + "LU_PLUS_SOILS"
+    SUBBASIN_GRID = watershedGDB_path + os.sep + "SUBBASIN_GRID"
+    RCN_TEMP = watershedGDB_path + os.sep + "RCN_TEMP"
     CULT_GRID = watershedGDB_path + os.sep + "CULT_GRID"
     CULT_POLY = watershedGDB_path + os.sep + "CULT_POLY"
     soilsLyr = "soilsLyr"
     SOILS_GRID = watershedGDB_path + os.sep + "SOILS"
     landuse = watershedGDB_path + os.sep + "NLCD"
-    RCN_Stats = watershedGDB_path + os.sep + "RCN_Stats"
-    RCN_Stats2 = watershedGDB_path + os.sep + "RCN_Stats2"
     
     # --------------------------------------------------- Permanent Datasets
     wsSoils = watershedFD + os.sep + wsName + "_Soils"
@@ -282,7 +282,7 @@ try:
     
     # -------------------------------------------------------------------------- Delete Previous Data if present 
     if FGDBexists:    
-        layersToRemove = (wsSoils,landuse,vectorLanduse,LU_PLUS_SOILS,CULT_GRID,CULT_POLY,SOILS_GRID,RCN_GRID,RCN_Stats)
+        layersToRemove = (wsSoils,landuse,vectorLanduse,SUBBASIN_GRID,RCN_TEMP,CULT_GRID,CULT_POLY,SOILS_GRID,RCN_GRID)
         x = 0        
         for layer in layersToRemove:
             if arcpy.Exists(layer):
@@ -471,99 +471,87 @@ try:
     arcpy.PolygonToRaster_conversion(soilsLyr,"HYD_CODE",SOILS_GRID,"MAXIMUM_AREA","NONE","" + str(cellSize) + "")
 
     # ----------------------------------------------------------------------------------------------- Create Curve Number Grid
-    # Combine Landuse and Soils
-    #gp.Combine_sa(landuse + ";" + SOILS_GRID, LU_PLUS_SOILS)
-    tempCombo = arcpy.sa.Combine(landuse + ";" + SOILS_GRID)
-    tempCombo.save(LU_PLUS_SOILS)
-    
-    arcpy.BuildRasterAttributeTable_management(LU_PLUS_SOILS)
-
-    # Add RCN field to raster attributes
-    arcpy.AddField_management(LU_PLUS_SOILS, "HYD_CODE", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-    arcpy.CalculateField_management(LU_PLUS_SOILS, "HYD_CODE", "(!NLCD! * 100) + !SOILS!", "PYTHON")
-    arcpy.AddField_management(LU_PLUS_SOILS, "LANDUSE", "TEXT", "", "", "255", "", "NULLABLE", "NON_REQUIRED", "")
-    arcpy.AddField_management(LU_PLUS_SOILS, "HYD_GROUP", "TEXT", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-    arcpy.AddField_management(LU_PLUS_SOILS, "RCN", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-    arcpy.AddField_management(LU_PLUS_SOILS, "ACRES", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-    arcpy.AddField_management(LU_PLUS_SOILS, "WGT_RCN", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-
-    # Calculate area of each combined unit in acres
+    # Landuse, soils and subbasin grids are read as aligned arrays and every cell's curve number is taken
+    # from a dense NLCD class x hydro group array of the NLCD_RCN_TABLE in one lookup
+    AddMsgAndPrint("\nCalculating Runoff Curve Numbers...",0)
+    rasterArrays.polygonsToRaster(watershed, "Subbasin", landuse, SUBBASIN_GRID)
+
+    landuseArray, landuseInfo = rasterArrays.rasterToArray(landuse)
+    soilsArray = rasterArrays.rasterToArray(SOILS_GRID, landuseInfo)[0]
+    subbasinArray = rasterArrays.rasterToArray(SUBBASIN_GRID, landuseInfo)[0]
+
+    nlcdRows = lookupTables.loadTables(os.path.dirname(NLCD_RCN_TABLE), {"NLCD_RCN_TABLE": lookupTables.supportTables["NLCD_RCN_TABLE"]})["NLCD_RCN_TABLE"]
+    rcnLookup = curveNumbers.curveNumberLookup([(joinCode, cn) for joinCode, cn, landuseDesc, hydGroup, hydID in nlcdRows])
+    rcnArray = curveNumbers.lookupCurveNumbers(rcnLookup, landuseArray, soilsArray)
+
+    # -------------------------------------------------------------------------------- Weight Curve Number
+    # Area weighted curve number of each subbasin and of the whole watershed
+    subbasinRCN = curveNumbers.weightedCurveNumbers(rcnArray, subbasinArray)
+    if not subbasinRCN:
+        AddMsgAndPrint("\tNo curve numbers could be assigned within " + str(wsName) + ". Check the NLCD and soils inputs. Exiting...",2)
+        sys.exit()
+
+    wsCells = sum(cells for subRCN, cells in subbasinRCN.values())
+    wgtRCN = sum(subRCN * cells for subRCN, cells in subbasinRCN.values()) / wsCells
+    AddMsgAndPrint("\n\tWeighted Average Runoff Curve No. for " + str(wsName) + " is " + str(int(wgtRCN)),0)
+    if len(subbasinRCN) > 1:
+        for subbasin in sorted(subbasinRCN):
+            AddMsgAndPrint("\t\tSubbasin " + str(subbasin) + ": " + str(int(subbasinRCN[subbasin][0])),0)
+
+    del wsCells, subbasinArray
+
+    # Export RCN Summary Table: one row per landuse / hydro group combination in the watershed
+    rcnDescriptions = {}
+    for joinCode, cn, landuseDesc, hydGroup, hydID in nlcdRows:
+        if joinCode is not None and int(joinCode) not in rcnDescriptions:
+            rcnDescriptions[int(joinCode)] = (landuseDesc, hydGroup)
+
     if units == "Meters":
-        arcpy.CalculateField_management(LU_PLUS_SOILS, "ACRES", "round(!COUNT! * (" + str(cellArea) + " / 4046.868564224),1)", "PYTHON")
-    elif units == "Feet":
-        arcpy.CalculateField_management(LU_PLUS_SOILS, "ACRES", "round(!COUNT! * (" + str(cellArea) + " / 43560),1)", "PYTHON")
+        acreConversion = 4046.868564224
     else:
-        pass
-    
-    # Sum the count (equivalent to area) for each CN in watershed
-    arcpy.Statistics_analysis(LU_PLUS_SOILS, RCN_Stats,"COUNT sum","")
-    
-    # Join NLCD Lookup table to retrieve RCN and desc values
-    arcpy.MakeRasterLayer_management(LU_PLUS_SOILS, "LU_PLUS_SOILS_LYR")
-    arcpy.AddJoin_management("LU_PLUS_SOILS_LYR", "HYD_CODE", NLCD_RCN_TABLE, "Join_", "KEEP_ALL")
-    arcpy.CalculateField_management("LU_PLUS_SOILS_LYR", "VAT_LU_PLUS_SOILS.RCN", "!NLCD_RCN_TABLE.CN!", "PYTHON")
-    arcpy.CalculateField_management("LU_PLUS_SOILS_LYR", "VAT_LU_PLUS_SOILS.LANDUSE", "!NLCD_RCN_TABLE.NRCS_LANDUSE!", "PYTHON")
-    arcpy.CalculateField_management("LU_PLUS_SOILS_LYR", "VAT_LU_PLUS_SOILS.HYD_GROUP", "!NLCD_RCN_TABLE.Soil!", "PYTHON")
-
-    # -------------------------------------------------------------------------------- Weight Curve Number    
-    # Retrieve the total area (Watershed Area)
-    rows = arcpy.SearchCursor(RCN_Stats)
-    row = rows.next()
-    wsArea = row.SUM_COUNT
-    
-    # Multiply CN by percent of area to weight
-    arcpy.CalculateField_management(LU_PLUS_SOILS, "WGT_RCN", "!RCN! * (!COUNT! / " + str(float(wsArea)) + ")", "PYTHON")
-    
-    # Sum the weights to create weighted RCN
-    arcpy.Statistics_analysis(LU_PLUS_SOILS, RCN_Stats2,"WGT_RCN sum","")
-    wgtrows = arcpy.SearchCursor(RCN_Stats2)
-    wgtrow = wgtrows.next()
-    wgtRCN = wgtrow.SUM_WGT_RCN
-    AddMsgAndPrint("\n\tWeighted Average Runoff Curve No. for " + str(wsName) + " is " + str(int(wgtRCN)),0)
-    
-    del wsArea
-    del rows
-    del row 
-    del wgtrows
-    del wgtrow
-    
-    # Export RCN Summary Table
-    arcpy.CopyRows_management(LU_PLUS_SOILS, RCN_TABLE)
-    
-    # Delete un-necessary fields from summary table
-    arcpy.DeleteField_management(RCN_TABLE, "VALUE;COUNT;SOILS;HYD_CODE;HYD_CODE;WGT_RCN")
-    
+        acreConversion = 43560
+
+    arcpy.CreateTable_management(watershedGDB_path, os.path.basename(RCN_TABLE))
+    arcpy.AddField_management(RCN_TABLE, "NLCD", "LONG", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+    arcpy.AddField_management(RCN_TABLE, "LANDUSE", "TEXT", "", "", "255", "", "NULLABLE", "NON_REQUIRED", "")
+    arcpy.AddField_management(RCN_TABLE, "HYD_GROUP", "TEXT", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+    arcpy.AddField_management(RCN_TABLE, "RCN", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+    arcpy.AddField_management(RCN_TABLE, "ACRES", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+
+    rows = arcpy.da.InsertCursor(RCN_TABLE, ["NLCD","LANDUSE","HYD_GROUP","RCN","ACRES"])
+    for nlcdClass, hydCode, cells in curveNumbers.combinationCounts(landuseArray, soilsArray):
+        landuseDesc, hydGroup = rcnDescriptions.get(nlcdClass * curveNumbers.soilCodes + hydCode, (None, None))
+        rcn = rcnLookup[nlcdClass, hydCode]
+        rows.insertRow((nlcdClass, landuseDesc, hydGroup, None if rcn != rcn else float(rcn), round(cells * cellArea / acreConversion,1)))
+    del rows, rcnDescriptions, acreConversion, rcnLookup, nlcdRows, landuseArray, soilsArray
+
     # ------------------------------------------------------------------ Pass results to user watershed
     AddMsgAndPrint("\nAdding RCN results to " + str(wsName) + "'s attributes",0)
     if not len(arcpy.ListFields(watershed,"RCN")) > 0:
         arcpy.AddField_management(watershed, "RCN", "LONG", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-    arcpy.CalculateField_management(watershed, "RCN", "" + str(wgtRCN) + "", "PYTHON")
+    attributeUpdates.updateAttributes(watershed, "Subbasin", dict((subbasin, {"RCN": int(subRCN)}) for subbasin, (subRCN, cells) in subbasinRCN.items()))
 
-    del wgtRCN
+    del wgtRCN, subbasinRCN
             
     # ------------------------------------------------------------------ Optional: Create Runoff Curve Number Grid
     if createRCN:
         AddMsgAndPrint("\nCreating Curve Number Raster...",0)
     
-        # If user provided a snap raster, assign from input        
+        # If user provided a snap raster, project the grid onto it
         if len(snapRaster) > 0:
+            rasterArrays.arrayToRaster(rcnArray, landuseInfo, RCN_TEMP)
             arcpy.env.snapRaster = snapRaster
-            arcpy.env.outputCoordinateSystem = outCoordSys
-            arcpy.env.cellSize = outCellSize
+            arcpy.ProjectRaster_management(RCN_TEMP, RCN_GRID, outCoordSys, "NEAREST", outCellSize)
             del outCoordSys, outCellSize
         else:
-            arcpy.env.snapRaster = landuse
-            arcpy.env.cellSize = cellSize
-            
-        # Convert Combined Raster to Curve Number grid
-        #gp.Lookup_sa(LU_PLUS_SOILS, "RCN", RCN_GRID)
-        tempLU = arcpy.sa.Lookup(LU_PLUS_SOILS, "RCN")
-        tempLU.save(RCN_GRID)
+            rasterArrays.arrayToRaster(rcnArray, landuseInfo, RCN_GRID)
         
         AddMsgAndPrint("\nSuccessfully Created Runoff Curve Number Grid!",0)
 
+    del rcnArray, landuseInfo
+
     # ----------------------------------------------------- Delete Intermediate data
-    layersToRemove = (LU_PLUS_SOILS,CULT_GRID,CULT_POLY,SOILS_GRID,RCN_Stats,RCN_Stats2,landuse)
+    layersToRemove = (SUBBASIN_GRID,RCN_TEMP,CULT_GRID,CULT_POLY,SOILS_GRID,landuse)
     x = 0        
     for layer in layersToRemove:
         if arcpy.Exists(layer):
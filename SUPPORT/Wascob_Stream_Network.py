@@ -97,6 +97,7 @@ def determineOverlap(culvertLayer):
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, traceback
+import priorityFlood, flowRouting
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -289,8 +290,7 @@ try:
                 arcpy.MosaicToNewRaster_management(mosaicList, watershedGDB_path, "hydroDEM", "#", "32_BIT_FLOAT", cellSize, "1", "LAST", "#")
 
                 AddMsgAndPrint("\nFilling sinks...",0)
-                tempFill = arcpy.sa.Fill(hydroDEM)
-                tempFill.save(Fill_hydroDEM)
+                priorityFlood.fillRaster(hydroDEM, Fill_hydroDEM, True)
                 AddMsgAndPrint("\nSuccessfully filled sinks in " + os.path.basename(hydroDEM) + " to remove small imperfections.",0)
 
                 # Delete unwanted datasets
@@ -302,8 +302,7 @@ try:
                 AddMsgAndPrint("\nNo Culverts overlap project area.",0)
                 AddMsgAndPrint("\nFilling sinks...",0)
                 cellSize = arcpy.Describe(DEM_aoi).MeanCellWidth
-                tempFill = arcpy.sa.Fill(DEM_aoi)
-                tempFill.save(Fill_hydroDEM)
+                priorityFlood.fillRaster(DEM_aoi, Fill_hydroDEM, True)
                 AddMsgAndPrint("\nSuccessfully filled sinks in " + os.path.basename(hydroDEM) + " to remove small imperfections.",0)
 
             del proceed
@@ -313,28 +312,21 @@ try:
             AddMsgAndPrint("\nNo new culverts were input.",0)
             AddMsgAndPrint("\nFilling sinks...",0)
             cellSize = arcpy.Describe(DEM_aoi).MeanCellWidth
-            tempFill = arcpy.sa.Fill(DEM_aoi)
-            tempFill.save(Fill_hydroDEM)
+            priorityFlood.fillRaster(DEM_aoi, Fill_hydroDEM, True)
             AddMsgAndPrint("\nSuccessfully filled sinks in " + os.path.basename(DEM_aoi) + " to remove small imperfections.",0)
 
     else:
         AddMsgAndPrint("\nNo culverts input or existing in project data.",0)
         AddMsgAndPrint("\nFilling sinks...",0)
         cellSize = arcpy.Describe(DEM_aoi).MeanCellWidth
-        tempFill = arcpy.sa.Fill(DEM_aoi)
-        tempFill.save(Fill_hydroDEM)
+        priorityFlood.fillRaster(DEM_aoi, Fill_hydroDEM, True)
         AddMsgAndPrint("\nSuccessfully filled sinks in " + os.path.basename(DEM_aoi) + " to remove small imperfections.",0)            
 
     # ---------------------------------------------------------------------------------------------- Create Stream Network
-    # Create Flow Direction Grid...
-    AddMsgAndPrint("\nCreating Flow Direciton...",0)
-    tempFlow = arcpy.sa.FlowDirection(Fill_hydroDEM, "NORMAL", "")
-    tempFlow.save(FlowDir)
-
-    # Create Flow Accumulation Grid...
-    AddMsgAndPrint("\nCreating Flow Accumulation...",0)
-    tempAcc = arcpy.sa.FlowAccumulation(FlowDir, "", "INTEGER")
-    tempAcc.save(FlowAccum)
+    # Create Flow Direction and Flow Accumulation Grids...
+    # D8 codes match arcpy.sa.FlowDirection and accumulation is a single topological pass over the same array
+    AddMsgAndPrint("\nCreating Flow Direction and Flow Accumulation...",0)
+    flowRouting.flowDirectionAndAccumulation(Fill_hydroDEM, FlowDir, FlowAccum)
 
     # Need to compute a histogram for the FlowAccumulation layer so that the full range of values is captured for subsequent stream generation
     # This tries to fix a bug of the primary channel not generating for large watersheds with high values in flow accumulation grid
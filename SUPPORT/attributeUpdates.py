@@ -0,0 +1,99 @@
+## attributeUpdates.py
+##
+## Created by USDA NRCS, 2026
+##
+## Bulk keyed attribute write-back.  The tools used to open a new UpdateCursor with a "Subbasin = N"
+## whereclause for every zone, one table scan per zone.  updateAttributes takes all of the values at once as
+## {key: {field: value}} and writes them in a single pass over the table.
+##
+## The table is reached through a cursor factory with the arcpy.da.UpdateCursor interface:
+## factory(table, fields) returns an iterable of row lists with updateRow(row).  arcpy.da.UpdateCursor is
+## the default; MemoryUpdateCursor (a list of dictionaries) and SqliteUpdateCursor (a sqlite3 table) stand in
+## for a feature class outside of ArcGIS.
+
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
+## ================================================================================================================
+def arcpyUpdateCursor(table, fields):
+    # Default cursor factory.
+
+    if arcpy is None:
+        raise ImportError("arcpy is required to update " + str(table))
+    return arcpy.da.UpdateCursor(table, fields)
+
+## ================================================================================================================
+class MemoryUpdateCursor(object):
+    # Update cursor over a list of dictionaries, one per row.
+
+    def __init__(self, table, fields):
+        self.table = table
+        self.fields = list(fields)
+
+    def __iter__(self):
+        for record in self.table:
+            self.current = record
+            yield [record.get(field) for field in self.fields]
+
+    def updateRow(self, row):
+        for field, value in zip(self.fields, row):
+            self.current[field] = value
+
+## ================================================================================================================
+class SqliteUpdateCursor(object):
+    # Update cursor over a sqlite3 table.  table is a (connection, tableName) tuple; changes are committed
+    # once the rows have been read.
+
+    def __init__(self, table, fields):
+        self.connection, self.tableName = table
+        self.fields = list(fields)
+
+    def __iter__(self):
+        columns = ", ".join('"' + field + '"' for field in self.fields)
+        records = self.connection.execute('SELECT rowid, ' + columns + ' FROM "' + self.tableName + '"').fetchall()
+        for record in records:
+            self.rowid = record[0]
+            yield list(record[1:])
+        self.connection.commit()
+
+    def updateRow(self, row):
+        assignments = ", ".join('"' + field + '" = ?' for field in self.fields)
+        self.connection.execute('UPDATE "' + self.tableName + '" SET ' + assignments + ' WHERE rowid = ?', list(row) + [self.rowid])
+
+## ================================================================================================================
+def updateAttributes(table, keyField, updates, cursorFactory=None):
+    # Writes updates ({key: {field: value}}) to every row of table whose keyField value is a key, in one
+    # cursor pass.  Fields a key does not list are left as they are.  Returns (rowsUpdated, missedKeys) where
+    # missedKeys are the keys that matched no row, in sorted order.
+
+    if cursorFactory is None:
+        cursorFactory = arcpyUpdateCursor
+
+    fields = []
+    for values in updates.values():
+        for field in values:
+            if field not in fields:
+                fields.append(field)
+
+    rowsUpdated = 0
+    matched = set()
+    if fields:
+        cursor = cursorFactory(table, [keyField] + fields)
+        for row in cursor:
+            key = row[0]
+            if key not in updates:
+                continue
+
+            values = updates[key]
+            for i, field in enumerate(fields):
+                if field in values:
+                    row[i + 1] = values[field]
+            cursor.updateRow(row)
+            rowsUpdated += 1
+            matched.add(key)
+        del cursor
+
+    missedKeys = sorted(key for key in updates if key not in matched)
+    return rowsUpdated, missedKeys
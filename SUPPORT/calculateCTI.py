@@ -70,6 +70,7 @@ def logBasicSettings():
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, string, traceback
+import terrainIndices
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -101,6 +102,11 @@ try:
     DEM_aoi = arcpy.GetParameterAsText(0)
     zUnits = arcpy.GetParameterAsText(1)
     inWatershed = arcpy.GetParameterAsText(2)
+
+    # Optional LS factor from the same pass
+    createLS = False
+    if arcpy.GetArgumentCount() > 4:
+        createLS = arcpy.GetParameterAsText(4).upper() == "TRUE"
         
     if len(inWatershed) > 0:
         clip = True
@@ -123,14 +129,11 @@ try:
     # ---------------------------------- Datasets -------------------------------------------
     # -------------------------------------------------------------------- Temporary Datasets
     smoothDEM = watershedGDB_path + os.sep + "smoothDEM"
-    ctiTemp = watershedGDB_path + os.sep + "ctiTemp"
-    DEMclip = watershedGDB_path + os.sep + "DEMclip"
-    FACclip = watershedGDB_path + os.sep + "FACclip"
-    FDRclip = watershedGDB_path + os.sep + "FDRclip"
     
     # -------------------------------------------------------------------- Permanent Datasets
     Slope = watershedGDB_path + os.sep + projectName + "_Slope"    
     ctiOut = watershedGDB_path + os.sep + projectName + "_CTI"
+    lsOut = watershedGDB_path + os.sep + projectName + "_LS"
 
     # -------------------------------------------------------------------- Required Existing Inputs
     FlowAccum = watershedGDB_path + os.sep + "flowAccumulation"
@@ -195,66 +198,31 @@ try:
     AddMsgAndPrint("\tElevation Values (Z): " + zUnits,0) 
     AddMsgAndPrint("\tCell Size: " + str(desc.MeanCellWidth) + " x " + str(desc.MeanCellHeight) + " " + units,0)
 
-    # ---------------------------------------------------------------------------- If user provided a mask clip inputs first.
+    # --------------------------------------------------------------------------------- Calculate Slope, CTI and LS
+    # DEM and flow accumulation are read once (clipped to the mask if one was given); slope and every index
+    # come from the same arrays.
     if clip:
-        # Clip inputs to input Mask
         AddMsgAndPrint("\nClipping Grids to " + str(os.path.basename(inWatershed)) + "...",0)
-        tempMask = arcpy.sa.ExtractByMask(DEM_aoi, inWatershed)
-        tempMask.save(DEMclip)
-        AddMsgAndPrint("\tSuccessfully clipped " + str(os.path.basename(DEM_aoi)),0)
-        
-        tempMask2 = arcpy.sa.ExtractByMask(FlowAccum, inWatershed)
-        tempMask2.save(FACclip)
-        AddMsgAndPrint("\tSuccessfully clipped Flow Accumulation",0)
-        
-        # Reset paths to DEM and Flow Accum
-        DEM_aoi = DEMclip
-        FlowAccum = FACclip
-
-    # --------------------------------------------------------------------------------- Calculate Slope Grid
     if not arcpy.Exists(Slope):
         AddMsgAndPrint("\nPreparing Slope Grid using a Z-Factor of " + str(Zfactor) + "",0)
-        if not arcpy.Exists(smoothDEM):
-            # Smooth the DEM to remove imperfections in drop
-            AddMsgAndPrint("\tSmoothing the DEM...",0)    
-            tempFocal = arcpy.sa.FocalStatistics(DEM_aoi, "RECTANGLE 3 3 CELL","MEAN","DATA")
-            tempFocal.save(smoothDEM)
-
-        # Calculate percent slope with proper Z Factor (create in Degrees to convert to radians for CTI)
-        AddMsgAndPrint("\tCalculating percent slope...",0)
-        tempSlope = arcpy.sa.Slope(smoothDEM, "DEGREE", Zfactor)
-        tempSlope.save(Slope)
-                       
-    # --------------------------------------------------------------------------------- Create and Filter CTI
-    # Calculate CTI
-    AddMsgAndPrint("\nCalculating Compound Topographic Index...",0)
-    #gp.SingleOutputMapAlgebra_sa("Ln((\""+str(FlowAccum)+"\" + 0.001) / (\""+str(Slope)+"\" / 100 + 0.001))", ctiTemp)
+        # Slope in degrees from the smoothed DEM (converted to radians for CTI)
+        AddMsgAndPrint("\tCalculating slope from the smoothed DEM...",0)
+    else:
+        AddMsgAndPrint("\nUsing existing slope grid " + str(os.path.basename(Slope)) + "",0)
 
     # Updated formula (6/4/2020) to: ln(((flow accumulation + 1)*cellize)/(tan(slope))), where slope is in radians
-
-    # Compute numerator
-    ras1 = arcpy.sa.Raster(FlowAccum)
-    ras2 = (ras1 + 1)*cellSize
-
-    # Convert slope to radians
-    ras3 = arcpy.sa.Raster(Slope)
-    ras4 = (ras3 * 1.570796)/90
-
-    # Compute denominator
-    tan_ras4 = arcpy.sa.Con(ras4 > 0, arcpy.sa.Tan(ras4), 0.001)
-
-    # Compute CTI
-    tempSOMA = arcpy.sa.Ln(ras2/tan_ras4)
-    tempSOMA.save(ctiTemp)
+    AddMsgAndPrint("\nCalculating Compound Topographic Index...",0)
+    outputs = {"CTI": ctiOut}
+    if createLS:
+        AddMsgAndPrint("\tCalculating LS Factor...",0)
+        outputs["LS"] = lsOut
+    terrainIndices.terrainIndexRasters(DEM_aoi, FlowAccum, outputs, Slope, Zfactor, inWatershed if clip else None,
+                                       metersPerUnit=sr.metersPerUnit)
     AddMsgAndPrint("\n\tFiltering index values...",0)
-
-    # Set Values < 0 to null
-    conStatement = "Value <= 0"
-    tempNull = arcpy.sa.SetNull(ctiTemp, ctiTemp, conStatement)
-    tempNull.save(ctiOut)
+    del outputs
 
     # --------------------------------------------------------------------------------- Delete intermediate data           
-    datasetsToRemove = (smoothDEM,ctiTemp,DEMclip,FACclip)
+    datasetsToRemove = (smoothDEM,)
 
     x = 0
     for dataset in datasetsToRemove:
@@ -277,7 +245,9 @@ try:
         pass
 
     # ------------------------------------------------------------ Prepare to Add to Arcmap
-    arcpy.SetParameterAsText(3, ctiOut)    
+    arcpy.SetParameterAsText(3, ctiOut)
+    if createLS:
+        AddMsgAndPrint("\tLS Factor saved as " + os.path.basename(lsOut),0)    
 
     #----------------------------------------------------------------------- Finished!
     AddMsgAndPrint("\nProcessing Completed!",0)
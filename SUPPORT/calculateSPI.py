@@ -77,6 +77,7 @@ def logBasicSettings():
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, string, traceback
+import terrainIndices
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -110,6 +111,14 @@ try:
     inWatershed = arcpy.GetParameterAsText(2)
     minFlow = arcpy.GetParameterAsText(3)
     maxDA = arcpy.GetParameterAsText(4)
+
+    # Optional CTI and LS factor from the same pass
+    createCTI = False
+    createLS = False
+    if arcpy.GetArgumentCount() > 6:
+        createCTI = arcpy.GetParameterAsText(6).upper() == "TRUE"
+    if arcpy.GetArgumentCount() > 7:
+        createLS = arcpy.GetParameterAsText(7).upper() == "TRUE"
         
     if len(inWatershed) > 0:
         clip = True
@@ -131,18 +140,13 @@ try:
 
     # ---------------------------------- Datasets -------------------------------------------
     # -------------------------------------------------------------------- Temporary Datasets
-    FlowLen = watershedGDB_path + os.sep + "FlowLen"
-    facFilt2 = watershedGDB_path + os.sep + "facFilt2"
-    facFilt1 = watershedGDB_path + os.sep + "facFilt1"
     smoothDEM = watershedGDB_path + os.sep + "smoothDEM"
-    spiTemp = watershedGDB_path + os.sep + "spiTemp"
-    DEMclip = watershedGDB_path + os.sep + "DEMclip"
-    FACclip = watershedGDB_path + os.sep + "FACclip"
-    FDRclip = watershedGDB_path + os.sep + "FDRclip"
     
     # -------------------------------------------------------------------- Permanent Datasets
     Slope = watershedGDB_path + os.sep + projectName + "_Slope"    
     spiOut = watershedGDB_path + os.sep + projectName + "_SPI"
+    ctiOut = watershedGDB_path + os.sep + projectName + "_CTI"
+    lsOut = watershedGDB_path + os.sep + projectName + "_LS"
 
     # -------------------------------------------------------------------- Required Existing Inputs
     FlowAccum = watershedGDB_path + os.sep + "flowAccumulation"
@@ -234,88 +238,39 @@ try:
         overlandThresh = float(minFlow) * 0.3048
         channelThresh = float(maxDA) * 4046.868564224 / cellArea
 
-    # ---------------------------------------------------------------------------- If user provided a mask clip inputs first.
+    # ----------------------------------------------------------------------------- Calculate Slope, SPI, CTI and LS
+    # DEM, flow direction and flow accumulation are read once (clipped to the mask if one was given).  The
+    # flow length and drainage area filters are applied as masks and every index comes from the same arrays.
     if clip:
-        # Clip inputs to input Mask
-        AddMsgAndPrint("\nClipping Grids to " + str(os.path.basename(inWatershed)) + "...",0) 
-        tempMask = arcpy.sa.ExtractByMask(DEM_aoi, inWatershed)
-        tempMask.save(DEMclip)
-        AddMsgAndPrint("\tSuccessfully clipped " + str(os.path.basename(DEM_aoi)),0)
+        AddMsgAndPrint("\nClipping Grids to " + str(os.path.basename(inWatershed)) + "...",0)
 
-        tempMask2 = arcpy.sa.ExtractByMask(FlowAccum, inWatershed)
-        tempMask2.save(FACclip)
-        AddMsgAndPrint("\tSuccessfully clipped Flow Accumulation",0)
-        
-        tempMask3 = arcpy.sa.ExtractByMask(FlowDir, inWatershed)
-        tempMask3.save(FDRclip)
-        AddMsgAndPrint("\tSuccessfully clipped Flow Direction",0)   
-        
-        # Reset paths to DEM, Flow Dir and Flow Accum
-        DEM_aoi = DEMclip
-        FlowAccum = FACclip
-        FlowDir = FDRclip
-        
-    # ----------------------------------------------------------------------------- Prefilter FlowAccum Based on Flow Length and Drain Area
-    AddMsgAndPrint("\nFiltering flow accumulation based on flow length and contributing area...",0)    
-    # Calculate Upstream Flow Length
+    AddMsgAndPrint("\nFiltering flow accumulation based on flow length and contributing area...",0)
     AddMsgAndPrint("\tCalculating Upstream Flow Lengths...",0)
-    tempLen = arcpy.sa.FlowLength(FlowDir, "UPSTREAM", "")
-    tempLen.save(FlowLen)
-
-    # Filter Out Overland Flow
-    expression = "\"VALUE\" < " + str(overlandThresh) + ""
     AddMsgAndPrint("\tFiltering out flow accumulation with overland flow < " + str(minFlow) + " feet...",0)
-    #gp.SetNull_sa(FlowAccum, FlowLen, facFilt1, expression)
-    tempNull = arcpy.sa.SetNull(FlowAccum, FlowLen, expression)
-    tempNull.save(facFilt1)
-    del expression
-
-    # Filter Out Channelized Flow
-    expression = "\"VALUE\" > " + str(channelThresh) + ""
     AddMsgAndPrint("\tFiltering out channelized flow with > " + str(maxDA) + " Acre Drainage Area...",0)
-    #gp.SetNull_sa(facFilt1, facFilt1, facFilt2, expression)
-    tempNull2 = arcpy.sa.SetNull(facFilt1, facFilt1, expression)
-    tempNull2.save(facFilt2)
-    del expression
 
-    # --------------------------------------------------------------------------------- Calculate Slope Grid
     if not arcpy.Exists(Slope):
         AddMsgAndPrint("\nPreparing Slope Grid using a Z-Factor of " + str(Zfactor) + "",0)
-        if not arcpy.Exists(smoothDEM):
-            # Smooth the DEM to remove imperfections in drop
-            AddMsgAndPrint("\tSmoothing the DEM...",0)    
-            #gp.Focalstatistics_sa(DEM_aoi, smoothDEM,"RECTANGLE 3 3 CELL","MEAN","DATA")
-            tempFocal = arcpy.sa.FocalStatistics(DEM_aoi, "RECTANGLE 3 3 CELL","MEAN","DATA")
-            tempFocal.save(smoothDEM)
-
-        # Calculate percent slope with proper Z Factor    
-        AddMsgAndPrint("\tCalculating percent slope...",0)
-        #gp.Slope_sa(smoothDEM, Slope, "PERCENT_RISE", Zfactor)
-        tempSlope = arcpy.sa.Slope(smoothDEM, "DEGREE", Zfactor)
-        tempSlope.save(Slope)
-        
+        AddMsgAndPrint("\tCalculating slope from the smoothed DEM...",0)
     else:
         AddMsgAndPrint("\nUsing existing slope grid " + str(os.path.basename(Slope)) + "",0)
-                       
-    # --------------------------------------------------------------------------------- Create and Filter Stream Power Index
+
     # Calculate SPI (formula updated to match ACPF and slope input changed to degrees, 6/5/2020)
     AddMsgAndPrint("\nCalculating Stream Power Index...",0)
-    #gp.SingleOutputMapAlgebra_sa("Ln((\""+str(facFilt2)+"\" + 0.001) * (\""+str(Slope)+"\" / 100 + 0.001))", spiTemp)
-    ras1 = arcpy.sa.Raster(facFilt2)
-    ras2 = arcpy.sa.Raster(Slope)
-    Beta = arcpy.sa.Con(ras2, "0.001", ras2, "Value = 0")
-    tempSOMA = arcpy.sa.Ln((ras1 + 0.001) * Beta)
-    tempSOMA.save(spiTemp)
+    outputs = {"SPI": spiOut}
+    if createCTI:
+        AddMsgAndPrint("\tCalculating Compound Topographic Index...",0)
+        outputs["CTI"] = ctiOut
+    if createLS:
+        AddMsgAndPrint("\tCalculating LS Factor...",0)
+        outputs["LS"] = lsOut
+    terrainIndices.terrainIndexRasters(DEM_aoi, FlowAccum, outputs, Slope, Zfactor, inWatershed if clip else None,
+                                       FlowDir, overlandThresh, channelThresh, sr.metersPerUnit)
     AddMsgAndPrint("\n\tFiltering index values...",0)
-
-    # Set Values < 0 to null
-    #gp.SetNull(spiTemp, spiTemp, spiOut, "\"VALUE\" <= 0")
-    conStatement = "Value <= 0"
-    tempNull3 = arcpy.sa.SetNull(spiTemp, spiTemp, conStatement)
-    tempNull3.save(spiOut)
+    del outputs
 
     # --------------------------------------------------------------------------------- Delete intermediate data
-    datasetsToRemove = (FlowLen,facFilt1,facFilt2,smoothDEM,spiTemp,DEMclip,FDRclip,FACclip)
+    datasetsToRemove = (smoothDEM,)
 
     x = 0
     for dataset in datasetsToRemove:
@@ -337,7 +292,11 @@ try:
         pass
 
     # ------------------------------------------------------------ Prepare to Add to Arcmap
-    arcpy.SetParameterAsText(5, spiOut)    
+    arcpy.SetParameterAsText(5, spiOut)
+    if createCTI:
+        AddMsgAndPrint("\tCompound Topographic Index saved as " + os.path.basename(ctiOut),0)
+    if createLS:
+        AddMsgAndPrint("\tLS Factor saved as " + os.path.basename(lsOut),0)    
 
     AddMsgAndPrint("\nProcessing Completed!",0)
     
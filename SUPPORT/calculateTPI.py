@@ -58,6 +58,8 @@ def logBasicSettings():
         f.write(" \tClipping set to mask: " + inWatershed + " \n")
     else:
         f.write(" \tClipping: NOT SELECTED\n") 
+    if multiScale:
+        f.write(" \tTPI Window Sizes: " + ", ".join(sizeNames) + (" (multiband)" if multiband else "") + " \n")
         
     f.close
     del f
@@ -65,6 +67,7 @@ def logBasicSettings():
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, string, traceback
+import focalStats, terrainPosition
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -100,6 +103,21 @@ try:
         clip = True
     else:
         clip = False
+
+    # Optional multi-scale mode: window sizes in cells ("3;9;21" or "9x15") and multiband or one raster per size
+    tpiSizes = []
+    multiband = True
+    if arcpy.GetArgumentCount() > 3 and arcpy.GetParameterAsText(3):
+        tpiSizes = [size.strip() for size in arcpy.GetParameterAsText(3).replace(",",";").split(";") if size.strip()]
+    if arcpy.GetArgumentCount() > 4 and arcpy.GetParameterAsText(4):
+        multiband = arcpy.GetParameterAsText(4).upper() != "FALSE"
+    try:
+        tpiSizes = [terrainPosition.windowShape(size) for size in tpiSizes]
+    except (ValueError, IndexError):
+        AddMsgAndPrint("\nTPI window sizes must be whole numbers of cells, e.g. 3;9;21 or 9x15. Exiting...",2)
+        sys.exit()
+    multiScale = len(tpiSizes) > 0 and tpiSizes != [(3, 3)]
+    sizeNames = [str(rows) if rows == cols else str(rows) + "x" + str(cols) for rows, cols in tpiSizes]
         
     # --------------------------------------------------------------------- Define Variables
     DEMpath = arcpy.Describe(DEM_aoi).CatalogPath
@@ -125,6 +143,12 @@ try:
     
     # -------------------------------------------------------------------- Permanent Datasets
     tpiOut = watershedGDB_path + os.sep + projectName + "_TPI"
+    if multiScale:
+        if multiband:
+            tpiOuts = [watershedGDB_path + os.sep + projectName + "_TPI_MultiScale"]
+        else:
+            tpiOuts = [tpiOut + "_" + sizeName for sizeName in sizeNames]
+        tpiOut = tpiOuts[0]
         
     #-------------------------------------------------------------------- Get Raster Properties
     AddMsgAndPrint("\nGathering information about " + os.path.basename(DEM_aoi)+ ":",0) 
@@ -164,19 +188,26 @@ try:
 
     # --------------------------------------------------------------------------------- Create TPI
     AddMsgAndPrint("\nCalculating Topographic Position Index...",0)
+    if multiScale:
+        # Every window size from one summed-area table of the DEM
+        AddMsgAndPrint("\tWindow sizes: " + ", ".join(sizeNames) + " cells",0)
+        terrainPosition.tpiRasters(DEM_aoi, tpiSizes, tpiOut, None if multiband else tpiOuts)
+        for out in tpiOuts:
+            AddMsgAndPrint("\tCreated " + os.path.basename(out),0)
+
+    else:
     
-    if not arcpy.Exists(smoothDEM):        
-        # Smooth the DEM to generalize cell transitions
-        AddMsgAndPrint("\tSmoothing the DEM...",0)    
-        tempFocal = arcpy.sa.FocalStatistics(DEM_aoi, "RECTANGLE 3 3 CELL","MEAN","DATA")
-        tempFocal.save(smoothDEM)
-
-    # Subtract the original surface to create tpi
-    AddMsgAndPrint("\tSubtracting original surface...",0)
-    #gp.Minus_sa(smoothDEM, DEM_aoi, tpiOut)
-    #tempMinus = arcpy.sa.Minus(smoothDEM, DEM_aoi)
-    tempMinus = arcpy.sa.Minus(DEM_aoi, smoothDEM)
-    tempMinus.save(tpiOut)
+        if not arcpy.Exists(smoothDEM):        
+            # Smooth the DEM to generalize cell transitions
+            AddMsgAndPrint("\tSmoothing the DEM...",0)    
+            focalStats.focalRaster(DEM_aoi, smoothDEM, "RECTANGLE 3 3 CELL", "MEAN")
+
+        # Subtract the original surface to create tpi
+        AddMsgAndPrint("\tSubtracting original surface...",0)
+        #gp.Minus_sa(smoothDEM, DEM_aoi, tpiOut)
+        #tempMinus = arcpy.sa.Minus(smoothDEM, DEM_aoi)
+        tempMinus = arcpy.sa.Minus(DEM_aoi, smoothDEM)
+        tempMinus.save(tpiOut)
         
     AddMsgAndPrint("\n\tSuccessfully determined topographic cell positions...",0)
 
@@ -57,6 +57,7 @@ def logBasicSettings():
     f.write("\tInput Dem: " + inputDEM + "\n")
     f.write("\tInput Elevation Z-units: " + zUnits + "\n")
     f.write("\tOutput Elevation Z-units: " + outzUnits + "\n")
+    f.write("\tOutput Pixel Type: " + ("32 bit integer" if integerOutput else "32 bit float") + "\n")
     
     f.close
     del f
@@ -64,6 +65,7 @@ def logBasicSettings():
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, traceback
+import demUnits
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -101,10 +103,14 @@ try:
     outzUnits = arcpy.GetParameterAsText(4)
     outputDEM = arcpy.GetParameterAsText(5)
 
+    # Optional output pixel type; FLOAT (32 bit float) unless INTEGER (32 bit integer centimeters) is chosen
+    integerOutput = False
+    if arcpy.GetArgumentCount() > 6:
+        integerOutput = arcpy.GetParameterAsText(6).upper() == "INTEGER"
+
     #--------------------------------------------------------------------- Directory Paths
     userWorkspace = os.path.dirname(os.path.realpath(outputDEM))
     demName = os.path.splitext(os.path.basename(outputDEM))[0]
-    DEMtemp = userWorkspace + os.sep + "DEMtemp"
     textFilePath = userWorkspace + os.sep + os.path.basename(userWorkspace).replace(" ","_") + "_EngTools.txt"
 
     # record basic user inputs and settings to log file for future purposes
@@ -155,59 +161,29 @@ try:
 
     # Coordinate System must be a Projected type in order to continue.
     # zUnits and outzUnits will determine conversion factor for the creation of a new DEM.
-    # Conversion factors are now set for use with the Times function, as of 10/16/2019.
+    # Conversion factors (set for multiplying, as of 10/16/2019) are kept in demUnits.zUnitFactors.
     
     if sr.Type == "Projected":
-        if zUnits == "Meters":
-            if outzUnits == "Feet":
-                convFactor = 3.280839896
-            if outzUnits == "Inches":
-                convFactor = 39.3701
-            if outzUnits == "Centimeters":
-                convFactor = 100
-            if outzUnits == "Meters":
-                AddMsgAndPrint("\n\n\tSelected output Z-Units are the same as input Z-Units. Exiting...",2)
-                sys.exit(0)
-        elif zUnits == "Centimeters":
-            if outzUnits == "Feet":
-                convFactor = 0.03280839896
-            if outzUnits == "Inches":
-                convFactor = 0.393701
-            if outzUnits == "Meters":
-                convFactor = 0.01
-            if outzUnits == "Centimeters":
-                AddMsgAndPrint("\n\n\tSelected output Z-Units are the same as input Z-Units. Exiting...",2)
-                sys.exit(0)            
-        elif zUnits == "Feet":
-            if outzUnits == "Centimeters":
-                convFactor = 30.48
-            if outzUnits == "Inches":
-                convFactor = 12
-            if outzUnits == "Meters":
-                convFactor = 0.3048
-            if outzUnits == "Feet":
-                AddMsgAndPrint("\n\n\tSelected output Z-Units are the same as input Z-Units. Exiting...",2)
-                sys.exit(0)
-        elif zUnits == "Inches":
-            if outzUnits == "Centimeters":
-                convFactor = 2.54
-            if outzUnits == "Feet":
-                convFactor = 0.0833333 
-            if outzUnits == "Meters":
-                convFactor = 0.0254
-            if outzUnits == "Inches":
-                AddMsgAndPrint("\n\n\tSelected output Z-Units are the same as input Z-Units. Exiting...",2)
-                sys.exit(0)                
+        if zUnits == outzUnits:
+            AddMsgAndPrint("\n\n\tSelected output Z-Units are the same as input Z-Units. Exiting...",2)
+            sys.exit(0)
+        convFactor = demUnits.conversionFactor(zUnits, outzUnits)
     else:
         AddMsgAndPrint("\n\n\t" + os.path.basename(inputDEM) + " is NOT in a projected Coordinate System. Exiting...",2)
         sys.exit(0)
 
+    # Whole centimeters fit a 32 bit integer raster without losing any survey precision
+    if integerOutput and outzUnits != "Centimeters":
+        AddMsgAndPrint("\n\n\tInteger output is only available for Centimeters. Exiting...",2)
+        sys.exit(0)
+
     AddMsgAndPrint("\tInput Projection Name: " + sr.Name,0)
     AddMsgAndPrint("\tXY Linear Units: " + units,0)
     AddMsgAndPrint("\tCell Size: " + str(desc.MeanCellWidth) + " x " + str(desc.MeanCellHeight) + " " + units + "\n",0)
     AddMsgAndPrint("\tInput Elevation Values (Z): " + zUnits,0)
     AddMsgAndPrint("\tOuput Elevation Values (Z): " + outzUnits,0) 
     AddMsgAndPrint("\tConversion Factor: " + str(float(convFactor)),0)
+    AddMsgAndPrint("\tOutput Pixel Type: " + ("32 bit integer" if integerOutput else "32 bit float"),0)
 
     # -------------------------------------------------------------------- Specify environments
     arcpy.env.extent = "MINOF"
@@ -216,29 +192,29 @@ try:
     arcpy.env.snapRaster = ""
     arcpy.env.outputCoordinateSystem = sr
     
-    # -------------------------------------------------------------------- Clip DEM to AOI if DEM not already clipped
-
+    # -------------------------------------------------------------------- Clip and convert DEM
+    # The DEM is clipped to the mask (if not already clipped) and converted in one pass over blocks of rows;
+    # statistics of the new values are gathered in the same pass and saved with the output DEM.
     if Clip:
-        clippedDEM = arcpy.sa.ExtractByMask(inputDEM, inMask)
-        clippedDEM.save(DEMtemp)
+        demStats = demUnits.convertDEM(inputDEM, outputDEM, convFactor, inMask, integerOutput)
+        if demStats is None:
+            AddMsgAndPrint("\n\n\t" + os.path.basename(inputDEM) + " does not overlap the mask. Exiting...",2)
+            sys.exit(0)
         AddMsgAndPrint("\nSuccessully Clipped " + os.path.basename(inputDEM) + " to area of interest...",0)
-        inputDEM = DEMtemp
-
-##    # Change to Times. Update conversion factors (Done 10/16/2019)
-##    gp.Divide_sa(inputDEM, convFactor, outputDEM)
-##    AddMsgAndPrint("\nSuccessfully converted " + os.path.basename(inputDEM) + " from " + str(zUnits) + " to " + str(outzUnits) + "\n",1)
+    else:
+        demStats = demUnits.convertDEM(inputDEM, outputDEM, convFactor, None, integerOutput)
 
-    outTimes = arcpy.sa.Times(inputDEM, convFactor)
-    outTimes.save(outputDEM)
     AddMsgAndPrint("\nSuccessfully converted " + os.path.basename(inputDEM) + " from " + str(zUnits) + " to " + str(outzUnits) + "\n",0)
-    
-    # -------------------------------------------------------------------- Delete Optional Temp Output
-    if Clip == True:
-        AddMsgAndPrint("\nDeleting intermediate data...",0)
-        try:
-            arcpy.Delete_management(DEMtemp)
-        except:
-            pass
+
+    if demStats.count > 0:
+        AddMsgAndPrint("\tMinimum Elevation: " + str(round(demStats.minimum,2)) + " " + outzUnits,0)
+        AddMsgAndPrint("\tMaximum Elevation: " + str(round(demStats.maximum,2)) + " " + outzUnits,0)
+        AddMsgAndPrint("\tMean Elevation: " + str(round(demStats.mean,2)) + " " + outzUnits,0)
+        AddMsgAndPrint("\tStandard Deviation: " + str(round(demStats.standardDeviation,2)) + " " + outzUnits,0)
+        AddMsgAndPrint("\tHistogram Bins: " + str(len(demStats.bins)) + " of 1 " + outzUnits + "\n",0)
+        AddMsgAndPrint("\tSaved statistics with " + os.path.basename(outputDEM),0)
+    del demStats
+
     # ------------------------------------------------------------------------------------------------ Compact FGDB
     try:
         arcpy.Compact_management(watershedGDB_path)
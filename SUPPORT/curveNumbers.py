@@ -0,0 +1,81 @@
+## curveNumbers.py
+##
+## Created by USDA NRCS, 2026
+##
+## Runoff curve numbers from NLCD landuse and hydrologic soil group grids without Combine, a raster
+## attribute table join and Lookup.  The NLCD_RCN_TABLE is loaded once into a dense 2-D array indexed by
+## NLCD class and hydrologic group code, so the RCN of every cell is one fancy-index operation on the two
+## aligned arrays.  The area weighted RCN of every subbasin comes from np.bincount over the subbasin grid,
+## and the landuse / soil combinations for the summary table from one more bincount.
+##
+## Join codes in the lookup table are NLCD class * 100 + hydrologic group code, as in the "Join_" field.
+
+import numpy as np
+
+nlcdClasses = 256
+soilCodes = 100
+
+## ================================================================================================================
+def curveNumberLookup(records):
+    # Dense (NLCD class, hydrologic group code) array of curve numbers from (joinCode, curveNumber) records.
+    # Combinations that are not in the table are NaN.
+
+    lookup = np.full((nlcdClasses, soilCodes), np.nan, dtype=np.float32)
+    for joinCode, curveNumber in records:
+        if joinCode is None or curveNumber is None:
+            continue
+        landuse, soil = divmod(int(joinCode), soilCodes)
+        if 0 <= landuse < nlcdClasses and np.isnan(lookup[landuse, soil]):
+            lookup[landuse, soil] = curveNumber
+    return lookup
+
+## ================================================================================================================
+def codeArrays(landuseArray, soilArray):
+    # Integer NLCD class and hydrologic group code arrays and the mask of cells where both are valid codes.
+
+    landuse = np.asarray(landuseArray, dtype=np.float64)
+    soil = np.asarray(soilArray, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        valid = (landuse >= 0) & (landuse < nlcdClasses) & (soil >= 0) & (soil < soilCodes)
+    landuseCodes = np.where(valid, landuse, 0).astype(np.intp)
+    soilCodesArray = np.where(valid, soil, 0).astype(np.intp)
+    return landuseCodes, soilCodesArray, valid
+
+## ================================================================================================================
+def lookupCurveNumbers(lookup, landuseArray, soilArray):
+    # RCN grid (float32, NaN where either input is NoData or the combination has no curve number).
+
+    landuse, soil, valid = codeArrays(landuseArray, soilArray)
+    rcn = lookup[landuse, soil]
+    rcn[~valid] = np.nan
+    return rcn
+
+## ================================================================================================================
+def weightedCurveNumbers(rcnArray, zoneArray=None, noDataZone=0):
+    # {zone: (weighted RCN, cells)} of the cells with a curve number in each zone.  Every cell has the same
+    # area, so the cell count is the area weight.  Without a zone array all cells are zone 1.
+
+    rcn = np.asarray(rcnArray, dtype=np.float64).ravel()
+    if zoneArray is None:
+        zones = np.ones(rcn.shape[0], dtype=np.int64)
+    else:
+        zones = np.asarray(zoneArray, dtype=np.float64).ravel()
+
+    with np.errstate(invalid="ignore"):
+        use = ~np.isnan(rcn) & ~np.isnan(zones) & (zones != noDataZone)
+    if not use.any():
+        return {}
+
+    ids, index = np.unique(zones[use].astype(np.int64), return_inverse=True)
+    cells = np.bincount(index, minlength=ids.shape[0])
+    total = np.bincount(index, rcn[use], minlength=ids.shape[0])
+    return dict((int(zone), (float(total[i] / cells[i]), int(cells[i]))) for i, zone in enumerate(ids.tolist()))
+
+## ================================================================================================================
+def combinationCounts(landuseArray, soilArray):
+    # [(NLCD class, hydrologic group code, cells)] for every combination present, in join code order.
+
+    landuse, soil, valid = codeArrays(landuseArray, soilArray)
+    counts = np.bincount((landuse[valid] * soilCodes + soil[valid]).ravel(), minlength=1)
+    present = np.nonzero(counts)[0]
+    return [(int(code // soilCodes), int(code % soilCodes), int(counts[code])) for code in present.tolist()]
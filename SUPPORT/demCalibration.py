@@ -0,0 +1,217 @@
+## demCalibration.py
+##
+## Created by USDA NRCS, 2026
+##
+## DEM calibration to surveyed spot elevations.  The DEM is sampled at every survey point in one pass (see
+## lineStations.sampleRaster).  A correction surface is fitted to the differences (survey - DEM) and added
+## to the DEM one band of rows at a time.  The old tool added a single average difference everywhere;
+## on large fields the bias changes across the field and a surface follows it.
+##
+## Correction surfaces:
+##   CONSTANT  the average difference (the original calibration)
+##   PLANAR    least squares trend plane a + b*x + c*y
+##   IDW       inverse distance weighted average of the nearest survey points (power 2)
+##   SPLINE    thin-plate spline through the differences, with optional smoothing
+## Nearest points for IDW come from scipy's cKDTree when scipy is installed and from a blocked brute force
+## search otherwise.
+##
+## Models are dictionaries so they can be logged and applied block by block.  RMSE of the survey points is
+## reported before and after, with the "after" values read at the same DEM cells the corrected raster has.
+
+import numpy as np
+import rasterArrays
+import focalStats
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+calibrationMethods = ("CONSTANT", "PLANAR", "IDW", "SPLINE")
+
+# Largest query points x survey points distance matrix built at once
+maxPairs = 4000000
+
+## ================================================================================================================
+def rmse(differences):
+    # Root mean square of an array of differences, ignoring NaN.  None if there are none.
+
+    values = np.asarray(differences, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if values.shape[0] == 0:
+        return None
+    return float(np.sqrt(np.mean(values ** 2)))
+
+## ================================================================================================================
+def nearestPoints(pointX, pointY, x, y, k):
+    # (distances, indexes) of the k survey points nearest each query location, both (n, k) and nearest
+    # first.
+
+    px = np.asarray(pointX, dtype=np.float64)
+    py = np.asarray(pointY, dtype=np.float64)
+    qx = np.asarray(x, dtype=np.float64).ravel()
+    qy = np.asarray(y, dtype=np.float64).ravel()
+    k = max(min(int(k), px.shape[0]), 1)
+
+    if cKDTree is not None:
+        distances, indexes = cKDTree(np.column_stack((px, py))).query(np.column_stack((qx, qy)), k)
+        return distances.reshape(qx.shape[0], k), indexes.reshape(qx.shape[0], k)
+
+    distances = np.empty((qx.shape[0], k))
+    indexes = np.empty((qx.shape[0], k), dtype=np.int64)
+    step = max(maxPairs // px.shape[0], 1)
+    for first in range(0, qx.shape[0], step):
+        d = np.hypot(qx[first:first + step, None] - px[None, :], qy[first:first + step, None] - py[None, :])
+        if k < px.shape[0]:
+            nearest = np.argpartition(d, k - 1, axis=1)[:, :k]
+        else:
+            nearest = np.tile(np.arange(px.shape[0]), (d.shape[0], 1))
+        rows = np.arange(d.shape[0])[:, None]
+        nearestD = d[rows, nearest]
+        order = np.argsort(nearestD, axis=1)
+        distances[first:first + step] = nearestD[rows, order]
+        indexes[first:first + step] = nearest[rows, order]
+    return distances, indexes
+
+## ================================================================================================================
+def splineKernel(r):
+    # Thin-plate spline radial basis r^2 ln(r), 0 at r = 0.
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(r > 0, r * r * np.log(r), 0.0)
+
+## ================================================================================================================
+def fitCorrection(x, y, differences, method="CONSTANT", neighbors=12, power=2.0, smoothing=0.0):
+    # Correction surface model fitted to the survey point differences (survey - DEM).  Points with a NaN
+    # difference are left out.
+
+    method = method.upper()
+    if method not in calibrationMethods:
+        raise ValueError("Unsupported calibration method: " + str(method))
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    d = np.asarray(differences, dtype=np.float64)
+    use = ~np.isnan(d)
+    x, y, d = x[use], y[use], d[use]
+    if d.shape[0] == 0:
+        raise ValueError("No survey point falls on the DEM")
+
+    # Coordinates are centered and scaled to keep the fits well conditioned
+    x0, y0 = float(x.mean()), float(y.mean())
+    scale = max(float(np.ptp(x)), float(np.ptp(y)), 1.0)
+    model = {"method": method, "x0": x0, "y0": y0, "scale": scale}
+
+    if method == "CONSTANT" or (method == "PLANAR" and d.shape[0] < 3):
+        return constantCorrection(d.mean())
+
+    elif method == "PLANAR":
+        design = np.column_stack((np.ones(d.shape[0]), (x - x0) / scale, (y - y0) / scale))
+        model["coefficients"] = np.linalg.lstsq(design, d, rcond=-1)[0]
+
+    elif method == "IDW":
+        model.update({"x": x, "y": y, "d": d, "neighbors": int(neighbors), "power": float(power)})
+
+    else:
+        u = (x - x0) / scale
+        v = (y - y0) / scale
+        n = d.shape[0]
+        system = np.zeros((n + 3, n + 3))
+        system[:n, :n] = splineKernel(np.hypot(u[:, None] - u[None, :], v[:, None] - v[None, :])) + float(smoothing) * np.eye(n)
+        system[:n, n] = 1.0
+        system[:n, n + 1] = u
+        system[:n, n + 2] = v
+        system[n:, :n] = system[:n, n:].T
+        solution = np.linalg.lstsq(system, np.concatenate((d, np.zeros(3))), rcond=-1)[0]
+        model.update({"u": u, "v": v, "weights": solution[:n], "affine": solution[n:]})
+
+    return model
+
+## ================================================================================================================
+def constantCorrection(value):
+    # CONSTANT model of a given adjustment, e.g. one entered by the user.
+
+    return {"method": "CONSTANT", "x0": 0.0, "y0": 0.0, "scale": 1.0, "value": float(value)}
+
+## ================================================================================================================
+def evaluateCorrection(model, x, y):
+    # Correction at map coordinates x, y (arrays of any matching shape).
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    shape = np.broadcast(x, y).shape
+    x, y = np.broadcast_arrays(x, y)
+    x = x.ravel()
+    y = y.ravel()
+    method = model["method"]
+
+    if method == "CONSTANT":
+        correction = np.full(x.shape[0], model["value"])
+
+    elif method == "PLANAR":
+        a, b, c = model["coefficients"]
+        correction = a + b * (x - model["x0"]) / model["scale"] + c * (y - model["y0"]) / model["scale"]
+
+    elif method == "IDW":
+        distances, indexes = nearestPoints(model["x"], model["y"], x, y, model["neighbors"])
+        values = model["d"][indexes]
+        with np.errstate(divide="ignore"):
+            weights = 1.0 / distances ** model["power"]
+        exact = distances[:, 0] == 0
+        weights[exact] = 0.0
+        weights[exact, 0] = 1.0
+        correction = (weights * values).sum(axis=1) / weights.sum(axis=1)
+
+    else:
+        u = (x - model["x0"]) / model["scale"]
+        v = (y - model["y0"]) / model["scale"]
+        a, b, c = model["affine"]
+        correction = a + b * u + c * v
+        step = max(maxPairs // model["u"].shape[0], 1)
+        for first in range(0, u.shape[0], step):
+            r = np.hypot(u[first:first + step, None] - model["u"][None, :], v[first:first + step, None] - model["v"][None, :])
+            correction[first:first + step] += splineKernel(r).dot(model["weights"])
+
+    return correction.reshape(shape)
+
+## ================================================================================================================
+def cellCenters(info, x, y):
+    # Map coordinates of the centers of the cells holding each point.
+
+    col = np.floor((np.asarray(x, dtype=np.float64) - info["xmin"]) / info["cellWidth"])
+    row = np.floor((info["ymax"] - np.asarray(y, dtype=np.float64)) / info["cellHeight"])
+    return info["xmin"] + (col + 0.5) * info["cellWidth"], info["ymax"] - (row + 0.5) * info["cellHeight"]
+
+## ================================================================================================================
+def calibrationReport(model, info, x, y, surveyed, rasterValues):
+    # (RMSE before, RMSE after) at the survey points.  After uses the correction at the center of each
+    # point's cell, the value the corrected DEM will hold there.
+
+    before = np.asarray(surveyed, dtype=np.float64) - np.asarray(rasterValues, dtype=np.float64)
+    centerX, centerY = cellCenters(info, x, y)
+    after = before - evaluateCorrection(model, centerX, centerY)
+    return rmse(before), rmse(after)
+
+## ================================================================================================================
+def correctedRowBlocks(inDEM, info, model, blockRows=focalStats.defaultBlockRows):
+    # Generator of DEM row bands with the correction added.  NoData stays NoData.
+
+    centerX = info["xmin"] + (np.arange(info["cols"]) + 0.5) * info["cellWidth"]
+    firstRow = 0
+    for block in rasterArrays.rowBlocks(inDEM, info, blockRows):
+        centerY = info["ymax"] - (firstRow + np.arange(block.shape[0]) + 0.5) * info["cellHeight"]
+        correction = np.zeros(block.shape)
+        valid = ~np.isnan(block)
+        if valid.any():
+            rows, cols = np.nonzero(valid)
+            correction[valid] = evaluateCorrection(model, centerX[cols], centerY[rows])
+        yield (block + correction).astype(np.float32)
+        firstRow += block.shape[0]
+
+## ================================================================================================================
+def applyCorrection(inDEM, outDEM, model, blockRows=focalStats.defaultBlockRows):
+    # Saves inDEM plus the correction surface as outDEM, one band of rows at a time.
+
+    info = rasterArrays.describeRaster(inDEM)
+    blockRows = max(int(blockRows), 1)
+    return rasterArrays.rowBlocksToRaster(correctedRowBlocks(inDEM, info, model, blockRows), info, outDEM)
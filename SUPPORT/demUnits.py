@@ -0,0 +1,204 @@
+## demUnits.py
+##
+## Created by USDA NRCS, 2026
+##
+## Block-wise DEM z-unit conversion used by Convert DEM Z-Units in place of ExtractByMask followed by Times.
+## The DEM is read in bands of rows, optionally clipped to a mask on the way (see mosaicRasters), scaled by
+## the conversion factor and written out band by band, so neither a clipped copy nor the whole DEM is ever
+## held in memory.  Rasters saved as .npy are memory-mapped for both reading and writing.
+##
+## Values are written as float32, or as int32 rounded to whole output units (e.g. centimeters) with
+## intNoData as NoData.  The minimum, maximum, mean, standard deviation and a histogram of the converted
+## values are gathered during the same pass and saved as the statistics of the output (writeStatistics),
+## so the output does not have to be read again to report them or to calculate its statistics.
+
+import math
+import numpy as np
+import rasterArrays
+import mosaicRasters
+import focalStats
+
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+zUnitNames = ("Meters", "Centimeters", "Feet", "Inches")
+
+# Multiplier from one z-unit to another, the factors the tool has used with Times since 10/16/2019
+zUnitFactors = {("Meters", "Feet"): 3.280839896,
+                ("Meters", "Inches"): 39.3701,
+                ("Meters", "Centimeters"): 100,
+                ("Centimeters", "Feet"): 0.03280839896,
+                ("Centimeters", "Inches"): 0.393701,
+                ("Centimeters", "Meters"): 0.01,
+                ("Feet", "Centimeters"): 30.48,
+                ("Feet", "Inches"): 12,
+                ("Feet", "Meters"): 0.3048,
+                ("Inches", "Centimeters"): 2.54,
+                ("Inches", "Feet"): 0.0833333,
+                ("Inches", "Meters"): 0.0254}
+
+intNoData = np.iinfo(np.int32).min
+
+## ================================================================================================================
+def conversionFactor(inUnits, outUnits):
+    # Factor that converts inUnits elevations to outUnits.  Raises ValueError for units that are not in
+    # zUnitNames or that are the same.
+
+    if (inUnits, outUnits) not in zUnitFactors:
+        raise ValueError("No conversion from " + str(inUnits) + " to " + str(outUnits))
+    return float(zUnitFactors[(inUnits, outUnits)])
+
+## ================================================================================================================
+class BlockStatistics(object):
+    # Running count, minimum, maximum, sum, sum of squares and histogram of the values of every block passed
+    # to update.
+    # The histogram has bins binWidth wide starting at multiples of binWidth, kept as {bin index: cells} so
+    # the range does not have to be known in advance.
+
+    def __init__(self, binWidth=1.0):
+        self.binWidth = float(binWidth)
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.totalSquares = 0.0
+        self.bins = {}
+
+    def update(self, values, noDataValue=None):
+        # Adds the cells of a block that are not NaN (or noDataValue for integer blocks).
+
+        values = np.asarray(values)
+        if noDataValue is None:
+            values = values[~np.isnan(values)]
+        else:
+            values = values[values != noDataValue]
+        if values.size == 0:
+            return
+
+        values = values.astype(np.float64)
+        low = float(values.min())
+        high = float(values.max())
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+        self.count += int(values.size)
+        self.total += float(values.sum())
+        self.totalSquares += float(np.dot(values, values))
+
+        index = np.floor(values / self.binWidth).astype(np.int64)
+        first = int(index.min())
+        counts = np.bincount(index - first)
+        for offset in np.nonzero(counts)[0].tolist():
+            key = first + offset
+            self.bins[key] = self.bins.get(key, 0) + int(counts[offset])
+
+    @property
+    def mean(self):
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    @property
+    def standardDeviation(self):
+        if self.count == 0:
+            return None
+        variance = self.totalSquares / self.count - self.mean * self.mean
+        return math.sqrt(max(variance, 0.0))
+
+    def histogram(self):
+        # (lower edge of every bin, cells in it) arrays in order of value.
+
+        keys = sorted(self.bins)
+        return np.array(keys, dtype=np.float64) * self.binWidth, np.array([self.bins[key] for key in keys], dtype=np.int64)
+
+## ================================================================================================================
+def convertBlock(block, factor, integer=False):
+    # Block scaled by factor: float32 with NaN as NoData, or int32 rounded to whole units with intNoData.
+
+    values = np.asarray(block, dtype=np.float64) * factor
+    if not integer:
+        return values.astype(np.float32)
+
+    noData = np.isnan(values)
+    converted = np.rint(np.where(noData, 0.0, values)).astype(np.int32)
+    converted[noData] = intNoData
+    return converted
+
+## ================================================================================================================
+def convertRowBlocks(blocks, factor, integer=False, statistics=None):
+    # Generator of converted row blocks.  statistics (a BlockStatistics) is updated with every block.
+
+    for block in blocks:
+        converted = convertBlock(block, factor, integer)
+        if statistics is not None:
+            statistics.update(converted, intNoData if integer else None)
+        yield converted
+
+## ================================================================================================================
+def convertDEM(inRaster, outRaster, factor, mask=None, integer=False, binWidth=1.0, blockRows=focalStats.defaultBlockRows):
+    # Converts the z-units of inRaster into outRaster one band of rows at a time, e.g.
+    #   convertDEM(inputDEM, outputDEM, conversionFactor("Meters", "Feet"), inMask)
+    # matches Times(ExtractByMask(inputDEM, inMask), 3.280839896).  Returns the BlockStatistics of the
+    # output, or None if the DEM does not overlap the mask.
+
+    info = rasterArrays.describeRaster(inRaster)
+    blockRows = max(int(blockRows), 1)
+
+    if mask is None:
+        outInfo = info
+        blocks = rasterArrays.rowBlocks(inRaster, info, blockRows)
+    else:
+        polygons = mosaicRasters.featurePolygons(mask, info.get("spatialReference"))
+        extent = mosaicRasters.polygonsExtent(polygons)
+        outInfo = None if extent is None else mosaicRasters.mosaicInfo([info], extent)
+        if outInfo is None:
+            return None
+        blocks = mosaicRasters.mosaicRowBlocks([(inRaster, info)], outInfo, "FIRST", polygons, False, blockRows)
+
+    statistics = BlockStatistics(binWidth)
+    converted = convertRowBlocks(blocks, factor, integer, statistics)
+    rasterArrays.rowBlocksToRaster(converted, outInfo, outRaster, intNoData if integer else None)
+    writeStatistics(outRaster, statistics)
+    return statistics
+
+## ================================================================================================================
+def writeStatistics(outRaster, statistics):
+    # Saves the gathered statistics (a BlockStatistics) as the band statistics of outRaster, with
+    # SetRasterProperties under arcpy or SetStatistics and the default histogram under GDAL.  Falls back
+    # to CalculateStatistics if arcpy cannot set them.  Returns False if there was nothing to save or the
+    # output (e.g. .npy) has no place for statistics.
+
+    if statistics.count == 0 or str(outRaster).lower().endswith(".npy"):
+        return False
+
+    values = (statistics.minimum, statistics.maximum, statistics.mean, statistics.standardDeviation)
+
+    if arcpy is not None:
+        try:
+            arcpy.SetRasterProperties_management(outRaster, "#", "1 " + " ".join(repr(float(value)) for value in values))
+        except arcpy.ExecuteError:
+            arcpy.CalculateStatistics_management(outRaster)
+        return True
+
+    if gdal is not None:
+        ds = gdal.Open(str(outRaster), gdal.GA_Update)
+        if ds is None:
+            return False
+        band = ds.GetRasterBand(1)
+        band.SetStatistics(*[float(value) for value in values])
+        edges, counts = statistics.histogram()
+        first = int(round(edges[0] / statistics.binWidth))
+        dense = np.zeros(int(round(edges[-1] / statistics.binWidth)) - first + 1, dtype=np.int64)
+        dense[np.rint(edges / statistics.binWidth).astype(np.int64) - first] = counts
+        band.SetDefaultHistogram(float(edges[0]), float(edges[0]) + dense.shape[0] * statistics.binWidth, dense.tolist())
+        ds.FlushCache()
+        ds = None
+        return True
+
+    return False
@@ -0,0 +1,169 @@
+## derivativeCache.py
+##
+## Created by USDA NRCS, 2026
+##
+## On-disk cache of the hydrologic derivatives of Create Stream Network.  Reruns with a different stream
+## threshold used to refill the DEM and recompute flow direction and flow accumulation even though the DEM
+## and culverts had not changed.  Each set of derivatives (the FlowDir and FlowAccum arrays and their grid)
+## is now saved under a key made from a hash of the DEM's cell values, extent, cell size and spatial
+## reference and of the culvert geometry.  A rerun whose key is in the cache writes the rasters straight
+## from the saved arrays.
+##
+## Files are kept in the size capped, least recently used cache of imageServiceTiles (TileCache) with one
+## entry per derivative, named "<key>.<derivative>".  A set with any entry evicted is treated as missing
+## and rebuilt.  cacheEntries and purgeCache are there to inspect and empty the cache.
+
+import os, time, hashlib
+import numpy as np
+import rasterArrays
+import imageServiceTiles
+import focalStats
+
+# Bump when the derivatives change (fill method, D8 codes) so older entries are never reused
+cacheVersion = 1
+
+defaultCacheBytes = 4 * 1024 ** 3
+
+# Grid of a derivative set, saved as its own entry
+gridKeys = ("xmin", "ymin", "xmax", "ymax", "cellWidth", "cellHeight", "rows", "cols")
+
+## ================================================================================================================
+def defaultCacheFolder():
+    # Per user cache folder shared by every project.
+
+    return os.path.join(os.path.dirname(imageServiceTiles.defaultCacheFolder()), "Derivatives")
+
+## ================================================================================================================
+def openCache(folder=None, maxBytes=defaultCacheBytes):
+    # The derivative cache in folder (default defaultCacheFolder), capped at maxBytes.
+
+    return imageServiceTiles.TileCache(folder or defaultCacheFolder(), maxBytes, ".npy")
+
+## ================================================================================================================
+def spatialReferenceText(spatialReference):
+    # Text that identifies a spatial reference in a signature.
+
+    if spatialReference is None:
+        return ""
+    if hasattr(spatialReference, "exportToString"):
+        return spatialReference.exportToString()
+    return str(spatialReference)
+
+## ================================================================================================================
+def rasterSignature(inRaster, blockRows=focalStats.defaultBlockRows):
+    # SHA-256 of a raster's grid, spatial reference and every cell value, read one band of rows at a time.
+
+    info = rasterArrays.describeRaster(inRaster)
+    digest = hashlib.sha256()
+    digest.update(repr([round(float(info[key]), 6) for key in gridKeys]).encode("utf-8"))
+    digest.update(spatialReferenceText(info.get("spatialReference")).encode("utf-8"))
+    for block in rasterArrays.rowBlocks(inRaster, info, blockRows):
+        digest.update(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+## ================================================================================================================
+def featureSignature(inFeatures, spatialReference=None):
+    # SHA-256 of the geometry of every feature, in spatialReference if given.  Features are sorted first so
+    # the order they were digitized in does not matter.  Requires arcpy.
+
+    import arcpy
+
+    shapes = []
+    with arcpy.da.SearchCursor(inFeatures, ["SHAPE@WKB"], spatial_reference=spatialReference) as cursor:
+        for row in cursor:
+            if row[0] is not None:
+                shapes.append(bytes(row[0]))
+
+    digest = hashlib.sha256()
+    for shape in sorted(shapes):
+        digest.update(hashlib.sha256(shape).digest())
+    return digest.hexdigest()
+
+## ================================================================================================================
+def derivativeKey(demSignature, culvertSignature=""):
+    # Cache key of the derivatives of a DEM hydro enforced with a set of culverts ("" for none).
+
+    return hashlib.sha1(("derivatives " + str(cacheVersion) + " " + demSignature + " " + culvertSignature).encode("utf-8")).hexdigest()
+
+## ================================================================================================================
+def saveDerivatives(cache, key, arrays, info):
+    # Adds a derivative set ({name: array}) on the grid in info to the cache.
+
+    entries = dict(arrays)
+    entries["grid"] = np.array([info[gridKey] for gridKey in gridKeys], dtype=np.float64)
+    keep = set(key + "." + name for name in entries)
+
+    partFolder = os.path.dirname(cache.partPath(key))
+    if not os.path.isdir(partFolder):
+        os.makedirs(partFolder)
+
+    try:
+        for name, array in entries.items():
+            partPath = cache.partPath(key + "." + name)
+            f = open(partPath, "wb")
+            try:
+                np.save(f, np.asarray(array))
+            finally:
+                f.close()
+            cache.put(key + "." + name, partPath, keep)
+    finally:
+        cache.flush()
+    return key
+
+## ================================================================================================================
+def loadDerivatives(cache, key, names):
+    # ({name: array}, grid info) of a cached derivative set, or None if any of names is not cached.
+
+    paths = {}
+    try:
+        for name in tuple(names) + ("grid",):
+            path = cache.get(key + "." + name)
+            if path is None:
+                return None
+            paths[name] = path
+    finally:
+        cache.flush()
+
+    grid = np.load(paths.pop("grid")).tolist()
+    info = dict(zip(gridKeys, grid))
+    info["rows"] = int(info["rows"])
+    info["cols"] = int(info["cols"])
+    return dict((name, np.load(path)) for name, path in paths.items()), info
+
+## ================================================================================================================
+def restoreDerivatives(cache, key, outputs, spatialReference=None):
+    # Writes the cached derivatives in outputs ({name: (raster, NoData value or None)}) and returns True,
+    # or returns False without writing anything if the set is not cached.
+
+    cached = loadDerivatives(cache, key, list(outputs))
+    if cached is None:
+        return False
+
+    arrays, info = cached
+    info["spatialReference"] = spatialReference
+    for name, (outRaster, noDataValue) in outputs.items():
+        rasterArrays.arrayToRaster(arrays[name], info, outRaster, noDataValue)
+    return True
+
+## ================================================================================================================
+def cacheEntries(cache):
+    # [(key, derivative names, bytes, last used as a time string)] of every derivative set in the cache,
+    # most recently used first.
+
+    sets = {}
+    for entryKey, size, used in cache.entries():
+        key, name = entryKey.split(".", 1)
+        names, total, lastUsed = sets.get(key, ([], 0, 0))
+        sets[key] = (names + [name], total + size, max(lastUsed, used))
+
+    items = sorted(sets.items(), key=lambda item: item[1][2], reverse=True)
+    return [(key, sorted(names), total, time.ctime(used)) for key, (names, total, used) in items]
+
+## ================================================================================================================
+def purgeCache(cache, keys=None):
+    # Removes the given derivative sets, or the whole cache if keys is None.  Returns the bytes freed.
+
+    if keys is None:
+        return cache.purge()
+    keys = set(keys)
+    return cache.purge([entryKey for entryKey, size, used in cache.entries() if entryKey.split(".", 1)[0] in keys])
@@ -0,0 +1,50 @@
+## flatGrid.py
+##
+## Created by USDA NRCS, 2026
+##
+## Flattened-index grid shared by the array hydrology engines (depression filling, flow direction,
+## flow accumulation and watershed labeling).  A raster is padded with one ring of NoData cells and
+## flattened in row order, so the eight neighbors of any interior cell are a fixed set of index offsets
+## and neighbor lookups never wrap across rows or fall off the edge of the array.
+
+import numpy as np
+
+# Neighbors in ESRI D8 code order: E=1, SE=2, S=4, SW=8, W=16, NW=32, N=64, NE=128
+d8Codes = (1, 2, 4, 8, 16, 32, 64, 128)
+d8RowShifts = (0, 1, 1, 1, 0, -1, -1, -1)
+d8ColShifts = (1, 1, 0, -1, -1, -1, 0, 1)
+
+## ================================================================================================================
+def flatten(array, fillValue=np.nan):
+    # Pads the array with one ring of fillValue and flattens it.
+    # Returns the flat array and the padded row width used to build neighbor offsets.
+
+    padded = np.pad(np.asarray(array), 1, mode="constant", constant_values=fillValue)
+    return padded.ravel(), padded.shape[1]
+
+## ================================================================================================================
+def unflatten(flatArray, rows, cols):
+    # Drops the padding ring and returns a (rows, cols) array.
+
+    return np.asarray(flatArray).reshape(rows + 2, cols + 2)[1:-1, 1:-1]
+
+## ================================================================================================================
+def neighborOffsets(width):
+    # Flat index offsets of the eight neighbors in D8 code order for a padded row width.
+
+    return [r * width + c for r, c in zip(d8RowShifts, d8ColShifts)]
+
+## ================================================================================================================
+def edgeCells(validFlat, width):
+    # Boolean flat mask of valid cells that touch the padding ring or an interior NoData cell.
+    # These are the cells water can leave the grid through.
+
+    edges = np.zeros(validFlat.shape, dtype=bool)
+    for offset in neighborOffsets(width):
+        neighborValid = np.ones(validFlat.shape, dtype=bool)
+        if offset > 0:
+            neighborValid[:-offset] = validFlat[offset:]
+        else:
+            neighborValid[-offset:] = validFlat[:offset]
+        edges |= ~neighborValid
+    return edges & validFlat
@@ -0,0 +1,139 @@
+## flowPaths.py
+##
+## Created by USDA NRCS, 2026
+##
+## Longest flow path per subbasin from a D8 flow direction array and a subbasin label grid, used in place of
+## the FlowLength UPSTREAM/DOWNSTREAM, Plus, ZonalStatistics, Minus, GreaterThan, Con, StreamLink and
+## StreamToFeature chain in Create Watershed.
+##
+## Downstream flow length (distance to the subbasin outlet) is computed in one pass outward from each
+## outlet cell, and upstream flow length (longest distance from a ridge) in one topological pass down the
+## flow network.  Both passes stay inside a cell's own subbasin.  The longest path of a subbasin starts at
+## its cell with the greatest downstream length and is traced down the D8 directions to the outlet.
+
+import numpy as np
+import flatGrid, flowRouting, watershedLabels
+
+## ================================================================================================================
+def flowStepLengths(flowDirArray, cellWidth, cellHeight=None):
+    # Distance from each cell to the cell it drains to, based on its D8 code.
+
+    if cellHeight is None:
+        cellHeight = cellWidth
+
+    codes = np.asarray(flowDirArray)
+    steps = np.zeros(codes.shape, dtype=np.float64)
+    diagonal = np.sqrt(float(cellWidth) ** 2 + float(cellHeight) ** 2)
+    for code, dr, dc in zip(flatGrid.d8Codes, flatGrid.d8RowShifts, flatGrid.d8ColShifts):
+        if dr == 0:
+            steps[codes == code] = cellWidth
+        elif dc == 0:
+            steps[codes == code] = cellHeight
+        else:
+            steps[codes == code] = diagonal
+    return steps
+
+## ================================================================================================================
+def zoneDownstreamIndex(flowDirArray, labels):
+    # Flat downstream index that stops at subbasin boundaries: a cell whose downstream neighbor is in a
+    # different subbasin (or off the grid) is that subbasin's outlet and gets -1.
+
+    target, width = flowRouting.downstreamIndex(flowDirArray)
+    labelFlat = flatGrid.flatten(np.asarray(labels).astype(np.int32), 0)[0]
+
+    drains = (target >= 0) & (labelFlat > 0)
+    drains[drains] = labelFlat[target[drains]] == labelFlat[drains]
+    target[~drains] = -1
+    return target, labelFlat, width
+
+## ================================================================================================================
+def downstreamLengths(target, inZone, step):
+    # Flat downstream flow length (distance to the subbasin outlet) of every cell, in one pass outward from
+    # the outlet cells of zoneDownstreamIndex.  step is the flat flowStepLengths array.
+
+    downstream = np.zeros(target.shape, dtype=np.float64)
+    donors, receivers = watershedLabels.upstreamGraph(target)
+    frontier = np.nonzero(inZone & (target < 0))[0]
+    while frontier.shape[0]:
+        upstream, source = watershedLabels.upstreamCells(donors, receivers, frontier)
+        downstream[upstream] = downstream[frontier[source]] + step[upstream]
+        frontier = upstream
+    return downstream
+
+## ================================================================================================================
+def upstreamLengths(target, inZone, step):
+    # Flat upstream flow length (longest distance from a ridge) of every cell, in one topological pass down
+    # the network of zoneDownstreamIndex.
+
+    upstreamLength = np.zeros(target.shape, dtype=np.float64)
+    hasTarget = target >= 0
+    inDegree = np.bincount(target[hasTarget], minlength=target.shape[0])
+    frontier = np.nonzero(inZone & (inDegree == 0))[0]
+    while frontier.shape[0]:
+        frontier = frontier[hasTarget[frontier]]
+        receivers = target[frontier]
+        np.maximum.at(upstreamLength, receivers, upstreamLength[frontier] + step[frontier])
+        np.subtract.at(inDegree, receivers, 1)
+        receivers = np.unique(receivers)
+        frontier = receivers[inDegree[receivers] == 0]
+    return upstreamLength
+
+## ================================================================================================================
+def flowLengths(flowDirArray, labels, cellWidth, cellHeight=None):
+    # Returns (downstream, upstream) flow length arrays measured within each labeled subbasin.
+    # Cells outside any subbasin are NaN.
+
+    codes = np.asarray(flowDirArray)
+    rows, cols = codes.shape
+    target, labelFlat, width = zoneDownstreamIndex(codes, labels)
+    step = flatGrid.flatten(flowStepLengths(codes, cellWidth, cellHeight), 0)[0]
+    inZone = labelFlat > 0
+
+    downstream = downstreamLengths(target, inZone, step)
+    upstreamLength = upstreamLengths(target, inZone, step)
+    downstream[~inZone] = np.nan
+    upstreamLength[~inZone] = np.nan
+    return flatGrid.unflatten(downstream, rows, cols).copy(), flatGrid.unflatten(upstreamLength, rows, cols).copy()
+
+## ================================================================================================================
+def longestFlowPaths(flowDirArray, labels, demArray, info):
+    # Longest flow path of every subbasin.  Returns {label: dictionary} where each dictionary holds
+    #   points     - list of (x, y) cell center coordinates from the head of the path to the outlet
+    #   length     - flow length along the path in the DEM's linear units
+    #   headElev   - elevation at the head of the path
+    #   outletElev - elevation at the outlet cell
+    #   drop       - headElev - outletElev, in the DEM's z units
+
+    codes = np.asarray(flowDirArray)
+    target, labelFlat, width = zoneDownstreamIndex(codes, labels)
+    step = flatGrid.flatten(flowStepLengths(codes, info["cellWidth"], info["cellHeight"]), 0)[0]
+    downFlat = downstreamLengths(target, labelFlat > 0, step)
+    demFlat = flatGrid.flatten(np.asarray(demArray, dtype=np.float64), np.nan)[0]
+
+    # Head of each path: the cell with the greatest downstream length in each subbasin
+    cells = np.nonzero(labelFlat > 0)[0]
+    order = np.lexsort((downFlat[cells], labelFlat[cells]))
+    cells = cells[order]
+    lastOfLabel = np.append(labelFlat[cells][1:] != labelFlat[cells][:-1], True)
+    heads = cells[lastOfLabel]
+
+    paths = {}
+    for head in heads.tolist():
+        path = [head]
+        while target[path[-1]] >= 0:
+            path.append(int(target[path[-1]]))
+
+        pathCells = np.array(path)
+        r = pathCells // width - 1
+        c = pathCells % width - 1
+        xs = info["xmin"] + (c + 0.5) * info["cellWidth"]
+        ys = info["ymax"] - (r + 0.5) * info["cellHeight"]
+
+        headElev = float(demFlat[head])
+        outletElev = float(demFlat[path[-1]])
+        paths[int(labelFlat[head])] = {"points": list(zip(xs.tolist(), ys.tolist())),
+                                       "length": float(downFlat[head]),
+                                       "headElev": headElev,
+                                       "outletElev": outletElev,
+                                       "drop": headElev - outletElev}
+    return paths
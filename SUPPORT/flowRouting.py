@@ -0,0 +1,138 @@
+## flowRouting.py
+##
+## Created by USDA NRCS, 2026
+##
+## D8 flow direction and flow accumulation on NumPy arrays, used in place of arcpy.sa.FlowDirection and
+## arcpy.sa.FlowAccumulation.  Directions use the ESRI D8 codes (1 = E, 2 = SE, 4 = S ... 128 = NE) so the
+## saved flowDirection raster is a drop-in replacement for StreamLink, StreamToFeature, Watershed and the
+## other tools that read it.
+##
+## Flow direction is computed with eight shifted-array comparisons.  Accumulation is a topological pass
+## (Kahn's algorithm) over the flattened grid: an in-degree count per cell and a work queue of cells whose
+## upstream neighbors are all done.  The queue is processed a whole frontier at a time with NumPy, so
+## the number of Python steps is the length of the longest flow path, not the number of cells.
+
+import numpy as np
+import flatGrid
+
+flowDirNoData = 255
+
+## ================================================================================================================
+def d8FlowDirection(demArray, cellWidth=1.0, cellHeight=None):
+    # Steepest descent D8 direction for every cell of a DEM with NoData as NaN.
+    # Cells on the edge of the data with no downslope neighbor flow out of the grid (ESRI "NORMAL").
+    # Interior cells with no downslope neighbor (unfilled sinks or flats) are given 0.
+    # NoData cells are given flowDirNoData.  Returns a uint8 array.
+
+    if cellHeight is None:
+        cellHeight = cellWidth
+
+    dem = np.asarray(demArray, dtype=np.float64)
+    rows, cols = dem.shape
+    padded = np.pad(dem, 1, mode="constant", constant_values=np.nan)
+    diagonal = np.sqrt(float(cellWidth) ** 2 + float(cellHeight) ** 2)
+
+    steepest = np.zeros(dem.shape)
+    direction = np.zeros(dem.shape, dtype=np.uint8)
+    outward = np.zeros(dem.shape, dtype=np.uint8)
+
+    for code, dr, dc in zip(flatGrid.d8Codes, flatGrid.d8RowShifts, flatGrid.d8ColShifts):
+        neighbor = padded[1 + dr:1 + dr + rows, 1 + dc:1 + dc + cols]
+
+        if dr == 0:
+            distance = float(cellWidth)
+        elif dc == 0:
+            distance = float(cellHeight)
+        else:
+            distance = diagonal
+
+        with np.errstate(invalid="ignore"):
+            drop = (dem - neighbor) / distance
+            steeper = drop > steepest
+
+        steepest[steeper] = drop[steeper]
+        direction[steeper] = code
+
+        # First NoData neighbor in code order is where an edge cell without a downslope neighbor drains
+        offGrid = np.isnan(neighbor) & (outward == 0)
+        outward[offGrid] = code
+
+    noDrop = direction == 0
+    direction[noDrop] = outward[noDrop]
+    direction[np.isnan(dem)] = flowDirNoData
+    return direction
+
+## ================================================================================================================
+def downstreamIndex(flowDirArray):
+    # Flattened-grid index of the cell each cell drains to, or -1 where flow leaves the grid, reaches
+    # NoData, or has no direction.  Returns the flat index array and the padded row width.
+
+    codes = np.asarray(flowDirArray)
+    flatCodes, width = flatGrid.flatten(codes.astype(np.int64), flowDirNoData)
+
+    target = np.full(flatCodes.shape, -1, dtype=np.int64)
+    cells = np.arange(flatCodes.shape[0], dtype=np.int64)
+    for code, offset in zip(flatGrid.d8Codes, flatGrid.neighborOffsets(width)):
+        matches = flatCodes == code
+        target[matches] = cells[matches] + offset
+
+    # Flow into padding or NoData ends at the edge
+    drains = target >= 0
+    drains[drains] = flatCodes[target[drains]] != flowDirNoData
+    target[~drains] = -1
+    return target, width
+
+## ================================================================================================================
+def flowAccumulation(flowDirArray, weightArray=None, dataType="INTEGER"):
+    # Number (or weighted sum) of upstream cells draining through each cell, not counting the cell itself,
+    # matching arcpy.sa.FlowAccumulation.  Returns int32 with -1 for NoData when dataType is "INTEGER",
+    # otherwise float32 with NaN for NoData.
+
+    codes = np.asarray(flowDirArray)
+    rows, cols = codes.shape
+    target, width = downstreamIndex(codes)
+    valid = flatGrid.flatten(codes != flowDirNoData, False)[0]
+
+    if weightArray is None:
+        weight = valid.astype(np.float64)
+    else:
+        weight = np.nan_to_num(flatGrid.flatten(np.asarray(weightArray, dtype=np.float64), 0)[0])
+
+    accum = np.zeros(target.shape, dtype=np.float64)
+    hasTarget = target >= 0
+    inDegree = np.bincount(target[hasTarget], minlength=target.shape[0])
+
+    # Work queue: every valid cell with nothing draining into it
+    frontier = np.nonzero(valid & (inDegree == 0))[0]
+    while frontier.shape[0]:
+        frontier = frontier[hasTarget[frontier]]
+        receivers = target[frontier]
+        np.add.at(accum, receivers, accum[frontier] + weight[frontier])
+        np.subtract.at(inDegree, receivers, 1)
+        receivers = np.unique(receivers)
+        frontier = receivers[inDegree[receivers] == 0]
+
+    accum = flatGrid.unflatten(accum, rows, cols)
+    noData = ~flatGrid.unflatten(valid, rows, cols)
+    if dataType == "INTEGER":
+        result = np.rint(accum).astype(np.int32)
+        result[noData] = -1
+    else:
+        result = accum.astype(np.float32)
+        result[noData] = np.nan
+    return result
+
+## ================================================================================================================
+def flowDirectionAndAccumulation(filledRaster, flowDirRaster, flowAccumRaster):
+    # Reads a filled DEM, computes D8 flow direction and flow accumulation and saves both rasters.
+    # Returns the two arrays and the raster info so callers can keep working in memory.
+
+    import rasterArrays
+
+    demArray, demInfo = rasterArrays.rasterToArray(filledRaster)
+    flowDirArray = d8FlowDirection(demArray, demInfo["cellWidth"], demInfo["cellHeight"])
+    rasterArrays.arrayToRaster(flowDirArray, demInfo, flowDirRaster, flowDirNoData)
+
+    flowAccArray = flowAccumulation(flowDirArray)
+    rasterArrays.arrayToRaster(flowAccArray, demInfo, flowAccumRaster, -1)
+    return flowDirArray, flowAccArray, demInfo
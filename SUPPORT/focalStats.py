@@ -0,0 +1,146 @@
+## focalStats.py
+##
+## Created by USDA NRCS, 2026
+##
+## Focal statistics on NumPy arrays, used in place of arcpy.sa.FocalStatistics for the DEM smoothing steps.
+## Rasters are streamed in bands of rows.  Each band is read with a halo of extra rows above and below so
+## the window is complete at the band edges, the statistic is computed by summing shifted views of the
+## band (one per window cell) and the result rows are written out before the next band is read.  Memory
+## is bounded by the band size, not the size of the DEM.
+##
+## Neighborhoods use the FocalStatistics strings: "RECTANGLE <width> <height> CELL|MAP" and
+## "CIRCLE <radius> CELL|MAP".  Statistics are MEAN, MINIMUM, MAXIMUM and SUM.  With ignoreNoData
+## (the "DATA" option) NoData cells are skipped and any window with at least one value gets a result,
+## otherwise a window touching NoData is NoData.
+
+import numpy as np
+import rasterArrays
+
+focalStatistics = ("MEAN", "MINIMUM", "MAXIMUM", "SUM")
+defaultBlockRows = 512
+
+## ================================================================================================================
+def neighborhoodWindow(neighborhood="RECTANGLE 3 3 CELL", cellSize=1.0):
+    # Boolean window for a FocalStatistics neighborhood string.  MAP units are converted to cells with
+    # cellSize.  The processing cell sits at (rows // 2, cols // 2) of the window.
+
+    parts = str(neighborhood).upper().split()
+    shape = parts[0]
+    units = parts[-1] if parts[-1] in ("CELL", "MAP") else "CELL"
+    scale = 1.0 / float(cellSize) if units == "MAP" else 1.0
+
+    if shape == "RECTANGLE":
+        width = max(int(round(float(parts[1]) * scale)), 1)
+        height = max(int(round(float(parts[2]) * scale)), 1) if len(parts) > 2 and parts[2] not in ("CELL", "MAP") else width
+        return np.ones((height, width), dtype=bool)
+
+    if shape == "CIRCLE":
+        radius = float(parts[1]) * scale
+        reach = int(np.floor(radius))
+        offsets = np.arange(-reach, reach + 1)
+        return offsets[:, None] ** 2 + offsets[None, :] ** 2 <= radius ** 2
+
+    raise ValueError("Unsupported neighborhood: " + str(neighborhood))
+
+## ================================================================================================================
+def windowHalo(window):
+    # Rows and columns the window reaches above, below, left and right of the processing cell.
+
+    height, width = window.shape
+    return height // 2, height - 1 - height // 2, width // 2, width - 1 - width // 2
+
+## ================================================================================================================
+def focalBlock(array, window, statistic="MEAN", ignoreNoData=True, haloTop=None, haloBottom=None):
+    # Focal statistic of a float array with NoData as NaN.  haloTop and haloBottom are the number of rows at
+    # the top and bottom of array that are only there to complete the window; they are dropped from the
+    # result.  Rows beyond the halo (the edge of the raster) are treated as NoData.
+
+    statistic = statistic.upper()
+    if statistic not in focalStatistics:
+        raise ValueError("Unsupported statistic: " + str(statistic))
+
+    up, down, left, right = windowHalo(window)
+    if haloTop is None:
+        haloTop = 0
+    if haloBottom is None:
+        haloBottom = 0
+
+    values = np.asarray(array, dtype=np.float32)
+    rows, cols = values.shape
+    outRows = rows - haloTop - haloBottom
+
+    # Pad only what the halo rows do not already supply
+    padTop = max(up - haloTop, 0)
+    padBottom = max(down - haloBottom, 0)
+    padded = np.pad(values, ((padTop, padBottom), (left, right)), mode="constant", constant_values=np.nan)
+    firstRow = haloTop + padTop - up
+
+    valid = ~np.isnan(padded)
+    data = np.where(valid, padded, 0).astype(np.float64)
+
+    count = np.zeros((outRows, cols), dtype=np.int32)
+    if statistic in ("MEAN", "SUM"):
+        result = np.zeros((outRows, cols), dtype=np.float64)
+    elif statistic == "MINIMUM":
+        result = np.full((outRows, cols), np.inf)
+    else:
+        result = np.full((outRows, cols), -np.inf)
+
+    for dr, dc in zip(*np.nonzero(window)):
+        r0 = firstRow + dr
+        view = (slice(r0, r0 + outRows), slice(dc, dc + cols))
+        count += valid[view]
+        if statistic in ("MEAN", "SUM"):
+            result += data[view]
+        elif statistic == "MINIMUM":
+            np.fmin(result, padded[view], out=result)
+        else:
+            np.fmax(result, padded[view], out=result)
+
+    if statistic == "MEAN":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = result / count
+
+    noData = count == 0
+    if not ignoreNoData:
+        noData |= count < int(window.sum())
+    result[noData] = np.nan
+    return result.astype(np.float32)
+
+## ================================================================================================================
+def focalArray(array, neighborhood="RECTANGLE 3 3 CELL", statistic="MEAN", ignoreNoData=True, cellSize=1.0):
+    # Focal statistic of a whole in-memory array.
+
+    return focalBlock(array, neighborhoodWindow(neighborhood, cellSize), statistic, ignoreNoData)
+
+## ================================================================================================================
+def focalRowBlocks(inRaster, info, window, statistic="MEAN", ignoreNoData=True, fillNoDataOnly=False, blockRows=defaultBlockRows):
+    # Generator of focal statistic row bands, top to bottom.  With fillNoDataOnly the input values are kept
+    # and the statistic only replaces NoData cells (gap filling).
+
+    up, down = windowHalo(window)[:2]
+    rows = info["rows"]
+
+    for firstRow in range(0, rows, blockRows):
+        nRows = min(blockRows, rows - firstRow)
+        readFirst = max(firstRow - up, 0)
+        readLast = min(firstRow + nRows + down, rows)
+        band = rasterArrays.readRows(inRaster, info, readFirst, readLast - readFirst)
+
+        result = focalBlock(band, window, statistic, ignoreNoData, firstRow - readFirst, readLast - firstRow - nRows)
+        if fillNoDataOnly:
+            center = band[firstRow - readFirst:firstRow - readFirst + nRows]
+            result = np.where(np.isnan(center), result, center)
+        yield result
+
+## ================================================================================================================
+def focalRaster(inRaster, outRaster, neighborhood="RECTANGLE 3 3 CELL", statistic="MEAN", ignoreNoData=True, fillNoDataOnly=False, blockRows=defaultBlockRows):
+    # Streams inRaster through the focal statistic and saves outRaster, e.g.
+    #   focalRaster(DEM_aoi, DEMsmooth, "RECTANGLE 3 3 CELL", "MEAN")
+    # matches FocalStatistics(DEM_aoi, "RECTANGLE 3 3 CELL", "MEAN", "DATA").
+
+    info = rasterArrays.describeRaster(inRaster)
+    window = neighborhoodWindow(neighborhood, info["cellWidth"])
+    blockRows = max(int(blockRows), 1)
+    blocks = focalRowBlocks(inRaster, info, window, statistic, ignoreNoData, fillNoDataOnly, blockRows)
+    return rasterArrays.rowBlocksToRaster(blocks, info, outRaster)
@@ -0,0 +1,354 @@
+## imageServiceTiles.py
+##
+## Created by USDA NRCS, 2026
+##
+## Tiled download of an ArcGIS image service used by Download Image Service Elevation in place of one
+## ExtractByMask request for the whole AOI.  The AOI extent is split into tiles of a fixed number of pixels
+## on a grid anchored at 0,0, so the same ground always maps to the same tile requests.  Tiles come from
+## the service's exportImage operation and are downloaded by a bounded pool of worker threads.  Failed
+## requests are retried with exponential backoff.  An interrupted download resumes from the bytes already
+## on disk with an HTTP Range request when the server supports it.  exportImage reports errors as JSON with
+## HTTP 200, so a download is only kept if it starts with a TIFF header.
+##
+## Finished tiles go into an on-disk cache.  Files are named by the SHA-256 of their content and an index
+## maps each request to its file.  Identical tiles (e.g. all NoData) are stored once.  The cache is capped
+## in size and the least recently used tiles are removed first, so rerunning a download for the same or
+## an overlapping area reads the tiles from disk.  Nothing here requires arcpy.
+
+import os, math, time, json, random, hashlib, threading, tempfile, shutil, socket
+from multiprocessing.pool import ThreadPool
+
+try:
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError, URLError
+    from urllib.parse import urlencode
+    import http.client as httplib
+except ImportError:
+    from urllib2 import Request, urlopen, HTTPError, URLError
+    from urllib import urlencode
+    import httplib
+
+defaultTilePixels = 1024
+defaultWorkers = 4
+defaultRetries = 5
+defaultBackoff = 1.0
+defaultTimeout = 120
+defaultCacheBytes = 2 * 1024 ** 3
+chunkBytes = 1024 * 1024
+
+# HTTP status codes worth retrying; any other HTTP error fails the tile at once
+retryStatus = (408, 429, 500, 502, 503, 504)
+
+# First bytes of a little and big endian TIFF and BigTIFF
+tiffSignatures = (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+")
+
+## ================================================================================================================
+def defaultCacheFolder():
+    # Per user cache folder shared by every project.
+
+    root = os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()
+    return os.path.join(root, "NRCS_EngTools", "ElevationTiles")
+
+## ================================================================================================================
+def tileGrid(extent, pixelSize, tilePixels=defaultTilePixels):
+    # Tiles covering extent (xmin, ymin, xmax, ymax) as a list of (xmin, ymin, xmax, ymax) tile extents,
+    # top row first.  Tiles are tilePixels x tilePixels cells of pixelSize and aligned to multiples of the
+    # tile size, so overlapping extents share tiles.
+
+    size = float(pixelSize) * tilePixels
+    firstCol = int(math.floor(extent[0] / size))
+    lastCol = int(math.floor(extent[2] / size - 1e-9))
+    firstRow = int(math.floor(extent[1] / size))
+    lastRow = int(math.floor(extent[3] / size - 1e-9))
+
+    tiles = []
+    for row in range(lastRow, firstRow - 1, -1):
+        for col in range(firstCol, lastCol + 1):
+            tiles.append((col * size, row * size, (col + 1) * size, (row + 1) * size))
+    return tiles
+
+## ================================================================================================================
+def exportImageParameters(tile, tilePixels=defaultTilePixels, wkid=4326, imageFormat="tiff", pixelType="F32"):
+    # exportImage query parameters for one tile, in the order they are sent.
+
+    return [("bbox", ",".join(repr(float(value)) for value in tile)),
+            ("bboxSR", str(wkid)),
+            ("imageSR", str(wkid)),
+            ("size", str(tilePixels) + "," + str(tilePixels)),
+            ("format", imageFormat),
+            ("pixelType", pixelType),
+            ("interpolation", "RSP_BilinearInterpolation"),
+            ("f", "image")]
+
+## ================================================================================================================
+def exportImageUrl(serviceUrl, parameters):
+    # Full exportImage request URL of an image service (".../ImageServer").
+
+    return serviceUrl.rstrip("/") + "/exportImage?" + urlencode(parameters)
+
+## ================================================================================================================
+def requestKey(url):
+    # Cache key of a request.
+
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+## ================================================================================================================
+def downloadFile(url, partPath, retries=defaultRetries, backoff=defaultBackoff, timeout=defaultTimeout):
+    # Downloads url to partPath.  Bytes already in partPath (from an earlier, interrupted attempt) are kept
+    # and only the rest is requested with a Range header; a server that ignores the range sends the whole
+    # file again and partPath is rewritten.  A response shorter than its Content-Length, a dropped
+    # connection and the HTTP errors in retryStatus are retried up to retries times, waiting
+    # backoff * 2 ** attempt seconds (with jitter) in between.  Returns partPath or raises IOError.
+
+    attempt = 0
+    while True:
+        try:
+            done = os.path.getsize(partPath) if os.path.exists(partPath) else 0
+            request = Request(url)
+            if done:
+                request.add_header("Range", "bytes=" + str(done) + "-")
+
+            try:
+                response = urlopen(request, timeout=timeout)
+            except HTTPError as e:
+                # Range past the end: the earlier attempt already has the whole file
+                if e.code == 416 and done:
+                    return partPath
+                raise
+
+            try:
+                resumed = done and response.getcode() == 206
+                expected = response.info().get("Content-Length")
+                received = 0
+                f = open(partPath, "ab" if resumed else "wb")
+                try:
+                    while True:
+                        try:
+                            chunk = response.read(chunkBytes)
+                        except httplib.IncompleteRead as e:
+                            chunk = e.partial
+                            f.write(chunk)
+                            received += len(chunk)
+                            break
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        received += len(chunk)
+                finally:
+                    f.close()
+            finally:
+                response.close()
+
+            if expected is None or received >= int(expected):
+                return partPath
+            error = "incomplete response"
+
+        except HTTPError as e:
+            if e.code not in retryStatus or attempt >= retries:
+                raise IOError("Download failed with HTTP " + str(e.code) + ": " + url)
+            error = "HTTP " + str(e.code)
+        except (URLError, httplib.HTTPException, socket.error, socket.timeout) as e:
+            error = str(e)
+
+        if attempt >= retries:
+            raise IOError("Download failed after " + str(retries + 1) + " attempts (" + error + "): " + url)
+        time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+        attempt += 1
+
+## ================================================================================================================
+def checkTiff(path, url=""):
+    # Returns path if the file is a TIFF.  Otherwise the file is removed and IOError is raised with the
+    # start of what the service sent instead (usually a JSON error).
+
+    f = open(path, "rb")
+    try:
+        head = f.read(512)
+    finally:
+        f.close()
+    if head[:4] in tiffSignatures:
+        return path
+
+    os.remove(path)
+    message = " ".join(head.decode("utf-8", "replace").split())
+    raise IOError("Service did not return a TIFF (" + (message[:200] or "empty response") + "): " + url)
+
+## ================================================================================================================
+class TileCache(object):
+    # Size capped, least recently used, content addressed file cache.  index.json maps request keys to the
+    # SHA-256 name of their file, its size and when it was last used.  Safe to share between the threads
+    # of one download; not meant to be written by two processes at once.  Hits and new entries only update
+    # the index in memory; it is saved by flush or the next purge, so a batch of tiles writes it once.
+
+    def __init__(self, folder=None, maxBytes=defaultCacheBytes, extension=".tif"):
+        self.folder = folder or defaultCacheFolder()
+        self.maxBytes = int(maxBytes)
+        self.extension = extension
+        self.indexPath = os.path.join(self.folder, "index.json")
+        self.lock = threading.Lock()
+        self.changed = False
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+        self.index = self._readIndex()
+
+    def _readIndex(self):
+        # Entries whose file is missing are dropped.
+
+        try:
+            f = open(self.indexPath, "r")
+            try:
+                index = json.load(f)
+            finally:
+                f.close()
+        except (IOError, OSError, ValueError):
+            return {}
+        return dict((key, entry) for key, entry in index.items() if os.path.exists(self.blobPath(entry["hash"])))
+
+    def _writeIndex(self):
+        tempPath = self.indexPath + ".tmp"
+        f = open(tempPath, "w")
+        try:
+            json.dump(self.index, f)
+        finally:
+            f.close()
+        if os.path.exists(self.indexPath):
+            os.remove(self.indexPath)
+        os.rename(tempPath, self.indexPath)
+        self.changed = False
+
+    def blobPath(self, contentHash):
+        return os.path.join(self.folder, contentHash[:2], contentHash + self.extension)
+
+    def partPath(self, key):
+        # Where a download for key is written until it is complete.
+
+        return os.path.join(self.folder, "partial", key + ".part")
+
+    def get(self, key):
+        # Cached file of a request, or None.  Marks the entry as just used.
+
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None or not os.path.exists(self.blobPath(entry["hash"])):
+                return None
+            entry["used"] = time.time()
+            self.changed = True
+            return self.blobPath(entry["hash"])
+
+    def flush(self):
+        # Saves the index if hits or new entries have changed it since it was last written.
+
+        with self.lock:
+            if self.changed:
+                self._writeIndex()
+
+    def put(self, key, sourcePath, keep=()):
+        # Moves a finished download into the cache and returns its cached path.  Entries other than those in
+        # keep are then evicted, least recently used first, until the cache is under maxBytes.  The index
+        # is saved by flush.
+
+        contentHash = hashlib.sha256()
+        f = open(sourcePath, "rb")
+        try:
+            for chunk in iter(lambda: f.read(chunkBytes), b""):
+                contentHash.update(chunk)
+        finally:
+            f.close()
+        contentHash = contentHash.hexdigest()
+        size = os.path.getsize(sourcePath)
+
+        with self.lock:
+            path = self.blobPath(contentHash)
+            if os.path.exists(path):
+                os.remove(sourcePath)
+            else:
+                if not os.path.isdir(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+                shutil.move(sourcePath, path)
+
+            self.index[key] = {"hash": contentHash, "size": size, "used": time.time()}
+            self._evict(set(keep) | set([key]))
+            self.changed = True
+        return path
+
+    def size(self):
+        # Bytes held, counting a file shared by several requests once.
+
+        return sum(dict((entry["hash"], entry["size"]) for entry in self.index.values()).values())
+
+    def entries(self):
+        # (key, bytes, last used) of every entry, most recently used first.
+
+        with self.lock:
+            items = [(key, entry["size"], entry["used"]) for key, entry in self.index.items()]
+        return sorted(items, key=lambda item: item[2], reverse=True)
+
+    def purge(self, keys=None):
+        # Removes the given entries, or every entry if keys is None, and returns the bytes freed.
+
+        with self.lock:
+            before = self.size()
+            for key in list(self.index if keys is None else keys):
+                entry = self.index.pop(key, None)
+                if entry is not None and not any(other["hash"] == entry["hash"] for other in self.index.values()):
+                    try:
+                        os.remove(self.blobPath(entry["hash"]))
+                    except OSError:
+                        pass
+            self._writeIndex()
+            return before - self.size()
+
+    def _evict(self, keep):
+        # Called with the lock held.
+
+        for key in sorted(self.index, key=lambda k: self.index[k]["used"]):
+            if self.size() <= self.maxBytes:
+                break
+            if key in keep:
+                continue
+            contentHash = self.index.pop(key)["hash"]
+            if not any(entry["hash"] == contentHash for entry in self.index.values()):
+                try:
+                    os.remove(self.blobPath(contentHash))
+                except OSError:
+                    pass
+
+## ================================================================================================================
+def fetchTiles(serviceUrl, tiles, cache, tilePixels=defaultTilePixels, wkid=4326, workers=defaultWorkers,
+               retries=defaultRetries, backoff=defaultBackoff, timeout=defaultTimeout, progress=None):
+    # Cached file of every tile, in tile order, downloading the ones not in the cache with up to workers
+    # threads.  progress, if given, is called as progress(tilesDone, tilesTotal, fromCache) after each
+    # tile.  Raises IOError if a tile still fails after its retries or the service sends something other
+    # than a TIFF.
+
+    urls = [exportImageUrl(serviceUrl, exportImageParameters(tile, tilePixels, wkid)) for tile in tiles]
+    keys = [requestKey(url) for url in urls]
+    keep = set(keys)
+
+    partFolder = os.path.dirname(cache.partPath(keys[0])) if keys else None
+    if partFolder and not os.path.isdir(partFolder):
+        os.makedirs(partFolder)
+
+    done = [0]
+    doneLock = threading.Lock()
+
+    def fetch(i):
+        path = cache.get(keys[i])
+        fromCache = path is not None
+        if not fromCache:
+            partPath = downloadFile(urls[i], cache.partPath(keys[i]), retries, backoff, timeout)
+            path = cache.put(keys[i], checkTiff(partPath, urls[i]), keep)
+        if progress is not None:
+            with doneLock:
+                done[0] += 1
+                progress(done[0], len(tiles), fromCache)
+        return path
+
+    if not tiles:
+        return []
+    pool = ThreadPool(max(min(int(workers), len(tiles)), 1))
+    try:
+        return pool.map(fetch, range(len(tiles)))
+    finally:
+        pool.close()
+        pool.join()
+        cache.flush()
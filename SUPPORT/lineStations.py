@@ -0,0 +1,239 @@
+## lineStations.py
+##
+## Created by USDA NRCS, 2026
+##
+## Line stationing and DEM profile sampling used in place of the station table -> CreateRoutes ->
+## MakeRouteEventLayer -> AddXY -> Buffer -> zonal statistics chain in the profile and station tools.
+## Each line's vertices are turned into a cumulative length array and every station is placed with one
+## np.interp call.  Elevations are read straight from the DEM array, either with a bilinear interpolation
+## or as the mean of the cells whose centers fall within a radius of the station (the old one cell buffer).
+##
+## Stations are returned as columns: {"ID", "STATION", "POINT_X", "POINT_Y", "POINT_Z"}, one array each.
+
+import numpy as np
+import rasterArrays
+
+stationFields = ("ID", "STATION", "POINT_X", "POINT_Y", "POINT_Z")
+sampleMethods = ("MEAN", "BILINEAR", "CELL")
+
+## ================================================================================================================
+def stationDistances(length, interval):
+    # Station values along a line of the given length: every interval from 0, then the end of the line.
+    # Values are whole feet, as the LONG STATION field stores them, and the end station comes first as it
+    # did in the station table.
+
+    count = int(np.floor(float(length) / interval)) + 1
+    stations = np.floor(np.arange(count) * float(interval))
+    return np.concatenate(([np.floor(float(length))], stations))
+
+## ================================================================================================================
+def upperLeftOrder(vertices):
+    # Vertices ordered to start at the end nearest the upper left corner of the line's extent, the
+    # "UPPER_LEFT" coordinate priority CreateRoutes used to set where measures begin.
+
+    xy = np.asarray(vertices, dtype=np.float64)
+    corner = np.array([xy[:, 0].min(), xy[:, 1].max()])
+    if np.hypot(*(xy[-1] - corner)) < np.hypot(*(xy[0] - corner)):
+        return xy[::-1]
+    return xy
+
+## ================================================================================================================
+def interpolateStations(vertices, stations, measureLength=None):
+    # X and Y arrays of the stations along a path of (x, y) vertices.  Station values are measures from
+    # 0 to measureLength (LENGTH_FT for the tools); by default the measure is the path length itself.
+
+    xy = np.asarray(vertices, dtype=np.float64)
+    cumLength = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(xy[:, 0]), np.diff(xy[:, 1])))))
+    if measureLength is None or measureLength <= 0:
+        measureLength = cumLength[-1]
+
+    distances = np.asarray(stations, dtype=np.float64) * (cumLength[-1] / float(measureLength))
+    return np.interp(distances, cumLength, xy[:, 0]), np.interp(distances, cumLength, xy[:, 1])
+
+## ================================================================================================================
+def lineStations(lines, interval, upperLeft=True):
+    # Stations of every line.  lines is a sequence of (ID, measureLength, vertices) where vertices is an
+    # (n, 2) array of the line's path.  Returns the station columns without POINT_Z.
+
+    ids = []
+    stations = []
+    xs = []
+    ys = []
+    for lineID, measureLength, vertices in lines:
+        if upperLeft:
+            vertices = upperLeftOrder(vertices)
+        distances = stationDistances(measureLength, interval)
+        x, y = interpolateStations(vertices, distances, measureLength)
+        ids.append(np.full(distances.shape[0], lineID, dtype=np.int64))
+        stations.append(distances)
+        xs.append(x)
+        ys.append(y)
+
+    if not ids:
+        return {"ID": np.zeros(0, dtype=np.int64), "STATION": np.zeros(0), "POINT_X": np.zeros(0), "POINT_Y": np.zeros(0)}
+
+    return {"ID": np.concatenate(ids),
+            "STATION": np.concatenate(stations),
+            "POINT_X": np.concatenate(xs),
+            "POINT_Y": np.concatenate(ys)}
+
+## ================================================================================================================
+def sampleBilinear(demArray, info, x, y):
+    # Bilinear interpolation of the DEM between the four nearest cell centers.  Where one of them is NoData
+    # the value of the cell holding the point is used instead.  Points off the raster are NaN.
+
+    z = np.asarray(demArray, dtype=np.float64)
+    rows, cols = z.shape
+    colF = (np.asarray(x, dtype=np.float64) - info["xmin"]) / info["cellWidth"] - 0.5
+    rowF = (info["ymax"] - np.asarray(y, dtype=np.float64)) / info["cellHeight"] - 0.5
+
+    inside = (colF > -1.0) & (colF < cols) & (rowF > -1.0) & (rowF < rows)
+    col0 = np.clip(np.floor(colF).astype(np.int64), 0, max(cols - 2, 0))
+    row0 = np.clip(np.floor(rowF).astype(np.int64), 0, max(rows - 2, 0))
+    col1 = np.minimum(col0 + 1, cols - 1)
+    row1 = np.minimum(row0 + 1, rows - 1)
+    fc = np.clip(colF - col0, 0.0, 1.0)
+    fr = np.clip(rowF - row0, 0.0, 1.0)
+
+    value = (z[row0, col0] * (1 - fr) * (1 - fc) + z[row0, col1] * (1 - fr) * fc +
+             z[row1, col0] * fr * (1 - fc) + z[row1, col1] * fr * fc)
+
+    nearest = z[np.clip(np.floor(rowF + 0.5).astype(np.int64), 0, rows - 1),
+                np.clip(np.floor(colF + 0.5).astype(np.int64), 0, cols - 1)]
+    value = np.where(np.isnan(value), nearest, value)
+    return np.where(inside, value, np.nan)
+
+## ================================================================================================================
+def sampleCell(demArray, info, x, y):
+    # Value of the cell holding each point, what zonal statistics of a point zone returns.  Points off the
+    # raster are NaN.
+
+    z = np.asarray(demArray, dtype=np.float64)
+    rows, cols = z.shape
+    col = np.floor((np.asarray(x, dtype=np.float64) - info["xmin"]) / info["cellWidth"]).astype(np.int64)
+    row = np.floor((info["ymax"] - np.asarray(y, dtype=np.float64)) / info["cellHeight"]).astype(np.int64)
+    inside = (row >= 0) & (row < rows) & (col >= 0) & (col < cols)
+    return np.where(inside, z[np.clip(row, 0, rows - 1), np.clip(col, 0, cols - 1)], np.nan)
+
+## ================================================================================================================
+def sampleWindowMean(demArray, info, x, y, radius):
+    # Mean of the cells whose centers are within radius of each point, the cells a buffer of that radius
+    # covers when it is converted to raster.  Like zonal statistics with "NODATA", a window that touches
+    # NoData is NaN; cells beyond the edge of the raster are simply not part of the window.
+
+    z = np.asarray(demArray, dtype=np.float64)
+    rows, cols = z.shape
+    px = np.asarray(x, dtype=np.float64)
+    py = np.asarray(y, dtype=np.float64)
+    colF = (px - info["xmin"]) / info["cellWidth"]
+    rowF = (info["ymax"] - py) / info["cellHeight"]
+    col = np.floor(colF).astype(np.int64)
+    row = np.floor(rowF).astype(np.int64)
+
+    reachCols = int(np.ceil(radius / info["cellWidth"])) + 1
+    reachRows = int(np.ceil(radius / info["cellHeight"])) + 1
+
+    total = np.zeros(px.shape[0])
+    count = np.zeros(px.shape[0], dtype=np.int64)
+    noData = np.zeros(px.shape[0], dtype=bool)
+    for dr in range(-reachRows, reachRows + 1):
+        for dc in range(-reachCols, reachCols + 1):
+            r = row + dr
+            c = col + dc
+            centerX = info["xmin"] + (c + 0.5) * info["cellWidth"]
+            centerY = info["ymax"] - (r + 0.5) * info["cellHeight"]
+            within = np.hypot(centerX - px, centerY - py) <= radius
+            onGrid = (r >= 0) & (r < rows) & (c >= 0) & (c < cols)
+            values = z[np.clip(r, 0, rows - 1), np.clip(c, 0, cols - 1)]
+
+            noData |= within & onGrid & np.isnan(values)
+            use = within & onGrid & ~np.isnan(values)
+            total += np.where(use, values, 0.0)
+            count += use
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+    mean[noData | (count == 0)] = np.nan
+    return mean
+
+## ================================================================================================================
+def sampleRaster(inRaster, x, y, method="MEAN", radius=None):
+    # Elevation at every point from a raster (anything rasterArrays can read).  Only the band of rows
+    # under the points is read.  radius for "MEAN" defaults to one cell width; "CELL" takes the value of
+    # the cell holding the point.
+
+    method = method.upper()
+    if method not in sampleMethods:
+        raise ValueError("Unsupported sample method: " + str(method))
+
+    px = np.asarray(x, dtype=np.float64)
+    py = np.asarray(y, dtype=np.float64)
+    if px.shape[0] == 0:
+        return np.zeros(0)
+
+    info = rasterArrays.describeRaster(inRaster)
+    if radius is None:
+        radius = info["cellWidth"]
+    margin = int(np.ceil(float(radius) / info["cellHeight"])) + 2
+
+    firstRow = int(np.floor((info["ymax"] - py.max()) / info["cellHeight"])) - margin
+    lastRow = int(np.floor((info["ymax"] - py.min()) / info["cellHeight"])) + margin + 1
+    firstRow = min(max(firstRow, 0), info["rows"])
+    lastRow = min(max(lastRow, firstRow), info["rows"])
+    if lastRow == firstRow:
+        return np.full(px.shape[0], np.nan)
+
+    band = rasterArrays.readRows(inRaster, info, firstRow, lastRow - firstRow)
+    bandInfo = rasterArrays.rowBlockInfo(info, firstRow, lastRow - firstRow)
+
+    if method == "BILINEAR":
+        return sampleBilinear(band, bandInfo, px, py)
+    if method == "CELL":
+        return sampleCell(band, bandInfo, px, py)
+    return sampleWindowMean(band, bandInfo, px, py, radius)
+
+## ================================================================================================================
+def shapeVertices(shape):
+    # (n, 2) vertex array of an arcpy polyline, with the parts of a multipart line joined end to end.
+
+    return np.array([(point.X, point.Y) for part in shape for point in part if point], dtype=np.float64)
+
+## ================================================================================================================
+def profileStations(inLines, inRaster, interval, zFactor=1.0, method="MEAN", radius=None):
+    # Stations of every line in a feature class with "ID" and "LENGTH_FT" fields, sampled from inRaster.
+    # POINT_Z is scaled by zFactor and NaN where the DEM has no value.  Requires arcpy.
+
+    import arcpy
+
+    lines = [(lineID, lengthFt, shapeVertices(shape)) for lineID, lengthFt, shape in arcpy.da.SearchCursor(inLines, ["ID", "LENGTH_FT", "SHAPE@"])]
+    stations = lineStations(lines, interval)
+    stations["POINT_Z"] = sampleRaster(inRaster, stations["POINT_X"], stations["POINT_Y"], method, radius) * zFactor
+    return stations
+
+## ================================================================================================================
+def writeStations(stations, outPoints, spatialReference, order=None):
+    # Creates a point feature class with the station columns in one insert.  POINT_Z is rounded to 0.1 and
+    # left empty where it is NaN.  order is an optional array of row indexes (e.g. sorted by STATION).
+    # Requires arcpy.
+
+    import arcpy, os
+
+    arcpy.CreateFeatureclass_management(os.path.dirname(outPoints), os.path.basename(outPoints), "POINT", "", "DISABLED", "DISABLED", spatialReference)
+    arcpy.AddField_management(outPoints, "ID", "LONG", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+    arcpy.AddField_management(outPoints, "STATION", "LONG", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+    arcpy.AddField_management(outPoints, "POINT_X", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+    arcpy.AddField_management(outPoints, "POINT_Y", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+    arcpy.AddField_management(outPoints, "POINT_Z", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+
+    if order is None:
+        order = np.arange(stations["ID"].shape[0])
+
+    rows = arcpy.da.InsertCursor(outPoints, ["SHAPE@XY"] + list(stationFields))
+    for i in order.tolist():
+        x = float(stations["POINT_X"][i])
+        y = float(stations["POINT_Y"][i])
+        z = float(stations["POINT_Z"][i])
+        rows.insertRow(((x, y), int(stations["ID"][i]), int(stations["STATION"][i]), x, y, None if np.isnan(z) else round(z, 1)))
+    del rows
+
+    return len(order)
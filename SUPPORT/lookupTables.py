@@ -0,0 +1,173 @@
+## lookupTables.py
+##
+## Created by USDA NRCS, 2026
+##
+## In-memory copies of the Support.gdb lookup tables.  The tools used to AddJoin each lookup table to their
+## features, CalculateField across the join and RemoveJoin again, once per looked up value.  loadTables reads
+## the tables once into lists of row tuples, and the typed dictionaries built from them are used inside a
+## single cursor pass instead.
+##
+## The rows are also kept in a small zlib compressed pickle next to Support.gdb.  The cache records a format
+## version and a signature of the files in Support.gdb (names, sizes and modified times), so editing the
+## geodatabase or changing the table list rebuilds it; a missing or unreadable cache is simply rebuilt.
+
+import os, sys, hashlib, zlib, pickle
+
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
+cacheVersion = 1
+cacheName = "Support_lookup.cache"
+
+# Table name: fields kept in memory
+supportTables = {"TR_55_RCN_Lookup": ("LandUseDes", "LU_CODE", "HYD_CODE", "RCN"),
+                 "HYD_GRP_Lookup": ("HYDGRP", "HYDCODE"),
+                 "NLCD_RCN_TABLE": ("Join_", "CN", "NRCS_LANDUSE", "Soil", "ID"),
+                 "ID_TABLE": ("IDENT", "ID_DESC"),
+                 "REACH_TYPE": ("TYPE",)}
+
+## ================================================================================================================
+def supportGDB():
+    # Path of the Support.gdb shipped next to the scripts.
+
+    return os.path.join(os.path.dirname(sys.argv[0]), "Support.gdb")
+
+## ================================================================================================================
+def sourceSignature(gdbPath):
+    # Hash of the names, sizes and modified times of the files in a file geodatabase folder.
+
+    signature = hashlib.md5()
+    if os.path.isdir(gdbPath):
+        for name in sorted(os.listdir(gdbPath)):
+            if name.lower().endswith(".lock"):
+                continue
+            stat = os.stat(os.path.join(gdbPath, name))
+            signature.update((name + ":" + str(stat.st_size) + ":" + str(int(stat.st_mtime))).encode("utf-8"))
+    return signature.hexdigest()
+
+## ================================================================================================================
+def readTable(table, fields):
+    # All rows of a table as a list of tuples.  Requires arcpy.
+
+    if arcpy is None:
+        raise ImportError("arcpy is required to read " + str(table))
+    with arcpy.da.SearchCursor(table, list(fields)) as cursor:
+        return [tuple(row) for row in cursor]
+
+## ================================================================================================================
+def readCache(cachePath, signature, tables):
+    # Cached {table: rows} if the cache matches the format version, the source signature and the fields of
+    # every requested table; otherwise None.
+
+    try:
+        f = open(cachePath, "rb")
+        try:
+            cache = pickle.loads(zlib.decompress(f.read()))
+        finally:
+            f.close()
+    except Exception:
+        return None
+
+    if not isinstance(cache, dict) or cache.get("version") != cacheVersion or cache.get("source") != signature:
+        return None
+    for name, fields in tables.items():
+        if tuple(cache.get("fields", {}).get(name, ())) != tuple(fields):
+            return None
+    return dict((name, cache["tables"][name]) for name in tables)
+
+## ================================================================================================================
+def writeCache(cachePath, signature, tables, rows):
+    # Saves {table: rows} with the format version and source signature.  Returns False if it could not be
+    # written (e.g. a read only install folder); the tables are then just read again next time.
+
+    cache = {"version": cacheVersion,
+             "source": signature,
+             "fields": dict((name, tuple(fields)) for name, fields in tables.items()),
+             "tables": rows}
+    try:
+        f = open(cachePath, "wb")
+        try:
+            f.write(zlib.compress(pickle.dumps(cache, 2)))
+        finally:
+            f.close()
+        return True
+    except (IOError, OSError):
+        return False
+
+## ================================================================================================================
+def loadTables(gdbPath=None, tables=None, cachePath=None):
+    # {table: list of row tuples} for the requested tables ({name: fields}, default all supportTables).
+    # Rows come from the cache when it is current, otherwise from the geodatabase, which refreshes the cache.
+
+    if gdbPath is None:
+        gdbPath = supportGDB()
+    if tables is None:
+        tables = supportTables
+    if cachePath is None:
+        cachePath = os.path.join(os.path.dirname(gdbPath), cacheName)
+
+    signature = sourceSignature(gdbPath)
+    rows = readCache(cachePath, signature, tables)
+    if rows is not None:
+        return rows
+
+    # Refresh every cached table so one cache serves all of the tools
+    allTables = dict(supportTables)
+    allTables.update(tables)
+    rows = {}
+    for name, fields in allTables.items():
+        table = os.path.join(gdbPath, name)
+        if arcpy is not None and arcpy.Exists(table):
+            rows[name] = readTable(table, fields)
+        elif name in tables:
+            raise IOError(name + " was not found in " + gdbPath)
+
+    writeCache(cachePath, signature, dict((name, allTables[name]) for name in rows), rows)
+    return dict((name, rows[name]) for name in tables)
+
+## ================================================================================================================
+def codeKey(value):
+    # Normalizes a code read from a table (text, float or int) so 11, 11.0 and "11" find the same entry.
+
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value).strip()
+    if number == int(number):
+        return int(number)
+    return number
+
+## ================================================================================================================
+def keyedLookup(rows, keyIndex, valueIndex, codeKeys=False):
+    # {key: value} from table rows.  As with AddJoin, the first row of a repeated key wins.
+
+    lookup = {}
+    for row in rows:
+        key = codeKey(row[keyIndex]) if codeKeys else row[keyIndex]
+        if key is not None and key not in lookup:
+            lookup[key] = row[valueIndex]
+    return lookup
+
+## ================================================================================================================
+def tr55Lookups(rows):
+    # Lookups for Calculate Runoff Curve Number from the loaded tables:
+    # (landuse description -> LU_CODE, hydro group -> HYDCODE, HYD_CODE -> RCN)
+
+    tr55 = rows["TR_55_RCN_Lookup"]
+    luCodes = keyedLookup(tr55, 0, 1)
+    hydCodes = keyedLookup(rows["HYD_GRP_Lookup"], 0, 1)
+    curveNumbers = keyedLookup(tr55, 2, 3, True)
+    return luCodes, hydCodes, curveNumbers
+
+## ================================================================================================================
+def combinedCode(luCode, hydCode):
+    # HYD_CODE of a landuse code and hydro group code: the two codes written one after the other
+    # (LU_CODE 12 and HYDCODE 3 give 123).  None if either is missing.
+
+    if luCode is None or hydCode is None:
+        return None
+    return int(str(int(luCode)) + str(int(hydCode)))
@@ -56,6 +56,7 @@ def logBasicSettings():
     f.write("\tWorkspace: " + userWorkspace + "\n")
     f.write("\tInput Rasters " + inRasters.replace(";",", ") + "\n")
     f.write("\tOutput Raster " + mergedDEM + "\n")
+    f.write("\tMosaic Method: " + mosaicMethod + "\n")
     
     f.close
     del f
@@ -63,6 +64,7 @@ def logBasicSettings():
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, traceback
+import mosaicRasters
 #import arcgisscripting
 
 # Environment settings
@@ -97,6 +99,14 @@ try:
     AOI = arcpy.GetParameterAsText(1)
     inRasters = arcpy.GetParameterAsText(2)
 
+    # Optional mosaic method for overlapping cells; MEAN as before
+    mosaicMethod = "MEAN"
+    if arcpy.GetArgumentCount() > 5 and arcpy.GetParameterAsText(5):
+        mosaicMethod = arcpy.GetParameterAsText(5).upper()
+    if mosaicMethod not in mosaicRasters.mosaicMethods:
+        AddMsgAndPrint("\n\nMosaic method must be one of " + ", ".join(mosaicRasters.mosaicMethods) + ". Exiting...\n",2)
+        sys.exit()
+
     # ------------------------------------------------------------------- Variables
     projectName = arcpy.ValidateTableName(os.path.basename(userWorkspace).replace(" ","_"))
 
@@ -124,8 +134,7 @@ try:
     logBasicSettings()    
     
     # ------------------------------------------------------------------ Intermediate Data
-    tempDEM = watershedGDB_path + os.sep + "tempDEM"
-    #outCLip = userWorkspace + os.sep + "clip" --- defined below in loop
+    #projRaster = watershedGDB_path + os.sep + "proj" --- defined below in loop, only for rasters on another grid
 
     # ------------------------------- Map Layers
     aoiOut = "" + os.path.basename(projectAOI) + ""
@@ -196,7 +205,7 @@ try:
 
     # ----------------------------------------------------------------------------------------------- Clean old files if FGDB already existed.
     if FGDBexists:    
-        gridsToRemove = (mergedDEM,tempDEM)
+        gridsToRemove = (mergedDEM,)
         x = 0        
         for grid in gridsToRemove:
             if arcpy.Exists(grid):
@@ -237,70 +246,48 @@ try:
         AddMsgAndPrint("\n\nYour Area of Interest must be a polygon layer. Exiting...\n",2)
         sys.exit()
 
-    # --------------------------------------------------------------------------------------------------- Clip Rasters
+    # --------------------------------------------------------------------------------------------------- Prepare Rasters
+    # The mosaic reads every raster on the grid of the first one; rasters in another coordinate system or
+    # cell size are projected onto that grid first.
+    rasterList = [raster.replace("'","") for raster in inRasters.split(';')]
+    grids = len(rasterList)
+
+    arcpy.env.snapRaster = firstRast
+    sourceList = []
     x = 0
-    # Get number of rasters to merge
-    grids = len(inRasters.split(';'))
-    inRasters = inRasters.replace(";",",")
-
-    while x < grids:
-        raster = inRasters.split(',')[x].replace("'","")
-        AddMsgAndPrint("\nClipping " + str(raster) + " to " + str(os.path.basename(projectAOI)) + "...",0)
-        outClip = watershedGDB_path + os.sep + "clip" + "_" + str(x)
-        extractedDEM = arcpy.sa.ExtractByMask(raster, projectAOI)
-        extractedDEM.save(outClip)
-        if x == 0:
-            # Start mosaic list
-            mosaicList = "" + str(outClip) + ""
-        else:
-            # Append to list
-            mosaicList = mosaicList + ";" + str(outClip)
+    for raster in rasterList:
+        rasterDesc = arcpy.Describe(raster)
+        if rasterDesc.SpatialReference.Name != sr.Name or rasterDesc.MeanCellWidth != cellSize:
+            AddMsgAndPrint("\nProjecting " + str(raster) + " to the grid of " + str(os.path.basename(firstRast)) + "...",0)
+            projRaster = watershedGDB_path + os.sep + "proj" + "_" + str(x)
+            arcpy.ProjectRaster_management(raster, projRaster, sr, "BILINEAR", cellSize)
+            raster = projRaster
+        sourceList.append(raster)
         x += 1
-        
+        del rasterDesc
+
     del x
     del raster
-    del outClip
-    
-    # ------------------------------------------------------------------------------------------------- Merge Clipped Data
-
-    if arcpy.Exists(tempDEM):
-        arcpy.Delete_management(tempDEM)# Redundant, I know but just in case....
-        
-    # Mosaic Clipped Rasters
-    arcpy.MosaicToNewRaster_management(mosaicList, watershedGDB_path, "tempDEM", "#", "32_BIT_FLOAT", cellSize, "1", "MEAN", "#")
-    AddMsgAndPrint("\nSuccessfully merged " + str(grids) + " rasters",0)
-    
-    del grids
+    arcpy.env.snapRaster = ""
 
-    # ------------------------------------------------------------------------------------------------- Fill any gaps with focal mean
-    # RasterCalculator is not available in arcpy. Need to do this as separate steps now (10.16.2019).
-    # 1. Create the focal mean surface.
-    # 2. Execute Con and if null, then use the focal mean surface, else use the normal surface.
-    outFocal = arcpy.sa.FocalStatistics(tempDEM, "RECTANGLE 3 3 CELL", "MEAN", "DATA")
-    outCon = arcpy.sa.Con(arcpy.sa.IsNull(tempDEM), outFocal, tempDEM)
-    outCon.save(mergedDEM)
-    arcpy.Delete_management(outFocal)
-    
-##    expression = "con(isnull([" + str(tempDEM) + "]),focalmean([" + str(tempDEM) + "], rectangle, 3, 3, DATA),[" + str(tempDEM) + "])"
-##    outSOMA = arcpy.sa.RasterCalculator(expression)
-##    outSOMA.save(mergedDEM)
-    
-    AddMsgAndPrint("\nSuccessfully removed any gaps in merged data",0)
+    # ------------------------------------------------------------------------------------------------- Merge Rasters
+    # Rasters are clipped to the AOI, mosaicked and any gaps filled with the focal mean in one streaming
+    # pass over row blocks of the output.
+    AddMsgAndPrint("\nMerging " + str(grids) + " rasters within " + str(os.path.basename(projectAOI)) + " using " + mosaicMethod + "...",0)
+    if mosaicRasters.mosaicRasters(sourceList, mergedDEM, mosaicMethod, projectAOI) is None:
+        AddMsgAndPrint("\n\nNone of the input rasters overlap " + str(os.path.basename(projectAOI)) + ". Exiting...\n",2)
+        sys.exit()
 
-    arcpy.Delete_management(tempDEM) 
-##    del expression   
+    AddMsgAndPrint("\nSuccessfully merged " + str(grids) + " rasters and removed any gaps in merged data",0)
+    del grids
+    del rasterList
 
     # ----------------------------------------------------------------------------------------------------- Delete intermediate data
     AddMsgAndPrint("\nDeleting intermediate data...",0)
-    arcpy.env.workspace = watershedGDB_path
-    fcs = arcpy.ListFeatureClasses("clip_*")
-    rasts = arcpy.ListRasters("clip_*", "All")
-    for fc in fcs:
-        arcpy.Delete_management(fc, "")
-    for rast in rasts:
-        arcpy.Delete_management(rast, "")
-    del fcs
-    del rasts
+    for raster in sourceList:
+        if os.path.basename(raster).startswith("proj_") and arcpy.Exists(raster):
+            arcpy.Delete_management(raster, "")
+    del sourceList
 
     # ------------------------------------------------------------------------------------------------ Compact FGDB
     try:
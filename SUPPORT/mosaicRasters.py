@@ -0,0 +1,287 @@
+## mosaicRasters.py
+##
+## Created by USDA NRCS, 2026
+##
+## Streaming mosaic used by Clip and Merge Adjacent DEM in place of ExtractByMask on every input, then
+## MosaicToNewRaster and a focal mean gap fill.  The output grid covers the AOI snapped to the first
+## raster.  It is built one band of rows at a time.  For each band only the window of every source that
+## overlaps it is read, and the windows are combined with the mosaic method.  Cells outside the AOI are
+## set to NoData with a scanline rasterization of the AOI polygons.  Any NoData cell left is then filled
+## with the 3x3 DATA focal mean of its neighbors.  Each band is read with one halo row above and below so
+## the fill is complete at band edges.  Memory is one output band plus one source window, and every
+## output cell is written once.
+##
+## Sources must share the output cell size and spatial reference (project them first if they do not).
+
+import numpy as np
+import rasterArrays
+import focalStats
+
+mosaicMethods = ("FIRST", "LAST", "MEAN", "MINIMUM", "MAXIMUM")
+
+# Largest rows x edges crossing matrix built at once when rasterizing the AOI
+maxScanCells = 4000000
+
+## ================================================================================================================
+def mosaicInfo(sourceInfos, extent=None, cellSize=None, snapInfo=None, spatialReference=None):
+    # Output grid of a mosaic: the union of the source extents, limited to extent (xmin, ymin, xmax, ymax)
+    # if one is given and snapped outward to the cells of snapInfo (default the first source).
+    # Returns None if the sources do not overlap the extent.
+
+    if snapInfo is None:
+        snapInfo = sourceInfos[0]
+    if cellSize is None:
+        cellSize = snapInfo["cellWidth"]
+    cellSize = float(cellSize)
+
+    xmin = min(info["xmin"] for info in sourceInfos)
+    ymin = min(info["ymin"] for info in sourceInfos)
+    xmax = max(info["xmax"] for info in sourceInfos)
+    ymax = max(info["ymax"] for info in sourceInfos)
+    if extent is not None:
+        xmin, ymin = max(xmin, extent[0]), max(ymin, extent[1])
+        xmax, ymax = min(xmax, extent[2]), min(ymax, extent[3])
+    if xmax <= xmin or ymax <= ymin:
+        return None
+
+    # Snap outward, with a small tolerance so edges already on the grid do not gain a cell
+    tolerance = 1e-6
+    xmin = snapInfo["xmin"] + np.floor((xmin - snapInfo["xmin"]) / cellSize + tolerance) * cellSize
+    ymin = snapInfo["ymin"] + np.floor((ymin - snapInfo["ymin"]) / cellSize + tolerance) * cellSize
+    cols = max(int(np.ceil((xmax - xmin) / cellSize - tolerance)), 1)
+    rows = max(int(np.ceil((ymax - ymin) / cellSize - tolerance)), 1)
+
+    if spatialReference is None:
+        spatialReference = snapInfo.get("spatialReference")
+    return {"xmin": float(xmin),
+            "ymin": float(ymin),
+            "xmax": float(xmin) + cols * cellSize,
+            "ymax": float(ymin) + rows * cellSize,
+            "cellWidth": cellSize,
+            "cellHeight": cellSize,
+            "rows": rows,
+            "cols": cols,
+            "spatialReference": spatialReference}
+
+## ================================================================================================================
+def readWindow(source, sourceInfo, blockInfo):
+    # The part of a source that overlaps a block of the output grid, as (array, firstRow, firstCol) with the
+    # offsets in block cells.  Only the overlapping window is read.  Returns None if they do not overlap.
+
+    cellWidth = blockInfo["cellWidth"]
+    cellHeight = blockInfo["cellHeight"]
+    c0 = max(int(round((sourceInfo["xmin"] - blockInfo["xmin"]) / cellWidth)), 0)
+    c1 = min(int(round((sourceInfo["xmax"] - blockInfo["xmin"]) / cellWidth)), blockInfo["cols"])
+    r0 = max(int(round((blockInfo["ymax"] - sourceInfo["ymax"]) / cellHeight)), 0)
+    r1 = min(int(round((blockInfo["ymax"] - sourceInfo["ymin"]) / cellHeight)), blockInfo["rows"])
+    if c1 <= c0 or r1 <= r0:
+        return None
+
+    # Arrays already in memory are sliced; rasters are read over the window's extent
+    if isinstance(source, np.ndarray) or str(source).lower().endswith(".npy"):
+        if not isinstance(source, np.ndarray):
+            source = np.load(source, mmap_mode="r")
+        sr0 = int(round((sourceInfo["ymax"] - blockInfo["ymax"]) / cellHeight)) + r0
+        sc0 = int(round((blockInfo["xmin"] - sourceInfo["xmin"]) / cellWidth)) + c0
+        return np.asarray(source[sr0:sr0 + r1 - r0, sc0:sc0 + c1 - c0], dtype=np.float32), r0, c0
+
+    window = dict(blockInfo)
+    window["xmin"] = blockInfo["xmin"] + c0 * cellWidth
+    window["xmax"] = blockInfo["xmin"] + c1 * cellWidth
+    window["ymax"] = blockInfo["ymax"] - r0 * cellHeight
+    window["ymin"] = blockInfo["ymax"] - r1 * cellHeight
+    window["rows"] = r1 - r0
+    window["cols"] = c1 - c0
+    return rasterArrays.rasterToArray(source, window)[0], r0, c0
+
+## ================================================================================================================
+def mosaicBlock(sources, blockInfo, method="MEAN"):
+    # One block of the mosaic of sources, a list of (source, info).  Overlapping values are combined as
+    # MosaicToNewRaster does: FIRST / LAST keep the value of the first / last source that has one, MEAN
+    # averages them (running sum and count), MINIMUM / MAXIMUM keep the extreme.
+
+    method = method.upper()
+    if method not in mosaicMethods:
+        raise ValueError("Unsupported mosaic method: " + str(method))
+
+    shape = (blockInfo["rows"], blockInfo["cols"])
+    result = np.full(shape, np.nan, dtype=np.float32)
+    if method == "MEAN":
+        total = np.zeros(shape, dtype=np.float64)
+        count = np.zeros(shape, dtype=np.int32)
+
+    for source, sourceInfo in sources:
+        window = readWindow(source, sourceInfo, blockInfo)
+        if window is None:
+            continue
+        values, r0, c0 = window
+        target = (slice(r0, r0 + values.shape[0]), slice(c0, c0 + values.shape[1]))
+        hasData = ~np.isnan(values)
+
+        if method == "MEAN":
+            total[target] += np.where(hasData, values, 0.0)
+            count[target] += hasData
+        elif method == "FIRST":
+            current = result[target]
+            result[target] = np.where(np.isnan(current), values, current)
+        elif method == "LAST":
+            result[target] = np.where(hasData, values, result[target])
+        elif method == "MINIMUM":
+            result[target] = np.fmin(result[target], values)
+        else:
+            result[target] = np.fmax(result[target], values)
+        del values, hasData
+
+    if method == "MEAN":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = (total / count).astype(np.float32)
+    return result
+
+## ================================================================================================================
+def polygonEdges(rings):
+    # (x0, y0, x1, y1) edge arrays of a polygon given as a list of closed (x, y) rings, holes included.
+
+    edges = []
+    for ring in rings:
+        xy = np.asarray(ring, dtype=np.float64)
+        if xy.shape[0] < 2:
+            continue
+        if (xy[0] != xy[-1]).any():
+            xy = np.vstack((xy, xy[:1]))
+        edges.append(np.column_stack((xy[:-1], xy[1:])))
+    if not edges:
+        return np.zeros((0, 4))
+    return np.concatenate(edges)
+
+## ================================================================================================================
+def polygonMask(polygons, blockInfo):
+    # Boolean mask of the cells of a block whose centers are inside any of the polygons (each an edge array
+    # from polygonEdges).  Each row is a scanline: the edges it crosses are sorted and cells between every
+    # pair of crossings are inside, so holes are left out (even-odd rule within a polygon).
+
+    rows, cols = blockInfo["rows"], blockInfo["cols"]
+    mask = np.zeros((rows, cols), dtype=bool)
+    centerY = blockInfo["ymax"] - (np.arange(rows) + 0.5) * blockInfo["cellHeight"]
+
+    for edges in polygons:
+        # Only edges spanning some row center of this block
+        low = np.minimum(edges[:, 1], edges[:, 3])
+        high = np.maximum(edges[:, 1], edges[:, 3])
+        edges = edges[(high > centerY[-1]) & (low <= centerY[0])] if rows else edges[:0]
+        if edges.shape[0] == 0:
+            continue
+        x0, y0, x1, y1 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+
+        step = max(maxScanCells // edges.shape[0], 1)
+        for first in range(0, rows, step):
+            y = centerY[first:first + step, None]
+            crosses = ((y0 <= y) & (y < y1)) | ((y1 <= y) & (y < y0))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                x = np.where(crosses, x0 + (y - y0) / (y1 - y0) * (x1 - x0), np.nan)
+            x.sort(axis=1)
+            if x.shape[1] % 2:
+                x = np.column_stack((x, np.full(x.shape[0], np.nan)))
+
+            # First cell with its center at or right of each crossing; cells from an entering crossing up to
+            # the next leaving crossing are inside
+            cells = np.ceil((x - blockInfo["xmin"]) / blockInfo["cellWidth"] - 0.5)
+            starts = cells[:, 0::2]
+            ends = cells[:, 1::2]
+            pairs = ~np.isnan(starts) & ~np.isnan(ends)
+            rowIndex = np.nonzero(pairs)[0]
+            starts = np.clip(starts[pairs], 0, cols).astype(np.intp)
+            ends = np.clip(ends[pairs], 0, cols).astype(np.intp)
+
+            runs = np.zeros((y.shape[0], cols + 1), dtype=np.int32)
+            np.add.at(runs, (rowIndex, starts), 1)
+            np.add.at(runs, (rowIndex, ends), -1)
+            mask[first:first + step] |= np.cumsum(runs[:, :cols], axis=1) > 0
+
+    return mask
+
+## ================================================================================================================
+def mosaicRowBlocks(sources, info, method="MEAN", polygons=None, fillGaps=True, blockRows=focalStats.defaultBlockRows):
+    # Generator of mosaic row bands on the grid described by info, top to bottom, clipped to polygons and
+    # gap filled with the 3x3 DATA focal mean where the clipped mosaic is NoData.
+
+    window = focalStats.neighborhoodWindow("RECTANGLE 3 3 CELL")
+    up, down = focalStats.windowHalo(window)[:2]
+    rows = info["rows"]
+
+    for firstRow in range(0, rows, blockRows):
+        nRows = min(blockRows, rows - firstRow)
+        readFirst = max(firstRow - up, 0) if fillGaps else firstRow
+        readLast = min(firstRow + nRows + down, rows) if fillGaps else firstRow + nRows
+        blockInfo = rasterArrays.rowBlockInfo(info, readFirst, readLast - readFirst)
+
+        band = mosaicBlock(sources, blockInfo, method)
+        if polygons is not None:
+            band[~polygonMask(polygons, blockInfo)] = np.nan
+
+        center = band[firstRow - readFirst:firstRow - readFirst + nRows]
+        if fillGaps:
+            filled = focalStats.focalBlock(band, window, "MEAN", True, firstRow - readFirst, readLast - firstRow - nRows)
+            center = np.where(np.isnan(center), filled, center)
+        yield center
+
+## ================================================================================================================
+def featurePolygons(inFeatures, spatialReference=None):
+    # Edge arrays of every polygon in a feature class, in spatialReference if one is given.  Interior rings
+    # follow their outer ring in each part, separated by an empty point.  Requires arcpy.
+
+    import arcpy
+
+    polygons = []
+    with arcpy.da.SearchCursor(inFeatures, ["SHAPE@"], spatial_reference=spatialReference) as cursor:
+        for row in cursor:
+            if row[0] is None:
+                continue
+            rings = []
+            for part in row[0]:
+                ring = []
+                for point in part:
+                    if point is None:
+                        rings.append(ring)
+                        ring = []
+                    else:
+                        ring.append((point.X, point.Y))
+                rings.append(ring)
+            polygons.append(polygonEdges([ring for ring in rings if ring]))
+    return polygons
+
+## ================================================================================================================
+def polygonsExtent(polygons):
+    # (xmin, ymin, xmax, ymax) of a list of polygon edge arrays, or None if they have no edges.
+
+    edges = [polygon for polygon in polygons if polygon.shape[0]]
+    if not edges:
+        return None
+    edges = np.concatenate(edges)
+    return (min(edges[:, 0].min(), edges[:, 2].min()), min(edges[:, 1].min(), edges[:, 3].min()),
+            max(edges[:, 0].max(), edges[:, 2].max()), max(edges[:, 1].max(), edges[:, 3].max()))
+
+## ================================================================================================================
+def mosaicRasters(inRasters, outRaster, method="MEAN", aoi=None, fillGaps=True, blockRows=focalStats.defaultBlockRows):
+    # Mosaics inRasters into outRaster on the grid of the first raster, e.g.
+    #   mosaicRasters(rasters, mergedDEM, "MEAN", projectAOI)
+    # matches ExtractByMask of every raster to projectAOI, MosaicToNewRaster "MEAN" and the focal mean gap
+    # fill.  Returns outRaster, or None if no raster overlaps the AOI.
+
+    sources = [(raster, rasterArrays.describeRaster(raster)) for raster in inRasters]
+    sourceInfos = [sourceInfo for raster, sourceInfo in sources]
+
+    polygons = None
+    extent = None
+    if aoi is not None:
+        polygons = featurePolygons(aoi, sourceInfos[0].get("spatialReference"))
+        extent = polygonsExtent(polygons)
+        if extent is None:
+            return None
+
+    info = mosaicInfo(sourceInfos, extent)
+    if info is None:
+        return None
+
+    blockRows = max(int(blockRows), 1)
+    blocks = mosaicRowBlocks(sources, info, method, polygons, fillGaps, blockRows)
+    return rasterArrays.rowBlocksToRaster(blocks, info, outRaster)
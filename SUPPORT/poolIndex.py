@@ -0,0 +1,328 @@
+## poolIndex.py
+##
+## Created by USDA NRCS, 2026
+##
+## Persisted sorted-elevation index of one subbasin for Wascob Design Height.  Designers rerun the tool for
+## the same subbasin with one design elevation after another, and every run used to repeat ExtractByMask,
+## SetNull, Times, Int and RasterToPolygon.  The first run now reads the subbasin window of the DEM once,
+## sorts its cells (stageStorage.buildElevationIndex) and saves the sorted elevations, their running sums
+## and the window itself to an .npz file.  Later runs load the file and answer the pool area and volume at
+## any elevation with a binary search; the pool outline is traced (poolPolygons) only for the elevation
+## that is finally chosen.
+##
+## designElevation works the other way: given the storage a subbasin must hold it bisects on the same
+## sorted cells for the lowest design elevation whose pool holds it.  A pool connected to an intake is
+## solved the same way on the level at which each cell joins the intake's pool, found with one
+## priority-flood from the intake (priorityFlood.fillDepressions with the intake as the only outlet).
+##
+## Each file carries a signature of the DEM (catalog path, format and, for a DEM in its own file or
+## folder, the size and time of its files), its grid and the subbasin polygon, all read without touching
+## the cells.  An index whose signature no longer matches, e.g. after the subbasin was redrawn, is rebuilt.
+## A geodatabase DEM has no file time of its own, so for one a few rows of the saved window are read back
+## and compared with the DEM to catch a DEM recalibrated in place.
+
+import os, hashlib
+import numpy as np
+import stageStorage
+import poolPolygons
+import priorityFlood
+import mosaicRasters
+
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
+# Bump when the saved arrays change so older files are rebuilt instead of misread
+indexVersion = 1
+
+# Grid keys saved with the index so the window can be placed without the DEM
+gridKeys = ("xmin", "ymin", "xmax", "ymax", "cellWidth", "cellHeight", "rows", "cols")
+
+# Rows of the saved window compared with a DEM that has no file time
+sampleRows = 16
+
+## ================================================================================================================
+def demStamp(inDEM):
+    # (text, timed) identifying a DEM without reading its cells: its catalog path, format and pixel type
+    # and, for a DEM stored in its own file or folder (GeoTIFF, ESRI grid), the size and modification time
+    # of its files.  timed is False when there are no such files, e.g. for a geodatabase raster.
+
+    path = str(inDEM)
+    details = []
+    if arcpy is not None:
+        desc = arcpy.Describe(inDEM)
+        path = desc.catalogPath
+        for attribute in ("format", "pixelType", "compressionType", "bandCount"):
+            details.append(str(getattr(desc, attribute, "")))
+
+    files = []
+    if os.path.isfile(path):
+        files = [path]
+    elif os.path.isdir(path):
+        files = [os.path.join(path, name) for name in sorted(os.listdir(path)) if os.path.isfile(os.path.join(path, name))]
+    for name in files:
+        details.append(os.path.basename(name) + " " + str(os.path.getsize(name)) + " " + repr(os.path.getmtime(name)))
+
+    if os.path.exists(path):
+        path = os.path.abspath(path)
+    return os.path.normcase(path) + "|" + "|".join(details), len(files) > 0
+
+## ================================================================================================================
+def indexSignature(stamp, demInfo, polygons):
+    # Hex digest identifying a DEM (stamp text from demStamp), its grid (info dictionary) and the subbasin
+    # polygon edge arrays from mosaicRasters.featurePolygons.
+
+    digest = hashlib.sha1()
+    digest.update(str(indexVersion).encode("utf-8"))
+    digest.update(stamp.encode("utf-8"))
+    digest.update(repr([round(float(demInfo[key]), 6) for key in gridKeys]).encode("utf-8"))
+    for edges in polygons:
+        digest.update(np.ascontiguousarray(np.asarray(edges, dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+## ================================================================================================================
+def windowMatches(index, inDEM, demInfo, rows=sampleRows):
+    # True if evenly spaced rows of the saved window still hold the DEM's values in every subbasin cell.
+    # Only those rows are read.
+
+    import rasterArrays
+
+    info = gridInfo(index)
+    for row in np.unique(np.linspace(0, info["rows"] - 1, min(rows, info["rows"])).astype(int)).tolist():
+        saved = index["dem"][row]
+        inside = ~np.isnan(saved)
+        values = mosaicRasters.mosaicBlock([(inDEM, demInfo)], rasterArrays.rowBlockInfo(info, row, 1), "FIRST")[0]
+        if not np.array_equal(np.asarray(values, dtype=np.float32)[inside], saved[inside]):
+            return False
+    return True
+
+## ================================================================================================================
+def buildPoolIndex(demArray, info, signature=""):
+    # Index of a masked DEM window (NaN outside the subbasin): the sorted elevation index of stageStorage
+    # plus the window and its grid, so outlines can be traced later without reading the DEM.
+
+    index = stageStorage.buildElevationIndex(demArray, info["cellWidth"], info["cellHeight"])
+    index["dem"] = np.asarray(demArray, dtype=np.float32)
+    index["grid"] = np.array([info[key] for key in gridKeys], dtype=np.float64)
+    index["signature"] = signature
+    return index
+
+## ================================================================================================================
+def gridInfo(index):
+    # Raster info dictionary of the window held by an index.
+
+    info = dict(zip(gridKeys, index["grid"].tolist()))
+    info["rows"] = int(info["rows"])
+    info["cols"] = int(info["cols"])
+    return info
+
+## ================================================================================================================
+def savePoolIndex(indexPath, index):
+    # Writes an index to indexPath (.npz).  The file is written beside the target and renamed over it, so
+    # an interrupted run never leaves a partial index behind.
+
+    folder = os.path.dirname(indexPath)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    tempPath = indexPath + ".tmp.npz"
+    np.savez(tempPath,
+             elevations=index["elevations"],
+             cumElevation=index["cumElevation"],
+             cumArea3D=index["cumArea3D"],
+             cellArea=np.float64(index["cellArea"]),
+             dem=index["dem"],
+             grid=index["grid"],
+             signature=np.array(index["signature"]))
+    if os.path.exists(indexPath):
+        os.remove(indexPath)
+    os.rename(tempPath, indexPath)
+    return indexPath
+
+## ================================================================================================================
+def loadPoolIndex(indexPath, signature=None):
+    # Index saved by savePoolIndex, or None if there is none, it cannot be read, or its signature differs
+    # from the one given.
+
+    if not os.path.exists(indexPath):
+        return None
+    try:
+        saved = np.load(indexPath)
+        try:
+            index = dict((name, saved[name]) for name in saved.files)
+        finally:
+            saved.close()
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+
+    index["cellArea"] = float(index["cellArea"])
+    index["signature"] = str(index["signature"])
+    if signature is not None and index["signature"] != signature:
+        return None
+    return index
+
+## ================================================================================================================
+def poolAt(index, elevation):
+    # (Area_2D, Area_3D, Volume) of every subbasin cell at or below elevation, one binary search in the index.
+
+    return tuple(stageStorage.stageStorage(index, [float(elevation)])[0][1:])
+
+## ================================================================================================================
+def poolVolume(index, elevation, seedRow=None, seedCol=None):
+    # (Area_2D, Area_3D, Volume) at elevation of the whole subbasin, or with a seed cell of only the pool
+    # connected to it (zeros if the seed is not next to any cell below elevation).
+
+    if seedRow is None:
+        return poolAt(index, elevation)
+
+    mask = poolPolygons.connectedPool(index["dem"], float(elevation), seedRow, seedCol)
+    if mask is None:
+        return 0.0, 0.0, 0.0
+    info = gridInfo(index)
+    return poolPolygons.poolStorage(index["dem"], mask, float(elevation), info["cellWidth"], info["cellHeight"])
+
+## ================================================================================================================
+def levelElevation(levels, elevations, target, lower):
+    # Lowest elevation at or above lower at which the cells whose level is at or below it hold target
+    # (cell elevation units times cells) below it, or None if they never do.  A cell is under water from
+    # its level up, so between two levels the volume rises linearly and is solved exactly; at a level it
+    # jumps by the depth of the cells joining there.
+
+    order = np.argsort(levels, kind="mergesort")
+    levels = np.asarray(levels, dtype=np.float64)[order]
+    cumElevation = np.concatenate(([0.0], np.cumsum(np.asarray(elevations, dtype=np.float64)[order])))
+
+    def volumeAt(elevation):
+        count = int(np.searchsorted(levels, elevation, side="right"))
+        return count * elevation - cumElevation[count]
+
+    if volumeAt(lower) >= target:
+        return float(lower)
+
+    low, high = int(np.searchsorted(levels, lower, side="right")), levels.shape[0]
+    while low < high:
+        middle = (low + high) // 2
+        if volumeAt(levels[middle]) >= target:
+            high = middle
+        else:
+            low = middle + 1
+    if low == levels.shape[0]:
+        return None
+
+    # count cells lie under any elevation between lower (or the level below) and levels[low]
+    count = int(np.searchsorted(levels, levels[low], side="left"))
+    return float(min((target + cumElevation[count]) / count, levels[low]))
+
+## ================================================================================================================
+def connectedPieces(index, seedRow, seedCol):
+    # [(seed, lower, upper)] giving the cell connectedPool grows the pool from at elevations from lower up
+    # to upper: the seed cell itself once it is under water and, below that, the lowest cell within the
+    # search radius of it (poolPolygons.seedCell).
+
+    z = index["dem"]
+    valid = ~np.isnan(z)
+    rows, cols = z.shape
+    seed = None
+    if 0 <= seedRow < rows and 0 <= seedCol < cols and valid[seedRow, seedCol]:
+        seed = (seedRow, seedCol)
+        valid = valid.copy()
+        valid[seed] = False
+    nearby = poolPolygons.seedCell(z, valid, seedRow, seedCol)
+
+    if seed is None:
+        return [] if nearby is None else [(nearby, float(z[nearby]), np.inf)]
+    if nearby is None or z[seed] <= z[nearby]:
+        return [(seed, float(z[seed]), np.inf)]
+    return [(nearby, float(z[nearby]), float(z[seed])), (seed, float(z[seed]), np.inf)]
+
+## ================================================================================================================
+def designElevation(index, volume, seedRow=None, seedCol=None):
+    # Lowest elevation whose pool holds volume (map units squared times z units), or None if even the pool
+    # up to the highest cell of the subbasin holds less.  For the whole subbasin a bisection over the sorted
+    # cells finds the first cell elevation holding the volume; below it the same cells are under water,
+    # so the volume rises linearly and the elevation is solved exactly.  A pool connected to a seed cell is
+    # solved the same way on the level at which each cell joins the seed's pool (levelElevation).
+
+    elevations = index["elevations"]
+    if elevations.shape[0] == 0:
+        return None
+    target = float(volume)
+    if target <= 0:
+        return float(elevations[0])
+    if poolVolume(index, elevations[-1], seedRow, seedCol)[2] < target:
+        return None
+
+    if seedRow is None:
+        low, high = 0, elevations.shape[0] - 1
+        while low < high:
+            middle = (low + high) // 2
+            if poolAt(index, elevations[middle])[2] >= target:
+                high = middle
+            else:
+                low = middle + 1
+        # low cells lie under any elevation between the cell below and elevations[low]
+        return float((target / index["cellArea"] + index["cumElevation"][low]) / low)
+
+    z = index["dem"]
+    for seed, lower, upper in connectedPieces(index, seedRow, seedCol):
+        outlet = np.zeros(z.shape, dtype=bool)
+        outlet[seed] = True
+        levels = priorityFlood.fillDepressions(z, False, outlet)
+        joined = ~np.isnan(levels)
+        elevation = levelElevation(levels[joined], z[joined], target / index["cellArea"], lower)
+        if elevation is not None and elevation < upper:
+            return elevation
+    return None
+
+## ================================================================================================================
+def lowestCell(index):
+    # (row, col) of the lowest cell of the subbasin window, the seed of a connected pool with no intake.
+
+    return tuple(int(i) for i in np.unravel_index(np.nanargmin(index["dem"]), index["dem"].shape))
+
+## ================================================================================================================
+def poolOutline(index, elevation, seedRow=None, seedCol=None):
+    # (map coordinate rings, pool mask) of the pool at elevation: every cell at or below it, as SetNull
+    # ("VALUE > elevation") kept, or with a seed cell only the cells connected to it.  None if the pool
+    # is empty or the seed is not next to it.
+
+    z = index["dem"]
+    if seedRow is None:
+        with np.errstate(invalid="ignore"):
+            mask = z <= float(elevation)
+    else:
+        mask = poolPolygons.connectedPool(z, float(elevation), seedRow, seedCol)
+    if mask is None or not mask.any():
+        return None
+    return poolPolygons.ringsToCoordinates(poolPolygons.traceBoundaries(mask), gridInfo(index)), mask
+
+## ================================================================================================================
+def subbasinPoolIndex(inDEM, subbasin, indexPath, demInfo=None):
+    # (index, built) for the subbasin polygon feature (layer or feature class with one subbasin) over
+    # inDEM.  The saved index is used when its signature matches (and, for a DEM with no file time, its
+    # sampled rows still match the DEM); otherwise the subbasin window is read and clipped in bands (see
+    # mosaicRasters), indexed and saved, and built is True.  Returns (None, False) if the subbasin does not
+    # overlap the DEM.  Requires arcpy.
+
+    import rasterArrays
+
+    if demInfo is None:
+        demInfo = rasterArrays.describeRaster(inDEM)
+    polygons = mosaicRasters.featurePolygons(subbasin, demInfo.get("spatialReference"))
+    stamp, timed = demStamp(inDEM)
+    signature = indexSignature(stamp, demInfo, polygons)
+
+    index = loadPoolIndex(indexPath, signature)
+    if index is not None and (timed or windowMatches(index, inDEM, demInfo)):
+        return index, False
+
+    extent = mosaicRasters.polygonsExtent(polygons)
+    info = None if extent is None else mosaicRasters.mosaicInfo([demInfo], extent)
+    if info is None:
+        return None, False
+
+    blocks = mosaicRasters.mosaicRowBlocks([(inDEM, demInfo)], info, "FIRST", polygons, False)
+    index = buildPoolIndex(np.concatenate(list(blocks)), info, signature)
+    savePoolIndex(indexPath, index)
+    return index, True
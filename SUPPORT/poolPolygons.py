@@ -0,0 +1,262 @@
+## poolPolygons.py
+##
+## Created by USDA NRCS, 2026
+##
+## Pool polygons for every stage of a stage-storage run without SetNull, Times, Int, RasterToPolygon and
+## Dissolve per stage.  The valid cells of the masked DEM are sorted once and the pool mask of each stage
+## is grown from the mask of the stage below it, so every cell is added exactly once over all stages.
+##
+## Each mask is vectorized with a direct boundary tracer: the cell edges between pool and non pool cells
+## are found with array comparisons and linked into rings.  Rings are clockwise around the pool and
+## counterclockwise around islands, the same orientation arcpy uses for outer rings and holes.  Cells that
+## only touch at a corner are kept apart, as RasterToPolygon does.
+##
+## connectedPool keeps only the part of a pool that is connected to a dam or intake cell.  Cells below the
+## pool elevation are labeled into connected components and the component holding the seed is the pool, so
+## isolated depressions elsewhere in the watershed do not add area or volume.
+
+import numpy as np
+
+# Edge directions in (row, col) vertex steps: east, south, west, north
+edgeRowSteps = (0, 1, 0, -1)
+edgeColSteps = (1, 0, -1, 0)
+
+## ================================================================================================================
+def poolMasks(demArray, stages):
+    # Generator of (stage, mask) with mask True for every cell at or below the stage elevation, the same
+    # cells SetNull("Value > stage") keeps.  Stages are visited from lowest to highest and the same mask
+    # array is grown and yielded each time, so copy it if it has to outlive the next iteration.
+
+    z = np.asarray(demArray, dtype=np.float64)
+    valid = np.nonzero(~np.isnan(z).ravel())[0]
+    elevations = z.ravel()[valid]
+    order = np.argsort(elevations, kind="mergesort")
+    cells = valid[order]
+    elevations = elevations[order]
+
+    mask = np.zeros(z.shape, dtype=bool)
+    flatMask = mask.ravel()
+    filled = 0
+    for stage in sorted(stages):
+        end = int(np.searchsorted(elevations, stage, side="right"))
+        flatMask[cells[filled:end]] = True
+        filled = end
+        yield stage, mask
+
+## ================================================================================================================
+def boundaryEdges(mask):
+    # Directed cell edges between pool and non pool cells as (startVertex, direction) arrays.  Vertices are
+    # numbered row * (cols + 1) + col on the (rows + 1) x (cols + 1) grid of cell corners.  The pool is
+    # always on the right of an edge.
+
+    m = np.asarray(mask, dtype=bool)
+    rows, cols = m.shape
+    padded = np.zeros((rows + 2, cols + 2), dtype=bool)
+    padded[1:-1, 1:-1] = m
+    inner = padded[1:-1, 1:-1]
+    vertexCols = cols + 1
+
+    starts = []
+    directions = []
+
+    # top edge runs east from the upper left corner, right edge south from the upper right corner,
+    # bottom edge west from the lower right corner and left edge north from the lower left corner
+    for direction, neighbor, dr, dc in ((0, padded[:-2, 1:-1], 0, 0),
+                                        (1, padded[1:-1, 2:], 0, 1),
+                                        (2, padded[2:, 1:-1], 1, 1),
+                                        (3, padded[1:-1, :-2], 1, 0)):
+        r, c = np.nonzero(inner & ~neighbor)
+        starts.append((r + dr) * vertexCols + (c + dc))
+        directions.append(np.full(r.shape[0], direction, dtype=np.int8))
+
+    return np.concatenate(starts), np.concatenate(directions)
+
+## ================================================================================================================
+def traceBoundaries(mask):
+    # Links the boundary edges of a mask into closed rings.  Returns a list of rings, each a list of
+    # (row, col) corner vertices with the first vertex repeated at the end.  Only corners where the ring
+    # changes direction are kept.
+
+    m = np.asarray(mask, dtype=bool)
+    cols = m.shape[1]
+    vertexCols = cols + 1
+    starts, directions = boundaryEdges(m)
+    if starts.shape[0] == 0:
+        return []
+
+    stepRows = np.array(edgeRowSteps)
+    stepCols = np.array(edgeColSteps)
+    ends = starts + stepRows[directions] * vertexCols + stepCols[directions]
+
+    # Outgoing edges by start vertex.  A vertex has two outgoing edges only where pool cells meet at a
+    # corner; the tracer then takes the right turn so those cells stay separate.
+    outgoing = {}
+    for edge, vertex in enumerate(starts.tolist()):
+        outgoing.setdefault(vertex, []).append(edge)
+
+    startList = starts.tolist()
+    directionList = directions.tolist()
+    endList = ends.tolist()
+    used = np.zeros(starts.shape[0], dtype=bool)
+
+    rings = []
+    for first in range(starts.shape[0]):
+        if used[first]:
+            continue
+
+        ring = []
+        edge = first
+        previous = None
+        while not used[edge]:
+            used[edge] = True
+            direction = directionList[edge]
+            if direction != previous:
+                vertex = startList[edge]
+                ring.append((vertex // vertexCols, vertex % vertexCols))
+            previous = direction
+
+            candidates = [e for e in outgoing[endList[edge]] if not used[e]]
+            if not candidates:
+                break
+            if len(candidates) > 1:
+                rightTurn = (direction + 1) % 4
+                candidates = [e for e in candidates if directionList[e] == rightTurn] or candidates
+            edge = candidates[0]
+
+        # the first vertex is not a corner if the ring closes going the same way it started
+        if directionList[first] == previous and len(ring) > 1:
+            ring = ring[1:]
+        ring.append(ring[0])
+        rings.append(ring)
+
+    return rings
+
+## ================================================================================================================
+def ringsToCoordinates(rings, info):
+    # Converts (row, col) corner rings to map coordinate rings using the raster info dictionary.
+
+    coordinateRings = []
+    for ring in rings:
+        vertices = np.array(ring, dtype=np.float64)
+        xs = info["xmin"] + vertices[:, 1] * info["cellWidth"]
+        ys = info["ymax"] - vertices[:, 0] * info["cellHeight"]
+        coordinateRings.append(list(zip(xs.tolist(), ys.tolist())))
+    return coordinateRings
+
+## ================================================================================================================
+def poolRings(demArray, info, stages):
+    # {stage: list of map coordinate rings} of the pool at every stage elevation, from one sort of the DEM.
+
+    pools = {}
+    for stage, mask in poolMasks(demArray, stages):
+        pools[stage] = ringsToCoordinates(traceBoundaries(mask), info)
+    return pools
+
+## ================================================================================================================
+def labelComponents(mask, connectivity=8):
+    # Connected-component labels of a boolean mask with a vectorized union-find.  Every pair of touching
+    # pool cells is an edge; each pass hooks the larger root of every edge onto the smaller one and then
+    # compresses the parent pointers by jumping until they are all roots.  Returns an int array with 0
+    # outside the mask and the smallest flat index + 1 of each component as its label.  connectivity is 4
+    # (edges only) or 8 (diagonals connect too, as water moves in D8).
+
+    m = np.asarray(mask, dtype=bool)
+    rows, cols = m.shape
+    flatMask = m.ravel()
+    parent = np.arange(flatMask.shape[0])
+
+    shifts = [(0, 1), (1, 0)]
+    if connectivity == 8:
+        shifts += [(1, 1), (1, -1)]
+
+    first = []
+    second = []
+    for dr, dc in shifts:
+        a = m[:rows - dr, max(-dc, 0):cols - max(dc, 0)]
+        b = m[dr:, max(dc, 0):cols - max(-dc, 0)]
+        r, c = np.nonzero(a & b)
+        c = c + max(-dc, 0)
+        first.append(r * cols + c)
+        second.append((r + dr) * cols + c + dc)
+    first = np.concatenate(first)
+    second = np.concatenate(second)
+
+    while first.shape[0]:
+        rootA = parent[first]
+        rootB = parent[second]
+        joined = rootA != rootB
+        if not joined.any():
+            break
+        first = first[joined]
+        second = second[joined]
+        rootA = rootA[joined]
+        rootB = rootB[joined]
+        np.minimum.at(parent, np.maximum(rootA, rootB), np.minimum(rootA, rootB))
+        while True:
+            grandparent = parent[parent]
+            if (grandparent == parent).all():
+                break
+            parent = grandparent
+
+    labels = np.where(flatMask, parent + 1, 0)
+    return labels.reshape(rows, cols)
+
+## ================================================================================================================
+def seedCell(demArray, mask, row, col, searchRadius=3):
+    # Pool cell to grow the pool from: the cell at (row, col) if it is in the pool, otherwise the lowest
+    # pool cell within searchRadius cells of it (an intake or dam point is rarely on the lowest cell).
+    # Returns None if there is no pool cell that close.
+
+    m = np.asarray(mask, dtype=bool)
+    rows, cols = m.shape
+    if 0 <= row < rows and 0 <= col < cols and m[row, col]:
+        return row, col
+
+    r0, r1 = max(row - searchRadius, 0), min(row + searchRadius + 1, rows)
+    c0, c1 = max(col - searchRadius, 0), min(col + searchRadius + 1, cols)
+    if r0 >= r1 or c0 >= c1:
+        return None
+
+    window = np.where(m[r0:r1, c0:c1], np.asarray(demArray, dtype=np.float64)[r0:r1, c0:c1], np.inf)
+    if not np.isfinite(window).any():
+        return None
+    r, c = np.unravel_index(np.argmin(window), window.shape)
+    return r0 + int(r), c0 + int(c)
+
+## ================================================================================================================
+def connectedPool(demArray, elevation, row, col, searchRadius=3, connectivity=8):
+    # Mask of the pool at elevation that is hydraulically connected to the cell at (row, col), such as a dam
+    # or intake location.  Low spots elsewhere in the watershed that are below the elevation but not joined
+    # to the seed are left out.  Returns None if no pool cell is near the seed.
+
+    z = np.asarray(demArray, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        belowElevation = z <= elevation
+
+    seed = seedCell(z, belowElevation, row, col, searchRadius)
+    if seed is None:
+        return None
+
+    labels = labelComponents(belowElevation, connectivity)
+    return labels == labels[seed]
+
+## ================================================================================================================
+def poolStorage(demArray, poolMask, elevation, cellWidth, cellHeight=None):
+    # (Area_2D, Area_3D, Volume) of a pool mask at elevation, from the DEM array already in memory.
+    # Cells at or below the elevation count, as in poolMasks and stageStorage, and the volume is the sum
+    # of (elevation - cell elevation) * cell area as in SurfaceVolume "BELOW".
+
+    import stageStorage
+
+    if cellHeight is None:
+        cellHeight = cellWidth
+
+    z = np.asarray(demArray, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        cells = np.asarray(poolMask, dtype=bool) & (z <= elevation)
+    cellArea = float(cellWidth) * float(cellHeight)
+
+    area2D = float(cells.sum()) * cellArea
+    area3D = float(stageStorage.surfaceAreaFactor(z, cellWidth, cellHeight)[cells].sum()) * cellArea
+    volume = float((elevation - z[cells]).sum()) * cellArea
+    return area2D, area3D, volume
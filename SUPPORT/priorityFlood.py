@@ -0,0 +1,128 @@
+## priorityFlood.py
+##
+## Created by USDA NRCS, 2026
+##
+## Priority-flood depression filling (Barnes, Lehman and Mulla, 2014) used in place of arcpy.sa.Fill.
+## Cells are flooded inward from the edges of the DEM in order of elevation.  Cells that are lower than
+## the cell they are reached from are raised to its elevation and handled from a plain FIFO pit queue,
+## so only cells on rising terrain go through the heap (Priority-Flood+).
+##
+## Elevations are compared as order-preserving integer keys of their float32 bit patterns.  This keeps
+## the fill exact in float32 and makes the optional epsilon gradient a +1 step to the next float32 up,
+## which leaves every filled flat with a drainable slope toward its outlet.
+##
+## Every cell is ranked by elevation in one up-front argsort, and the heap is a byte flag per rank: a
+## cell is pushed by setting the flag of its rank and the lowest cell is popped by scanning forward from
+## the last rank popped.  A cell only goes on the heap when it is above the flood level, so the scan
+## moves forward through the flags and reads them about once over the whole fill.  The keys, ranks and pit queue are
+## NumPy arrays of 4 or 8 bytes per cell rather than Python lists, whose int objects took several times
+## the memory of the DEM itself.
+
+import numpy as np
+import flatGrid
+
+## ================================================================================================================
+def float32ToKeys(values):
+    # Maps float32 values to int64 keys that sort in the same order as the floats and step by 1
+    # between adjacent representable float32 values.
+
+    bits = np.asarray(values, dtype=np.float32).view(np.int32).astype(np.int64)
+    return np.where(bits >= 0, bits, -(bits & 0x7fffffff))
+
+## ================================================================================================================
+def keysToFloat32(keys):
+    # Inverse of float32ToKeys.
+
+    keys = np.asarray(keys, dtype=np.int64)
+    bits = np.where(keys >= 0, keys, (-keys) | 0x80000000).astype(np.uint32)
+    return bits.view(np.float32)
+
+## ================================================================================================================
+def fillDepressions(demArray, epsilon=False, outlets=None):
+    # Fills all depressions in a float32 DEM with NoData as NaN.  Water leaves the grid through the
+    # outer edge and through any cell next to NoData.  With epsilon=True flats are given the smallest
+    # float32 gradient so every cell has a downslope neighbor.  Returns a new float32 array.
+    # outlets, a boolean array, makes only those cells the way out; each cell is then filled to the
+    # lowest level at which it is connected to an outlet, and cells with no path to one are NaN.
+
+    dem = np.asarray(demArray, dtype=np.float32)
+    rows, cols = dem.shape
+
+    flat, width = flatGrid.flatten(dem, np.nan)
+    valid = ~np.isnan(flat)
+    z = float32ToKeys(np.where(valid, flat, 0))
+
+    # Rank every cell by elevation once; the heap only ever holds these ranks
+    cells = z.shape[0]
+    indexType = np.int32 if cells < 2 ** 31 else np.int64
+    order = np.argsort(z, kind="mergesort").astype(indexType)
+    rank = np.empty(cells, dtype=indexType)
+    rank[order] = np.arange(cells, dtype=indexType)
+
+    if outlets is None:
+        seeds = flatGrid.edgeCells(valid, width)
+    else:
+        seeds = flatGrid.flatten(np.asarray(outlets, dtype=bool), False)[0] & valid
+    queued = bytearray(cells)
+    for r in rank[seeds].tolist():
+        queued[r] = 1
+    lowest = 0
+
+    # Cells enter the pit queue once, so it is a plain array read from pitHead and appended at pitTail
+    pit = np.empty(cells, dtype=indexType)
+    pitHead = pitTail = 0
+
+    closed = bytearray((~valid | seeds).astype(np.uint8).tobytes())
+    offsets = flatGrid.neighborOffsets(width)
+    step = 1 if epsilon else 0
+
+    while True:
+        top = queued.find(b"\x01", lowest)
+        if top >= 0:
+            lowest = top
+        if pitHead < pitTail:
+            # With epsilon, a heap cell at the same elevation as the pit front must be processed first
+            # or the gradient applied across the flat can be pushed the wrong way.
+            if epsilon and top >= 0 and z.item(order.item(top)) == z.item(pit.item(pitHead)):
+                queued[top] = 0
+                c = order.item(top)
+            else:
+                c = pit.item(pitHead)
+                pitHead += 1
+        elif top >= 0:
+            queued[top] = 0
+            c = order.item(top)
+        else:
+            break
+
+        spill = z.item(c) + step
+        for offset in offsets:
+            n = c + offset
+            if closed[n]:
+                continue
+            closed[n] = 1
+            if z.item(n) <= spill:
+                z[n] = spill
+                pit[pitTail] = n
+                pitTail += 1
+            else:
+                r = rank.item(n)
+                queued[r] = 1
+                if r < lowest:
+                    lowest = r
+
+    filled = keysToFloat32(z)
+    filled[~valid] = np.nan
+    if outlets is not None:
+        filled[np.frombuffer(bytes(closed), dtype=np.uint8) == 0] = np.nan
+    return flatGrid.unflatten(filled, rows, cols).copy()
+
+## ================================================================================================================
+def fillRaster(inRaster, outRaster, epsilon=False):
+    # Reads inRaster, fills its depressions and saves the result to outRaster.
+
+    import rasterArrays
+
+    demArray, demInfo = rasterArrays.rasterToArray(inRaster)
+    rasterArrays.arrayToRaster(fillDepressions(demArray, epsilon), demInfo, outRaster)
+    return outRaster
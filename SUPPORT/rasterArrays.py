@@ -0,0 +1,313 @@
+## rasterArrays.py
+##
+## Created by USDA NRCS, 2026
+##
+## Shared helpers for moving rasters in and out of NumPy arrays.  The array engines used by the
+## Engineering Tools work on plain float32 arrays with NoData stored as NaN.  Inside ArcGIS the
+## rasters are read and written with arcpy.  Outside of ArcGIS (benchmarks, headless runs) GDAL is
+## used for GeoTIFFs and .npy files are read directly.
+
+import os
+import numpy as np
+
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+## ================================================================================================================
+def defaultRasterInfo(rows, cols, cellSize=1.0, xmin=0.0, ymin=0.0):
+    # Builds the georeferencing dictionary used by every engine for an array that has none of its own.
+    # Lower left corner defaults to 0,0 with square cells.
+
+    return {"xmin": float(xmin),
+            "ymin": float(ymin),
+            "xmax": float(xmin) + cols * float(cellSize),
+            "ymax": float(ymin) + rows * float(cellSize),
+            "cellWidth": float(cellSize),
+            "cellHeight": float(cellSize),
+            "rows": int(rows),
+            "cols": int(cols),
+            "spatialReference": None}
+
+## ================================================================================================================
+def rasterToArray(inRaster, templateInfo=None, noDataValue=None):
+    # Reads a raster into a float32 array with NoData set to NaN.
+    # Returns the array and a dictionary with the extent, cell size and spatial reference.
+    # Accepts anything arcpy can describe, a GDAL readable file such as a GeoTIFF, or a .npy file.
+    # templateInfo reads the raster over the extent of another raster so the two arrays line up cell for cell.
+    # noDataValue keeps the raster's own data type (e.g. integer zones) and fills NoData with that value instead.
+
+    if isinstance(inRaster, np.ndarray):
+        array = np.asarray(inRaster, dtype=np.float32) if noDataValue is None else np.asarray(inRaster)
+        return array, defaultRasterInfo(array.shape[0], array.shape[1])
+
+    if str(inRaster).lower().endswith(".npy"):
+        array = np.load(inRaster)
+        if noDataValue is None:
+            array = array.astype(np.float32)
+        return array, defaultRasterInfo(array.shape[0], array.shape[1])
+
+    if arcpy is not None:
+        desc = arcpy.Describe(inRaster)
+        fillValue = np.nan if noDataValue is None else noDataValue
+
+        if templateInfo is None:
+            ext = desc.Extent
+            array = arcpy.RasterToNumPyArray(inRaster, nodata_to_value=fillValue)
+            info = {"xmin": ext.XMin,
+                    "ymin": ext.YMin,
+                    "xmax": ext.XMax,
+                    "ymax": ext.YMax,
+                    "cellWidth": desc.MeanCellWidth,
+                    "cellHeight": desc.MeanCellHeight,
+                    "rows": array.shape[0],
+                    "cols": array.shape[1],
+                    "spatialReference": desc.SpatialReference}
+        else:
+            lowerLeft = arcpy.Point(templateInfo["xmin"], templateInfo["ymin"])
+            array = arcpy.RasterToNumPyArray(inRaster, lowerLeft, templateInfo["cols"], templateInfo["rows"], fillValue)
+            info = dict(templateInfo)
+
+        if noDataValue is None:
+            array = array.astype(np.float32)
+        return array, info
+
+    if gdal is not None:
+        ds = gdal.Open(str(inRaster))
+        if ds is None:
+            raise IOError("Could not open " + str(inRaster))
+        band = ds.GetRasterBand(1)
+        gt = ds.GetGeoTransform()
+        if templateInfo is None:
+            array = band.ReadAsArray()
+        else:
+            xoff = int(round((templateInfo["xmin"] - gt[0]) / gt[1]))
+            yoff = int(round((templateInfo["ymax"] - gt[3]) / gt[5]))
+            array = band.ReadAsArray(xoff, yoff, templateInfo["cols"], templateInfo["rows"])
+        noData = band.GetNoDataValue()
+        if noDataValue is None:
+            array = array.astype(np.float32)
+            if noData is not None:
+                array[array == np.float32(noData)] = np.nan
+        elif noData is not None:
+            array[array == noData] = noDataValue
+        if templateInfo is not None:
+            ds = None
+            return array, dict(templateInfo)
+        info = {"xmin": gt[0],
+                "ymin": gt[3] + gt[5] * ds.RasterYSize,
+                "xmax": gt[0] + gt[1] * ds.RasterXSize,
+                "ymax": gt[3],
+                "cellWidth": abs(gt[1]),
+                "cellHeight": abs(gt[5]),
+                "rows": ds.RasterYSize,
+                "cols": ds.RasterXSize,
+                "spatialReference": ds.GetProjection()}
+        ds = None
+        return array, info
+
+    raise ImportError("Reading " + str(inRaster) + " requires arcpy or GDAL")
+
+## ================================================================================================================
+def arrayToRaster(array, info, outRaster, noDataValue=None):
+    # Writes an array to outRaster using the extent and cell size in info.
+    # Float arrays are written with NaN as NoData; integer arrays use noDataValue if one is given.
+
+    if str(outRaster).lower().endswith(".npy"):
+        np.save(outRaster, array)
+        return outRaster
+
+    if arcpy is not None:
+        lowerLeft = arcpy.Point(info["xmin"], info["ymin"])
+        if noDataValue is None:
+            newRaster = arcpy.NumPyArrayToRaster(array, lowerLeft, info["cellWidth"], info["cellHeight"])
+        else:
+            newRaster = arcpy.NumPyArrayToRaster(array, lowerLeft, info["cellWidth"], info["cellHeight"], noDataValue)
+        newRaster.save(outRaster)
+        if info.get("spatialReference") is not None:
+            arcpy.DefineProjection_management(outRaster, info["spatialReference"])
+        return outRaster
+
+    if gdal is not None:
+        if array.dtype.kind == "f":
+            gdalType = gdal.GDT_Float32
+        elif array.dtype == np.uint8:
+            gdalType = gdal.GDT_Byte
+        else:
+            gdalType = gdal.GDT_Int32
+        driver = gdal.GetDriverByName("GTiff")
+        bands = 1 if array.ndim == 2 else array.shape[0]
+        rows, cols = array.shape[-2], array.shape[-1]
+        ds = driver.Create(str(outRaster), cols, rows, bands, gdalType)
+        ds.SetGeoTransform((info["xmin"], info["cellWidth"], 0.0, info["ymax"], 0.0, -info["cellHeight"]))
+        if info.get("spatialReference"):
+            ds.SetProjection(str(info["spatialReference"]))
+        for b in range(bands):
+            band = ds.GetRasterBand(b + 1)
+            if array.dtype.kind == "f":
+                band.SetNoDataValue(float("nan"))
+            elif noDataValue is not None:
+                band.SetNoDataValue(noDataValue)
+            band.WriteArray(array if array.ndim == 2 else array[b])
+        ds.FlushCache()
+        ds = None
+        return outRaster
+
+    raise ImportError("Writing " + str(outRaster) + " requires arcpy or GDAL")
+
+## ================================================================================================================
+def describeRaster(inRaster):
+    # Georeferencing dictionary of a raster (same keys as rasterToArray returns) without reading its cells.
+
+    if isinstance(inRaster, np.ndarray):
+        return defaultRasterInfo(inRaster.shape[0], inRaster.shape[1])
+
+    if str(inRaster).lower().endswith(".npy"):
+        array = np.load(inRaster, mmap_mode="r")
+        return defaultRasterInfo(array.shape[0], array.shape[1])
+
+    if arcpy is not None:
+        desc = arcpy.Describe(inRaster)
+        ext = desc.Extent
+        return {"xmin": ext.XMin,
+                "ymin": ext.YMin,
+                "xmax": ext.XMax,
+                "ymax": ext.YMax,
+                "cellWidth": desc.MeanCellWidth,
+                "cellHeight": desc.MeanCellHeight,
+                "rows": desc.Height,
+                "cols": desc.Width,
+                "spatialReference": desc.SpatialReference}
+
+    if gdal is not None:
+        ds = gdal.Open(str(inRaster))
+        if ds is None:
+            raise IOError("Could not open " + str(inRaster))
+        gt = ds.GetGeoTransform()
+        info = {"xmin": gt[0],
+                "ymin": gt[3] + gt[5] * ds.RasterYSize,
+                "xmax": gt[0] + gt[1] * ds.RasterXSize,
+                "ymax": gt[3],
+                "cellWidth": abs(gt[1]),
+                "cellHeight": abs(gt[5]),
+                "rows": ds.RasterYSize,
+                "cols": ds.RasterXSize,
+                "spatialReference": ds.GetProjection()}
+        ds = None
+        return info
+
+    raise ImportError("Reading " + str(inRaster) + " requires arcpy or GDAL")
+
+## ================================================================================================================
+def rowBlockInfo(info, firstRow, nRows):
+    # Georeferencing dictionary for rows firstRow to firstRow + nRows of a raster described by info.
+
+    block = dict(info)
+    block["ymax"] = info["ymax"] - firstRow * info["cellHeight"]
+    block["ymin"] = block["ymax"] - nRows * info["cellHeight"]
+    block["rows"] = int(nRows)
+    return block
+
+## ================================================================================================================
+def readRows(inRaster, info, firstRow, nRows):
+    # Reads a band of whole rows from a raster as float32 with NoData as NaN.  Only the requested rows are
+    # held in memory, so large rasters can be processed a block at a time.
+
+    firstRow = max(int(firstRow), 0)
+    nRows = min(int(nRows), info["rows"] - firstRow)
+
+    if isinstance(inRaster, np.ndarray):
+        return np.asarray(inRaster[firstRow:firstRow + nRows], dtype=np.float32)
+
+    if str(inRaster).lower().endswith(".npy"):
+        return np.asarray(np.load(inRaster, mmap_mode="r")[firstRow:firstRow + nRows], dtype=np.float32)
+
+    return rasterToArray(inRaster, rowBlockInfo(info, firstRow, nRows))[0]
+
+## ================================================================================================================
+def rowBlocks(inRaster, info, blockRows=512):
+    # Generator of float32 row bands of inRaster on the grid described by info, top to bottom.
+
+    for firstRow in range(0, info["rows"], blockRows):
+        yield readRows(inRaster, info, firstRow, blockRows)
+
+## ================================================================================================================
+def rowBlocksToRaster(blocks, info, outRaster, noDataValue=None):
+    # Writes an iterable of float32 row blocks, top to bottom, to outRaster without holding the whole raster.
+    # NaN is written as NoData.  With noDataValue the blocks are int32 and cells equal to it are NoData.
+
+    dtype = np.float32 if noDataValue is None else np.int32
+    pixelType = "32_BIT_FLOAT" if noDataValue is None else "32_BIT_SIGNED"
+
+    if str(outRaster).lower().endswith(".npy"):
+        out = np.lib.format.open_memmap(outRaster, mode="w+", dtype=dtype, shape=(info["rows"], info["cols"]))
+        row = 0
+        for block in blocks:
+            out[row:row + block.shape[0]] = block
+            row += block.shape[0]
+        out.flush()
+        del out
+        return outRaster
+
+    if arcpy is not None:
+        # Each block is saved as its own raster and the pieces are mosaicked into the output
+        workspace = arcpy.env.scratchWorkspace or arcpy.env.scratchFolder
+        pieces = []
+        row = 0
+        try:
+            for block in blocks:
+                piece = arcpy.CreateUniqueName("blk", workspace)
+                arrayToRaster(block.astype(dtype), rowBlockInfo(info, row, block.shape[0]), piece, noDataValue)
+                pieces.append(piece)
+                row += block.shape[0]
+
+            if arcpy.Exists(outRaster):
+                arcpy.Delete_management(outRaster)
+            arcpy.MosaicToNewRaster_management(";".join(pieces), os.path.dirname(outRaster), os.path.basename(outRaster),
+                                               info.get("spatialReference") or "#", pixelType, info["cellWidth"], "1", "FIRST", "#")
+        finally:
+            for piece in pieces:
+                if arcpy.Exists(piece):
+                    arcpy.Delete_management(piece)
+        return outRaster
+
+    if gdal is not None:
+        driver = gdal.GetDriverByName("GTiff")
+        ds = driver.Create(str(outRaster), info["cols"], info["rows"], 1, gdal.GDT_Float32 if noDataValue is None else gdal.GDT_Int32)
+        ds.SetGeoTransform((info["xmin"], info["cellWidth"], 0.0, info["ymax"], 0.0, -info["cellHeight"]))
+        if info.get("spatialReference"):
+            ds.SetProjection(str(info["spatialReference"]))
+        band = ds.GetRasterBand(1)
+        band.SetNoDataValue(float("nan") if noDataValue is None else noDataValue)
+        row = 0
+        for block in blocks:
+            band.WriteArray(block.astype(dtype), 0, row)
+            row += block.shape[0]
+        ds.FlushCache()
+        ds = None
+        return outRaster
+
+    raise ImportError("Writing " + str(outRaster) + " requires arcpy or GDAL")
+
+## ================================================================================================================
+def polygonsToRaster(inFeatures, field, templateRaster, outRaster):
+    # Rasterizes polygons on the grid of templateRaster (same cell size, snap and extent) so the result can be
+    # read cell for cell against it, e.g. as a zone or mask raster.  Cells are assigned by cell center,
+    # matching ExtractByMask.  Requires arcpy.
+
+    tempSnap = arcpy.env.snapRaster
+    tempExtent = arcpy.env.extent
+    try:
+        arcpy.env.snapRaster = templateRaster
+        arcpy.env.extent = templateRaster
+        arcpy.PolygonToRaster_conversion(inFeatures, field, outRaster, "CELL_CENTER", "", arcpy.Describe(templateRaster).MeanCellWidth)
+    finally:
+        arcpy.env.snapRaster = tempSnap
+        arcpy.env.extent = tempExtent
+    return outRaster
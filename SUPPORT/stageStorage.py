@@ -0,0 +1,283 @@
+## stageStorage.py
+##
+## Created by USDA NRCS, 2026
+##
+## Single pass stage-storage engine.  The masked DEM is read once, the valid cell elevations are sorted,
+## and the surface area and volume below every stage elevation are taken from prefix sums instead of
+## running SurfaceVolume_3d once per stage.  Rows use the same columns as the SurfaceVolume text output
+## (Plane_Height, Area_2D, Area_3D, Volume) so the storage CSV and storage table workflow is unchanged.
+## The area of a stage counts every cell at or below it, the same cells its pool polygon covers
+## (poolPolygons); cells exactly at the stage add area but no volume.
+##
+## Runs without arcpy on a NumPy array, a .npy file or a GeoTIFF (GDAL) for headless benchmarking:
+##     python stageStorage.py <dem> <maxElev> <increment> [outputCSV]
+
+import sys, os, time, math
+import numpy as np
+
+# Columns written by SurfaceVolume_3d; Area_2D is index 4 and Volume is index 6
+storageFields = ("Dataset","Plane_Height","Reference","Z_Factor","Area_2D","Area_3D","Volume")
+
+## ================================================================================================================
+def surfaceAreaFactor(z, cellWidth, cellHeight):
+    # Ratio of 3D surface area to planar area for each cell, from the surface gradient.
+    # Cells on the edge of the mask (NaN neighbors) fall back to the planar area.
+
+    if min(z.shape) > 1:
+        dzdy, dzdx = np.gradient(z, float(cellHeight), float(cellWidth))
+        surfaceFactor = np.sqrt(1.0 + dzdx * dzdx + dzdy * dzdy)
+        surfaceFactor[~np.isfinite(surfaceFactor)] = 1.0
+    else:
+        surfaceFactor = np.ones(z.shape)
+    return surfaceFactor
+
+## ================================================================================================================
+def buildElevationIndex(demArray, cellWidth, cellHeight=None):
+    # Sorts the valid (non NaN) cells of a masked DEM once.
+    # Returns a dictionary with the sorted elevations and running sums of elevation and 3D surface area
+    # so that area and volume below any stage can be answered without touching the DEM again.
+
+    if cellHeight is None:
+        cellHeight = cellWidth
+
+    z = np.asarray(demArray, dtype=np.float64)
+    valid = ~np.isnan(z)
+    cellArea = float(cellWidth) * float(cellHeight)
+    surfaceFactor = surfaceAreaFactor(z, cellWidth, cellHeight)
+
+    elevations = z[valid]
+    order = np.argsort(elevations, kind="mergesort")
+    elevations = elevations[order]
+    area3D = surfaceFactor[valid][order] * cellArea
+
+    return {"elevations": elevations,
+            "cumElevation": np.concatenate(([0.0], np.cumsum(elevations))),
+            "cumArea3D": np.concatenate(([0.0], np.cumsum(area3D))),
+            "cellArea": cellArea}
+
+## ================================================================================================================
+def stageStorage(elevIndex, stages):
+    # Returns one (Plane_Height, Area_2D, Area_3D, Volume) row per stage elevation.
+    # Volume is the BELOW volume: the sum of (stage - cell elevation) * cell area for every cell at or
+    # below the stage.
+
+    stages = np.atleast_1d(np.asarray(stages, dtype=np.float64))
+    cellsBelow = np.searchsorted(elevIndex["elevations"], stages, side="right")
+
+    area2D = cellsBelow * elevIndex["cellArea"]
+    area3D = elevIndex["cumArea3D"][cellsBelow]
+    volume = (stages * cellsBelow - elevIndex["cumElevation"][cellsBelow]) * elevIndex["cellArea"]
+
+    return list(zip(stages.tolist(), area2D.tolist(), area3D.tolist(), volume.tolist()))
+
+## ================================================================================================================
+def buildZoneElevationIndex(demArray, zoneArray, cellWidth, cellHeight=None, noDataZone=0):
+    # Labeled-zone version of buildElevationIndex for many subbasins at once.
+    # Cells are sorted by zone and then by elevation in a single lexsort, so each zone occupies one
+    # contiguous run of the sorted arrays and the running sums can be differenced per zone.
+
+    if cellHeight is None:
+        cellHeight = cellWidth
+
+    z = np.asarray(demArray, dtype=np.float64)
+    zones = np.asarray(zoneArray).astype(np.int64)
+    valid = ~np.isnan(z) & (zones != noDataZone)
+    cellArea = float(cellWidth) * float(cellHeight)
+    surfaceFactor = surfaceAreaFactor(z, cellWidth, cellHeight)
+
+    zoneValues = zones[valid]
+    elevations = z[valid]
+    order = np.lexsort((elevations, zoneValues))
+    zoneValues = zoneValues[order]
+    elevations = elevations[order]
+    area3D = surfaceFactor[valid][order] * cellArea
+
+    zoneIDs, zoneStarts, zoneCounts = np.unique(zoneValues, return_index=True, return_counts=True)
+
+    return {"zones": zoneIDs,
+            "starts": zoneStarts,
+            "counts": zoneCounts,
+            "elevations": elevations,
+            "cumElevation": np.concatenate(([0.0], np.cumsum(elevations))),
+            "cumArea3D": np.concatenate(([0.0], np.cumsum(area3D))),
+            "cellArea": cellArea}
+
+## ================================================================================================================
+def zoneRange(zoneIndex, zoneID):
+    # Minimum and maximum elevation of one zone, or None if the zone has no cells on the DEM.
+
+    i = np.searchsorted(zoneIndex["zones"], zoneID)
+    if i >= len(zoneIndex["zones"]) or zoneIndex["zones"][i] != zoneID:
+        return None
+    start = zoneIndex["starts"][i]
+    return zoneIndex["elevations"][start], zoneIndex["elevations"][start + zoneIndex["counts"][i] - 1]
+
+## ================================================================================================================
+def zonalStageStorage(zoneIndex, stagesByZone):
+    # stagesByZone is a dictionary of {zone ID: list of stage elevations}.
+    # Returns {zone ID: StageStorageTable} using the grouped running sums.
+    # Zones without any DEM cells return an empty table.
+
+    results = {}
+    for zoneID, stages in stagesByZone.items():
+        i = np.searchsorted(zoneIndex["zones"], zoneID)
+        if i >= len(zoneIndex["zones"]) or zoneIndex["zones"][i] != zoneID:
+            results[zoneID] = StageStorageTable()
+            continue
+
+        start = zoneIndex["starts"][i]
+        end = start + zoneIndex["counts"][i]
+        stages = np.atleast_1d(np.asarray(stages, dtype=np.float64))
+
+        cellsBelow = np.searchsorted(zoneIndex["elevations"][start:end], stages, side="right")
+        stop = start + cellsBelow
+
+        area2D = cellsBelow * zoneIndex["cellArea"]
+        area3D = zoneIndex["cumArea3D"][stop] - zoneIndex["cumArea3D"][start]
+        volume = (stages * cellsBelow - (zoneIndex["cumElevation"][stop] - zoneIndex["cumElevation"][start])) * zoneIndex["cellArea"]
+
+        results[zoneID] = StageStorageTable(zip(stages.tolist(), area2D.tolist(), area3D.tolist(), volume.tolist()))
+
+    return results
+
+## ================================================================================================================
+class StageStorageTable(object):
+    # In-memory stage-storage curve: array-backed Plane_Height, Area_2D, Area_3D and Volume columns that
+    # grow by appending, so a curve is built once and written once instead of being re-read from the
+    # storage CSV.  Lookups interpolate linearly between stages with a binary search; elevations outside
+    # the curve take the first or last row.  Iterating yields (Plane_Height, Area_2D, Area_3D, Volume) rows.
+
+    def __init__(self, rows=None):
+        self.data = np.zeros((16, 4))
+        self.count = 0
+        self.order = None
+        if rows is not None:
+            self.extend(rows)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.rows())
+
+    def append(self, plane, area2D, area3D, volume):
+        if self.count == self.data.shape[0]:
+            self.data = np.concatenate((self.data, np.zeros(self.data.shape)))
+        self.data[self.count] = (plane, area2D, area3D, volume)
+        self.count += 1
+        self.order = None
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(*row)
+
+    def rows(self):
+        return [tuple(row) for row in self.data[:self.count].tolist()]
+
+    def column(self, index):
+        return self.data[:self.count, index]
+
+    def sortedColumns(self):
+        # Columns in ascending elevation.  The sort is cached until the next append; stages may be added
+        # in either direction.
+        if self.order is None:
+            self.order = np.argsort(self.column(0), kind="mergesort")
+        return self.data[:self.count][self.order]
+
+    def interpolate(self, keyIndex, valueIndex, key):
+        if self.count == 0:
+            raise ValueError("Stage storage table is empty")
+        table = self.sortedColumns()
+        keys = table[:, keyIndex]
+        i = int(np.searchsorted(keys, key, side="left"))
+        if i == 0:
+            return float(table[0, valueIndex])
+        if i == self.count:
+            return float(table[-1, valueIndex])
+        k0, k1 = keys[i - 1], keys[i]
+        v0, v1 = table[i - 1, valueIndex], table[i, valueIndex]
+        if k1 == k0:
+            return float(v1)
+        return float(v0 + (v1 - v0) * (key - k0) / (k1 - k0))
+
+    def volumeAt(self, elevation):
+        return self.interpolate(0, 3, elevation)
+
+    def areaAt(self, elevation):
+        return self.interpolate(0, 1, elevation)
+
+    def elevationAt(self, volume):
+        # Volume never decreases with elevation, so the volume column is searched directly.
+        return self.interpolate(3, 0, volume)
+
+    def writeCSV(self, storageTxtFile, datasetName, reference="BELOW", zFactor=1):
+        writeStorageCSV(storageTxtFile, datasetName, self.rows(), reference, zFactor)
+
+## ================================================================================================================
+def footStages(minElev, maxElev):
+    # One foot stages used by the WASCOB storage tables.  The first stage is offset from the minimum
+    # elevation by the fractional part of the range so the last stage lands on maxElev.
+
+    totalElev = round(float(maxElev - minElev),1)
+    remainder = totalElev - math.floor(totalElev)
+
+    stages = []
+    plnHgt = minElev + remainder
+    while plnHgt <= maxElev:
+        stages.append(plnHgt)
+        plnHgt = 1 + plnHgt
+    return stages
+
+## ================================================================================================================
+def stageElevations(maxElev, minElev, increment):
+    # Stage elevations from maxElev down to (but not including) minElev at the user increment.
+    # Same sequence the original SurfaceVolume loop stepped through.
+
+    stages = []
+    elev = maxElev
+    while elev > minElev:
+        stages.append(elev)
+        elev = elev - increment
+    return stages
+
+## ================================================================================================================
+def writeStorageCSV(storageTxtFile, datasetName, rows, reference="BELOW", zFactor=1):
+    # Appends rows to a SurfaceVolume style comma delimited text file, writing the header if the file is new.
+
+    newFile = not os.path.exists(storageTxtFile)
+    f = open(storageTxtFile, 'a')
+    if newFile:
+        f.write(",".join(storageFields) + "\n")
+    for plane, area2D, area3D, volume in rows:
+        f.write("%s,%.4f,%s,%.4f,%.4f,%.4f,%.4f\n" % (datasetName, plane, reference, zFactor, area2D, area3D, volume))
+    f.close()
+
+## ================================================================================================================
+if __name__ == '__main__':
+
+    import rasterArrays
+
+    if len(sys.argv) < 4:
+        print("Usage: python stageStorage.py <dem> <maxElev> <increment> [outputCSV]")
+        sys.exit(1)
+
+    start = time.time()
+    demArray, demInfo = rasterArrays.rasterToArray(sys.argv[1])
+    loaded = time.time()
+
+    elevIndex = buildElevationIndex(demArray, demInfo["cellWidth"], demInfo["cellHeight"])
+    stages = stageElevations(float(sys.argv[2]), float(np.nanmin(demArray)), float(sys.argv[3]))
+    rows = stageStorage(elevIndex, stages)
+    finished = time.time()
+
+    if len(sys.argv) > 4:
+        if os.path.exists(sys.argv[4]):
+            os.remove(sys.argv[4])
+        writeStorageCSV(sys.argv[4], os.path.basename(sys.argv[1]), rows)
+    else:
+        print(",".join(storageFields[1:2] + storageFields[4:]))
+        for row in rows:
+            print("%.4f,%.4f,%.4f,%.4f" % row)
+
+    print("\n" + str(len(elevIndex["elevations"])) + " cells, " + str(len(rows)) + " stages")
+    print("Read DEM: %.3f sec   Stage-storage: %.3f sec" % (loaded - start, finished - loaded))
@@ -0,0 +1,134 @@
+## surfaceSlope.py
+##
+## Created by USDA NRCS, 2026
+##
+## Fused smooth-then-slope kernel used in place of the FocalStatistics -> ExtractByMask -> Slope chain in the
+## slope based tools.  The DEM is read once in bands of rows; each band is smoothed with the 3 x 3 "DATA"
+## focal mean, cells outside the mask are dropped and slope is computed with Horn's method, so neither the
+## smoothed DEM nor the masked copy of it is ever written out.
+##
+## Slope matches arcpy.sa.Slope: NoData neighbors of a valid cell take the value of the cell itself,
+## the z-factor scales elevations, and the result is in percent rise or degrees.
+
+import numpy as np
+import rasterArrays, focalStats
+
+slopeTypes = ("PERCENT_RISE", "DEGREE")
+
+## ================================================================================================================
+def hornSlope(array, cellWidth, cellHeight=None, zFactor=1.0, slopeType="PERCENT_RISE", haloTop=0, haloBottom=0):
+    # Horn slope of a float array with NoData as NaN.  haloTop and haloBottom rows only complete the 3 x 3
+    # window and are dropped from the result; missing rows beyond them are the edge of the raster.
+
+    if cellHeight is None:
+        cellHeight = cellWidth
+
+    slopeType = slopeType.upper()
+    if slopeType not in slopeTypes:
+        raise ValueError("Unsupported slope type: " + str(slopeType))
+
+    values = np.asarray(array, dtype=np.float64)
+    rows, cols = values.shape
+    outRows = rows - haloTop - haloBottom
+    padTop = max(1 - haloTop, 0)
+    padBottom = max(1 - haloBottom, 0)
+    padded = np.pad(values, ((padTop, padBottom), (1, 1)), mode="constant", constant_values=np.nan)
+    firstRow = haloTop + padTop - 1
+
+    center = padded[firstRow + 1:firstRow + 1 + outRows, 1:1 + cols]
+
+    def neighbor(dr, dc):
+        view = padded[firstRow + 1 + dr:firstRow + 1 + dr + outRows, 1 + dc:1 + dc + cols]
+        return np.where(np.isnan(view), center, view)
+
+    a, b, c = neighbor(-1, -1), neighbor(-1, 0), neighbor(-1, 1)
+    d, f = neighbor(0, -1), neighbor(0, 1)
+    g, h, i = neighbor(1, -1), neighbor(1, 0), neighbor(1, 1)
+
+    dzdx = ((c + 2 * f + i) - (a + 2 * d + g)) * zFactor / (8.0 * cellWidth)
+    dzdy = ((g + 2 * h + i) - (a + 2 * b + c)) * zFactor / (8.0 * cellHeight)
+    rise = np.sqrt(dzdx ** 2 + dzdy ** 2)
+
+    if slopeType == "DEGREE":
+        slope = np.degrees(np.arctan(rise))
+    else:
+        slope = rise * 100.0
+    return slope.astype(np.float32)
+
+## ================================================================================================================
+def smoothedSlope(demArray, cellWidth, cellHeight=None, zFactor=1.0, slopeType="PERCENT_RISE", maskArray=None, smooth=True):
+    # Whole-array version: 3 x 3 focal mean, mask (NaN or 0 in maskArray is outside), then Horn slope.
+
+    dem = np.asarray(demArray, dtype=np.float32)
+    if smooth:
+        dem = focalStats.focalArray(dem, "RECTANGLE 3 3 CELL", "MEAN")
+    if maskArray is not None:
+        outside = maskOutside(maskArray)
+        dem = np.where(outside, np.nan, dem)
+
+    slope = hornSlope(dem, cellWidth, cellHeight, zFactor, slopeType)
+    slope[np.isnan(dem)] = np.nan
+    return slope
+
+## ================================================================================================================
+def maskOutside(maskArray):
+    # True where a mask array excludes the cell (NoData or 0).
+
+    mask = np.asarray(maskArray)
+    if mask.dtype.kind == "f":
+        return np.isnan(mask) | (mask == 0)
+    return mask == 0
+
+## ================================================================================================================
+def slopeRowBlocks(inDEM, info, zFactor=1.0, slopeType="PERCENT_RISE", maskRaster=None, smooth=True, blockRows=focalStats.defaultBlockRows):
+    # Generator of slope row bands, top to bottom.  Each band of output rows is computed from a read of the
+    # DEM two rows deeper on each side: one row for the focal mean and one for the slope window.
+
+    window = focalStats.neighborhoodWindow("RECTANGLE 3 3 CELL")
+    rows = info["rows"]
+    depth = 2 if smooth else 1
+
+    for firstRow in range(0, rows, blockRows):
+        nRows = min(blockRows, rows - firstRow)
+        readFirst = max(firstRow - depth, 0)
+        readLast = min(firstRow + nRows + depth, rows)
+        band = rasterArrays.readRows(inDEM, info, readFirst, readLast - readFirst)
+
+        # Smoothed surface for the output rows plus one row of slope window on each side
+        surfFirst = max(firstRow - 1, 0)
+        surfLast = min(firstRow + nRows + 1, rows)
+        if smooth:
+            surface = focalStats.focalBlock(band, window, "MEAN", True, surfFirst - readFirst, readLast - surfLast)
+        else:
+            surface = band[surfFirst - readFirst:surfLast - readFirst]
+
+        if maskRaster is not None:
+            mask = rasterArrays.readRows(maskRaster, info, surfFirst, surfLast - surfFirst)
+            surface = np.where(maskOutside(mask), np.nan, surface)
+
+        slope = hornSlope(surface, info["cellWidth"], info["cellHeight"], zFactor, slopeType, firstRow - surfFirst, surfLast - firstRow - nRows)
+        slope[np.isnan(surface[firstRow - surfFirst:firstRow - surfFirst + nRows])] = np.nan
+        yield slope
+
+## ================================================================================================================
+def slopeRaster(inDEM, outSlope, zFactor=1.0, slopeType="PERCENT_RISE", maskRaster=None, smooth=True, blockRows=focalStats.defaultBlockRows):
+    # Smooths inDEM with a 3 x 3 mean, limits it to maskRaster (any raster on the DEM grid; NoData or 0 is
+    # outside) and saves the slope to outSlope.  Replaces
+    #   FocalStatistics(inDEM, "RECTANGLE 3 3 CELL", "MEAN", "DATA") -> ExtractByMask(mask) -> Slope(slopeType, zFactor)
+
+    info = rasterArrays.describeRaster(inDEM)
+    blocks = slopeRowBlocks(inDEM, info, zFactor, slopeType, maskRaster, smooth, max(int(blockRows), 1))
+    return rasterArrays.rowBlocksToRaster(blocks, info, outSlope)
+
+## ================================================================================================================
+def zonalSlopeStatistics(inDEM, zoneRaster, zFactor=1.0, slopeType="PERCENT_RISE", smooth=True, blockRows=focalStats.defaultBlockRows):
+    # Slope statistics per zone ({zone: {"MEAN", "MIN", ...}}, see zonalStats.zonalTable) without writing the
+    # slope grid.  zoneRaster (NoData outside the zones) also masks the smoothed DEM, as in slopeRaster.
+
+    import zonalStats
+
+    info = rasterArrays.describeRaster(inDEM)
+    blockRows = max(int(blockRows), 1)
+    slopeBlocks = slopeRowBlocks(inDEM, info, zFactor, slopeType, zoneRaster, smooth, blockRows)
+    zoneBlocks = rasterArrays.rowBlocks(zoneRaster, info, blockRows)
+    return zonalStats.zonalStatisticsBlocks(zoneBlocks, slopeBlocks, info["cellWidth"] * info["cellHeight"])
@@ -0,0 +1,126 @@
+## terrainIndices.py
+##
+## Created by USDA NRCS, 2026
+##
+## Compound Topographic Index, Stream Power Index and LS factor from one load of the DEM and flow
+## accumulation.  The tools previously saved clipped copies of every input, a slope grid, and each raster
+## algebra intermediate (the Ln / Tan expression, the SetNull filters) separately.  Here the masked inputs
+## are read into arrays once, slope comes from the same arrays (or the existing project slope grid), and
+## every index is computed in one vectorized float32 pass.  The overland flow length and drainage area
+## filters of SPI are boolean masks.
+##
+## Formulas (slope in degrees, as the tools have used since 6/2020):
+##   CTI = Ln(((FlowAccum + 1) * cellSize) / Tan(slope radians)), Tan of a flat cell taken as 0.001
+##   SPI = Ln((filtered FlowAccum + 0.001) * slope), a flat cell's slope taken as 0.001
+##   LS  = (As / 22.13) ^ 0.4 * (Sin(slope) / 0.0896) ^ 1.3 with As = (FlowAccum + 1) * cell size in meters
+## Values <= 0 are NoData for CTI and SPI, as the SetNull("Value <= 0") step made them.
+
+import numpy as np
+import rasterArrays
+import surfaceSlope
+import mosaicRasters
+import flowPaths
+
+terrainIndexNames = ("CTI", "SPI", "LS")
+
+# Degrees to radians as written in the CTI expression
+degreesToRadians = 1.570796 / 90
+
+## ================================================================================================================
+def compoundTopographicIndex(facArray, slopeArray, cellSize):
+    # CTI of every cell from flow accumulation (cells) and slope (degrees).
+
+    fac = np.asarray(facArray, dtype=np.float32)
+    radians = np.asarray(slopeArray, dtype=np.float32) * np.float32(degreesToRadians)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tangent = np.where(radians > 0, np.tan(radians), np.float32(0.001))
+        cti = np.log((fac + 1) * np.float32(cellSize) / tangent)
+        cti[~(cti > 0)] = np.nan
+    return cti.astype(np.float32)
+
+## ================================================================================================================
+def flowFilter(facArray, flowLengthArray, overlandThreshold, channelThreshold):
+    # Cells kept for SPI: upstream flow length at least overlandThreshold (drops overland flow) and flow
+    # accumulation no more than channelThreshold cells (drops channelized flow).
+
+    with np.errstate(invalid="ignore"):
+        return (np.asarray(flowLengthArray) >= float(overlandThreshold)) & (np.asarray(facArray) <= float(channelThreshold))
+
+## ================================================================================================================
+def streamPowerIndex(facArray, slopeArray, keep=None):
+    # SPI of every cell from flow accumulation (cells) and slope (degrees).  Cells outside keep are NoData.
+
+    fac = np.asarray(facArray, dtype=np.float32)
+    slope = np.asarray(slopeArray, dtype=np.float32)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        beta = np.where(slope == 0, np.float32(0.001), slope)
+        spi = np.log((fac + np.float32(0.001)) * beta)
+        if keep is not None:
+            spi[~keep] = np.nan
+        spi[~(spi > 0)] = np.nan
+    return spi.astype(np.float32)
+
+## ================================================================================================================
+def lsFactor(facArray, slopeArray, cellSizeMeters):
+    # Moore and Burch LS factor from flow accumulation (cells) and slope (degrees).
+
+    area = (np.asarray(facArray, dtype=np.float32) + 1) * np.float32(cellSizeMeters)
+    sine = np.sin(np.asarray(slopeArray, dtype=np.float32) * np.float32(np.pi / 180))
+    with np.errstate(invalid="ignore"):
+        return ((area / np.float32(22.13)) ** np.float32(0.4) * (sine / np.float32(0.0896)) ** np.float32(1.3)).astype(np.float32)
+
+## ================================================================================================================
+def terrainIndices(facArray, slopeArray, cellSize, indices=terrainIndexNames, keep=None, metersPerUnit=1.0):
+    # {name: array} of the requested indices.  keep is the SPI flow filter (see flowFilter).
+
+    results = {}
+    for name in indices:
+        name = name.upper()
+        if name == "CTI":
+            results[name] = compoundTopographicIndex(facArray, slopeArray, cellSize)
+        elif name == "SPI":
+            results[name] = streamPowerIndex(facArray, slopeArray, keep)
+        elif name == "LS":
+            results[name] = lsFactor(facArray, slopeArray, cellSize * metersPerUnit)
+        else:
+            raise ValueError("Unsupported terrain index: " + str(name))
+    return results
+
+## ================================================================================================================
+def terrainIndexRasters(inDEM, flowAccum, outputs, slopeRaster, zFactor=1.0, mask=None, flowDir=None,
+                        overlandThreshold=None, channelThreshold=None, metersPerUnit=1.0):
+    # Writes every index in outputs ({name: raster}) for the DEM, clipped to mask polygons if given.  The
+    # slope (degrees, from the 3 x 3 smoothed DEM) is read from slopeRaster if it exists and saved there
+    # otherwise.  SPI also needs flowDir and the two thresholds (flow length in map units, accumulation in
+    # cells).  Requires arcpy.
+
+    import arcpy
+
+    demArray, info = rasterArrays.rasterToArray(inDEM)
+    if mask is not None:
+        inside = mosaicRasters.polygonMask(mosaicRasters.featurePolygons(mask, info.get("spatialReference")), info)
+        demArray[~inside] = np.nan
+    outside = np.isnan(demArray)
+
+    if arcpy.Exists(slopeRaster):
+        slopeArray = rasterArrays.rasterToArray(slopeRaster, info)[0]
+    else:
+        slopeArray = surfaceSlope.smoothedSlope(demArray, info["cellWidth"], info["cellHeight"], zFactor, "DEGREE")
+        rasterArrays.arrayToRaster(slopeArray, info, slopeRaster)
+    del demArray
+
+    facArray = rasterArrays.rasterToArray(flowAccum, info)[0]
+    facArray[outside] = np.nan
+
+    keep = None
+    if "SPI" in outputs:
+        flowDirArray = rasterArrays.rasterToArray(flowDir, info, 0)[0]
+        flowDirArray[outside] = 0
+        upstream = flowPaths.flowLengths(flowDirArray, (flowDirArray > 0).astype(np.int32), info["cellWidth"], info["cellHeight"])[1]
+        keep = flowFilter(facArray, upstream, overlandThreshold, channelThreshold)
+        del flowDirArray, upstream
+
+    results = terrainIndices(facArray, slopeArray, info["cellWidth"], list(outputs), keep, metersPerUnit)
+    for name, outRaster in outputs.items():
+        rasterArrays.arrayToRaster(results[name.upper()], info, outRaster)
+    return outputs
@@ -0,0 +1,94 @@
+## terrainPosition.py
+##
+## Created by USDA NRCS, 2026
+##
+## Multi-scale Topographic Position Index.  TPI is the DEM minus the mean of a window around each cell, the
+## same as DEM - FocalStatistics(DEM, "RECTANGLE h w CELL", "MEAN", "DATA").  One summed-area table of the
+## DEM and one of its valid-cell count are built.  The sum and count of any rectangle then come from four
+## lookups in each table, so every window size costs the same per cell no matter how large it is.
+##
+## The DEM mean is subtracted before summing so the running sums stay small and do not lose precision on
+## large DEMs.  As with the "DATA" option, windows are clipped at the edge of the raster and NoData cells
+## are skipped.  Cells that are NoData in the DEM are NoData in the TPI.
+
+import numpy as np
+import rasterArrays
+
+## ================================================================================================================
+def windowShape(size):
+    # (rows, cols) of a window size given as an int (square), "9", "9x15" / "9 15" or a (rows, cols) pair.
+
+    if isinstance(size, (tuple, list)):
+        rows, cols = int(size[0]), int(size[-1])
+    else:
+        parts = str(size).lower().replace("x", " ").split()
+        rows, cols = int(float(parts[0])), int(float(parts[-1]))
+    if rows < 1 or cols < 1:
+        raise ValueError("Window sizes must be at least 1 cell: " + str(size))
+    return rows, cols
+
+## ================================================================================================================
+def integralImages(demArray):
+    # Summed-area tables (values, valid counts) of a DEM with a zero first row and column, so the sum of
+    # rows r0:r1 and cols c0:c1 is S[r1, c1] - S[r0, c1] - S[r1, c0] + S[r0, c0].  Values are offset by
+    # the DEM mean, which is returned as the third item.
+
+    z = np.asarray(demArray, dtype=np.float64)
+    valid = ~np.isnan(z)
+    offset = float(z[valid].mean()) if valid.any() else 0.0
+
+    rows, cols = z.shape
+    sums = np.zeros((rows + 1, cols + 1), dtype=np.float64)
+    counts = np.zeros((rows + 1, cols + 1), dtype=np.int64)
+    np.cumsum(np.cumsum(np.where(valid, z - offset, 0.0), axis=0), axis=1, out=sums[1:, 1:])
+    np.cumsum(np.cumsum(valid, axis=0, dtype=np.int64), axis=1, out=counts[1:, 1:])
+    return sums, counts, offset
+
+## ================================================================================================================
+def windowMean(sums, counts, offset, size):
+    # Mean of the valid cells in the size window around every cell, from the tables of integralImages.
+    # The processing cell sits at (rows // 2, cols // 2) of the window, as in focalStats.  NaN where the
+    # window has no valid cells.
+
+    height, width = windowShape(size)
+    rows, cols = sums.shape[0] - 1, sums.shape[1] - 1
+
+    r = np.arange(rows)
+    c = np.arange(cols)
+    r0 = np.clip(r - height // 2, 0, rows)[:, None]
+    r1 = np.clip(r + height - height // 2, 0, rows)[:, None]
+    c0 = np.clip(c - width // 2, 0, cols)[None, :]
+    c1 = np.clip(c + width - width // 2, 0, cols)[None, :]
+
+    total = sums[r1, c1] - sums[r0, c1] - sums[r1, c0] + sums[r0, c0]
+    count = counts[r1, c1] - counts[r0, c1] - counts[r1, c0] + counts[r0, c0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / count + offset
+
+## ================================================================================================================
+def multiScaleTPI(demArray, sizes):
+    # [(size, TPI array)] for every window size, float32 with NaN where the DEM is NoData.
+
+    z = np.asarray(demArray, dtype=np.float64)
+    sums, counts, offset = integralImages(z)
+    results = []
+    for size in sizes:
+        results.append((size, (z - windowMean(sums, counts, offset, size)).astype(np.float32)))
+    return results
+
+## ================================================================================================================
+def tpiRasters(inDEM, sizes, outRaster=None, outRasters=None):
+    # Writes the TPI of inDEM at every window size, either as one multiband raster (band order follows
+    # sizes) or as one raster per size (outRasters, a list parallel to sizes).  Returns the paths written.
+
+    demArray, info = rasterArrays.rasterToArray(inDEM)
+    results = multiScaleTPI(demArray, sizes)
+    del demArray
+
+    if outRasters is not None:
+        for (size, tpi), out in zip(results, outRasters):
+            rasterArrays.arrayToRaster(tpi, info, out)
+        return list(outRasters)
+
+    rasterArrays.arrayToRaster(np.array([tpi for size, tpi in results]), info, outRaster)
+    return [outRaster]
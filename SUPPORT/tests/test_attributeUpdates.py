@@ -0,0 +1,62 @@
+## test_attributeUpdates.py
+##
+## Created by USDA NRCS, 2026
+##
+## Runs the keyed attribute write-back (attributeUpdates) against its in-memory and sqlite3 stand-ins for a
+## feature class, so the single cursor pass, the rows it updates and the keys it misses can be checked
+## without arcpy.
+##
+##     python -m unittest discover SUPPORT/tests
+
+import os, sys, sqlite3, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import attributeUpdates
+
+## ================================================================================================================
+class AttributeUpdatesTest(unittest.TestCase):
+
+    def setUp(self):
+        # Two rows share subbasin 2, as a multipart subbasin split into several polygons would
+        self.records = [{"Subbasin": 1, "Acres": None, "Avg_Slope": None},
+                        {"Subbasin": 2, "Acres": None, "Avg_Slope": None},
+                        {"Subbasin": 2, "Acres": None, "Avg_Slope": None},
+                        {"Subbasin": 3, "Acres": 7.5, "Avg_Slope": 1.0}]
+        self.updates = {1: {"Acres": 10.0, "Avg_Slope": 2.5},
+                        2: {"Acres": 20.0},
+                        9: {"Acres": 90.0}}
+
+    def testMemoryCursor(self):
+        rowsUpdated, missedKeys = attributeUpdates.updateAttributes(self.records, "Subbasin", self.updates,
+                                                                    attributeUpdates.MemoryUpdateCursor)
+        self.assertEqual(rowsUpdated, 3)
+        self.assertEqual(missedKeys, [9])
+        self.assertEqual(self.records[0], {"Subbasin": 1, "Acres": 10.0, "Avg_Slope": 2.5})
+        self.assertEqual(self.records[1], {"Subbasin": 2, "Acres": 20.0, "Avg_Slope": None})
+        self.assertEqual(self.records[2], {"Subbasin": 2, "Acres": 20.0, "Avg_Slope": None})
+        self.assertEqual(self.records[3], {"Subbasin": 3, "Acres": 7.5, "Avg_Slope": 1.0})
+
+    def testSqliteCursor(self):
+        connection = sqlite3.connect(":memory:")
+        try:
+            connection.execute('CREATE TABLE "Watershed" ("Subbasin" INTEGER, "Acres" REAL, "Avg_Slope" REAL)')
+            connection.executemany('INSERT INTO "Watershed" VALUES (?, ?, ?)',
+                                   [(record["Subbasin"], record["Acres"], record["Avg_Slope"]) for record in self.records])
+
+            rowsUpdated, missedKeys = attributeUpdates.updateAttributes((connection, "Watershed"), "Subbasin", self.updates,
+                                                                        attributeUpdates.SqliteUpdateCursor)
+            self.assertEqual(rowsUpdated, 3)
+            self.assertEqual(missedKeys, [9])
+            rows = connection.execute('SELECT "Subbasin", "Acres", "Avg_Slope" FROM "Watershed" ORDER BY rowid').fetchall()
+            self.assertEqual(rows, [(1, 10.0, 2.5), (2, 20.0, None), (2, 20.0, None), (3, 7.5, 1.0)])
+        finally:
+            connection.close()
+
+    def testNothingToWrite(self):
+        rowsUpdated, missedKeys = attributeUpdates.updateAttributes(self.records, "Subbasin", {4: {}},
+                                                                    attributeUpdates.MemoryUpdateCursor)
+        self.assertEqual(rowsUpdated, 0)
+        self.assertEqual(missedKeys, [4])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+## test_imageServiceTiles.py
+##
+## Created by USDA NRCS, 2026
+##
+## Runs the tiled image service fetcher (imageServiceTiles) against a local HTTP stand-in for an ArcGIS
+## ImageServer.  The stand-in answers exportImage with a synthetic elevation tile for the requested bbox
+## and can be told to fail, drop connections half way or answer with a JSON error, so retries, resumed
+## downloads, the TIFF check and the cache can be exercised without the network or arcpy.
+##
+##     python -m unittest discover SUPPORT/tests
+
+import os, sys, json, time, shutil, struct, tempfile, threading, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import imageServiceTiles
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from urlparse import urlparse, parse_qs
+
+## ================================================================================================================
+def syntheticTile(bbox, pixels=8):
+    # Little endian TIFF header followed by float32 elevations that depend on the bbox, so every tile has
+    # its own content.
+
+    xmin, ymin = [float(value) for value in bbox.split(",")[:2]]
+    values = [xmin + ymin + i * 0.5 for i in range(pixels * pixels)]
+    return b"II*\x00" + struct.pack("<%df" % len(values), *values)
+
+## ================================================================================================================
+class StandInHandler(BaseHTTPRequestHandler):
+    # exportImage of a fake ImageServer.  The server's settings decide how each request is answered.
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        query = parse_qs(urlparse(self.path).query)
+        bbox = query["bbox"][0]
+        body = syntheticTile(bbox)
+
+        with server.lock:
+            server.requests.append((bbox, self.headers.get("Range")))
+            attempt = server.attempts.get(bbox, 0)
+            server.attempts[bbox] = attempt + 1
+
+        if attempt < server.failures:
+            self.send_error(503)
+            return
+
+        if server.jsonError:
+            error = json.dumps({"error": {"code": 400, "message": "Unable to complete operation."}}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(error)))
+            self.end_headers()
+            self.wfile.write(error)
+            return
+
+        rangeHeader = self.headers.get("Range")
+        if rangeHeader and server.ranges:
+            start = int(rangeHeader.split("=")[1].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Type", "image/tiff")
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (start, len(body) - 1, len(body)))
+            self.send_header("Content-Length", str(len(body) - start))
+            self.end_headers()
+            self.wfile.write(body[start:])
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/tiff")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if attempt < server.failures + server.truncations:
+            # Promise the whole tile but send only half of it
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+## ================================================================================================================
+class ImageServiceTilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.attempts = {}
+        self.server.failures = 0
+        self.server.truncations = 0
+        self.server.ranges = True
+        self.server.jsonError = False
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.serviceUrl = "http://127.0.0.1:%d/arcgis/rest/services/Elevation/ImageServer" % self.server.server_address[1]
+        self.folder = tempfile.mkdtemp()
+        self.tiles = imageServiceTiles.tileGrid((0.0, 0.0, 20.0, 10.0), 1.0, 8)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.folder)
+
+    def fetch(self, cache=None, **kwargs):
+        cache = cache or imageServiceTiles.TileCache(self.folder)
+        return imageServiceTiles.fetchTiles(self.serviceUrl, self.tiles, cache, 8, workers=3, backoff=0, timeout=10, **kwargs)
+
+    def tileBytes(self, path):
+        f = open(path, "rb")
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def testDownloadsEveryTileOnceThenReadsTheCache(self):
+        paths = self.fetch()
+        self.assertEqual(len(paths), len(self.tiles))
+        for tile, path in zip(self.tiles, paths):
+            self.assertEqual(self.tileBytes(path), syntheticTile(",".join(repr(float(v)) for v in tile)))
+        self.assertEqual(len(self.server.requests), len(self.tiles))
+
+        progress = []
+        again = self.fetch(progress=lambda done, total, fromCache: progress.append(fromCache))
+        self.assertEqual(again, paths)
+        self.assertEqual(len(self.server.requests), len(self.tiles))
+        self.assertEqual(progress, [True] * len(self.tiles))
+
+    def testRetriesFailedRequests(self):
+        self.server.failures = 2
+        paths = self.fetch()
+        self.assertEqual(len(paths), len(self.tiles))
+        self.assertEqual(len(self.server.requests), 3 * len(self.tiles))
+
+    def testGivesUpAfterRetries(self):
+        self.server.failures = 3
+        cache = imageServiceTiles.TileCache(self.folder)
+        self.assertRaises(IOError, imageServiceTiles.fetchTiles, self.serviceUrl, self.tiles, cache, 8,
+                          workers=1, retries=1, backoff=0, timeout=10)
+
+    def testResumesTruncatedDownloads(self):
+        self.server.truncations = 1
+        paths = self.fetch()
+        for tile, path in zip(self.tiles, paths):
+            self.assertEqual(self.tileBytes(path), syntheticTile(",".join(repr(float(v)) for v in tile)))
+        resumed = [rangeHeader for bbox, rangeHeader in self.server.requests if rangeHeader]
+        self.assertEqual(len(resumed), len(self.tiles))
+
+    def testRestartsWhenRangeIsIgnored(self):
+        self.server.truncations = 1
+        self.server.ranges = False
+        paths = self.fetch()
+        for tile, path in zip(self.tiles, paths):
+            self.assertEqual(self.tileBytes(path), syntheticTile(",".join(repr(float(v)) for v in tile)))
+
+    def testJsonErrorIsNotCached(self):
+        self.server.jsonError = True
+        cache = imageServiceTiles.TileCache(self.folder)
+        self.assertRaises(IOError, self.fetch, cache)
+        self.assertEqual(cache.entries(), [])
+        partFolder = os.path.dirname(cache.partPath("x"))
+        self.assertEqual(os.listdir(partFolder), [])
+
+    def testCacheHitsAreSavedOnFlush(self):
+        cache = imageServiceTiles.TileCache(self.folder)
+        self.fetch(cache)
+        key = cache.entries()[-1][0]
+        used = cache.index[key]["used"]
+
+        time.sleep(0.01)
+        cache.get(key)
+        saved = imageServiceTiles.TileCache(self.folder).index[key]["used"]
+        self.assertEqual(saved, used)
+
+        cache.flush()
+        saved = imageServiceTiles.TileCache(self.folder).index[key]["used"]
+        self.assertTrue(saved > used)
+
+    def testNewEntriesAreSavedOnFlush(self):
+        cache = imageServiceTiles.TileCache(self.folder)
+        partPath = cache.partPath("tile")
+        os.makedirs(os.path.dirname(partPath))
+        f = open(partPath, "wb")
+        try:
+            f.write(syntheticTile("0,0"))
+        finally:
+            f.close()
+
+        path = cache.put("tile", partPath)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(imageServiceTiles.TileCache(self.folder).entries(), [])
+
+        cache.flush()
+        self.assertEqual([entry[0] for entry in imageServiceTiles.TileCache(self.folder).entries()], ["tile"])
+
+    def testEvictsLeastRecentlyUsedTiles(self):
+        tileSize = len(syntheticTile("0,0"))
+        cache = imageServiceTiles.TileCache(self.folder, 2 * tileSize)
+        tiles = self.tiles
+        paths = []
+        for tile in tiles[:3]:
+            self.tiles = [tile]
+            paths.append(self.fetch(cache)[0])
+        self.assertTrue(cache.size() <= 2 * tileSize)
+        self.assertFalse(os.path.exists(paths[0]))
+        self.assertTrue(os.path.exists(paths[1]) and os.path.exists(paths[2]))
+
+if __name__ == '__main__':
+    unittest.main()
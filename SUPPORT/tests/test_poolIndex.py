@@ -0,0 +1,57 @@
+## test_poolIndex.py
+##
+## Created by USDA NRCS, 2026
+##
+## Checks the design elevation solve of the subbasin pool index (poolIndex) on small DEM arrays whose
+## pools can be worked out by hand, for the whole subbasin and for a pool connected to an intake, and the
+## sampled check of a saved window against its DEM.  Nothing here requires arcpy.
+##
+##     python -m unittest discover SUPPORT/tests
+
+import os, sys, unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import poolIndex, rasterArrays
+
+## ================================================================================================================
+class PoolIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        # One row of unit cells: a low spot at column 0, a ridge at column 2 and a second low spot beyond it
+        dem = np.array([[0.0, 1.0, 5.0, 0.0, 0.0]], dtype=np.float32)
+        self.index = poolIndex.buildPoolIndex(dem, rasterArrays.defaultRasterInfo(1, 5))
+
+    def testWholeSubbasin(self):
+        # Columns 0, 3 and 4 fill together: 3e = 1.5
+        self.assertAlmostEqual(poolIndex.designElevation(self.index, 1.5), 0.5)
+        self.assertIsNone(poolIndex.designElevation(self.index, 100.0))
+
+    def testConnectedToIntake(self):
+        # Only columns 0 and 1 until the ridge is topped: 2e - 1 = 1.5
+        self.assertAlmostEqual(poolIndex.designElevation(self.index, 1.5, 0, 0), 1.25)
+        self.assertAlmostEqual(poolIndex.designElevation(self.index, 9.0, 0, 0), 5.0)
+
+        # Topping the ridge at 5 adds the low spot beyond it at once, so 12 is first held at 5
+        elevation = poolIndex.designElevation(self.index, 12.0, 0, 0)
+        self.assertAlmostEqual(elevation, 5.0)
+        self.assertTrue(poolIndex.poolVolume(self.index, elevation, 0, 0)[2] >= 12.0)
+
+    def testIntakeOnTheRidge(self):
+        # Below the ridge the pool grows from the lowest cell near the intake (column 0)
+        self.assertAlmostEqual(poolIndex.designElevation(self.index, 0.5, 0, 2), 0.5)
+        self.assertAlmostEqual(poolIndex.designElevation(self.index, 12.0, 0, 2), 5.0)
+
+    def testSampledRowsMatchTheDEM(self):
+        dem = np.arange(40 * 30, dtype=np.float32).reshape(40, 30)
+        info = rasterArrays.defaultRasterInfo(40, 30)
+        window = dem.copy()
+        window[:3, :3] = np.nan
+        index = poolIndex.buildPoolIndex(window, info)
+
+        self.assertTrue(poolIndex.windowMatches(index, dem, info))
+        dem[-1, 10] += 0.5
+        self.assertFalse(poolIndex.windowMatches(index, dem, info))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -71,6 +71,7 @@ def splitThousands(someNumber):
 ## ================================================================================================================
 # Import system modules
 import arcpy, sys, os, traceback, string, re
+import rasterArrays, surfaceSlope, attributeUpdates
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -128,7 +129,7 @@ try:
     DEMsmooth = watershedGDB_path + os.sep + "DEMsmooth"
 
     # --------------------------------------------------------------------- Temporary Datasets
-    wtshdDEMsmooth = watershedGDB_path + os.sep + "wtshdDEMsmooth"
+    wtshdGrid = watershedGDB_path + os.sep + "wtshdGrid"
     slopeGrid = watershedGDB_path + os.sep + "slopeGrid"
     slopeStats = watershedGDB_path + os.sep + "slopeStats"
 
@@ -240,54 +241,26 @@ try:
     if Zfactor > 0:
         AddMsgAndPrint("\nCalculating average slope...",0)
         
-        if arcpy.Exists(DEMsmooth):
+        if arcpy.Exists(DEM_aoi) or arcpy.Exists(DEMsmooth):
             
-            # Use smoothed DEM to calculate slope to remove extraneous values
+            # Use smoothed DEM to calculate slope to remove extraneous values.  Smoothing, the watershed mask,
+            # slope and the per subbasin statistics are computed in one pass over the DEM.
             if len(arcpy.ListFields(watershed, "Avg_Slope")) < 1:
                 arcpy.AddField_management(watershed, "Avg_Slope", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
 
-            #gp.ExtractByMask_sa(DEMsmooth, watershed, wtshdDEMsmooth)
-            tempWtshDEM = arcpy.sa.ExtractByMask(DEMsmooth, watershed)
-            tempWtshDEM.save(wtshdDEMsmooth)
-            
-            #gp.Slope_sa(wtshdDEMsmooth, slopeGrid, "PERCENT_RISE", Zfactor)
-            tempSlope = arcpy.sa.Slope(wtshdDEMsmooth, "PERCENT_RISE", Zfactor)
-            tempSlope.save(slopeGrid)
-            
-            #gp.ZonalStatisticsAsTable_sa(watershed, "Subbasin", slopeGrid, slopeStats, "DATA")
-            arcpy.sa.ZonalStatisticsAsTable(watershed, "Subbasin", slopeGrid, slopeStats, "DATA")
-            calcAvgSlope = True
-
-            # Delete unwanted rasters
-            arcpy.Delete_management(DEMsmooth)
-            arcpy.Delete_management(wtshdDEMsmooth)
-            arcpy.Delete_management(slopeGrid)
-
-        elif arcpy.Exists(DEM_aoi):
-           
-            # Run Focal Statistics on the DEM_aoi to remove exteraneous values
-            #gp.focalstatistics_sa(DEM_aoi, DEMsmooth,"RECTANGLE 3 3 CELL","MEAN","DATA")
-            tempFocal = arcpy.sa.FocalStatistics(DEM_aoi, "RECTANGLE 3 3 CELL","MEAN","DATA")
-            tempFocal.save(DEMsmooth)
-
-            arcpy.AddField_management(watershed, "Avg_Slope", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-
-            #gp.ExtractByMask_sa(DEMsmooth, watershed, wtshdDEMsmooth)
-            tempWtshDEM = arcpy.sa.ExtractByMask(DEMsmooth, watershed)
-            tempWtshDEM.save(wtshdDEMsmooth)
-            
-            #gp.Slope_sa(wtshdDEMsmooth, slopeGrid, "PERCENT_RISE", Zfactor)
-            tempSlope = arcpy.sa.Slope(wtshdDEMsmooth, "PERCENT_RISE", Zfactor)
-            tempSlope.save(slopeGrid)
-            
-            #gp.ZonalStatisticsAsTable_sa(watershed, "Subbasin", slopeGrid, slopeStats, "DATA")
-            arcpy.sa.ZonalStatisticsAsTable(watershed, "Subbasin", slopeGrid, slopeStats, "DATA")
+            if arcpy.Exists(DEM_aoi):
+                rasterArrays.polygonsToRaster(watershed, "Subbasin", DEM_aoi, wtshdGrid)
+                subbasinSlopes = surfaceSlope.zonalSlopeStatistics(DEM_aoi, wtshdGrid, Zfactor, "PERCENT_RISE")
+            else:
+                # DEMsmooth is already smoothed
+                rasterArrays.polygonsToRaster(watershed, "Subbasin", DEMsmooth, wtshdGrid)
+                subbasinSlopes = surfaceSlope.zonalSlopeStatistics(DEMsmooth, wtshdGrid, Zfactor, "PERCENT_RISE", False)
             calcAvgSlope = True
 
             # Delete unwanted rasters
-            arcpy.Delete_management(DEMsmooth)
-            arcpy.Delete_management(wtshdDEMsmooth)
-            arcpy.Delete_management(slopeGrid)   
+            if arcpy.Exists(DEMsmooth):
+                arcpy.Delete_management(DEMsmooth)
+            arcpy.Delete_management(wtshdGrid)
 
         else:
             AddMsgAndPrint("\nMissing DEMsmooth and DEM_aoi from FGDB. Could not Calculate Average Slope",1)
@@ -297,63 +270,38 @@ try:
     # -------------------------------------------------------------------------------------- Update Watershed FC with Average Slope
     if calcAvgSlope:
         
-        # go through each zonal Stat record and pull out the Mean value
-        rows = arcpy.SearchCursor(slopeStats)
-        row = rows.next()
+        # go through each subbasin's zonal statistics and pull out the Mean value
 
         AddMsgAndPrint("\nSuccessfully re-calculated average slope",0)
 
         AddMsgAndPrint("\n===================================================",0)
         AddMsgAndPrint("\tUser Watershed: " + str(wsName),0)
         
-        while row:
-            wtshdID = row.OBJECTID
-
-            # zonal stats doesnt generate "Value" with the 9.3 geoprocessor
-            if len(arcpy.ListFields(slopeStats,"Value")) > 0:
-                zonalValue = row.VALUE
-                
-            else:
-                zonalValue = row.SUBBASIN
+        # Pass the Mean values from the zonal statistics to the watershed FC in one pass
+        slopeUpdates = dict((zonalValue, {"Avg_Slope": subbasinSlopes[zonalValue]["MEAN"]}) for zonalValue in subbasinSlopes)
+        attributeUpdates.updateAttributes(watershed, "Subbasin", slopeUpdates)
+
+        wtshdRows = sorted(arcpy.da.SearchCursor(watershed, ["Subbasin","OID@","Acres","SHAPE@AREA"]))
+        for zonalValue, wtshdID, wtshdAcres, wtshdArea in wtshdRows:
+            if zonalValue not in subbasinSlopes:
+                continue
+            zonalMeanValue = subbasinSlopes[zonalValue]["MEAN"]
+
+            # Inform the user of Watershed Acres, area and avg. slope
+            if displayAreaInfo:
                 
-            zonalMeanValue = row.MEAN
-
-            whereclause = "Subbasin = " + str(zonalValue)
-            wtshdRows = arcpy.UpdateCursor(watershed,whereclause)
-            wtshdRow = wtshdRows.next()           
+                # Inform the user of Watershed Acres, area and avg. slope
+                AddMsgAndPrint("\n\tSubbasin: " + str(wtshdID),0)
+                AddMsgAndPrint("\t\tAcres: " + str(splitThousands(round(wtshdAcres,2))),0)
+                AddMsgAndPrint("\t\tArea: " + str(splitThousands(round(wtshdArea,2))) + " Sq. " + units,0)
+                AddMsgAndPrint("\t\tAvg. Slope: " + str(round(zonalMeanValue,2)),0)
 
-            # Pass the Mean value from the zonalStat table to the watershed FC.
-            while wtshdRow:
-                wtshdRow.Avg_Slope = zonalMeanValue
-                wtshdRows.updateRow(wtshdRow)
+            else:
+                AddMsgAndPrint("\tSubbasin " + str(wtshdID) + " Avg. Slope: " + str(zonalMeanValue) + "%",0)
 
-                # Inform the user of Watershed Acres, area and avg. slope
-                if displayAreaInfo:
-                    
-                    # Inform the user of Watershed Acres, area and avg. slope
-                    AddMsgAndPrint("\n\tSubbasin: " + str(wtshdRow.OBJECTID),0)
-                    AddMsgAndPrint("\t\tAcres: " + str(splitThousands(round(wtshdRow.Acres,2))),0)
-                    AddMsgAndPrint("\t\tArea: " + str(splitThousands(round(wtshdRow.Shape_Area,2))) + " Sq. " + units,0)
-                    AddMsgAndPrint("\t\tAvg. Slope: " + str(round(zonalMeanValue,2)),0)
-
-                else:
-                    AddMsgAndPrint("\tSubbasin " + str(wtshdRow.OBJECTID) + " Avg. Slope: " + str(zonalMeanValue) + "%",0)
-                                   
-                break
-
-            row = rows.next()        
-
-            del wtshdID
-            del zonalValue
-            del zonalMeanValue
-            del whereclause
-            del wtshdRows
-            del wtshdRow
+        del slopeUpdates, wtshdRows
 
-        del rows
-        del row
         AddMsgAndPrint("\n===================================================",0)
-        arcpy.Delete_management(slopeStats)
 
     ## ????????
     import time
@@ -61,6 +61,7 @@ def logBasicSettings():
 ## ================================================================================================================    
 # Import system modules
 import arcpy, sys, os, string, traceback
+import zonalStats
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -132,7 +133,7 @@ try:
     station_lyr = "stations"
     stationLyr = "stationLyr"
     stationBuffer = watershedFD_path + os.sep + "stationsBuffer"
-    stationElev = watershedGDB_path + os.sep + "stationElev"
+    stationGrid = watershedGDB_path + os.sep + "stationGrid"
     outlets = watershedFD_path + os.sep + "tileOutlets"
     
     # -------------------------------------------------------------- Create Temp Point(s)
@@ -318,16 +319,18 @@ try:
         bufferSize = str(cellSize) + " Unknown"
            
     arcpy.Buffer_analysis(stationTemp, stationBuffer, bufferSize, "FULL", "ROUND", "NONE", "")
-    arcpy.sa.ZonalStatisticsAsTable(stationBuffer, "STATIONID", DEM_aoi, stationElev, "NODATA", "ALL")
-    arcpy.AddJoin_management(stationLyr, "StationID", stationElev, "StationID", "KEEP_ALL")
-    expression = "round(!stationElev.MEAN!,1)"
-    arcpy.CalculateField_management(stationLyr, "stations.POINT_Z", expression, "PYTHON")
-    arcpy.RemoveJoin_management(stationLyr, "stationElev")
+    stationElevations = zonalStats.zonalStatisticsByFeatures(stationBuffer, "STATIONID", DEM_aoi, stationGrid, False)
+    stationRows = arcpy.da.UpdateCursor(stationTemp, ["STATIONID","POINT_Z"])
+    for stationRow in stationRows:
+        if stationRow[0] in stationElevations:
+            stationRow[1] = round(stationElevations[stationRow[0]]["MEAN"],1)
+        else:
+            stationRow[1] = None
+        stationRows.updateRow(stationRow)
+    del stationRows, stationElevations
     arcpy.DeleteField_management(stationTemp, "STATIONID; POINT_M")
-    del expression
 
     AddMsgAndPrint("\n\tSuccessfully added elevation values",0)    
-    arcpy.Delete_management(stationElev)
     arcpy.Delete_management(stationBuffer)
 
     # --------------------------------------------------------------------------- Copy Station Output to FD
@@ -135,6 +135,7 @@ def splitThousands(someNumber):
 ## ================================================================================================================
 # Import system modules
 import sys, os, arcpy, string, traceback, re
+import focalStats
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -445,8 +446,7 @@ try:
     AddMsgAndPrint("\nCreating " + str(interval) + "-foot contours...",0)
  
     # Run Focal Statistics on the Project DEM to generate smooth contours
-    tempFocal = arcpy.sa.FocalStatistics(projectDEM, "RECTANGLE 3 3 CELL","MEAN","DATA")
-    tempFocal.save(DEMsmooth)
+    focalStats.focalRaster(projectDEM, DEMsmooth, "RECTANGLE 3 3 CELL", "MEAN")
 
     # Create Contours from DEMsmooth if user-defined interval is greater than 0
     if interval > 0:
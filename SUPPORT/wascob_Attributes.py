@@ -78,7 +78,8 @@ def splitThousands(someNumber):
 
 ## ================================================================================================================
 # Import system modules
-import arcpy, sys, os, string, traceback, re, math
+import arcpy, sys, os, string, traceback, re
+import rasterArrays, stageStorage, surfaceSlope, zonalStats, attributeUpdates
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -106,13 +107,6 @@ try:
         arcpy.AddError("Spatial Analyst Extension not enabled. Please enable Spatial analyst from the Tools/Extensions menu. Exiting...\n")
         sys.exit()
 
-    # Check out 3D Analyst License        
-    if arcpy.CheckExtension("3D") == "Available":
-        arcpy.CheckOutExtension("3D")
-    else:
-        arcpy.AddError("3D Analyst Extension not enabled. Please enable 3D Analyst from the Tools/Extensions menu. Exiting...\n")
-        sys.exit()
-
     # Script Parameters
     inWatershed = arcpy.GetParameterAsText(0)
     inSoils = arcpy.GetParameterAsText(1)  
@@ -160,11 +154,11 @@ try:
     # -------------------------------------------------------------------------- Temporary Datasets
     cluClip = watershedFD + os.sep + "cluClip"
     watershedDissolve = watershedGDB_path + os.sep + "watershedDissolve"
-    wtshdDEMsmooth = watershedGDB_path + os.sep + "wtshdDEMsmooth"
+    wtshdGrid = watershedGDB_path + os.sep + "wtshdGrid"
     slopeGrid = watershedGDB_path + os.sep + "slopeGrid"
     slopeStats = watershedGDB_path + os.sep + "slopeStats"
     outletBuffer = watershedGDB_path + os.sep + "Layers" + os.sep + "outletBuffer"
-    outletStats = watershedGDB_path + os.sep + "outletStats"
+    outletGrid = watershedGDB_path + os.sep + "outletGrid"
     subMask = watershedFD + os.sep + "subbasin_mask"
     subGrid = watershedGDB_path + os.sep + "subElev"   
     #storageTemp = tables + os.sep + "storageTemp"
@@ -284,7 +278,7 @@ try:
     del x, layersToRemove
 
     # -------------------------------------------------------------------------- Delete Previous Data if present
-    datasetsToRemove = (wsSoils,landuse,cluClip,wtshdDEMsmooth,slopeGrid,slopeStats,watershedDissolve,cluClip,storageTemp,subMask,subGrid,outletStats,outletBuffer)
+    datasetsToRemove = (wsSoils,landuse,cluClip,wtshdGrid,slopeGrid,slopeStats,watershedDissolve,cluClip,storageTemp,subMask,subGrid,outletGrid,outletBuffer)
 
     x = 0
     for dataset in datasetsToRemove:
@@ -412,87 +406,52 @@ try:
     calcAvgSlope = False
     AddMsgAndPrint("\nUpdating average slope",0)
 
-    # Always re-create DEMsmooth in case people jumped from Watershed workflow to WASCOB workflow somehow and base on ProjectDEM in this WASCOB toolset
-    arcpy.Delete_management(DEMsmooth)
+    # Always smooth the ProjectDEM in case people jumped from Watershed workflow to WASCOB workflow somehow and base on ProjectDEM in this WASCOB toolset
+    if arcpy.Exists(DEMsmooth):
+        arcpy.Delete_management(DEMsmooth)
 
-    # Run Focal Statistics on the ProjectDEM for the purpose of generating smoothed results.
-    tempFocal = arcpy.sa.FocalStatistics(ProjectDEM, "RECTANGLE 3 3 CELL","MEAN","DATA")
-    tempFocal.save(DEMsmooth)
-    
-    # Extract area for slope from DEMSmooth and compute statistics for it
-    tempExtract = arcpy.sa.ExtractByMask(DEMsmooth, inWatershed)
-    tempExtract.save(wtshdDEMsmooth)
-        
-    tempSlope = arcpy.sa.Slope(wtshdDEMsmooth, "PERCENT_RISE", Zfactor)
-    tempSlope.save(slopeGrid)
-        
-    arcpy.sa.ZonalStatisticsAsTable(inWatershed, "Subbasin", slopeGrid, slopeStats, "DATA")
+    # Smooth the ProjectDEM, limit it to the watershed, compute slope and summarize it by subbasin in one pass
+    rasterArrays.polygonsToRaster(inWatershed, "Subbasin", ProjectDEM, wtshdGrid)
+    subbasinSlopes = surfaceSlope.zonalSlopeStatistics(ProjectDEM, wtshdGrid, Zfactor, "PERCENT_RISE")
     calcAvgSlope = True
 
     # Delete unwanted rasters
-    arcpy.Delete_management(DEMsmooth)
-    arcpy.Delete_management(wtshdDEMsmooth)
-    arcpy.Delete_management(slopeGrid)   
+    arcpy.Delete_management(wtshdGrid)
 
     # -------------------------------------------------------------------------------------- Update inWatershed FC with Average Slope
     if calcAvgSlope:
         
-        # go through each zonal Stat record and pull out the Mean value
-        rows = arcpy.SearchCursor(slopeStats)
-        row = rows.next()
+        # go through each subbasin's zonal statistics and pull out the Mean value
 
         AddMsgAndPrint("\n\tSuccessfully re-calculated average slope",0)
 
-        while row:
-            wtshdID = row.OBJECTID
-            
-            # zonal stats doesnt generate "Value" with the 9.3 geoprocessor in 10
-            if len(arcpy.ListFields(slopeStats,"Value")) > 0:
-                zonalValue = row.VALUE
+        # Pass the Mean values from the zonal statistics to the watershed FC in one pass
+        slopeUpdates = dict((zonalValue, {"Avg_Slope": subbasinSlopes[zonalValue]["MEAN"]}) for zonalValue in subbasinSlopes)
+        attributeUpdates.updateAttributes(inWatershed, "Subbasin", slopeUpdates)
+
+        wtshdRows = sorted(arcpy.da.SearchCursor(inWatershed, ["Subbasin","OID@","Acres","SHAPE@AREA"]))
+        for zonalValue, wtshdID, wtshdAcres, wtshdArea in wtshdRows:
+            if zonalValue not in subbasinSlopes:
+                continue
+            zonalMeanValue = subbasinSlopes[zonalValue]["MEAN"]
+
+            # Inform the user of Watershed Acres, area and avg. slope
+            if displayAreaInfo:
+                
+                # Inform the user of Watershed Acres, area and avg. slope                    
+                AddMsgAndPrint("\n\tSubbasin ID: " + str(wtshdID),0)
+                AddMsgAndPrint("\t\tAcres: " + str(splitThousands(round(wtshdAcres,2))),0)
+                AddMsgAndPrint("\t\tArea: " + str(splitThousands(round(wtshdArea,2))) + " Sq. " + units,0)
+                AddMsgAndPrint("\t\tAvg. Slope: " + str(round(zonalMeanValue,2)),0)
+                if wtshdAcres > 40:
+                    AddMsgAndPrint("\t\tSubbasin " + str(wtshdID) + " is greater than the 40 acre 638 standard.",1)
+                    AddMsgAndPrint("\t\tConsider re-delineating to split basins or move upstream.",1)
+
             else:
-                zonalValue = row.SUBBASIN
-   
-            zonalMeanValue = row.MEAN
-
-            whereclause = "Subbasin = " + str(zonalValue)
-            wtshdRows = arcpy.UpdateCursor(inWatershed,whereclause)
-            wtshdRow = wtshdRows.next()           
-
-            # Pass the Mean value from the zonalStat table to the watershed FC.
-            while wtshdRow:
-                wtshdRow.Avg_Slope = zonalMeanValue
-                wtshdRows.updateRow(wtshdRow)
-
-                # Inform the user of Watershed Acres, area and avg. slope
-                if displayAreaInfo:
-                    
-                    # Inform the user of Watershed Acres, area and avg. slope                    
-                    AddMsgAndPrint("\n\tSubbasin ID: " + str(wtshdRow.OBJECTID),0)
-                    AddMsgAndPrint("\t\tAcres: " + str(splitThousands(round(wtshdRow.Acres,2))),0)
-                    AddMsgAndPrint("\t\tArea: " + str(splitThousands(round(wtshdRow.Shape_Area,2))) + " Sq. " + units,0)
-                    AddMsgAndPrint("\t\tAvg. Slope: " + str(round(zonalMeanValue,2)),0)
-                    if wtshdRow.Acres > 40:
-                        AddMsgAndPrint("\t\tSubbasin " + str(wtshdRow.OBJECTID) + " is greater than the 40 acre 638 standard.",1)
-                        AddMsgAndPrint("\t\tConsider re-delineating to split basins or move upstream.",1)
-
-                else:
-                    AddMsgAndPrint("\tWatershed ID: " + str(wtshdRow.OBJECTID) + " is " + str(zonalMeanValue),0)
-                                   
-                break
-
-            row = rows.next()        
-
-            del wtshdID
-            del zonalValue
-            del zonalMeanValue
-            del whereclause
-            del wtshdRows
-            del wtshdRow
-
-        del rows
-        del row
-        
-        arcpy.Delete_management(slopeStats)
+                AddMsgAndPrint("\tWatershed ID: " + str(wtshdID) + " is " + str(zonalMeanValue),0)
+
+        del slopeUpdates, wtshdRows
+
     
     # ------------------------------------------------------------------------ Update reference line / Perform storage calculations                          
     calcSurfaceVol = False
@@ -517,130 +476,69 @@ try:
         del bufferSize, bufferDist
 
         # Get Reference Line Elevation Properties
-        arcpy.sa.ZonalStatisticsAsTable(outletBuffer, "Subbasin", ProjectDEM, outletStats, "DATA")
+        outletElevations = zonalStats.zonalStatisticsByFeatures(outletBuffer, "Subbasin", ProjectDEM, outletGrid)
         
-        rows = arcpy.SearchCursor(outletStats)
-        row = rows.next()
-
-        while row:
-            wtshdID = row.OBJECTID
-
-            # zonal stats doesnt generate "Value" with the 9.3 geoprocessor in 10
-            if len(arcpy.ListFields(outletStats,"Value")) > 0:
-                zonalValue = row.VALUE
-            else:
-                zonalValue = row.SUBBASIN
-
-            zonalMaxValue = row.MAX   
-            zonalMeanValue = row.MEAN
-            zonalMinValue = row.MIN
-
-            whereclause = "Subbasin = " + str(zonalValue)
-            refRows = arcpy.UpdateCursor(ReferenceLine,whereclause)
-            refRow = refRows.next()           
-
-            # Pass the elevation Data to Reference Line FC.
-            while refRow:
-                refRow.MaxElev = zonalMaxValue
-                refRow.MinElev = zonalMinValue
-                refRow.MeanElev = round(zonalMeanValue,1)
-                refRows.updateRow(refRow)
-                
-                break
-
-            row = rows.next()        
-
-            del wtshdID
-            del zonalValue
-            del zonalMeanValue
-            del zonalMaxValue
-            del zonalMinValue
-            del whereclause
-            del refRows
-            del refRow
-
-        del rows
-        del row
+        # Pass the elevation Data to Reference Line FC in one pass
+        outletUpdates = {}
+        for zonalValue in outletElevations:
+            outletUpdates[zonalValue] = {"MaxElev": outletElevations[zonalValue]["MAX"],
+                                         "MinElev": outletElevations[zonalValue]["MIN"],
+                                         "MeanElev": round(outletElevations[zonalValue]["MEAN"],1)}
+        attributeUpdates.updateAttributes(ReferenceLine, "Subbasin", outletUpdates)
+        del outletElevations, outletUpdates
 
         AddMsgAndPrint("\n\tSuccessfully updated Reference Line attributes.",0)
-        arcpy.Delete_management(outletStats)
         arcpy.Delete_management(outletBuffer)
     
         # --------------------------------------------------------------------- Begin Subbasin Stage Storage Calcs
         AddMsgAndPrint("\nBeginning subbasin storage calculations...",0)
         arcpy.CopyRows_management(storageTemplate, storageTable, "")
-        rows = arcpy.UpdateCursor(ReferenceLine)
-        row = rows.next()
-        while row:
-            value = row.Subbasin
-            query = "Subbasin"+" = " +str(value)
-            arcpy.SelectLayerByAttribute_management(inWatershed, "NEW_SELECTION", query)
-            arcpy.CopyFeatures_management(inWatershed, subMask)
-            tempExtract2 = arcpy.sa.ExtractByMask(ProjectDEM, subMask)
-            tempExtract2.save(subGrid)
-            
-            AddMsgAndPrint("\n\tRetrieving Minumum Elevation for subbasin "+ str(value) + "\n",0)
-            maxValue = row.MaxElev
-            MinElev = round(float(arcpy.GetRasterProperties_management(subGrid, "MINIMUM").getOutput(0)),1)
-            totalElev = round(float(maxValue - MinElev),1)
-            roundElev = math.floor(totalElev)
-            remainder = totalElev - roundElev
-            
-            Reference_Plane = "BELOW"
-            plnHgt = MinElev + remainder
-            outputText = tables + os.sep + "subbasin" + str(value) +".txt"
-
-            f = open(outputText, "w")
-            f.write("Dataset, Plane_heig, Reference, Z_Factor, Area_2D, Area_3D, Volume, Subbasin\n")
-            f.close()
-            
-            while plnHgt <= maxValue:
-                Plane_Height = plnHgt
-                AddMsgAndPrint("\tCalculating storage at elevation " + str(round(plnHgt,1)),0)
-                arcpy.SurfaceVolume_3d(subGrid, outputText, Reference_Plane, Plane_Height, 1)
-                plnHgt = 1 + plnHgt
-
-            AddMsgAndPrint("\n\t\t\t\tConverting results...",0)
-            arcpy.CopyRows_management(outputText, storageTemp, "")
-            arcpy.CalculateField_management(storageTemp, "Subbasin", value, "PYTHON")
-
-            arcpy.Append_management(storageTemp, storageTable, "NO_TEST", "", "")
-            arcpy.Delete_management(storageTemp)
-            
-            rows.updateRow(row)
-            row = rows.next()
-            
-        del rows
-        del maxValue
-        del MinElev
-        del totalElev
-        del roundElev
-        del remainder
-        del Reference_Plane
-        del plnHgt
-        del outputText
-        
-        arcpy.SelectLayerByAttribute_management(inWatershed, "CLEAR_SELECTION", "")
 
         arcpy.AddField_management(storageTable, "ELEV_FEET", "DOUBLE", "5", "1", "", "", "NULLABLE", "NON_REQUIRED", "")
         arcpy.AddField_management(storageTable, "POOL_SQFT", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
         arcpy.AddField_management(storageTable, "POOL_ACRES", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
         arcpy.AddField_management(storageTable, "ACRE_FOOT", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
 
-        # Convert area sq feet and volume to cu ft (as necessary)
-        elevFeetCalc = "round(!Plane_heig! *" + str(conversionFactor) + ",1)"
-        pool2dSqftCalc = "round(!Area_2D! /" + str(ftConversion) + ",1)"
-        pool2dAcCalc = "round(!Area_2D! /" + str(acreConversion) + ",1)"
-        #pool3dSqftCalc = "round([Area_3D] /" + str(ftConversion) + ",1)"
-        cuFootCalc = "round(!Volume! /" + str(volConversion) + ",1)"
-                
-        arcpy.CalculateField_management(storageTable, "Subbasin", "'Subbasin' + !Subbasin!", "PYTHON")
-        arcpy.CalculateField_management(storageTable, "ELEV_FEET", elevFeetCalc, "PYTHON")
-        arcpy.CalculateField_management(storageTable, "POOL_SQFT", pool2dSqftCalc, "PYTHON")
-        arcpy.CalculateField_management(storageTable, "POOL_ACRES", pool2dAcCalc, "PYTHON")
-        #gp.CalculateField_management(storageTable, "Area_3D", pool3dSqftCalc, "VB")
-        arcpy.CalculateField_management(storageTable, "ACRE_FOOT", cuFootCalc, "PYTHON")
-        
+        # Rasterize all subbasins on the ProjectDEM grid so every subbasin is read from the DEM in one pass
+        rasterArrays.polygonsToRaster(inWatershed, "Subbasin", ProjectDEM, subGrid)
+
+        demArray, demInfo = rasterArrays.rasterToArray(ProjectDEM)
+        zoneArray = rasterArrays.rasterToArray(subGrid, demInfo, 0)[0]
+        zoneIndex = stageStorage.buildZoneElevationIndex(demArray, zoneArray, demInfo["cellWidth"], demInfo["cellHeight"])
+        del demArray, zoneArray
+
+        # 1 foot stages from each subbasin's minimum elevation up to its reference line maximum
+        stagesBySubbasin = {}
+        for value, maxValue in arcpy.da.SearchCursor(ReferenceLine, ["Subbasin","MaxElev"]):
+            AddMsgAndPrint("\n\tRetrieving Minumum Elevation for subbasin "+ str(value) + "\n",0)
+            elevRange = stageStorage.zoneRange(zoneIndex, value)
+            if elevRange is None:
+                AddMsgAndPrint("\tSubbasin " + str(value) + " does not overlay " + os.path.basename(ProjectDEM) + ". No storage will be calculated.",1)
+                continue
+
+            MinElev = round(float(elevRange[0]),1)
+            stagesBySubbasin[value] = stageStorage.footStages(MinElev, maxValue)
+            for plnHgt in stagesBySubbasin[value]:
+                AddMsgAndPrint("\tCalculating storage at elevation " + str(round(plnHgt,1)),0)
+
+        # {subbasin: StageStorageTable}, written to the storage table once below
+        storageBySubbasin = stageStorage.zonalStageStorage(zoneIndex, stagesBySubbasin)
+
+        AddMsgAndPrint("\n\t\t\t\tConverting results...",0)
+
+        # Convert area sq feet and volume to cu ft (as necessary) and write every subbasin's rows at once
+        storageFields = ["Dataset","Plane_heig","Reference","Z_Factor","Area_2D","Area_3D","Volume","Subbasin","ELEV_FEET","POOL_SQFT","POOL_ACRES","ACRE_FOOT"]
+        storageRows = arcpy.da.InsertCursor(storageTable, storageFields)
+
+        for value in sorted(storageBySubbasin):
+            for plane, area2D, area3D, volume in storageBySubbasin[value]:
+                storageRows.insertRow((subGrid, plane, "BELOW", 1, area2D, area3D, volume, "Subbasin" + str(value),
+                                       round(plane * conversionFactor,1),
+                                       round(area2D / ftConversion,1),
+                                       round(area2D / acreConversion,1),
+                                       round(volume / volConversion,1)))
+        del storageRows, storageFields, zoneIndex, stagesBySubbasin, storageBySubbasin
+
         AddMsgAndPrint("\n\tSurface volume and area calculations completed",0)
 
         arcpy.Delete_management(subMask)
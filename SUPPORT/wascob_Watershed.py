@@ -107,6 +107,7 @@ def splitThousands(someNumber):
 ## ================================================================================================================
 # Import system modules
 import sys, os, string, traceback, re
+import rasterArrays, surfaceSlope, zonalStats, attributeUpdates
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -178,11 +179,11 @@ try:
     watershedGrid = watershedGDB_path + os.sep + "watershedGrid"
     watershedTemp = watershedGDB_path + os.sep + "watershedTemp"
     watershedDissolve = watershedGDB_path + os.sep + "watershedDissolve"
-    wtshdDEMsmooth = watershedGDB_path + os.sep + "wtshdDEMsmooth"
+    wtshdGrid = watershedGDB_path + os.sep + "wtshdGrid"
     slopeGrid = watershedGDB_path + os.sep + "slopeGrid"
     slopeStats = watershedGDB_path + os.sep + "slopeStats"
     # Wascob Additions
-    outletStats = watershedGDB_path + os.sep + "outletStats"
+    outletGrid = watershedGDB_path + os.sep + "outletGrid"
     clippedOutlets = watershedGDB_path + os.sep + "Layers" + os.sep + projectName + "_clippedOutlets"
     # Features in Arcmap
     watershedOut = "" + os.path.basename(watershed) + ""
@@ -293,7 +294,7 @@ try:
     
     # ---------------------------------------------------------------------------------------------- Delete old datasets
     # dropped outletFC from the remove list on 1/11/2018. It would cause problems with the Create New Outlet sequence
-    datasetsToRemove = (watershed,outletBuffer,pourPointGrid,snapPourPoint,watershedGrid,watershedTemp,wtshdDEMsmooth,slopeGrid,slopeStats,outletStats)
+    datasetsToRemove = (watershed,outletBuffer,pourPointGrid,snapPourPoint,watershedGrid,watershedTemp,wtshdGrid,slopeGrid,slopeStats,outletGrid)
 
     x = 0
     for dataset in datasetsToRemove:
@@ -347,52 +348,16 @@ try:
 
     # Get Reference Line Elevation Properties (Uses ProjectDEM, which is vertical feet by 1/10ths)
     AddMsgAndPrint("\nCalculating Reference Line Attributes...",0)
-    arcpy.sa.ZonalStatisticsAsTable(outletBuffer, "Subbasin", ProjectDEM, outletStats, "DATA")
+    outletElevations = zonalStats.zonalStatisticsByFeatures(outletBuffer, "Subbasin", ProjectDEM, outletGrid)
     
-    rows = arcpy.SearchCursor(outletStats)
-    row = rows.next()
-
-    while row:
-        wtshdID = row.OBJECTID
-
-        # zonal stats doesnt generate "Value" with the 9.3 geoprocessor
-        if len(arcpy.ListFields(outletStats,"Value")) > 0:
-            zonalValue = row.VALUE
-        else:
-            zonalValue = row.SUBBASIN
-
-        zonalMaxValue = row.MAX   
-        zonalMeanValue = row.MEAN
-        zonalMinValue = row.MIN
-
-        whereclause = "Subbasin = " + str(zonalValue)
-        refRows = arcpy.UpdateCursor(outletFC,whereclause)
-        refRow = refRows.next()           
-
-        # Pass the elevation Data to Reference Line FC.
-        while refRow:
-            refRow.MaxElev = zonalMaxValue
-            refRow.MinElev = zonalMinValue
-            refRow.MeanElev = round(zonalMeanValue,1)
-            refRows.updateRow(refRow)
-            
-            break
-
-        row = rows.next()        
-
-        del wtshdID
-        del zonalValue
-        del zonalMeanValue
-        del zonalMaxValue
-        del zonalMinValue
-        del whereclause
-        del refRows
-        del refRow
-
-    del rows
-    del row
-
-    arcpy.Delete_management(outletStats)
+    # Pass the elevation Data to Reference Line FC in one pass
+    outletUpdates = {}
+    for zonalValue in outletElevations:
+        outletUpdates[zonalValue] = {"MaxElev": outletElevations[zonalValue]["MAX"],
+                                     "MinElev": outletElevations[zonalValue]["MIN"],
+                                     "MeanElev": round(outletElevations[zonalValue]["MEAN"],1)}
+    attributeUpdates.updateAttributes(outletFC, "Subbasin", outletUpdates)
+    del outletElevations, outletUpdates
 
     # --------------------------------------------------------------------- Delineate Watershed(s) from Reference Lines
     # Convert buffered outlet Feature to Raster Pour Point.
@@ -471,93 +436,59 @@ try:
     # ------------------------------------------------------- Add slope attributes to watershed basins
     AddMsgAndPrint("\nCalculating average slope...",0)
 
-    # Always re-create DEMsmooth in case people jumped from Watershed workflow to WASCOB workflow somehow and base on ProjectDEM in this WASCOB toolset
-    arcpy.Delete_management(DEMsmooth)
-        
-    # Run Focal Statistics on the ProjectDEM for the purpose of generating smoothed results.
-    tempFocal = arcpy.sa.FocalStatistics(ProjectDEM, "RECTANGLE 3 3 CELL","MEAN","DATA")
-    tempFocal.save(DEMsmooth)
+    # Always smooth the ProjectDEM in case people jumped from Watershed workflow to WASCOB workflow somehow and base on ProjectDEM in this WASCOB toolset
+    if arcpy.Exists(DEMsmooth):
+        arcpy.Delete_management(DEMsmooth)
         
     # Add Avg_Slope field to watershed layer
     arcpy.AddField_management(watershed, "Avg_Slope", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
 
-    # Extract area for slope from DEMSmooth and compute statistics for it
-    tempWtshDEM = arcpy.sa.ExtractByMask(DEMsmooth, watershed)
-    tempWtshDEM.save(wtshdDEMsmooth)
-    
-    tempSlope = arcpy.sa.Slope(wtshdDEMsmooth, "PERCENT_RISE", Zfactor)
-    tempSlope.save(slopeGrid)
-    
-    arcpy.sa.ZonalStatisticsAsTable(watershed, "Subbasin", slopeGrid, slopeStats, "DATA")
+    # Smooth the ProjectDEM, limit it to the watershed, compute slope and summarize it by subbasin in one pass
+    rasterArrays.polygonsToRaster(watershed, "Subbasin", ProjectDEM, wtshdGrid)
+    subbasinSlopes = surfaceSlope.zonalSlopeStatistics(ProjectDEM, wtshdGrid, Zfactor, "PERCENT_RISE")
     calcAvgSlope = True
 
     # Delete unwanted rasters
-    arcpy.Delete_management(DEMsmooth)
-    arcpy.Delete_management(wtshdDEMsmooth)
-    arcpy.Delete_management(slopeGrid)
+    arcpy.Delete_management(wtshdGrid)
 
     # -------------------------------------------------------------------------------------- Update Watershed FC with Average Slope
     if calcAvgSlope:
         
-        # go through each zonal Stat record and pull out the Mean value
-        rows = arcpy.SearchCursor(slopeStats)
-        row = rows.next()
+        # go through each subbasin's zonal statistics and pull out the Mean value
 
         AddMsgAndPrint("\nSuccessfully Calculated Average Slope",0)
 
         AddMsgAndPrint("\n===================================================",0)
         AddMsgAndPrint("\tUser Watershed: " + str(watershedOut),0)
         
-        while row:
-            wtshdID = row.OBJECTID
-
-            # zonal stats doesnt generate "Value" with the 9.3 geoprocessor in 10
-            if len(arcpy.ListFields(slopeStats,"Value")) > 0:
-                zonalValue = row.VALUE
-            else:
-                zonalValue = row.SUBBASIN
+        # Pass the Mean values from the zonal statistics to the watershed FC in one pass
+        slopeUpdates = dict((zonalValue, {"Avg_Slope": subbasinSlopes[zonalValue]["MEAN"]}) for zonalValue in subbasinSlopes)
+        attributeUpdates.updateAttributes(watershed, "Subbasin", slopeUpdates)
+
+        wtshdRows = sorted(arcpy.da.SearchCursor(watershed, ["Subbasin","OID@","Acres","SHAPE@AREA"]))
+        for zonalValue, wtshdID, wtshdAcres, wtshdArea in wtshdRows:
+            if zonalValue not in subbasinSlopes:
+                continue
+            zonalMeanValue = subbasinSlopes[zonalValue]["MEAN"]
+
+            # Inform the user of Watershed Acres, area and avg. slope
+            if displayAreaInfo:
                 
-            zonalMeanValue = row.MEAN
+                # Inform the user of Watershed Acres, area and avg. slope
+                AddMsgAndPrint("\n\tSubbasin: " + str(wtshdID),0)
+                AddMsgAndPrint("\t\tAcres: " + str(splitThousands(round(wtshdAcres,2))),0)
+                AddMsgAndPrint("\t\tArea: " + str(splitThousands(round(wtshdArea,2))) + " Sq. " + units,0)
+                AddMsgAndPrint("\t\tAvg. Slope: " + str(round(zonalMeanValue,2)),0)
+                if wtshdAcres > 40:
+                    AddMsgAndPrint("\t\tSubbasin " + str(wtshdID) + " is greater than the 40 acre 638 standard.",1)
+                    AddMsgAndPrint("\t\tConsider re-delineating to split basins or move upstream.",1)
 
-            whereclause = "Subbasin = " + str(zonalValue)
-            wtshdRows = arcpy.UpdateCursor(watershed,whereclause)
-            wtshdRow = wtshdRows.next()           
+            else:
+                AddMsgAndPrint("\tSubbasin " + str(wtshdID) + " Avg. Slope: " + str(zonalMeanValue) + "%",0)
 
-            # Pass the Mean value from the zonalStat table to the watershed FC.
-            while wtshdRow:
-                wtshdRow.Avg_Slope = zonalMeanValue
-                wtshdRows.updateRow(wtshdRow)
+        del slopeUpdates, wtshdRows
 
-                # Inform the user of Watershed Acres, area and avg. slope
-                if displayAreaInfo:
-                    
-                    # Inform the user of Watershed Acres, area and avg. slope
-                    AddMsgAndPrint("\n\tSubbasin: " + str(wtshdRow.OBJECTID),0)
-                    AddMsgAndPrint("\t\tAcres: " + str(splitThousands(round(wtshdRow.Acres,2))),0)
-                    AddMsgAndPrint("\t\tArea: " + str(splitThousands(round(wtshdRow.Shape_Area,2))) + " Sq. " + units,0)
-                    AddMsgAndPrint("\t\tAvg. Slope: " + str(round(zonalMeanValue,2)),0)
-                    if wtshdRow.Acres > 40:
-                        AddMsgAndPrint("\t\tSubbasin " + str(wtshdRow.OBJECTID) + " is greater than the 40 acre 638 standard.",1)
-                        AddMsgAndPrint("\t\tConsider re-delineating to split basins or move upstream.",1)
-
-                else:
-                    AddMsgAndPrint("\tSubbasin " + str(wtshdRow.OBJECTID) + " Avg. Slope: " + str(zonalMeanValue) + "%",0)
-                    
-                break
-
-            row = rows.next()        
-
-            del wtshdID
-            del zonalValue
-            del zonalMeanValue
-            del whereclause
-            del wtshdRows
-            del wtshdRow
-
-        del rows
-        del row
         AddMsgAndPrint("\n===================================================",0)
-        arcpy.Delete_management(slopeStats)
     
     # ------------------------------------------------------------------------------------------------ Compact FGDB
     try:
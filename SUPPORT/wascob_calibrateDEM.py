@@ -58,6 +58,7 @@ def logBasicSettings():
     f.write("\tInput DEM: " + inputDEM + "\n")
     if len(str(inputPoints)) > 0:
         f.write("\tInput Survey Points: " + inputPoints + "\n")
+        f.write("\tCalibration Method: " + calibrationMethod + "\n")
     else:
         f.write("\tInput Adjustment Value: " + str(inputValue) + "\n")
     f.close
@@ -67,6 +68,7 @@ def logBasicSettings():
 ## ================================================================================================================
 # Import system modules
 import sys, os, arcpy, traceback
+import attributeUpdates, rasterArrays, lineStations, demCalibration
 #import string
 
 # Environment settings
@@ -104,6 +106,14 @@ try:
     #inputValue = float(arcpy.GetParameterAsText(3))
     inputValue = arcpy.GetParameter(3)
 
+    # Optional correction surface fitted to the survey points; CONSTANT (average difference) as before
+    calibrationMethod = "CONSTANT"
+    if arcpy.GetArgumentCount() > 5 and arcpy.GetParameterAsText(5):
+        calibrationMethod = arcpy.GetParameterAsText(5).upper()
+    if calibrationMethod not in demCalibration.calibrationMethods:
+        arcpy.AddError(" \n\nCalibration method must be one of " + ", ".join(demCalibration.calibrationMethods) + ". Exiting...\n")
+        sys.exit()
+
     watershed_path = arcpy.Describe(inputDEM).CatalogPath
    
     # Check source of input DEM, exit if not a WASCOB "Project DEM"
@@ -127,7 +137,6 @@ try:
     backupDEM = watershedGDB_path + os.sep + "backupDEM"
     tempDEM = watershedGDB_path + os.sep + "tempDEM"
     tempPoints = watershedGDB_path + os.sep + "tempPoints"
-    tempStats = watershedGDB_path + os.sep + "tempStats"
 
     # start log file
     textFilePath = userWorkspace + os.sep + projectName + "_EngTools.txt"
@@ -160,6 +169,8 @@ try:
     
     if not len(str(inputPoints)) > 0:
         averageDifference = inputValue
+        calibrationMethod = "CONSTANT"
+        correction = demCalibration.constantCorrection(averageDifference)
         
     else:
         AddMsgAndPrint(" \n\tCopying input survey points...",0)
@@ -179,53 +190,60 @@ try:
         #arcpy.CalculateField_management(tempPoints, "SURV_ELEV", "[" + str(inputField) + "]", "VB", "")
         arcpy.CalculateField_management(tempPoints, "SURV_ELEV", "!" + str(inputField) + "!", "PYTHON")
 
-        # Use Zonal Statistics to pull values from project DEM
-        arcpy.sa.ZonalStatisticsAsTable(tempPoints, "POINTID", inputDEM, tempStats, "DATA")
-
-        rows = arcpy.SearchCursor(tempStats)
-        totalPoints = 0
-        totalDifference = 0
-        
-        # Use search cursor on stats TABLE
-        for row in rows:
-            pointID = row.POINTID
-            zonalValue = row.MEAN
-            
-            # Pass Values to survey points
-            whereclause = "POINTID = " + str(pointID)
-            pointRows = arcpy.UpdateCursor(tempPoints,whereclause)         
-
-            # Pass the elevation Data to Reference Line FC.
-            for pointRow in pointRows:
-                survElev = pointRow.SURV_ELEV
-                pointRow.RAST_ELEV = round(zonalValue,1)
-                pointRow.DIFF = round(survElev - zonalValue,1)
-                pointRows.updateRow(pointRow)
-                totalDifference += pointRow.DIFF
-                totalPoints += 1
-
-                break      
-             
-            del pointID
-            del zonalValue
-            del survElev
-            del whereclause
-            del pointRow
-            del pointRows
-            
-        del row
-        del rows
+        # Sample the project DEM at every survey point in one pass (the cell holding each point)
+        pointIDs = []
+        pointX = []
+        pointY = []
+        survElevs = []
+        for pointID, xy, survElev in arcpy.da.SearchCursor(tempPoints, ["POINTID","SHAPE@XY","SURV_ELEV"], spatial_reference=sr):
+            if xy[0] is None or survElev is None:
+                continue
+            pointIDs.append(pointID)
+            pointX.append(xy[0])
+            pointY.append(xy[1])
+            survElevs.append(survElev)
+        rastElevs = lineStations.sampleRaster(inputDEM, pointX, pointY, "CELL")
+
+        # Pass Values to survey points in one pass; points off the DEM are left empty
+        pointUpdates = {}
+        for i, pointID in enumerate(pointIDs):
+            if rastElevs[i] == rastElevs[i]:
+                pointUpdates[pointID] = {"RAST_ELEV": round(float(rastElevs[i]),1),
+                                         "DIFF": round(survElevs[i] - float(rastElevs[i]),1)}
+
+        if not pointUpdates:
+            AddMsgAndPrint(" \nNone of the survey points fall on " + str(inputDEM) + ". Exiting...",2)
+            sys.exit()
+
+        totalPoints = attributeUpdates.updateAttributes(tempPoints, "POINTID", pointUpdates)[0]
+        totalDifference = sum(pointUpdates[pointID]["DIFF"] for pointID in pointUpdates)
+        del pointUpdates
         
         averageDifference = round(totalDifference / totalPoints,1)
         
         del totalDifference, totalPoints
 
+        # Fit the correction surface and report how well the adjusted DEM matches the survey
+        if calibrationMethod == "CONSTANT":
+            correction = demCalibration.constantCorrection(averageDifference)
+        else:
+            AddMsgAndPrint(" \n\tFitting " + calibrationMethod + " correction surface to " + str(int((rastElevs == rastElevs).sum())) + " survey points...",0)
+            correction = demCalibration.fitCorrection(pointX, pointY, [survElevs[i] - rastElevs[i] for i in range(len(rastElevs))], calibrationMethod)
+
+        rmseBefore, rmseAfter = demCalibration.calibrationReport(correction, rasterArrays.describeRaster(inputDEM), pointX, pointY, survElevs, rastElevs)
+        AddMsgAndPrint(" \tRMSE before calibration: " + str(round(rmseBefore,2)),0)
+        AddMsgAndPrint(" \tRMSE after calibration: " + str(round(rmseAfter,2)),0)
+        del pointIDs, pointX, pointY, survElevs, rastElevs, rmseBefore, rmseAfter
+
         # Copy survey points to project FD    
         arcpy.CopyFeatures_management(tempPoints, surveyPoints)
 
     # ----------------------  Create New Adjusted Raster Surface
     AddMsgAndPrint( " \nAverage difference in surface elevation is " + str(averageDifference) + " feet...",0)
-    if averageDifference == 0:
+    if calibrationMethod != "CONSTANT":
+        AddMsgAndPrint( " \nApplying " + calibrationMethod + " correction surface to " + str(inputDEM) + "...",0)
+        demCalibration.applyCorrection(inputDEM, tempDEM, correction)
+    elif averageDifference == 0:
         AddMsgAndPrint(" \n No difference (greater than 0.1 foot) was detected.",2)
         AddMsgAndPrint(" \nYour DEM will not be adjusted. Exiting...",2)
         sys.exit()
@@ -234,6 +252,7 @@ try:
         #arcpy.gp.Plus_sa(inputDEM, averageDifference, tempDEM)
         outPlus = arcpy.sa.Plus(inputDEM, averageDifference)
         outPlus.save(tempDEM)
+    del correction
 
 
 ##    # shouldn't this always be just the Plus function? If Average Difference is negative, subtracting a negative would actually be adding positive? See change above (else statement).
@@ -260,9 +279,9 @@ try:
         AddMsgAndPrint(" \nAdjusted surface can be found at " + str(tempDEM) + ".",2)
 
     if proceed:
-        datasetsToRemove = (tempDEM,backupDEM,tempPoints,tempStats)
+        datasetsToRemove = (tempDEM,backupDEM,tempPoints)
     else:
-        datasetsToRemove = (tempPoints,backupDEM,tempStats)
+        datasetsToRemove = (tempPoints,backupDEM)
 
     x = 0
     for dataset in datasetsToRemove:
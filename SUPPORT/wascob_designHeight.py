@@ -58,13 +58,146 @@ def logBasicSettings():
     f.write("\tSelected Subbasin: " + Subbasin + "\n")
     f.write("\tDesign Elevation: " + DesignElev + "\n") 
     f.write("\tIntake Elevation: " + IntakeElev + "\n")    
+    f.write("\tConnected Pool Only: " + str(connectedOnly) + "\n")
+    if len(requiredStorage) > 0:
+        f.write("\tRequired Storage (Acre Feet): " + ";".join(subbasinID + ":" + str(requiredStorage[subbasinID]) for subbasinID in sorted(requiredStorage, key=int)) + "\n")
         
     f.close
     del f   
 
+## ================================================================================================================
+def storageTargets(storageText, subbasin):
+    # {subbasin ID: required storage in acre feet} from the Required Storage parameter: a single value for
+    # the selected subbasin, or "subbasin:acreFeet" pairs separated by semicolons.
+
+    targets = {}
+    for item in storageText.split(";"):
+        item = item.strip()
+        if not item:
+            continue
+        if ":" in item:
+            subbasinID, acreFeet = item.split(":", 1)
+        else:
+            subbasinID, acreFeet = subbasin, item
+        targets[str(int(float(subbasinID)))] = float(acreFeet)
+    return targets
+
+## ================================================================================================================
+def designSubbasin(subbasinID, designElev, acreFeet=None, intakeXY=None, severity=2):
+    # Creates the pool and embankment reference points of one subbasin at designElev, or at the lowest
+    # elevation whose pool holds acreFeet when a required storage is given, replacing the points of an
+    # earlier design only once it succeeds.  A connected pool grows from the intake (intakeXY) or, without
+    # one, from the lowest cell of the subbasin.  Problems are reported at severity.  Returns the design
+    # elevation used, or None if the subbasin could not be designed.
+
+    exp = "\"Subbasin\" = " + subbasinID
+
+    arcpy.SelectLayerByAttribute_management(RefLineLyr, "NEW_SELECTION", exp)
+    arcpy.CopyFeatures_management(RefLineLyr, refTemp, "", "0", "0", "0")
+    arcpy.SelectLayerByAttribute_management(RefLineLyr, "CLEAR_SELECTION", "")
+    if not int(arcpy.GetCount_management(refTemp).getOutput(0)) > 0:
+        AddMsgAndPrint("\tNo reference line features were found for subbasin " + subbasinID,severity)
+        return None
+
+    # Use DEM to determine intersection of Reference Line and Plane @ Design Elevation
+    AddMsgAndPrint("\nCalculating Pool Extent...",0)
+    arcpy.SelectLayerByAttribute_management(inWatershed, "NEW_SELECTION", exp)
+    arcpy.CopyFeatures_management(inWatershed, WSmask, "", "0", "0", "0")
+    arcpy.SelectLayerByAttribute_management(inWatershed, "CLEAR_SELECTION", "")
+
+    # Sorted subbasin elevations saved by the first run, so trying another design elevation is a lookup
+    indexFile = poolIndexFolder + os.sep + "poolIndex_" + wsName.replace(" ","_") + "_" + subbasinID + ".npz"
+    elevIndex, built = poolIndex.subbasinPoolIndex(DEM_aoi, WSmask, indexFile, rasterArrays.describeRaster(DEM_aoi))
+    if elevIndex is None:
+        AddMsgAndPrint("\tSubbasin " + subbasinID + " does not overlap the Project DEM",severity)
+        AddMsgAndPrint("\tCheck your input watershed.",severity)
+        return None
+    if built:
+        AddMsgAndPrint("\tBuilt elevation index for subbasin " + subbasinID,0)
+    else:
+        AddMsgAndPrint("\tUsing saved elevation index for subbasin " + subbasinID,0)
+
+    seedRow = seedCol = None
+    if connectedOnly:
+        # The cells below the design elevation that are connected to the intake make up the pool
+        if intakeXY is not None:
+            AddMsgAndPrint("\tLimiting the pool to the area connected to the intake",0)
+            indexInfo = poolIndex.gridInfo(elevIndex)
+            seedRow = int((indexInfo["ymax"] - intakeXY[1]) // indexInfo["cellHeight"])
+            seedCol = int((intakeXY[0] - indexInfo["xmin"]) // indexInfo["cellWidth"])
+        else:
+            AddMsgAndPrint("\tLimiting the pool to the area connected to the lowest cell of the subbasin",0)
+            seedRow, seedCol = poolIndex.lowestCell(elevIndex)
+
+    if acreFeet is not None:
+        # Bisect on the stage-storage curve of the index for the lowest elevation holding the storage (z units are feet)
+        designElev = poolIndex.designElevation(elevIndex, acreFeet * acreConversion, seedRow, seedCol)
+        if designElev is None:
+            capacity = poolIndex.poolVolume(elevIndex, elevIndex["elevations"][-1], seedRow, seedCol)[2] / acreConversion
+            AddMsgAndPrint("\tSubbasin " + subbasinID + " can not hold " + str(acreFeet) + " Acre Feet",severity)
+            AddMsgAndPrint("\tIt holds at most " + str(round(capacity,2)) + " Acre Feet below its highest cell",severity)
+            return None
+        # Round up to the hundredth so the pool never holds less than required, then make sure rounding
+        # error did not land a hundredth too high or too low
+        designElev = math.ceil(designElev * 100) / 100
+        while poolIndex.poolVolume(elevIndex, designElev, seedRow, seedCol)[2] < acreFeet * acreConversion:
+            designElev = round(designElev + 0.01,2)
+        while poolIndex.poolVolume(elevIndex, designElev - 0.01, seedRow, seedCol)[2] >= acreFeet * acreConversion:
+            designElev = round(designElev - 0.01,2)
+        AddMsgAndPrint("\tLowest design elevation holding " + str(acreFeet) + " Acre Feet: " + str(designElev) + " feet",0)
+
+    pool = poolIndex.poolOutline(elevIndex, float(designElev), seedRow, seedCol)
+    if pool is None:
+        if connectedOnly:
+            AddMsgAndPrint("\tThe intake is not next to any area below " + str(designElev) + " feet",severity)
+            AddMsgAndPrint("\tCheck the intake location and design elevation.",severity)
+        else:
+            AddMsgAndPrint("\tNo part of subbasin " + subbasinID + " is below " + str(designElev) + " feet",severity)
+            AddMsgAndPrint("\tCheck the design elevation.",severity)
+        return None
+
+    rings, poolMask = pool
+    arcpy.CreateFeatureclass_management(watershedGDB_path, os.path.basename(DA_snPoly), "POLYGON", "", "DISABLED", "DISABLED", sr)
+    rows = arcpy.da.InsertCursor(DA_snPoly, ["SHAPE@"])
+    rows.insertRow([arcpy.Polygon(arcpy.Array([arcpy.Array([arcpy.Point(x, y) for x, y in ring]) for ring in rings]), sr)])
+    del rows, rings, pool, poolMask
+
+    # Report the pool at the design elevation straight from the index
+    area2D, area3D, volume = poolIndex.poolVolume(elevIndex, float(designElev), seedRow, seedCol)
+    AddMsgAndPrint("\tPool Area at " + str(designElev) + " feet: " + str(round(area2D / acreConversion,2)) + " Acres",0)
+    AddMsgAndPrint("\tPool Storage at " + str(designElev) + " feet: " + str(round(volume / acreConversion,2)) + " Acre Feet",0)
+
+    AddMsgAndPrint("\nCreating Embankment Reference Points...",0)
+    arcpy.Clip_analysis(refTemp, DA_snPoly, refTempClip, "")
+    arcpy.FeatureVerticesToPoints_management(refTempClip, refPoints, "BOTH_ENDS")
+    AddMsgAndPrint("\tSuccessfully created " +  str(int(arcpy.GetCount_management(refPoints).getOutput(0))) + " reference points at " + str(designElev) + " feet",0)
+    arcpy.AddField_management(refPoints, "Id", "LONG", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+    arcpy.CalculateField_management(refPoints, "Id", "" + subbasinID + "", "PYTHON")
+    arcpy.AddField_management(refPoints, "Elev", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+    arcpy.CalculateField_management(refPoints, "Elev", "" + str(designElev)+ "", "PYTHON")
+    arcpy.AddField_management(refPoints, "Notes", "TEXT", "", "", "50", "", "NULLABLE", "NON_REQUIRED", "")
+    arcpy.CalculateField_management(refPoints, "Notes", "\"Embankment\"", "PYTHON")
+
+    # Replace the points of an earlier design only now that the new ones exist: every point of the
+    # selected subbasin, which gets the new intake, and only the embankment points of any other
+    if subbasinID == str(Subbasin):
+        arcpy.SelectLayerByAttribute_management(stakeoutPointsLyr, "NEW_SELECTION", exp)
+    else:
+        arcpy.SelectLayerByAttribute_management(stakeoutPointsLyr, "NEW_SELECTION", exp + " AND \"Notes\" = 'Embankment'")
+    if int(arcpy.GetCount_management(stakeoutPointsLyr).getOutput(0)) > 0:
+        arcpy.DeleteFeatures_management(stakeoutPointsLyr)
+    arcpy.SelectLayerByAttribute_management(stakeoutPointsLyr, "CLEAR_SELECTION", "")
+    AddMsgAndPrint("\tAppending Results to Stakeout Points...",0)
+    if subbasinID == str(Subbasin):
+        arcpy.Append_management(intake, stakeoutPoints, "NO_TEST", "", "")
+    arcpy.Append_management(refPoints, stakeoutPoints, "NO_TEST", "", "")
+
+    return float(designElev)
+
 ## ================================================================================================================
 # Import system modules
-import arcpy, sys, os, traceback, string
+import arcpy, sys, os, traceback, string, math
+import rasterArrays, poolIndex
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -99,6 +232,17 @@ try:
     IntakeElev = arcpy.GetParameterAsText(3)
     IntakeLocation = arcpy.GetParameterAsText(4)
 
+    # Optional: limit the pool to the area connected to the intake, leaving out other low spots in the subbasin
+    connectedOnly = False
+    if arcpy.GetArgumentCount() > 6:
+        connectedOnly = arcpy.GetParameterAsText(6).upper() == "TRUE"
+
+    # Optional: required storage in acre feet.  The design elevation is then solved as the lowest elevation
+    # whose pool holds it, and "subbasin:acreFeet" pairs separated by semicolons solve several subbasins.
+    requiredStorage = {}
+    if arcpy.GetArgumentCount() > 7 and arcpy.GetParameterAsText(7) not in ("", "#"):
+        requiredStorage = storageTargets(arcpy.GetParameterAsText(7), Subbasin)
+
     # ---------------------------------------------------------------------------- Define Variables 
     watershed_path = arcpy.Describe(inWatershed).CatalogPath
     watershedGDB_path = watershed_path[:watershed_path .find(".gdb")+4]
@@ -109,6 +253,7 @@ try:
     
     # ---------------------------------------------------------------------------- Existing Datasets
     stakeoutPoints = watershedFD_path + os.sep + "stakeoutPoints"
+    poolIndexFolder = userWorkspace + os.sep + "gis_output" + os.sep + "tables"
     DEM_aoi = watershedGDB_path + os.sep + os.path.basename(userWorkspace).replace(" ","_") + "_Project_DEM"
     #DEM_aoi = watershedGDB_path + os.sep + "Project_DEM"
 
@@ -126,10 +271,6 @@ try:
     refTempClip = watershedFD_path + os.sep + "refTemp_Clip"
     refPoints = watershedFD_path + os.sep + "refPoints"
     WSmask = watershedFD_path + os.sep + "WSmask"
-    DA_Dem = watershedGDB_path + os.sep + "da_dem"
-    DA_sn = watershedGDB_path + os.sep + "da_sn"
-    DAint = watershedGDB_path + os.sep + "daint"
-    DAx0 = watershedGDB_path + os.sep + "dax0"
     DA_snPoly = watershedGDB_path + os.sep + "DA_snPoly"
 
     # Set path to log file and start logging
@@ -176,6 +317,15 @@ try:
     sr = desc.SpatialReference
     cellSize = desc.MeanCellWidth    
     
+    if sr.LinearUnitName in ("Meter","Meters"):
+        acreConversion = 4046.86    # 4046.86 sq meters in 1 acre
+    else:
+        acreConversion = 43560      # 43560 sq feet in 1 acre
+
+    # The selected subbasin comes first, followed by any other subbasins given a required storage
+    subbasinIDs = [str(Subbasin)] + sorted([subbasinID for subbasinID in requiredStorage if subbasinID != str(Subbasin)], key=int)
+    severity = 2 if len(subbasinIDs) == 1 else 1
+
     # ----------------------------------------------------- Select reference line for specified Subbasin
     arcpy.MakeFeatureLayer_management(ReferenceLine, RefLineLyr)
     exp = "\"Subbasin\" = " + str(Subbasin) + ""
@@ -189,18 +339,12 @@ try:
         AddMsgAndPrint("\tDouble check your inputs and specify a different subbasin ID. Exiting...",2)
         sys.exit()
         
-    arcpy.CopyFeatures_management(refLineSelection, refTemp, "", "0", "0", "0")
     arcpy.SelectLayerByAttribute_management(RefLineLyr, "CLEAR_SELECTION", "")
 
-    # Select any existing Reference points for specified basin and delete
+    # Existing Reference points of the specified basin are replaced once its design succeeds (designSubbasin)
     arcpy.MakeFeatureLayer_management(stakeoutPoints, stakeoutPointsLyr)
-    arcpy.SelectLayerByAttribute_management(stakeoutPointsLyr, "NEW_SELECTION", exp)
-    arcpy.MakeFeatureLayer_management(stakeoutPointsLyr, pointsSelection)
-    if int(arcpy.GetCount_management(pointsSelection).getOutput(0)) > 0:
-        arcpy.DeleteFeatures_management(pointsSelection)
-    arcpy.SelectLayerByAttribute_management(stakeoutPointsLyr, "CLEAR_SELECTION", "")
     
-    # Create Intake from user input and append to Stakeout Points
+    # Create Intake from user input; it is appended to Stakeout Points with the embankment points
     AddMsgAndPrint("\nCreating Intake Reference Point...",0)
     arcpy.CopyFeatures_management(IntakeLocation, intake, "", "0", "0", "0")
     arcpy.CalculateField_management(intake, "Id", "" + str(Subbasin)+ "", "PYTHON")
@@ -208,52 +352,37 @@ try:
     arcpy.CalculateField_management(intake, "Elev", "" + str(IntakeElev)+ "", "PYTHON")
     arcpy.CalculateField_management(intake, "Notes", "\"Intake\"", "PYTHON")
     AddMsgAndPrint("\tSuccessfully created intake for subbasin " + str(Subbasin) + " at " + str(IntakeElev) + " feet",0)
-    AddMsgAndPrint("\tAppending results to Stakeout Points...",0)
-    arcpy.Append_management(intake, stakeoutPoints, "NO_TEST", "", "")
-    
-    # Use DEM to determine intersection of Reference Line and Plane @ Design Elevation
-    AddMsgAndPrint("\nCalculating Pool Extent...",0)
-    arcpy.SelectLayerByAttribute_management(inWatershed, "NEW_SELECTION", exp)
-    arcpy.CopyFeatures_management(inWatershed, WSmask, "", "0", "0", "0")
-    arcpy.SelectLayerByAttribute_management(inWatershed, "CLEAR_SELECTION", "")
-
-    #gp.ExtractByMask_sa(DEM_aoi, WSmask, DA_Dem)
-    tempMask = arcpy.sa.ExtractByMask(DEM_aoi, WSmask)
-    tempMask.save(DA_Dem)
-    
-    #gp.SetNull_sa(DA_Dem, DA_Dem, DA_sn, "VALUE > " + str(DesignElev))
-    tempNull = arcpy.sa.SetNull(DA_Dem, DA_Dem, "VALUE > " + str(DesignElev))
-    tempNull.save(DA_sn)
-
-    #gp.Times_sa(DA_sn, "0", DAx0)
-    tempTimes = arcpy.sa.Times(DA_sn, 0)
-    tempTimes.save(DAx0)
+    intakeXY = [row[0] for row in arcpy.da.SearchCursor(intake, ["SHAPE@XY"], "", sr)][0]
 
-    #gp.Int_sa(DAx0, DAint)
-    tempInt = arcpy.sa.Int(DAx0)
-    tempInt.save(DAint)
+    # Design the pool and embankment points of every subbasin
+    designElevations = {}
+    for subbasinID in subbasinIDs:
+        if subbasinID != str(Subbasin):
+            # Only the embankment points are replaced, once the design succeeds; the intake of another subbasin is kept
+            AddMsgAndPrint("\nSubbasin " + subbasinID + "...",0)
 
-    arcpy.RasterToPolygon_conversion(DAint, DA_snPoly, "NO_SIMPLIFY", "VALUE")
+        elevation = designSubbasin(subbasinID, DesignElev, requiredStorage.get(subbasinID), intakeXY if subbasinID == str(Subbasin) else None, severity)
+        if elevation is None:
+            if severity == 2:
+                sys.exit()
+            continue
+        designElevations[subbasinID] = elevation
 
-    AddMsgAndPrint("\nCreating Embankment Reference Points...",0)
-    arcpy.Clip_analysis(refTemp, DA_snPoly, refTempClip, "")
-    arcpy.FeatureVerticesToPoints_management(refTempClip, refPoints, "BOTH_ENDS")
-    AddMsgAndPrint("\tSuccessfully created " +  str(int(arcpy.GetCount_management(refPoints).getOutput(0))) + " reference points at " + str(DesignElev) + " feet",0)
-    arcpy.AddField_management(refPoints, "Id", "LONG", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-    arcpy.CalculateField_management(refPoints, "Id", "" + str(Subbasin)+ "", "PYTHON")
-    arcpy.AddField_management(refPoints, "Elev", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-    arcpy.CalculateField_management(refPoints, "Elev", "" + str(DesignElev)+ "", "PYTHON")
-    arcpy.AddField_management(refPoints, "Notes", "TEXT", "", "", "50", "", "NULLABLE", "NON_REQUIRED", "")
-    arcpy.CalculateField_management(refPoints, "Notes", "\"Embankment\"", "PYTHON")
-    AddMsgAndPrint("\tAppending Results to Stakeout Points...",0)
-    arcpy.Append_management(refPoints, stakeoutPoints, "NO_TEST", "", "")
+    if len(subbasinIDs) > 1:
+        AddMsgAndPrint("\nDesign Elevations:",0)
+        for subbasinID in subbasinIDs:
+            if subbasinID in designElevations:
+                AddMsgAndPrint("\tSubbasin " + subbasinID + ": " + str(round(designElevations[subbasinID],2)) + " feet",0)
+            else:
+                AddMsgAndPrint("\tSubbasin " + subbasinID + ": not designed",1)
+    del subbasinIDs, severity, intakeXY, designElevations
 
     # Add XY Coordinates to Stakeout Points
     AddMsgAndPrint("\nAdding XY Coordinates to Stakeout Points...",0)
     arcpy.AddXY_management(stakeoutPoints)
 
     # -------------------------------------------------------------- Delete Intermediate Files
-    datasetsToRemove = (stakeoutPointsLyr,RefLineLyr,pointsSelection,refLineSelection,refTemp,intake,refTempClip,refPoints,WSmask,DA_Dem,DA_sn,DAint,DAx0,DA_snPoly)
+    datasetsToRemove = (stakeoutPointsLyr,RefLineLyr,pointsSelection,refLineSelection,refTemp,intake,refTempClip,refPoints,WSmask,DA_snPoly)
 
     x = 0
     for dataset in datasetsToRemove:
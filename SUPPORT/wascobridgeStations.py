@@ -64,6 +64,7 @@ def logBasicSettings():
 ## ================================================================================================================    
 # Import system modules
 import arcpy, sys, os, string, traceback
+import lineStations
 
 # Environment settings
 arcpy.env.overwriteOutput = True
@@ -135,13 +136,7 @@ try:
 
     # --------------------------------------------------------------------- Temp Datasets
     lineTemp = watershedFD_path + os.sep + "lineTemp"
-    routes = watershedFD_path + os.sep + "routes"
-    stationTable = watershedGDB_path + os.sep + "stationTable"
-    stationEvents = watershedGDB_path + os.sep + "stationEvents"
     stationTemp = watershedFD_path + os.sep + "stations"
-    stationLyr = "stations"
-    stationBuffer = watershedFD_path + os.sep + "stationsBuffer"
-    stationElev = watershedGDB_path + os.sep + "stationElev"
     
     # --------------------------------------------------------------------- Check some parameters
     AddMsgAndPrint("\nChecking inptus...",0)
@@ -235,74 +230,22 @@ try:
     del rows
     del remainder
 
-    # Create Table to hold station values
-    arcpy.CreateTable_management(watershedGDB_path, "stationTable")
-    arcpy.AddField_management(stationTable, "ID", "LONG", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-    arcpy.AddField_management(stationTable, "STATION", "LONG", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-    arcpy.AddField_management(stationTable, "POINT_X", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-    arcpy.AddField_management(stationTable, "POINT_Y", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")    
-    arcpy.AddField_management(stationTable, "POINT_Z", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-
-    # Calculate location for each station along the line
-    rows = arcpy.SearchCursor(lineTemp)
-    row = rows.next()
-    while row:
-        stations = row.NO_STATIONS
-        length = int(row.LENGTH_FT)
-        stationRows = arcpy.InsertCursor(stationTable)
-        newRow = stationRows.newRow()
-        newRow.ID = row.ID
-        newRow.STATION = length
-        stationRows.insertRow(newRow)
-        currentStation = 0
-
-        while currentStation < stations:
-            newRow = stationRows.newRow()
-            newRow.ID = row.ID
-            newRow.STATION = currentStation * interval
-            stationRows.insertRow(newRow)
-            currentStation = currentStation + 1
-
-        row = rows.next()
-
-        del stationRows
-        del newRow
-    del row
-    del rows
-
-    # Create Route(s) lyr and define events along each route
+    # Calculate location for each station along the line; stations are placed on the line's vertex array
+    # and measured from the upper left end of each line, where CreateRoutes started its measures
     AddMsgAndPrint("\nCreating Stations...",0)
-    arcpy.CreateRoutes_lr(lineTemp, "ID", routes, "TWO_FIELDS", "FROM_PT", "LENGTH_FT", "UPPER_LEFT", "1", "0", "IGNORE", "INDEX")
-    arcpy.MakeRouteEventLayer_lr(routes, "ID", stationTable, "ID POINT STATION", stationEvents, "", "NO_ERROR_FIELD", "NO_ANGLE_FIELD", "NORMAL", "ANGLE", "LEFT", "POINT")
-    arcpy.AddField_management(stationEvents, "STATIONID", "TEXT", "", "", "25", "", "NULLABLE", "NON_REQUIRED", "")  
-    #gp.CalculateField_management(stationEvents, "STATIONID", "[STATION] & \"_\" & [ID]", "VB", "")
-    arcpy.CalculateField_management(stationEvents, "STATIONID", "str(!STATION!) + '_' + str(!ID!)", "PYTHON")
-    arcpy.CopyFeatures_management(stationEvents, stationTemp, "", "0", "0", "0")
-    arcpy.AddXY_management(stationTemp)
-    arcpy.AddField_management(stationTemp, "POINT_Z", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")  
-    arcpy.MakeFeatureLayer_management(stationTemp, stationLyr, "", "", "")
-    AddMsgAndPrint("\tSuccessfuly created a total of " + str(int(arcpy.GetCount_management(stationLyr).getOutput(0))) + " stations",0)
-    AddMsgAndPrint("\tfor the " + str(int(arcpy.GetCount_management(lineTemp).getOutput(0))) + " line(s) provided\n",0)
+    lines = [(lineID, lengthFt, lineStations.shapeVertices(shape)) for lineID, lengthFt, shape in arcpy.da.SearchCursor(lineTemp, ["ID","LENGTH_FT","SHAPE@"])]
+    stationPoints = lineStations.lineStations(lines, interval)
+    del lines
 
     # --------------------------------------------------------------------- Retrieve Elevation values
     AddMsgAndPrint("\nRetrieving station elevations...",0)
-    
-    # Buffer the stations the width of one raster cell / unit
-    if units == "Meters":
-        bufferSize = str(cellSize) + " Meters"
-    elif units == "Feet":
-        bufferSize = str(cellSize) + " Feet"
-    else:
-        bufferSize = str(cellSize) + " Unknown"
-        
-    arcpy.Buffer_analysis(stationTemp, stationBuffer, bufferSize, "FULL", "ROUND", "NONE", "")
-    arcpy.sa.ZonalStatisticsAsTable(stationBuffer, "STATIONID", DEM_aoi, stationElev, "NODATA", "ALL")
-    arcpy.AddJoin_management(stationLyr, "StationID", stationElev, "StationID", "KEEP_ALL")
-    expression = "round(!stationElev.MEAN! * " + str(Zfactor) + ",1)"
-    arcpy.CalculateField_management(stationLyr, "stations.POINT_Z", expression, "PYTHON")
-    arcpy.RemoveJoin_management(stationLyr, "stationElev")
-    arcpy.DeleteField_management(stationTemp, "STATIONID; POINT_M")
-    del expression
+
+    # Mean of the cells within one cell width of each station, read straight from the DEM
+    stationPoints["POINT_Z"] = lineStations.sampleRaster(DEM_aoi, stationPoints["POINT_X"], stationPoints["POINT_Y"], "MEAN", cellSize) * Zfactor
+    lineStations.writeStations(stationPoints, stationTemp, sr)
+    AddMsgAndPrint("\tSuccessfuly created a total of " + str(len(stationPoints["ID"])) + " stations",0)
+    AddMsgAndPrint("\tfor the " + str(int(arcpy.GetCount_management(lineTemp).getOutput(0))) + " line(s) provided\n",0)
+    del stationPoints
     
     # ---------------------------------------------------------------------- Create final output
     # Interpolate Line to 3d via Z factor
@@ -317,7 +260,7 @@ try:
 
     # ------------------------------------------------------------------- Delete Temp Layers
     AddMsgAndPrint("\nDeleting temporary files...",0)
-    layersToRemove = (lineTemp,routes,stationTable,stationEvents,stationTemp,stationLyr,stationBuffer,stationElev)    
+    layersToRemove = (lineTemp,stationTemp)    
 
     x = 0
     for layer in layersToRemove:
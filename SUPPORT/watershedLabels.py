@@ -0,0 +1,68 @@
+## watershedLabels.py
+##
+## Created by USDA NRCS, 2026
+##
+## Multi-outlet watershed labeling on a D8 flow direction array, used in place of arcpy.sa.Watershed.
+## Every pour point cell seeds a breadth-first search up the reversed D8 graph and each upstream cell takes
+## the label of the first pour point it drains to.  Pour point cells keep their own labels, so an outlet
+## nested inside another outlet's watershed splits it into separate subbasins exactly as Watershed does.
+## All outlets are processed in a single pass, one frontier at a time.
+
+import numpy as np
+import flatGrid, flowRouting
+
+## ================================================================================================================
+def upstreamGraph(target):
+    # Reverse D8 graph in compressed form.  donors lists every cell that has a downstream neighbor, grouped
+    # by the cell it drains to; receivers is the matching sorted list of downstream cells.
+
+    donors = np.nonzero(target >= 0)[0]
+    order = np.argsort(target[donors], kind="mergesort")
+    donors = donors[order]
+    return donors, target[donors]
+
+## ================================================================================================================
+def upstreamCells(donors, receivers, cells):
+    # All cells draining directly into any of cells, and the position in cells each one drains into.
+
+    starts = np.searchsorted(receivers, cells, side="left")
+    counts = np.searchsorted(receivers, cells, side="right") - starts
+    total = counts.sum()
+    if total == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    source = np.repeat(np.arange(cells.shape[0]), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return donors[np.repeat(starts, counts) + offsets], source
+
+## ================================================================================================================
+def labelWatersheds(flowDirArray, pourPointArray):
+    # flowDirArray holds ESRI D8 codes; pourPointArray holds a positive integer label on every pour point
+    # cell and 0 elsewhere.  Returns an int32 label grid (0 where a cell drains to no pour point) and a
+    # dictionary of {label: cell count}.
+
+    codes = np.asarray(flowDirArray)
+    rows, cols = codes.shape
+    target, width = flowRouting.downstreamIndex(codes)
+    donors, receivers = upstreamGraph(target)
+
+    labels = flatGrid.flatten(np.asarray(pourPointArray).astype(np.int32), 0)[0]
+    labels[flatGrid.flatten(codes == flowRouting.flowDirNoData, True)[0]] = 0
+
+    frontier = np.nonzero(labels > 0)[0]
+    while frontier.shape[0]:
+        upstream, source = upstreamCells(donors, receivers, frontier)
+        unlabeled = labels[upstream] == 0
+        upstream = upstream[unlabeled]
+        labels[upstream] = labels[frontier[source[unlabeled]]]
+        frontier = upstream
+
+    labels = flatGrid.unflatten(labels, rows, cols).copy()
+    return labels, labelCounts(labels)
+
+## ================================================================================================================
+def labelCounts(labels):
+    # {label: number of cells} for every positive label in the grid.
+
+    ids, counts = np.unique(labels[labels > 0], return_counts=True)
+    return dict(zip(ids.tolist(), counts.tolist()))
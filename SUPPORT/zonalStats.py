@@ -0,0 +1,188 @@
+## zonalStats.py
+##
+## Created by USDA NRCS, 2026
+##
+## In-memory zonal statistics used in place of arcpy.sa.ZonalStatisticsAsTable.  Zone ids are mapped to
+## consecutive indexes with np.unique and every statistic for every zone is gathered in one pass with
+## np.bincount, np.minimum.at and np.maximum.at, so thousands of zones cost the same as one.
+##
+## A pass produces a partial aggregate (count, sum, sum of squares, min, max and NoData count per zone).
+## Partials from separate tiles merge exactly, so large rasters can be streamed a band of rows at a time
+## and only the per-zone totals are kept.  zonalTable turns an aggregate into the ZonalStatisticsAsTable
+## fields: {zone: {"COUNT", "AREA", "MIN", "MAX", "RANGE", "MEAN", "STD", "SUM"}}.
+
+import numpy as np
+import rasterArrays
+
+statisticFields = ("COUNT", "AREA", "MIN", "MAX", "RANGE", "MEAN", "STD", "SUM")
+
+## ================================================================================================================
+def emptyAggregate():
+    # Partial aggregate with no zones.
+
+    return {"zones": np.zeros(0, dtype=np.int64),
+            "count": np.zeros(0, dtype=np.int64),
+            "sum": np.zeros(0),
+            "sumSq": np.zeros(0),
+            "min": np.zeros(0),
+            "max": np.zeros(0),
+            "noData": np.zeros(0, dtype=np.int64)}
+
+## ================================================================================================================
+def zonalAggregate(zoneArray, valueArray, noDataZone=0):
+    # Partial aggregate of valueArray (NoData as NaN) for every zone in zoneArray.  Cells with zone
+    # noDataZone or a NaN zone belong to no zone.  Values are accumulated in float64.
+
+    zones = np.asarray(zoneArray).ravel()
+    values = np.asarray(valueArray, dtype=np.float64).ravel()
+
+    if zones.dtype.kind == "f":
+        inZone = ~np.isnan(zones)
+        inZone[inZone] = zones[inZone] != noDataZone
+    else:
+        inZone = zones != noDataZone
+    if not inZone.any():
+        return emptyAggregate()
+
+    ids, index = np.unique(zones[inZone].astype(np.int64), return_inverse=True)
+    values = values[inZone]
+    n = ids.shape[0]
+
+    hasData = ~np.isnan(values)
+    dataIndex = index[hasData]
+    data = values[hasData]
+
+    minimum = np.full(n, np.inf)
+    maximum = np.full(n, -np.inf)
+    np.minimum.at(minimum, dataIndex, data)
+    np.maximum.at(maximum, dataIndex, data)
+
+    return {"zones": ids,
+            "count": np.bincount(dataIndex, minlength=n).astype(np.int64),
+            "sum": np.bincount(dataIndex, data, minlength=n),
+            "sumSq": np.bincount(dataIndex, data * data, minlength=n),
+            "min": minimum,
+            "max": maximum,
+            "noData": np.bincount(index[~hasData], minlength=n).astype(np.int64)}
+
+## ================================================================================================================
+def mergeAggregates(aggregates):
+    # Combines partial aggregates (e.g. from separate tiles) into one.
+
+    # Also used on a single aggregate whose zone ids were relabeled, to combine duplicate ids
+    aggregates = [agg for agg in aggregates if agg["zones"].shape[0]]
+    if not aggregates:
+        return emptyAggregate()
+
+    allZones = np.concatenate([agg["zones"] for agg in aggregates])
+    ids, index = np.unique(allZones, return_inverse=True)
+    n = ids.shape[0]
+
+    merged = {"zones": ids}
+    for key in ("count", "sum", "sumSq", "noData"):
+        merged[key] = np.bincount(index, np.concatenate([agg[key] for agg in aggregates]), minlength=n)
+    merged["count"] = merged["count"].astype(np.int64)
+    merged["noData"] = merged["noData"].astype(np.int64)
+
+    merged["min"] = np.full(n, np.inf)
+    merged["max"] = np.full(n, -np.inf)
+    np.minimum.at(merged["min"], index, np.concatenate([agg["min"] for agg in aggregates]))
+    np.maximum.at(merged["max"], index, np.concatenate([agg["max"] for agg in aggregates]))
+    return merged
+
+## ================================================================================================================
+def zonalTable(aggregate, cellArea=1.0, ignoreNoData=True):
+    # {zone: {field: value}} with the ZonalStatisticsAsTable fields.  Zones without any data are left out.
+    # With ignoreNoData=False ("NODATA") a zone containing any NoData cell is left out as well.
+    # STD is the population standard deviation, as in ZonalStatisticsAsTable.
+
+    table = {}
+    agg = aggregate
+    for i in range(agg["zones"].shape[0]):
+        count = int(agg["count"][i])
+        if count == 0 or (not ignoreNoData and agg["noData"][i] > 0):
+            continue
+
+        mean = agg["sum"][i] / count
+        variance = max(agg["sumSq"][i] / count - mean * mean, 0.0)
+        table[int(agg["zones"][i])] = {"COUNT": count,
+                                       "AREA": count * cellArea,
+                                       "MIN": float(agg["min"][i]),
+                                       "MAX": float(agg["max"][i]),
+                                       "RANGE": float(agg["max"][i] - agg["min"][i]),
+                                       "MEAN": float(mean),
+                                       "STD": float(np.sqrt(variance)),
+                                       "SUM": float(agg["sum"][i])}
+    return table
+
+## ================================================================================================================
+def zonalStatistics(zoneArray, valueArray, cellArea=1.0, ignoreNoData=True, noDataZone=0):
+    # Zonal statistics of two aligned in-memory arrays; see zonalTable for the result.
+
+    return zonalTable(zonalAggregate(zoneArray, valueArray, noDataZone), cellArea, ignoreNoData)
+
+## ================================================================================================================
+def zonalAggregateBlocks(zoneBlocks, valueBlocks, noDataZone=0):
+    # Aggregate of two matching sequences of row blocks (e.g. from rasterArrays.rowBlocks or an engine that
+    # yields its output a band at a time).  Only the per-zone partials are kept between blocks.
+
+    partial = emptyAggregate()
+    for zoneBlock, valueBlock in zip(zoneBlocks, valueBlocks):
+        partial = mergeAggregates([partial, zonalAggregate(zoneBlock, valueBlock, noDataZone)])
+    return partial
+
+## ================================================================================================================
+def zonalStatisticsBlocks(zoneBlocks, valueBlocks, cellArea=1.0, ignoreNoData=True, noDataZone=0):
+    # Zonal statistics of two matching sequences of row blocks; see zonalTable for the result.
+
+    return zonalTable(zonalAggregateBlocks(zoneBlocks, valueBlocks, noDataZone), cellArea, ignoreNoData)
+
+## ================================================================================================================
+def zonalStatisticsRaster(zoneRaster, valueRaster, ignoreNoData=True, blockRows=512):
+    # Streams a zone raster (NoData outside the zones) and a value raster through the engine in bands of rows
+    # on the value raster's grid.  AREA is in the value raster's squared linear units.
+
+    info = rasterArrays.describeRaster(valueRaster)
+    zoneBlocks = rasterArrays.rowBlocks(zoneRaster, info, blockRows)
+    valueBlocks = rasterArrays.rowBlocks(valueRaster, info, blockRows)
+    return zonalStatisticsBlocks(zoneBlocks, valueBlocks, info["cellWidth"] * info["cellHeight"], ignoreNoData)
+
+## ================================================================================================================
+def relabelZones(aggregate, zoneKeys):
+    # Regroups an aggregate by any hashable key (text ids, for example).  zoneKeys maps each zone id in the
+    # aggregate to its key; zones that share a key are combined.  Returns the aggregate with consecutive
+    # integer zone ids and a dictionary of {zone id: key}.
+
+    codes = {}
+    zones = np.array([codes.setdefault(zoneKeys[zone], len(codes) + 1) for zone in aggregate["zones"].tolist()], dtype=np.int64)
+    relabeled = dict(aggregate)
+    relabeled["zones"] = zones
+    return mergeAggregates([relabeled]), dict((code, key) for key, code in codes.items())
+
+## ================================================================================================================
+def zonalStatisticsByFeatures(inFeatures, zoneField, valueRaster, zoneRaster, ignoreNoData=True, blockRows=512):
+    # Replacement for ZonalStatisticsAsTable(inFeatures, zoneField, valueRaster, ...) that returns the table in
+    # memory, keyed by the values of zoneField (text or numeric).  The features are rasterized by object id
+    # to zoneRaster on the value raster's grid by cell center, the same way ZonalStatisticsAsTable converts
+    # feature zones, and zoneRaster is deleted afterwards.  Requires arcpy.
+
+    import arcpy
+
+    zoneKeys = {}
+    with arcpy.da.SearchCursor(inFeatures, ["OID@", zoneField]) as cursor:
+        for oid, key in cursor:
+            zoneKeys[oid] = key
+
+    rasterArrays.polygonsToRaster(inFeatures, arcpy.Describe(inFeatures).OIDFieldName, valueRaster, zoneRaster)
+    try:
+        info = rasterArrays.describeRaster(valueRaster)
+        zoneBlocks = rasterArrays.rowBlocks(zoneRaster, info, blockRows)
+        valueBlocks = rasterArrays.rowBlocks(valueRaster, info, blockRows)
+        aggregate = zonalAggregateBlocks(zoneBlocks, valueBlocks)
+    finally:
+        if arcpy.Exists(zoneRaster):
+            arcpy.Delete_management(zoneRaster)
+
+    aggregate, keys = relabelZones(aggregate, zoneKeys)
+    table = zonalTable(aggregate, info["cellWidth"] * info["cellHeight"], ignoreNoData)
+    return dict((keys[zone], stats) for zone, stats in table.items())